@@ -19,6 +19,11 @@ Use this file as a live trading system base and update incrementally.
 # 1. CONFIGURATION & ENVIRONMENT SETUP
 # ================================
 import os
+import time
+
+# Cold-start clock: measured up to the first tick (see run_tick)
+STARTUP_T0 = time.perf_counter()
+
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -30,38 +35,136 @@ CONFIG = {
     "CDP_API_KEY_PRIVATE": os.getenv("CDP_API_KEY_PRIVATE"),
     "RPC_URL": os.getenv("RPC_URL"),
     "PAPER_TRADING": os.getenv("PAPER_TRADING", "True") == "True",
+    # Registered strategy name (strategy_registry.py); "default" = price vs SMA with RSI filter,
+    # "regime" = switch among default_strategies by the detected market regime (regime.py)
     "STRATEGY_MODE": os.getenv("STRATEGY_MODE", "default"),
+    # Optional JSON file {"strategy": ..., "params": {...}} that hot-swaps the running strategy
+    "STRATEGY_FILE": os.getenv("STRATEGY_FILE"),
+    # "stream" = O(1) incremental indicators, "batch" = pandas_ta/TA-Lib over the whole window
+    "INDICATOR_BACKEND": os.getenv("INDICATOR_BACKEND", "stream"),
+    # Shared on-disk OHLCV history (market_store.py); unset = simulated prices
+    "MARKET_DATA_DIR": os.getenv("MARKET_DATA_DIR"),
+    "SYMBOL": os.getenv("SYMBOL", "BTC-USD"),
+    # Live bars (market_feed.py): "coinbase", "tcp://host:port" or "stub"; unset = poll the store
+    "MARKET_FEED": os.getenv("MARKET_FEED"),
+    "FEED_TIMEFRAME": int(os.getenv("FEED_TIMEFRAME", 60)),
+    # Persisted CDP wallet seed, reused across runs instead of creating a wallet each time
+    "WALLET_FILE": os.getenv("WALLET_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "wallet_seed.json")),
+    # Retuned strategy_params written by optimizer.py (used when the file exists)
+    "STRATEGY_PARAMS_FILE": os.getenv("STRATEGY_PARAMS_FILE", "tuned_params.json"),
+    # Paper execution (paper_exchange.py): a "buy" opens a position worth TRADE_FRACTION of the
+    # agent's equity (or TRADE_SIZE units when set), never more than its cash covers;
+    # fees and slippage in basis points
+    "TRADE_SIZE": float(os.getenv("TRADE_SIZE")) if os.getenv("TRADE_SIZE") else None,
+    "TRADE_FRACTION": float(os.getenv("TRADE_FRACTION", 0.1)),
+    "PAPER_FEE_BPS": float(os.getenv("PAPER_FEE_BPS", 10)),
+    "PAPER_SLIPPAGE_BPS": float(os.getenv("PAPER_SLIPPAGE_BPS", 5)),
+    # Seconds from process start to first tick before we warn
+    "COLD_START_BUDGET": float(os.getenv("COLD_START_BUDGET", 1.0)),
     # Additional config parameters can be added here
 }
 
 # ================================
 # 2. WALLET, API, & RPC SETUP
 # ================================
-from cdp import Cdp, Wallet
-from web3 import Web3
+# Clients are created on first use, so importing this module (tests, backtests,
+# paper sessions) needs no network access and doesn't pay for the CDP/Web3 imports.
+# `AAA.wallet` and `AAA.web3` still work: they resolve through get_wallet()/get_web3().
+RPC_URL = CONFIG["RPC_URL"]
+_clients = {}
+
+def load_or_create_wallet(api_key_name, api_key_private, wallet_file=CONFIG["WALLET_FILE"]):
+    """
+    Configure CDP and reuse the persisted wallet, creating (and saving) one only if needed.
+    Same flow as agent2.py's load_or_create_wallet.
+    """
+    from cdp import Cdp, Wallet
+    Cdp.configure(api_key_name, api_key_private)
+    if os.path.exists(wallet_file):
+        try:
+            import json
+            with open(wallet_file, "r") as f:
+                wallet_id = json.load(f).get("id")
+            if not wallet_id:
+                raise ValueError("Wallet ID not found in seed file.")
+            wallet = Wallet.fetch(wallet_id)
+            wallet.load_seed_from_file(wallet_file)
+            print(f"✅ Wallet Loaded: {wallet.id}")
+            return wallet
+        except Exception as e:
+            print(f"Error loading wallet: {e}. Removing corrupt wallet file.")
+            os.remove(wallet_file)
+    wallet = Wallet.create("base-mainnet")
+    wallet.save_seed_to_file(wallet_file, encrypt=True)
+    print(f"✅ Wallet Created: {wallet.id}")
+    return wallet
 
-# Configure CDP API
-Cdp.configure(CONFIG["CDP_API_KEY_NAME"], CONFIG["CDP_API_KEY_PRIVATE"])
-wallet = Wallet.create("base-mainnet")
-print(f"✅ Wallet Created: {wallet.id}")
-print(f"✅ Default Address: {wallet.default_address.address_id}")
+def get_wallet():
+    if "wallet" not in _clients:
+        wallet = load_or_create_wallet(CONFIG["CDP_API_KEY_NAME"], CONFIG["CDP_API_KEY_PRIVATE"])
+        print(f"✅ Default Address: {wallet.default_address.address_id}")
+        _clients["wallet"] = wallet
+    return _clients["wallet"]
 
-# Set up RPC URL and Web3
-RPC_URL = CONFIG["RPC_URL"]
-web3 = Web3(Web3.HTTPProvider(RPC_URL))
-if web3.is_connected():
-    print("Connected to Ethereum network!")
-    print("Latest block number:", web3.eth.block_number)
-else:
-    print("Connection failed. Check your RPC_URL and network settings.")
+def get_web3():
+    if "web3" not in _clients:
+        from web3 import Web3
+        web3 = Web3(Web3.HTTPProvider(RPC_URL))
+        if web3.is_connected():
+            print("Connected to Ethereum network!")
+            print("Latest block number:", web3.eth.block_number)
+        else:
+            print("Connection failed. Check your RPC_URL and network settings.")
+        _clients["web3"] = web3
+    return _clients["web3"]
+
+def __getattr__(name):
+    # Lazy module attributes (PEP 562)
+    if name == "wallet":
+        return get_wallet()
+    if name == "web3":
+        return get_web3()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ================================
 # 3. AGENT SETUP & GUIDELINES
 # ================================
 import numpy as np
-import pandas as pd
-import pandas_ta as ta
-import talib
+from indicators import IndicatorEngine
+from market_store import MarketStore
+from instrumentation import instruments, span
+from paper_exchange import PaperExchange
+from clocks import get_clock
+from journal import journal
+from regime import REGIME_DEFAULTS, regimes
+from risk import risk
+from strategy_registry import HISTORY_INPUTS, SIGNAL_NAMES, strategies
+
+# pandas / pandas_ta / TA-Lib are only imported when INDICATOR_BACKEND=batch is used.
+
+# One memory-mapped copy of history shared by every agent in the process
+market_store = MarketStore(CONFIG["MARKET_DATA_DIR"]) if CONFIG["MARKET_DATA_DIR"] else None
+
+# Bars loaded on (re)start and by the batch backend: the indicator warm-up (100) or the
+# longest history-strategy window (SMA 200), whichever is longer. The regime detector's shared
+# history, which the streaming backend hands to the history strategies, must hold as many.
+from strategies import lookback
+TRAINING_BARS = max(100, lookback())
+if regimes.params.get("history", REGIME_DEFAULTS["history"]) < TRAINING_BARS:
+    regimes.params["history"] = TRAINING_BARS
+
+# Local order book that fills paper trades and keeps each agent's capital/profit
+paper_exchange = PaperExchange(fee_bps=CONFIG["PAPER_FEE_BPS"], slippage_bps=CONFIG["PAPER_SLIPPAGE_BPS"])
+
+def load_tuned_params(path=None):
+    """The "agent" params from the optimizer's output file, or {} if there is none."""
+    path = path or CONFIG["STRATEGY_PARAMS_FILE"]
+    if not path or not os.path.exists(path):
+        return {}
+    import json
+    with open(path) as f:
+        tuned = json.load(f).get("agent", {}).get("params", {})
+    return {k: int(v) for k, v in tuned.items()}
 
 class TradingAgent:
     """
@@ -69,8 +172,9 @@ class TradingAgent:
     Contains guidelines, roles, and basic attributes.
     Can be extended for dynamic strategy adjustments.
     """
-    def __init__(self, name, initial_capital=1000):
+    def __init__(self, name, initial_capital=1000, symbol=None):
         self.name = name
+        self.symbol = symbol or CONFIG["SYMBOL"]
         self.capital = initial_capital
         self.profit = 0
         # Parameters for strategy (these may be updated dynamically)
@@ -80,81 +184,208 @@ class TradingAgent:
             "rsi_overbought": int(os.getenv("RSI_OVERBOUGHT", 70)),
             "rsi_oversold": int(os.getenv("RSI_OVERSOLD", 30))
         }
+        self.strategy_params.update(load_tuned_params())
+        # update_strategy() widens the RSI thresholds relative to these (env or tuned) values
+        self.base_thresholds = (self.strategy_params["rsi_overbought"], self.strategy_params["rsi_oversold"])
+        # Compiled once; decide() calls it directly and update_strategy()/STRATEGY_FILE swap it in place.
+        # In "regime" mode update_strategy() picks the default strategy; hybrid until the regime is known.
+        self.regime_switching = CONFIG["STRATEGY_MODE"] == "regime"
+        mode = "hybrid" if self.regime_switching else CONFIG["STRATEGY_MODE"]
+        self.strategy = strategies.handle(mode, source=CONFIG["STRATEGY_FILE"])
+        self.strategy.swap(**{k: v for k, v in self.strategy_params.items() if k in self.strategy.params})
+        # Streaming indicator state (ring buffers), updated in O(1) per tick
+        self.indicators = IndicatorEngine(self.strategy_params)
+        self.market_data = None
+        self.last_ts = -1  # last bar read from the market store
+        self.feed = None   # market_feed Subscription, when a live feed is running
+        self.regime = None # RegimeDetector shared by every agent on this symbol (regime.py)
         # Initialize other necessary properties...
     
     def load_training_data(self):
         """
-        Load or simulate the latest 100 trades as training data.
-        Replace this with your actual data source.
+        Load the latest TRAINING_BARS bars (as of the session clock) from the market store, or simulate them.
+        market_data is a DataFrame for the batch backend, otherwise a dict of NumPy columns.
         """
-        prices = np.random.normal(loc=100, scale=5, size=100)
-        self.market_data = pd.DataFrame({
+        if market_store is not None:
+            bars = market_store.last(self.symbol, TRAINING_BARS, end_ts=get_clock().time_ns() + 1)
+            self.last_ts = int(bars.ts[-1]) if len(bars) else -1
+            prices = bars.close
+        else:
+            prices = np.random.normal(loc=100, scale=5, size=TRAINING_BARS)
+        self.market_data = {
             'price': prices,
-            # Add other columns as necessary (e.g., volume, open, close, color, etc.)
-        })
-    
+            # Add other columns as necessary (e.g., open, close, color, etc.)
+        }
+        if market_store is not None:
+            self.market_data['ts'] = bars.ts
+            self.market_data['volume'] = bars.volume
+        if CONFIG["INDICATOR_BACKEND"] == "batch":
+            import pandas as pd
+            self.market_data = pd.DataFrame(self.market_data)
+
+    def next_bars(self):
+        """
+        (timestamps, closes, volumes) of the bars that arrived since the last call
+        (from the live feed, new bars in the market store, or one simulated tick).
+        Timestamps and volumes are None for simulated prices.
+        """
+        if self.feed is not None:
+            bars = self.feed.drain()
+            return [bar.ts for bar in bars], [bar.close for bar in bars], [bar.volume for bar in bars]
+        if market_store is None:
+            return None, [np.random.normal(loc=100, scale=5)], None
+        bars = market_store.range(self.symbol, self.last_ts + 1, get_clock().time_ns() + 1)
+        if len(bars):
+            self.last_ts = int(bars.ts[-1])
+        return bars.ts, bars.close, bars.volume
+
+    def next_prices(self):
+        """Closes that arrived since the last call (see next_bars)."""
+        return self.next_bars()[1]
+
+    @property
+    def market(self):
+        """
+        Key of the price series this agent trades: its symbol, shared with every agent on
+        it, or "symbol/name" when there is no feed or market store and the prices are this
+        agent's own simulation (so it gets its own regime detector and paper product).
+        """
+        if self.feed is not None or market_store is not None:
+            return self.symbol
+        return f"{self.symbol}/{self.name}"
+
+    def observe_regime(self, ts, prices, volumes=None):
+        """
+        Push new closes (and volumes) into the market's regime detector; bars
+        another agent already pushed are skipped.
+        """
+        self.regime = regimes.update(self.market, prices, ts, volumes)
+
+    def mark_price(self):
+        """
+        Price the paper exchange marks this agent's market at: the symbol's latest bar as of
+        the session clock from the market store, else the newest close any agent on the
+        symbol took from the feed (its shared regime history), else the agent's own price.
+        """
+        if market_store is not None:
+            bars = market_store.last(self.symbol, 1, end_ts=get_clock().time_ns() + 1)
+            if len(bars):
+                return float(bars.close[-1])
+        if self.regime is not None and self.regime.history.count:
+            return self.regime.history.last()
+        return self.last_price()
+
     def update_strategy(self):
         """
         Dynamically adjust strategy parameters based on market conditions.
         For example, use volatility measures or other indicators.
         """
-        volatility = self.market_data['price'].std()
-        # Example: widen RSI thresholds if volatility is high
-        if volatility > 5:
-            self.strategy_params["rsi_overbought"] = 75
-            self.strategy_params["rsi_oversold"] = 25
+        if CONFIG["INDICATOR_BACKEND"] == "batch":
+            # Rolling std kept by the shared regime detector (O(1) per bar, once per symbol)
+            # instead of a std over the whole window on every call
+            volatility = self.regime.price_std.value
         else:
-            self.strategy_params["rsi_overbought"] = 70
-            self.strategy_params["rsi_oversold"] = 30
+            volatility = self.indicators.volatility.value
+        if self.regime_switching:
+            regime = self.regime.regime
+            if regime is not None and regime != self.strategy.name:
+                previous = self.strategy.name
+                self.strategy.swap(regime)
+                print(f"[{self.name}] Regime {regime}: strategy {previous} -> {regime}")
+        # Widen the RSI thresholds while volatility is high (the backtester's "agent" rule does the same)
+        overbought, oversold = rsi_thresholds(*self.base_thresholds, volatility > VOLATILITY_RULE["threshold"])
+        self.strategy_params["rsi_overbought"] = overbought
+        self.strategy_params["rsi_oversold"] = oversold
+        self.strategy.refresh()
+        # Re-bind the thresholds only when they change; compiled variants are cached
+        bound = self.strategy.params
+        thresholds = {k: self.strategy_params[k] for k in ("rsi_overbought", "rsi_oversold") if k in bound}
+        if any(bound[k] != v for k, v in thresholds.items()):
+            self.strategy.swap(**thresholds)
     
     def evaluate_trade_signal(self):
         """
         Evaluate the trading signal using a simple dynamic strategy.
+        The streaming backend warms up on the training data once and then
+        updates its ring buffers with one new price per call.
+        """
+        if CONFIG["INDICATOR_BACKEND"] == "batch":
+            return self.evaluate_trade_signal_batch()
+        if self.indicators.ticks == 0:
+            with span("data_load", self.name):
+                self.load_training_data()
+                ts, prices, volumes = (self.market_data.get(k) for k in ('ts', 'price', 'volume'))
+            with span("indicators", self.name):
+                self.indicators.warm_up(prices)
+                self.observe_regime(ts, prices, volumes)
+        else:
+            with span("data_load", self.name):
+                ts, prices, volumes = self.next_bars()
+            with span("indicators", self.name):
+                for price in prices:
+                    self.indicators.update(price)
+                self.observe_regime(ts, prices, volumes)
+        with span("update_strategy", self.name):
+            self.update_strategy()
+        with span("signal", self.name):
+            return self.decide(self.indicators.price, self.indicators.sma.value, self.indicators.rsi.value)
+
+    def evaluate_trade_signal_batch(self):
+        """
+        Evaluate the trading signal over the full window.
         Uses pandas_ta and talib to compute indicators.
         """
+        import pandas_ta as ta
+        import talib
         self.load_training_data()
+        ts = self.market_data['ts'].values if 'ts' in self.market_data else None
+        volumes = self.market_data['volume'].values if 'volume' in self.market_data else None
+        prices = self.market_data['price'].values
+        if ts is None and self.regime is not None:
+            # Simulated bars have no timestamps to skip by: the window seeded the detector
+            # on the first call, and every later call has one new bar for it
+            prices, volumes = prices[-1:], None if volumes is None else volumes[-1:]
+        self.observe_regime(ts, prices, volumes)
         self.update_strategy()
         # Compute a simple moving average with pandas_ta
         self.market_data['SMA'] = ta.sma(self.market_data['price'], length=self.strategy_params["ma_period"])
         # Compute RSI with TA-Lib
         self.market_data['RSI'] = talib.RSI(self.market_data['price'].values, timeperiod=self.strategy_params["rsi_period"])
         
-        # Simple logic: if last price > SMA and RSI is below overbought -> buy; else hold.
         last_price = self.market_data['price'].iloc[-1]
         last_sma = self.market_data['SMA'].iloc[-1]
         last_rsi = self.market_data['RSI'].iloc[-1]
-        
-        if last_price > last_sma and last_rsi < self.strategy_params["rsi_overbought"]:
-            return "buy"
-        elif last_price < last_sma and last_rsi > self.strategy_params["rsi_oversold"]:
-            return "sell"
-        else:
-            return "hold"
+        return self.decide(last_price, last_sma, last_rsi)
+
+    def last_price(self):
+        if CONFIG["INDICATOR_BACKEND"] == "batch":
+            return float(self.market_data['price'].iloc[-1])
+        return self.indicators.price
+
+    def decide(self, last_price, last_sma, last_rsi):
+        # Price vs SMA with RSI filter by default; history strategies (trend, volatility, ...)
+        # read the close/volume window instead (volume None: not recorded, no volume filter).
+        strategy = self.strategy.compiled
+        if strategy.inputs is HISTORY_INPUTS:
+            if CONFIG["INDICATOR_BACKEND"] == "batch":
+                window = self.market_data['price'].values
+                volume = self.market_data['volume'].values if 'volume' in self.market_data else None
+            elif self.regime is not None:
+                # The symbol's shared close/volume history: long enough for the SMA 200 rules
+                window, volume = self.regime.history.values(), self.regime.history_volume()
+            else:
+                window, volume = self.indicators.volatility.buffer.values(), None
+            return SIGNAL_NAMES[int(strategy.fn(window, volume))]
+        return SIGNAL_NAMES[int(strategy.fn(last_price, last_sma, last_rsi))]
 
 # ================================
 # 4. DYNAMIC STRATEGY DEFINITIONS
 # ================================
-# You can define multiple default setups here.
-# For instance, four default strategies can be stored in a dictionary.
-default_strategies = {
-    "trend": {
-        "description": "SMA 50 & 200, RSI",
-        "params": {"ma_short": 50, "ma_long": 200, "rsi_period": 14}
-    },
-    "volatility": {
-        "description": "Bollinger Bands & MACD",
-        "params": {"bbands_length": 20, "macd_fast": 8, "macd_slow": 21}
-    },
-    "momentum": {
-        "description": "EMA crossovers, Volume SMA",
-        "params": {"ema_short": 20, "ema_long": 50, "volume_sma": 20}
-    },
-    "hybrid": {
-        "description": "Combination of trend and momentum",
-        "params": {"sma_short": 50, "sma_long": 200, "ema": 20, "rsi": 14}
-    }
-}
+# The four default setups (trend, volatility, momentum, hybrid) live in strategies.py
+# so the backtester can use them without touching CDP/Web3.
+from strategies import VOLATILITY_RULE, default_strategies, rsi_thresholds
 # These strategies can be dynamically selected and parameters updated via CONFIG/ENV.
+# Use backtest.py to evaluate them (and parameter grids around them) on history.
 
 # ================================
 # 5. SESSION & ACCOUNT PROCEDURES
@@ -163,17 +394,168 @@ def run_session(agent: TradingAgent, session_duration=300):
     """
     Run a trading session for a given agent.
     For simplicity, we loop until the session duration expires.
+    Time comes from the session clock (clocks.py), so a SimClock runs this at CPU speed.
     """
-    import time
-    start_time = time.time()
-    while time.time() - start_time < session_duration:
-        signal = agent.evaluate_trade_signal()
-        print(f"{agent.name}: Signal={signal}, Capital={agent.capital}, Profit={agent.profit}")
-        # Insert execution logic (paper trade or live trade) here:
-        # execute_trade(wallet, signal, asset_from, asset_to, trade_amount)
-        time.sleep(5)  # Wait a bit between iterations (adjust as needed)
+    clock = get_clock()
+    start_time = clock.time()
+    journal.session_start(agent.name, agent.capital)
+    while clock.time() - start_time < session_duration:
+        run_tick(agent)
+        clock.sleep(5)  # Wait a bit between iterations (adjust as needed)
+    journal.session_end(agent.name, agent.capital, agent.profit)
     print(f"Session complete for {agent.name}. Final Profit: {agent.profit}")
 
+_first_tick_done = False
+
+def report_cold_start(agent_name):
+    """
+    Time from process start to the first evaluated tick, checked against COLD_START_BUDGET.
+    """
+    global _first_tick_done
+    _first_tick_done = True
+    elapsed = time.perf_counter() - STARTUP_T0
+    instruments.record("cold_start", elapsed, agent_name)
+    budget = CONFIG["COLD_START_BUDGET"]
+    status = "✅" if elapsed <= budget else "⚠️ over budget:"
+    print(f"{status} First tick ({agent_name}) {elapsed * 1000:.0f} ms after start (budget {budget * 1000:.0f} ms)")
+    return elapsed
+
+def buy_target(account, market, price):
+    """
+    Position a "buy" signal takes a flat account to: TRADE_SIZE units when set, otherwise
+    TRADE_FRACTION of its equity at `price`; capped at what its cash covers after fees
+    and slippage. An open position is kept as it is.
+    """
+    held = account.positions.get(market, 0.0)
+    if held > 0 or price <= 0:
+        return held
+    cost = price * (1 + paper_exchange.taker_fee + paper_exchange.slippage + paper_exchange.half_spread)
+    affordable = held + max(account.cash, 0.0) / cost
+    wanted = CONFIG["TRADE_SIZE"] or CONFIG["TRADE_FRACTION"] * account.equity(paper_exchange.marks) / price
+    return max(held, min(wanted, affordable))
+
+def execute_paper_trade(agent: TradingAgent, signal):
+    """
+    Fill a signal on the paper exchange: "buy" opens a position sized from the agent's
+    capital (buy_target), "sell" closes it, "hold" only marks it to market. Fills update
+    agent.capital/profit. Orders pass the pre-trade risk checks (risk.py) first.
+    """
+    if agent.name not in paper_exchange.accounts:
+        paper_exchange.bind(agent)
+    market, price = agent.market, agent.mark_price()
+    paper_exchange.update_price(market, price)
+    account = paper_exchange.accounts[agent.name]
+    held = account.positions.get(market, 0.0)
+    if signal == "buy":
+        target = buy_target(account, market, price)
+    else:
+        target = 0.0 if signal == "sell" else held
+    if abs(target - held) > 1e-12:
+        side = "BUY" if target > held else "SELL"
+        size = abs(target - held)
+        reason = risk.check_order(agent.name, side, agent.symbol, size, price)
+        if reason is not None:
+            print(f"[{agent.name} RISK] {side} {size} {agent.symbol} rejected: {reason}")
+        else:
+            order = paper_exchange.place_order(side, market, size, account=agent.name)
+            risk.settle(agent.name, side, agent.symbol, size, order['filled_size'], price)
+            journal.order(agent.name, order)
+            print(f"[{agent.name} PAPER] {side} {order['filled_size']:.8g} {market} @ {order['average_filled_price']:.2f} ({order['status']})")
+    paper_exchange.mark_to_market(agent.name)
+    risk.update_equity(agent.name, agent.capital)
+
+def run_tick(agent: TradingAgent, verbose=True, lease=None):
+    """
+    One iteration of a session: evaluate the signal and act on it.
+    Under a coordinator `lease` (fleet.py), the signal is only acted on if the
+    lease is still valid once it has been evaluated.
+    """
+    with span("tick", agent.name):
+        signal = agent.evaluate_trade_signal()
+    if not _first_tick_done:
+        report_cold_start(agent.name)
+    journal.signal(agent.name, agent.symbol, signal, agent.last_price())
+    if lease is not None and not lease.valid():
+        # The wallet may already belong to another worker: nothing is signed from here
+        print(f"{agent.name}: lease lost, not acting on {signal}")
+        return None
+    if CONFIG["PAPER_TRADING"]:
+        execute_paper_trade(agent, signal)
+    # Live execution goes here:
+    # execute_trade(wallet, signal, asset_from, asset_to, trade_amount)
+    if verbose:
+        print(f"{agent.name}: Signal={signal}, Capital={agent.capital:.2f}, Profit={agent.profit:.2f}")
+    return signal
+
+def run_sessions(agents, session_duration=300, interval=5, jitter=0.5):
+    """
+    Run sessions for many agents concurrently on one event loop.
+    Each agent ticks every `interval` seconds (plus up to `jitter` seconds).
+    Under a simulated clock the session is replayed instead (see replay_sessions).
+    """
+    from functools import partial
+    clock = get_clock()
+    if getattr(clock, "simulated", False):
+        return replay_sessions(agents, clock.time(), clock.time() + session_duration, interval, clock=clock)
+    from scheduler import AgentScheduler
+    scheduler = AgentScheduler()
+    for agent in agents:
+        journal.session_start(agent.name, agent.capital)
+        scheduler.add(agent.name, partial(run_tick, agent), interval=interval, jitter=jitter)
+    stats = scheduler.start(duration=session_duration)
+    for agent in agents:
+        journal.session_end(agent.name, agent.capital, agent.profit)
+        print(f"Session complete for {agent.name}. Final Profit: {agent.profit} "
+              f"(ticks={stats[agent.name]['ticks']}, missed={stats[agent.name]['missed']})")
+    return stats
+
+def start_market_feed(agents, spec=None):
+    """
+    Start the live ingestion pipeline on its own thread and subscribe every agent
+    to FEED_TIMEFRAME bars of its symbol. A lagging agent loses its oldest bars
+    instead of holding up the feed. Closed bars are also appended to the market store.
+    """
+    from market_feed import FeedPipeline, StubSource, TcpSource, WebSocketSource
+    spec = spec or CONFIG["MARKET_FEED"]
+    symbols = sorted(set(agent.symbol for agent in agents))
+    timeframe = CONFIG["FEED_TIMEFRAME"]
+    if spec == "coinbase":
+        source = WebSocketSource(symbols)
+    elif spec.startswith("tcp://"):
+        host, port = spec[len("tcp://"):].rsplit(":", 1)
+        source = TcpSource(host, int(port))
+    elif spec == "stub":
+        source = StubSource(symbols, rate=1000)
+    else:
+        raise ValueError(f"Unknown MARKET_FEED {spec!r}")
+    pipeline = FeedPipeline(source, timeframes=sorted({1, timeframe}), store=market_store, store_timeframe=timeframe)
+    for agent in agents:
+        agent.feed = pipeline.subscribe(agent.name, symbols=[agent.symbol], timeframes=[timeframe], maxsize=256)
+    print(f"📡 Market feed {spec}: {', '.join(symbols)} ({timeframe}s bars)")
+    return pipeline.start()
+
+def replay_sessions(agents, start, end, interval=5, speed=None, clock=None, seed=None, verbose=False):
+    """
+    Replay agents over recorded history between `start` and `end` (epoch seconds):
+    store bars mark the paper exchange, and each agent ticks every `interval`
+    simulated seconds. speed=None runs as fast as possible, speed=N at N x real time.
+    Deterministic for a given seed.
+    """
+    from functools import partial
+    from replay import ReplayEngine
+    engine = ReplayEngine(start, end, speed=speed, clock=clock, seed=seed)
+    if market_store is not None:
+        engine.add_store(market_store, sorted(set(agent.symbol for agent in agents)), on_bar=paper_exchange.update_price)
+    for agent in agents:
+        engine.at(start, partial(journal.session_start, agent.name, agent.capital))
+        engine.every(interval, partial(run_tick, agent, verbose))
+    stats = engine.run()
+    for agent in agents:
+        journal.session_end(agent.name, agent.capital, agent.profit)
+        print(f"Replay complete for {agent.name}. Final Capital: {agent.capital:.2f}, Profit: {agent.profit:.2f}")
+    print(f"Replayed {end - start:.0f}s: {stats['bars']} bars, {stats['ticks']} ticks, {stats['errors']} errors")
+    return {agent.name: {"capital": agent.capital, "profit": agent.profit} for agent in agents}
+
 # ================================
 # 6. ERC-3525 / TOKENIZED AGENT CONCEPT (Outline)
 # ================================
@@ -199,17 +581,56 @@ def run_session(agent: TradingAgent, session_duration=300):
 #
 # # Integration with Alchemy or other blockchain APIs can occur here.
 # # This outline serves as a guide for further development.
+#
+# For thousands of tokenized agents per process, use agent_registry.py instead of one
+# object per agent: capital, profit, strategy_params and the slots above are NumPy
+# columns, each agent is a small AgentView, and one vectorized step ticks them all:
+#
+# from agent_registry import AgentRegistry
+# registry = AgentRegistry()
+# agent = registry.add("Agent_1", symbol=CONFIG["SYMBOL"], token_id=1)
+# agent.slots["risk_profile"] = 0.5
+# registry.step({CONFIG["SYMBOL"]: market_store.last(CONFIG["SYMBOL"], 100).close})
+# registry.update_slots()
 
 # ================================
 # MAIN EXECUTION
 # ================================
 if __name__ == "__main__":
+    # Live trading needs the wallet and RPC up front; paper sessions never touch them.
+    if not CONFIG["PAPER_TRADING"]:
+        get_wallet()
+        get_web3()
+
     # Create a few agent instances for live trading.
     agents = [TradingAgent(f"Agent_{i+1}") for i in range(4)]
     
-    # Run a session for each agent. In a real system, these might run concurrently.
-    for agent in agents:
-        run_session(agent, session_duration=60)  # Short session for demonstration
+    if os.getenv("REPLAY_START"):
+        # Replay recorded history from MARKET_DATA_DIR, e.g. REPLAY_START=1717200000 REPLAY_END=1719792000
+        start = float(os.getenv("REPLAY_START"))
+        end = float(os.getenv("REPLAY_END", start + 86400))
+        speed = float(os.getenv("REPLAY_SPEED", 0)) or None
+        replay_sessions(agents, start, end, speed=speed, seed=int(os.getenv("REPLAY_SEED", 0)))
+    else:
+        # Live bars for the agents (MARKET_FEED=coinbase), instead of polling the store
+        feed = start_market_feed(agents) if CONFIG["MARKET_FEED"] else None
+        # Run all sessions concurrently on one event loop.
+        run_sessions(agents, session_duration=60)  # Short session for demonstration
+        if feed is not None:
+            stats = feed.stop()
+            print(f"📡 Feed: {stats['ticks']} ticks, {stats['bars']} bars, {stats['ticks_per_sec']} ticks/s")
+
+    # Signals, orders and fills of the run (enable with AAA_JOURNAL_DIR=<dir>); analyze with journal.py
+    if journal.enabled:
+        journal.close()
+        from journal import load_session
+        for row in load_session(journal.path).pnl():
+            print(f"📒 {row['agent']} {row['symbol']}: fills={row['fills']} fees={row['fees']:.2f} pnl={row['pnl']:.2f}")
+        print(f"📒 Journal written to {journal.path}")
+
+    # Per-agent span latencies (enable with AAA_METRICS=1)
+    if instruments.enabled:
+        print(instruments.prometheus_text())
 
     # Final session/account procedures would include profit reconciliation, wallet updates,
     # and potentially transferring profits or reconfiguring for the next session.
@@ -5,7 +5,6 @@
  
  #env python3
  import os
- import time
  import json
  import logging
  import argparse
@@ -13,6 +12,14 @@
  from dotenv import load_dotenv
  from web3 import Web3
  from cdp import Cdp, Wallet
+ from slot_monitor import SlotMonitor
+ from tx_pipeline import TxPipeline
+ from slot_watcher import SlotWatcher
+ from instrumentation import instruments, span
+ from clocks import get_clock
+ from strategy_registry import JsonFileWatch, strategies
+ from journal import journal
+ from risk import risk
  
  # Setup logging
  logging.basicConfig(
@@ -37,9 +44,20 @@
  def parse_args():
      parser = argparse.ArgumentParser()
      parser.add_argument('--paper', action='store_true', help='Enable paper trading mode (simulate transactions)')
-     parser.add_argument('--strategy', type=str, default='default', help='Select strategy mode (default, alternate)')
+     parser.add_argument('--strategy', type=str, default='default', help='Select strategy mode (default, alternate, multi)')
+     parser.add_argument('--slots', type=str, default='1:50,2:100', help='slot:threshold pairs managed by the multi strategy')
+     parser.add_argument('--multicall', action='store_true', help='Fold slot reads into one Multicall3 aggregate3 call')
+     parser.add_argument('--watch', action='store_true', help='Follow TransferValue/SlotChanged logs instead of polling every 10s')
      args = parser.parse_args()
-     return args.paper, args.strategy
+     return args.paper, args.strategy, parse_slot_thresholds(args.slots), args.multicall, args.watch
+ 
+ def parse_slot_thresholds(spec):
+     # "1:50,2:100" -> {1: Decimal("50"), 2: Decimal("100")}
+     thresholds = {}
+     for pair in filter(None, (p.strip() for p in spec.split(','))):
+         slot, threshold = pair.split(':')
+         thresholds[int(slot)] = Decimal(threshold)
+     return thresholds
  
  # Define wallet file location.
  WALLET_FILE = os.path.join(os.path.dirname(__file__), "wallet_seed.json")
@@ -109,93 +127,185 @@
      logger.info(f"Using account address: {account.address}")
      return account
  
- def simple_strategy(web3, contract, account, paper_mode):
-     slot = 1
-     threshold = Decimal("50")
+ # Mints queued on the TxPipeline by slot, so a slot isn't topped up twice while its mint is in flight.
+ pending_mints = {}
+ 
+ def queue_mint(pipeline, contract, account, slot, mint_value):
+     pending = pending_mints.get(slot)
+     if pending is not None and not pending.done():
+         logger.info(f"Mint for slot {slot} still in flight ({pending}). Skipping.")
+         return pending
+     pending_mints[slot] = pipeline.submit(contract.functions._mint(account.address, slot, int(mint_value)), label=f"slot {slot}")
+     logger.info(f"Mint of {mint_value} tokens in slot {slot} queued on the transaction pipeline.")
+     return pending_mints[slot]
+ 
+ # Slot presets for --strategy; 'multi' manages the --slots thresholds instead.
+ SLOT_PRESETS = {'default': {1: Decimal("50")}, 'alternate': {2: Decimal("100")}}
+ 
+ def send_mint(web3, contract, account, slot, mint_value, nonce=None, gas_price=None):
+     # Synchronous fallback when no TxPipeline is running.
      try:
-         slot_balance = contract.functions.slotBalance(slot).call()
-         logger.info(f"Current balance for slot {slot}: {slot_balance}")
+         txn = contract.functions._mint(account.address, slot, int(mint_value)).buildTransaction({
+             'from': account.address,
+             'nonce': web3.eth.getTransactionCount(account.address) if nonce is None else nonce,
+             'gas': 300000,
+             'gasPrice': gas_price or web3.toWei('5', 'gwei')
+         })
+         signed_txn = web3.eth.account.signTransaction(txn, private_key=account.privateKey)
+         tx_hash = web3.eth.sendRawTransaction(signed_txn.rawTransaction)
+         logger.info(f"Mint transaction sent for slot {slot}, tx hash: {web3.toHex(tx_hash)}")
+         journal.mint("ERC3525", slot, mint_value, "sent", web3.toHex(tx_hash), txn['nonce'])
+         return True
      except Exception as e:
-         logger.error(f"Error reading slot balance: {e}")
-         slot_balance = 0
-     if Decimal(slot_balance) < threshold:
-         logger.info("Balance below threshold. Proceeding to mint additional tokens.")
-         mint_value = threshold - Decimal(slot_balance)
-         if paper_mode:
-             logger.info(f"(Paper Trade) Simulate minting {mint_value} tokens in slot {slot}.")
-         else:
-             try:
-                 txn = contract.functions._mint(account.address, slot, int(mint_value)).buildTransaction({
-                     'from': account.address,
-                     'nonce': web3.eth.getTransactionCount(account.address),
-                     'gas': 300000,
-                     'gasPrice': web3.toWei('5', 'gwei')
-                 })
-                 signed_txn = web3.eth.account.signTransaction(txn, private_key=account.privateKey)
-                 tx_hash = web3.eth.sendRawTransaction(signed_txn.rawTransaction)
-                 logger.info(f"Mint transaction sent, tx hash: {web3.toHex(tx_hash)}")
-             except Exception as e:
-                 logger.error(f"Error sending mint transaction: {e}", exc_info=True)
+         logger.error(f"Error sending mint transaction for slot {slot}: {e}", exc_info=True)
+         journal.mint("ERC3525", slot, mint_value, "failed", nonce=nonce)
+         return False
+ 
+ def resolve_strategy(strategy_mode, thresholds=None):
+     # Done once per loop (and on a hot swap), never per tick: one compiled slot_topup rule per slot.
+     mode = strategy_mode.lower()
+     if mode == 'multi' and thresholds:
+         slots, label = thresholds, "(Multi) "
      else:
-         logger.info("Balance meets threshold. No minting necessary.")
+         if mode not in SLOT_PRESETS:
+             logger.warning("Unknown strategy mode specified. Defaulting to simple strategy.")
+             mode = 'default'
+         slots, label = SLOT_PRESETS[mode], "(Alternate) " if mode == 'alternate' else ""
+     rules = {slot: strategies.compile('slot_topup', threshold=threshold) for slot, threshold in slots.items()}
+     return rules, label
  
- def alternate_strategy(web3, contract, account, paper_mode):
-     slot = 2
-     threshold = Decimal("100")
-     try:
-         slot_balance = contract.functions.slotBalance(slot).call()
-         logger.info(f"(Alternate) Current balance for slot {slot}: {slot_balance}")
-     except Exception as e:
-         logger.error(f"Error reading slot balance for alternate strategy: {e}")
-         slot_balance = 0
-     if Decimal(slot_balance) < threshold:
-         logger.info("(Alternate) Balance below threshold. Minting additional tokens.")
-         mint_value = threshold - Decimal(slot_balance)
+ def read_slot_balances(contract, slots, monitor=None):
+     # All slot balances, the pending nonce and the gas price in one batched RPC round trip when a
+     # monitor is available; otherwise one slotBalance call per slot (a failed read counts as 0).
+     if monitor is not None:
+         snapshot = monitor.read(slots)
+         logger.info(f"Slots: {snapshot}")
+         return {slot: snapshot.balance(slot) for slot in slots if slot not in snapshot.errors}, snapshot
+     balances = {}
+     for slot in slots:
+         try:
+             balances[slot] = contract.functions.slotBalance(slot).call()
+             logger.info(f"Current balance for slot {slot}: {balances[slot]}")
+         except Exception as e:
+             logger.error(f"Error reading slot balance for slot {slot}: {e}")
+             balances[slot] = 0
+     return balances, None
+ 
+ def slot_strategy(web3, contract, account, paper_mode, rules, monitor=None, pipeline=None, label=""):
+     # Top every managed slot back up to its threshold; `rules` comes from resolve_strategy().
+     balances, snapshot = read_slot_balances(contract, list(rules), monitor)
+     nonce = snapshot.nonce if snapshot is not None else None
+     gas_price = snapshot.gas_price if snapshot is not None else None
+     for slot, rule in rules.items():
+         if slot not in balances:
+             continue
+         slot_balance = Decimal(balances[slot])
+         journal.slot_balance("ERC3525", slot, slot_balance, rule.params['threshold'])
+         mint_value = rule(slot_balance)
+         if mint_value <= 0:
+             logger.info(f"{label}Slot {slot} balance {slot_balance} meets threshold. No minting necessary.")
+             continue
+         logger.info(f"{label}Slot {slot} balance {slot_balance} below threshold {rule.params['threshold']}. Minting {mint_value} tokens.")
+         # Mint caps per slot and the kill switch (risk.py); the amount may come back clipped or 0
+         allowed = risk.check_mint("ERC3525", slot, mint_value)
+         if allowed <= 0:
+             logger.warning(f"{label}Mint of {mint_value} in slot {slot} blocked by risk limits.")
+             continue
+         if allowed < mint_value:
+             logger.warning(f"{label}Mint in slot {slot} clipped from {mint_value} to {allowed} by risk limits.")
+             mint_value = allowed
          if paper_mode:
-             logger.info(f"(Paper Trade) (Alternate) Simulate minting {mint_value} tokens in slot {slot}.")
-         else:
-             try:
-                 txn = contract.functions._mint(account.address, slot, int(mint_value)).buildTransaction({
-                     'from': account.address,
-                     'nonce': web3.eth.getTransactionCount(account.address),
-                     'gas': 300000,
-                     'gasPrice': web3.toWei('5', 'gwei')
-                 })
-                 signed_txn = web3.eth.account.signTransaction(txn, private_key=account.privateKey)
-                 tx_hash = web3.eth.sendRawTransaction(signed_txn.rawTransaction)
-                 logger.info(f"(Alternate) Mint transaction sent, tx hash: {web3.toHex(tx_hash)}")
-             except Exception as e:
-                 logger.error(f"Error sending mint transaction in alternate strategy: {e}", exc_info=True)
-     else:
-         logger.info("(Alternate) Balance meets threshold. No action required.")
+             logger.info(f"(Paper Trade) {label}Simulate minting {mint_value} tokens in slot {slot}.")
+             journal.mint("ERC3525", slot, mint_value, "paper")
+         elif pipeline is not None:
+             queue_mint(pipeline, contract, account, slot, mint_value)
+             journal.mint("ERC3525", slot, mint_value, "queued")
+         elif send_mint(web3, contract, account, slot, mint_value, nonce, gas_price) and nonce is not None:
+             nonce += 1
+ 
+ def run_strategy(web3, contract, account, paper_mode, strategy_mode, monitor=None, thresholds=None, pipeline=None):
+     # One tick of the agent, for scheduler.AgentScheduler and other callers that hold a mode name;
+     # main_loop resolves the strategy once and calls slot_strategy directly.
+     rules, label = resolve_strategy(strategy_mode, thresholds)
+     slot_strategy(web3, contract, account, paper_mode, rules, monitor, pipeline, label)
  
- def main_loop(web3, contract, account, paper_mode, strategy_mode):
-     while True:
+ def main_loop(web3, contract, account, paper_mode, strategy_mode, monitor=None, thresholds=None, pipeline=None,
+               interval=10, until=None, clock=None, strategy_file=None):
+     # Sleeps go through the session clock (clocks.py); `until` stops the loop at a clock time.
+     # `strategy_file` ({"strategy": "alternate"} or {"strategy": "multi", "slots": "1:60,3:20"})
+     # swaps the strategy between ticks without a restart.
+     clock = clock or get_clock()
+     rules, label = resolve_strategy(strategy_mode, thresholds)
+     watch = JsonFileWatch(strategy_file) if strategy_file else None
+     while until is None or clock.time() < until:
          try:
-             if strategy_mode.lower() == 'default':
-                 simple_strategy(web3, contract, account, paper_mode)
-             elif strategy_mode.lower() == 'alternate':
-                 alternate_strategy(web3, contract, account, paper_mode)
-             else:
-                 logger.warning("Unknown strategy mode specified. Defaulting to simple strategy.")
-                 simple_strategy(web3, contract, account, paper_mode)
+             spec = watch.changed() if watch is not None else None
+             if spec is not None:
+                 strategy_mode = spec.get('strategy', strategy_mode)
+                 if 'slots' in spec:
+                     thresholds = parse_slot_thresholds(spec['slots'])
+                 rules, label = resolve_strategy(strategy_mode, thresholds)
+                 logger.info(f"Strategy switched to {strategy_mode}: " + str({slot: rule.params['threshold'] for slot, rule in rules.items()}))
+             with span("strategy_tick", "ERC3525"):
+                 slot_strategy(web3, contract, account, paper_mode, rules, monitor, pipeline, label)
          except Exception as e:
              logger.error(f"Error in main loop: {e}", exc_info=True)
-         time.sleep(10)  # Adjust the interval as needed
+         clock.sleep(interval)  # Adjust the interval as needed
+ 
+ def watch_loop(web3, contract, account, paper_mode, monitor, thresholds, pipeline=None, poll_interval=2):
+     # Event-driven mode: the slot index is updated from contract logs each block, and we only
+     # act when a slot's balance drops below its threshold.
+     def on_cross(slot, slot_balance, threshold, below):
+         if not below:
+             logger.info(f"(Watch) Slot {slot} back at {slot_balance} (threshold {threshold}).")
+             return
+         mint_value = threshold - Decimal(slot_balance)
+         logger.info(f"(Watch) Slot {slot} fell to {slot_balance}, below threshold {threshold}.")
+         journal.slot_balance("ERC3525", slot, slot_balance, threshold)
+         allowed = risk.check_mint("ERC3525", slot, mint_value)
+         if allowed <= 0:
+             logger.warning(f"(Watch) Mint of {mint_value} in slot {slot} blocked by risk limits.")
+             return
+         mint_value = min(mint_value, allowed)
+         if paper_mode:
+             logger.info(f"(Paper Trade) (Watch) Simulate minting {mint_value} tokens in slot {slot}.")
+             journal.mint("ERC3525", slot, mint_value, "paper")
+         elif pipeline is not None:
+             queue_mint(pipeline, contract, account, slot, mint_value)
+             journal.mint("ERC3525", slot, mint_value, "queued")
+         else:
+             logger.warning(f"(Watch) No transaction pipeline; not minting slot {slot}.")
+ 
+     watcher = SlotWatcher(monitor, thresholds, on_cross=on_cross)
+     watcher.run(poll_interval=poll_interval)
  
  def main():
      try:
-         paper_mode, strategy_mode = parse_args()
+         paper_mode, strategy_mode, thresholds, use_multicall, watch = parse_args()
          rpc_url, erc3525_address, api_key_name, api_key_private, private_key = setup_env()
          web3 = init_web3(rpc_url)
          wallet = load_or_create_wallet(api_key_name, api_key_private)
          account = get_account(web3, private_key, wallet)
          contract = load_contract(web3, erc3525_address)
+         monitor = SlotMonitor(rpc_url, contract.address, account.address, slots=thresholds, use_multicall=use_multicall)
+         # Periodic span latency snapshot next to the log (AAA_METRICS=1)
+         if instruments.enabled:
+             instruments.start_json_snapshots(os.path.join(os.path.dirname(__file__), "erc3525_metrics.json"), interval=60)
+         # Local nonces, background signing/sending and receipt tracking for live mints
+         pipeline = None if paper_mode else TxPipeline(web3, account, gas=300000).start()
+         if watch:
+             logger.info("Starting slot watcher for ERC3525 agent.")
+             watch_loop(web3, contract, account, paper_mode, monitor, thresholds, pipeline)
+             return
          logger.info("Starting main loop for ERC3525 agent.")
-         main_loop(web3, contract, account, paper_mode, strategy_mode)
+         main_loop(web3, contract, account, paper_mode, strategy_mode, monitor, thresholds, pipeline,
+                   strategy_file=os.getenv("STRATEGY_FILE"))
      except Exception as e:
          logger.critical(f"Critical error encountered: {e}", exc_info=True)
          exit(1)
+     finally:
+         # Mints and slot readings are journaled when AAA_JOURNAL_DIR is set (journal.py)
+         journal.close()
  
  if __name__ == "__main__":
      main()
\ No newline at end of file
@@ -38,6 +38,8 @@ PAPER_MODE      = config("PAPER_TRADING", cast=bool, default=True)
 STRATEGY       = config("STRATEGY_MODE", default="default")  
 ASSETS          = config("ASSETS", cast=Csv(), default="BTC-USD,ETH-USD,PEPE-USD")  
 SIZE            = config("TRADE_SIZE", default="0.01")
+MARKET_DATA_DIR = config("MARKET_DATA_DIR", default="market_data")  # shared OHLCV history (market_store.py)
+COORDINATOR     = config("COORDINATOR", default="")  # host:port of coordinator.py; empty = run every agent here
 
 # Strategy thresholds  
 THRESHOLD_SHORT  = config("THRESHOLD_SHORT", cast=float, default=50.0)  
@@ -55,32 +57,25 @@ THRESHOLD_LONG   = config("THRESHOLD_LONG", cast=float, default=100.0)
 #Shared REST wrapper (trade_api.py)
 #-------------------------------------------
 
-import time, hmac, hashlib, json, requests
 from config import CB_API_KEY, CB_API_SECRET, CB_API_PASSPHRASE
+from order_client import OrderClient
 
 API_URL = "https://api.coinbase.com"
 
+# One pooled, keep-alive session shared by every order (see order_client.py);
+# AsyncOrderClient is the asyncio variant.
+client = OrderClient(API_URL, CB_API_KEY, CB_API_SECRET, CB_API_PASSPHRASE, pool_size=10, max_concurrency=4)
+
 
 def _sign_request(method, path, body):
-    timestamp = str(int(time.time()))
-    payload = timestamp + method + path + (json.dumps(body) if body else "")
-    signature = hmac.new(CB_API_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
-    return {
-        "CB-ACCESS-KEY": CB_API_KEY,
-        "CB-ACCESS-SIGN": signature,
-        "CB-ACCESS-TIMESTAMP": timestamp,
-        "CB-ACCESS-PASSPHRASE": CB_API_PASSPHRASE,
-        "Content-Type": "application/json"
-    }
+    return client.sign(method, path, body)
 
 def place_order(side, product_id, size, price=None):
-    path = "/v3/brokerage/orders"
-    body = {"side": side, "product_id": product_id, "size": size}
-    if price:
-        body.update(type="limit", limit_price=price)
-    resp = requests.post(API_URL + path, headers=_sign_request("POST", path, body), json=body)
-    resp.raise_for_status()
-    return resp.json()
+    return client.place_order(side, product_id, size, price)
+
+def place_orders(orders):
+    # Batch of (side, product_id, size, price) tuples; failed orders come back as exceptions
+    return client.place_orders(orders)
 
 
 
@@ -92,10 +87,17 @@ def place_order(side, product_id, size, price=None):
 #------------------------
 #agent_base.py and STRATEGY ENGINE
 #------------------------
-import time
 from decimal import Decimal
-from trade_api import place_order
-from indicators import compute_signals
+import trade_api
+from indicators import compute_signals, default_store
+from instrumentation import span
+from paper_exchange import PaperExchange
+from clocks import get_clock
+from journal import journal
+from risk import GuardedClient, risk
+
+# Paper fills come from a local order book (paper_exchange.py), marked to the shared market store
+paper_exchange = PaperExchange(fee_bps=10, slippage_bps=5)
 
 class TradingAgent:
     def __init__(self, name, assets, paper_mode, strategy_params):
@@ -103,36 +105,100 @@ class TradingAgent:
         self.assets = assets
         self.paper_mode = paper_mode
         self.params = strategy_params
+        self.capital = float(strategy_params.get("capital", 1000))
+        self.profit = 0.0
+        # Same place_order/place_orders interface as trade_api, filled locally
+        self.paper = paper_exchange.bind(self) if paper_mode else None
+        # Every order, paper or live, goes through the pre-trade risk checks (risk.py);
+        # a rejected order comes back as a RiskRejected in its result slot
+        self.client = GuardedClient(self.paper or trade_api, risk, name)
 
     def run_cycle(self):
-        signals = compute_signals(self.assets, self.params)
-        for sig in signals:
-            side, product, size, price = sig.values()
-            if self.paper_mode:
-                print(f"[{self.name} PAPER] {side} {size} {product} @ {price}")
-            else:
-                resp = place_order(side, product, size, price)
+        with span("compute_signals", self.name):
+            signals = compute_signals(self.assets, self.params)
+        orders = [tuple(sig.values()) for sig in signals]
+        # Marks and equity first, paper or live: the risk checks price market orders
+        # at these marks and halt on drawdown from this equity
+        store = default_store()
+        for asset in self.assets:
+            price = store.last_price(asset)
+            if price == price:  # skip assets with no history (NaN)
+                if self.paper_mode:
+                    paper_exchange.update_price(asset, price)
+                risk.update_price(asset, price)
+        risk.update_equity(self.name, self.capital)
+        if self.paper_mode:
+            for resp in self.client.place_orders(orders):
+                journal.order(self.name, resp)
+                print(f"[{self.name} PAPER] order →", resp)
+            paper_exchange.mark_to_market(self.name)
+            risk.update_equity(self.name, self.capital)
+            print(f"[{self.name} PAPER] capital={self.capital:.2f} profit={self.profit:.2f}")
+        elif orders:
+            # Fan the cycle's orders out over the pooled client instead of one at a time
+            with span("submit_orders", self.name):
+                responses = self.client.place_orders(orders)
+            for resp in responses:
+                journal.order(self.name, resp)
                 print(f"[{self.name} LIVE] order →", resp)
 
-    def start(self, interval=10):
-        while True:
+    def start(self, interval=10, until=None, clock=None):
+        # Sleeps go through the session clock, so a SimClock replays this loop at CPU speed
+        clock = clock or get_clock()
+        while until is None or clock.time() < until:
             try:
-                self.run_cycle()
+                with span("cycle", self.name):
+                    self.run_cycle()
             except Exception as e:
                 print(f"[{self.name} ERROR]", e)
-            time.sleep(interval)
+            clock.sleep(interval)
 
 #------------------------------------
 #main.py
 #------------------------------------
-from config import PAPER_MODE, STRATEGY, ASSETS, SIZE
+from config import PAPER_MODE, STRATEGY, ASSETS, SIZE, THRESHOLD_SHORT, COORDINATOR
 from agent_base import TradingAgent
 from erc3525_agent import ERC3525Agent
-import json
+from scheduler import AgentScheduler
+from instrumentation import instruments
+from strategy_registry import strategies
+
+def fleet_items():
+    # Work items for coordinator.py: one per asset for the REST agent, one per slot for Agent 2.
+    # Slots all sign with the minting wallet, so they (and its nonce) stay on a single worker.
+    items = [{"key": f"asset:{asset}", "kind": "asset", "asset": asset, "interval": 5} for asset in ASSETS]
+    items.append({"key": "slot:1", "kind": "slot", "slot": 1, "threshold": THRESHOLD_SHORT,
+                  "wallet": "erc3525-minter", "interval": 10})
+    return items
+
+_slot_agent = None
+
+def make_tick(item, lease):
+    # Worker factory for coordinator.py: the tick for one assigned asset or slot. The worker
+    # only calls it while it holds the item's lease, so two processes never mint from one wallet.
+    global _slot_agent
+    if item["kind"] == "asset":
+        agent = TradingAgent(f"Agent1‑{item['asset']}", [item["asset"]], PAPER_MODE, strategies.params_for(STRATEGY))
+        return agent.run_cycle
+    if _slot_agent is None:
+        _slot_agent = ERC3525Agent("Agent2‑Slot", PAPER_MODE)
+    return lambda: _slot_agent.mint_if_needed(item["slot"], item["threshold"])
 
 def main():
-    # Load dynamic strategy params from .env or a JSON blob
-    strategy_params = json.loads(STRATEGY)
+    if COORDINATOR:
+        # Sharded fleet: run only the assets/slots the coordinator assigns to this process.
+        # FEATURE_CACHE=shared lets the workers on one host share computed features (feature_cache.py).
+        #   python coordinator.py serve --items fleet:fleet_items     (fleet.py: the same items for AAA.py's agents)
+        #   FEATURE_CACHE=shared COORDINATOR=127.0.0.1:8800 python main.py   (one per worker process / host)
+        #   or, without this blueprint: python coordinator.py worker --factory fleet:make_tick
+        import asyncio
+        from coordinator import Worker
+        host, port = COORDINATOR.rsplit(":", 1)
+        asyncio.run(Worker(make_tick, host, int(port)).run())
+        return
+
+    # STRATEGY_MODE is a registered strategy name (its default params) or a JSON blob of params
+    strategy_params = strategies.params_for(STRATEGY)
     
     # Agent 1: spot‑bot REST  
     agent1 = TradingAgent("Agent1‑REST", ASSETS, PAPER_MODE, strategy_params)
@@ -140,9 +206,16 @@ def main():
     # Agent 2: ERC‑3525 slot manager  
     agent2 = ERC3525Agent("Agent2‑Slot", PAPER_MODE)
 
-    # In prod you may run these in separate processes/threads
-    agent1.start(interval=5)
-    # or spawn agent2.start(...)
+    # Span latencies per agent; scrape http://localhost:9108/metrics (AAA_METRICS=1)
+    if instruments.enabled:
+        instruments.serve_prometheus(9108)
+
+    # Run both agents concurrently on one event loop (see scheduler.py).
+    # agent1.start(interval=5) still works for a single blocking agent.
+    scheduler = AgentScheduler()
+    scheduler.add(agent1.name, agent1.run_cycle, interval=5, jitter=0.5)
+    scheduler.add(agent2.name, lambda: agent2.mint_if_needed(1, THRESHOLD_SHORT), interval=10, jitter=0.5)
+    scheduler.start()
     
 if __name__ == "__main__":
     main()
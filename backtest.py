@@ -0,0 +1,470 @@
+#!/usr/bin/env python
+"""
+Vectorized Backtester
+-----------------------------
+
+Evaluates every strategy in `default_strategies` (and any parameter grid
+around them) over an OHLCV history held in NumPy arrays.
+
+Indicators are computed once per distinct parameter value as 2-D arrays
+(one row per value) and gathered per parameter combination; signals,
+positions, fills, PnL and drawdown are then array ops over a
+(combinations x bars) block. The only loops are over strategies, chunks of
+combinations (to bound memory) and fixed-size EMA blocks.
+
+Usage:
+    data = {"open": o, "high": h, "low": l, "close": c, "volume": v}
+    result = backtest(data, grids={"trend": {"ma_short": [20, 50], "ma_long": [100, 200]}})
+    for i in result.best("sharpe", 5):
+        print(result.params(i), result["sharpe"][i])
+    equity, exchange = replay(data, "trend", result.params(i))   # same fills as paper trading
+"""
+
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+
+from strategies import VOLATILITY_RULE, default_strategies, rsi_thresholds
+
+# Extra parameters the signal rules read when a param set doesn't define them.
+DEFAULT_EXTRA_PARAMS = {
+    "rsi_overbought": 70,
+    "rsi_oversold": 30,
+    "bbands_std": 2.0,
+    "macd_signal": 9,
+}
+EMA_BLOCK = 128
+STD_BLOCK = 64
+MINUTES_PER_YEAR = 365 * 24 * 60
+
+
+# ================================
+# 1. VECTORIZED INDICATORS (rows = parameter values, columns = bars)
+# ================================
+def rolling_mean(x, windows):
+    """Rolling means of 1-D `x` for every window in `windows`; NaN until each window is full."""
+    x = np.asarray(x, dtype=float)
+    windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    base = x[0] if len(x) else 0.0  # centre the data to keep cumulative sums small
+    csum = np.concatenate(([0.0], np.cumsum(x - base)))
+    idx = np.arange(len(x))
+    lo = idx[None, :] + 1 - windows[:, None]
+    out = (csum[idx + 1][None, :] - csum[np.clip(lo, 0, None)]) / windows[:, None] + base
+    out[lo < 0] = np.nan
+    return out
+
+
+def rolling_std(x, windows, block=STD_BLOCK):
+    """
+    Rolling population standard deviation (TA-Lib STDDEV / BBANDS convention).
+
+    Sums of squares run over blocks of `block` outputs, each centred on its own
+    first price: one cumulative sum over the whole series grows with the price
+    drift and cancels away the small variances of short windows.
+    """
+    x = np.asarray(x, dtype=float)
+    windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    out = np.full((len(windows), len(x)), np.nan)
+    for r, w in enumerate(windows.tolist()):
+        n_out = len(x) - w + 1
+        if n_out <= 0:
+            continue
+        b = max(block, w)
+        rows = -(-n_out // b)
+        padded = np.concatenate((x, np.repeat(x[-1], rows * b - n_out)))
+        seg = np.lib.stride_tricks.sliding_window_view(padded, b + w - 1)[::b]
+        centred = seg - seg[:, :1]
+        zeros = np.zeros((rows, 1))
+        c1 = np.concatenate((zeros, np.cumsum(centred, axis=1)), axis=1)
+        c2 = np.concatenate((zeros, np.cumsum(centred * centred, axis=1)), axis=1)
+        mean = ((c1[:, w:] - c1[:, :-w]) / w).ravel()[:n_out]
+        mean_sq = ((c2[:, w:] - c2[:, :-w]) / w).ravel()[:n_out]
+        out[r, w - 1:] = np.sqrt(np.clip(mean_sq - mean * mean, 0.0, None))
+    return out
+
+
+def ema_rows(x, alphas, starts, seeds, block=EMA_BLOCK):
+    """
+    Exponential smoothing of `x` (1-D or one row per alpha), row r seeded with
+    `seeds[r]` at bar `starts[r]`. The recursion is solved a block of bars at a
+    time with a decay matrix, so there is no per-bar Python loop.
+    """
+    alphas = np.asarray(alphas, dtype=float)
+    starts = np.asarray(starts, dtype=np.int64)
+    rows = len(alphas)
+    x = np.broadcast_to(np.asarray(x, dtype=float), (rows, np.shape(x)[-1]))
+    n = x.shape[1]
+    idx = np.arange(n)
+    out = np.full((rows, n), np.nan)
+    if n == 0 or rows == 0:
+        return out
+    # Drive the recursion with zeros before the seed bar and seed/alpha on it,
+    # so y[start] == seed and y[t] = (1 - a) * y[t-1] + a * x[t] afterwards.
+    drive = np.where(idx[None, :] > starts[:, None], x, 0.0)
+    drive = np.nan_to_num(drive, nan=0.0)
+    valid = starts < n
+    drive[np.arange(rows)[valid], starts[valid]] = np.asarray(seeds, dtype=float)[valid] / alphas[valid]
+    decay = 1.0 - alphas
+    powers = decay[:, None] ** np.arange(block + 1)[None, :]
+    lag = np.arange(block)[:, None] - np.arange(block)[None, :]
+    weights = np.where(lag >= 0, powers[:, np.clip(lag, 0, None)], 0.0)  # (rows, block, block)
+    prev = np.zeros(rows)
+    for b0 in range(0, n, block):
+        xb = drive[:, b0:b0 + block]
+        size = xb.shape[1]
+        yb = alphas[:, None] * np.matmul(weights[:, :size, :size], xb[:, :, None])[:, :, 0]
+        yb += powers[:, 1:size + 1] * prev[:, None]
+        out[:, b0:b0 + size] = yb
+        prev = yb[:, -1]
+    out[(idx[None, :] < starts[:, None]) | ~valid[:, None]] = np.nan
+    return out
+
+
+def _at(table, cols):
+    """table[r, cols[r]] with NaN where the column is out of range."""
+    cols = np.asarray(cols, dtype=np.int64)
+    ok = (cols >= 0) & (cols < table.shape[1])
+    out = np.full(len(cols), np.nan)
+    out[ok] = table[np.arange(len(cols))[ok], cols[ok]]
+    return out
+
+
+def ema(x, periods):
+    """TA-Lib EMA for every period in `periods` (seeded with the SMA of the first `period` values)."""
+    periods = np.atleast_1d(np.asarray(periods, dtype=np.int64))
+    starts = periods - 1
+    seeds = _at(rolling_mean(x, periods), starts)
+    return ema_rows(x, 2.0 / (periods + 1), starts, seeds)
+
+
+def rsi(close, periods):
+    """TA-Lib RSI (Wilder smoothing) for every period in `periods`."""
+    close = np.asarray(close, dtype=float)
+    periods = np.atleast_1d(np.asarray(periods, dtype=np.int64))
+    out = np.full((len(periods), len(close)), np.nan)
+    if len(close) < 2:
+        return out
+    change = np.diff(close)
+    gains = np.clip(change, 0.0, None)
+    losses = np.clip(-change, 0.0, None)
+    starts = periods - 1
+    avg_gain = ema_rows(gains, 1.0 / periods, starts, _at(rolling_mean(gains, periods), starts))
+    avg_loss = ema_rows(losses, 1.0 / periods, starts, _at(rolling_mean(losses, periods), starts))
+    total = avg_gain + avg_loss
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[:, 1:] = np.where(total == 0, 0.0, 100.0 * avg_gain / total)
+    return out
+
+
+def macd(close, fasts, slows, signal=9):
+    """TA-Lib MACD for paired (fast, slow) periods. Returns (macd, signal, hist) arrays."""
+    close = np.asarray(close, dtype=float)
+    fasts = np.atleast_1d(np.asarray(fasts, dtype=np.int64))
+    slows = np.atleast_1d(np.asarray(slows, dtype=np.int64))
+    fasts, slows = np.minimum(fasts, slows), np.maximum(fasts, slows)
+    n = len(close)
+    # The fast EMA is seeded on the same bar as the slow one, as TA-Lib does.
+    starts = slows - 1
+    fast_ema = ema_rows(close, 2.0 / (fasts + 1), starts, _at(rolling_mean(close, fasts), starts))
+    slow_ema = ema(close, slows)
+    line = fast_ema - slow_ema
+    sig_starts = starts + signal - 1
+    offsets = starts[:, None] + np.arange(signal)[None, :]
+    seed_rows = np.take_along_axis(line, np.clip(offsets, 0, max(n - 1, 0)), axis=1) if n else line
+    seeds = np.where(sig_starts < n, seed_rows.mean(axis=1) if n else np.nan, np.nan)
+    sig = ema_rows(line, np.full(len(slows), 2.0 / (signal + 1)), sig_starts, seeds)
+    line = np.where(np.isnan(sig), np.nan, line)
+    return line, sig, line - sig
+
+
+class _IndicatorCache:
+    """
+    Indicator rows computed once per distinct parameter value, gathered per combination.
+    With `max_bytes` the least recently used rows are dropped to stay under it (rows the
+    current call needs are always kept).
+    """
+
+    def __init__(self, data, max_bytes=None):
+        self.data = data
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.rows = OrderedDict()
+
+    def get(self, name, keys, compute):
+        keys = [tuple(k) if np.ndim(k) else k for k in np.asarray(keys).tolist()]
+        missing = sorted(set(k for k in keys if (name, k) not in self.rows))
+        for key in set(keys) - set(missing):
+            self.rows.move_to_end((name, key))
+        if missing:
+            outputs = compute(np.asarray(missing))
+            if not isinstance(outputs, tuple):
+                outputs = (outputs,)
+            for i, key in enumerate(missing):
+                row = self.rows[(name, key)] = tuple(o[i] for o in outputs)
+                self.bytes += sum(r.nbytes for r in row)
+            if self.max_bytes is not None:
+                self._evict(name, keys)
+        stacked = [np.stack([self.rows[(name, k)][j] for k in keys]) for j in range(len(self.rows[(name, keys[0])]))]
+        return stacked[0] if len(stacked) == 1 else tuple(stacked)
+
+    def _evict(self, name, keys):
+        needed = set((name, k) for k in keys)
+        for cached in list(self.rows):
+            if self.bytes <= self.max_bytes:
+                break
+            if cached not in needed:
+                self.bytes -= sum(r.nbytes for r in self.rows.pop(cached))
+
+
+# ================================
+# 2. SIGNAL RULES (one per default strategy)
+# ================================
+# Each rule returns an int8 (combinations x bars) array: +1 buy, -1 sell, 0 hold.
+def _cross_signals(buy, sell):
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+
+def _trend_signals(data, p, cache):
+    close = data["close"]
+    fast = cache.get("sma", p["ma_short"], lambda w: rolling_mean(close, w))
+    slow = cache.get("sma", p["ma_long"], lambda w: rolling_mean(close, w))
+    strength = cache.get("rsi", p["rsi_period"], lambda w: rsi(close, w))
+    buy = (fast > slow) & (strength < p["rsi_overbought"][:, None])
+    sell = (fast < slow) & (strength > p["rsi_oversold"][:, None])
+    return _cross_signals(buy, sell)
+
+
+def _volatility_signals(data, p, cache):
+    close = data["close"]
+    length = p["bbands_length"].astype(np.int64)
+    middle = cache.get("sma", length, lambda w: rolling_mean(close, w))
+    std = cache.get("std", length, lambda w: rolling_std(close, w))
+    upper = middle + p["bbands_std"][:, None] * std
+    lower = middle - p["bbands_std"][:, None] * std
+    pairs = np.stack([p["macd_fast"], p["macd_slow"], p["macd_signal"]], axis=1).astype(np.int64)
+    hist = cache.get("macd_hist", pairs, lambda k: np.stack([macd(close, f, s, g)[2][0] for f, s, g in k]))
+    rising = np.zeros_like(hist, dtype=bool)
+    rising[:, 1:] = hist[:, 1:] > hist[:, :-1]
+    falling = np.zeros_like(hist, dtype=bool)
+    falling[:, 1:] = hist[:, 1:] < hist[:, :-1]
+    # Mean reversion at the bands, confirmed by the MACD histogram turning.
+    buy = (close <= lower) & rising
+    sell = (close >= upper) & falling
+    return _cross_signals(buy, sell)
+
+
+def _momentum_signals(data, p, cache):
+    close, volume = data["close"], data.get("volume")
+    fast = cache.get("ema", p["ema_short"], lambda w: ema(close, w))
+    slow = cache.get("ema", p["ema_long"], lambda w: ema(close, w))
+    if volume is None:
+        # No volume recorded: the EMA crossover alone
+        return _cross_signals(fast > slow, fast < slow)
+    vol_sma = cache.get("volume_sma", p["volume_sma"], lambda w: rolling_mean(volume, w))
+    active = volume > vol_sma
+    return _cross_signals((fast > slow) & active, (fast < slow) & active)
+
+
+def _hybrid_signals(data, p, cache):
+    close = data["close"]
+    fast = cache.get("sma", p["sma_short"], lambda w: rolling_mean(close, w))
+    slow = cache.get("sma", p["sma_long"], lambda w: rolling_mean(close, w))
+    trend = cache.get("ema", p["ema"], lambda w: ema(close, w))
+    strength = cache.get("rsi", p["rsi"], lambda w: rsi(close, w))
+    buy = (fast > slow) & (close > trend) & (strength < p["rsi_overbought"][:, None])
+    sell = (fast < slow) & (close < trend) & (strength > p["rsi_oversold"][:, None])
+    return _cross_signals(buy, sell)
+
+
+def _agent_signals(data, p, cache):
+    # TradingAgent.decide (AAA.py): price vs SMA, filtered by RSI, with the thresholds
+    # widened by update_strategy's volatility rule (strategies.VOLATILITY_RULE)
+    close = data["close"]
+    average = cache.get("sma", p["ma_period"], lambda w: rolling_mean(close, w))
+    strength = cache.get("rsi", p["rsi_period"], lambda w: rsi(close, w))
+    window = VOLATILITY_RULE["window"]
+    # Sample std, as IndicatorEngine.volatility / pandas; NaN while warming up counts as calm
+    volatility = cache.get("sample_std", [window], lambda w: rolling_std(close, w) * np.sqrt(w / (w - 1))[:, None])
+    volatile = (volatility > VOLATILITY_RULE["threshold"])[0]
+    overbought, oversold = rsi_thresholds(p["rsi_overbought"][:, None], p["rsi_oversold"][:, None], volatile[None, :])
+    buy = (close > average) & (strength < overbought)
+    sell = (close < average) & (strength > oversold)
+    return _cross_signals(buy, sell)
+
+
+SIGNAL_RULES = {
+    "trend": _trend_signals,
+    "volatility": _volatility_signals,
+    "momentum": _momentum_signals,
+    "hybrid": _hybrid_signals,
+    # Not a default strategy: TradingAgent.strategy_params (ma_period, rsi_period, rsi_overbought, rsi_oversold)
+    "agent": _agent_signals,
+}
+# The parameters each rule reads (BacktestResult.params reports only these)
+RULE_PARAMS = {
+    "trend": ("ma_short", "ma_long", "rsi_period", "rsi_overbought", "rsi_oversold"),
+    "volatility": ("bbands_length", "bbands_std", "macd_fast", "macd_slow", "macd_signal"),
+    "momentum": ("ema_short", "ema_long", "volume_sma"),
+    "hybrid": ("sma_short", "sma_long", "ema", "rsi", "rsi_overbought", "rsi_oversold"),
+    "agent": ("ma_period", "rsi_period", "rsi_overbought", "rsi_oversold"),
+}
+
+
+# ================================
+# 3. POSITIONS, FILLS, PNL, DRAWDOWN
+# ================================
+def simulate(close, signals, fee_bps=10.0, slippage_bps=5.0, initial_capital=1000.0, periods_per_year=MINUTES_PER_YEAR):
+    """
+    Turn (combinations x bars) signals into per-combination metrics.
+    The position is the last non-zero signal carried forward (long +1, short -1,
+    flat before the first signal); it is filled at the signal bar's close,
+    adjusted for slippage, and held until the next bar's close.
+    """
+    close = np.asarray(close, dtype=float)
+    rows, n = signals.shape
+    last = np.maximum.accumulate(np.where(signals != 0, np.arange(n)[None, :], 0), axis=1)
+    position = np.take_along_axis(signals, last, axis=1).astype(np.float64)
+    traded = np.abs(np.diff(position, axis=1, prepend=0.0))
+    fills = np.count_nonzero(traded, axis=1)
+    slip = slippage_bps / 1e4
+    fill_price = close[None, :] * (1.0 + slip * np.sign(np.diff(position, axis=1, prepend=0.0)))
+    turnover = (traded * fill_price).sum(axis=1)
+    returns = np.zeros((rows, n))
+    if n > 1:
+        returns[:, 1:] = position[:, :-1] * (close[1:] / close[:-1] - 1.0)[None, :]
+    returns -= traded * ((fee_bps + slippage_bps) / 1e4)
+    equity = initial_capital * np.cumprod(1.0 + returns, axis=1)
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1.0
+    std = returns.std(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = np.where(std > 0, returns.mean(axis=1) / std * np.sqrt(periods_per_year), 0.0)
+    final = equity[:, -1] if n else np.full(rows, initial_capital)
+    return {
+        "final_equity": final,
+        "pnl": final - initial_capital,
+        "total_return": final / initial_capital - 1.0,
+        "max_drawdown": drawdown.min(axis=1) if n else np.zeros(rows),
+        "sharpe": sharpe,
+        "fills": fills,
+        "turnover": turnover,
+        "exposure": (position != 0).mean(axis=1) if n else np.zeros(rows),
+    }
+
+
+# ================================
+# 4. GRID EXPANSION & DRIVER
+# ================================
+def expand_grid(base_params, grid=None):
+    """All combinations of `grid` values on top of `base_params` (plus DEFAULT_EXTRA_PARAMS)."""
+    base = dict(DEFAULT_EXTRA_PARAMS, **base_params)
+    grid = {k: list(v) if np.ndim(v) else [v] for k, v in (grid or {}).items()}
+    keys = sorted(grid)
+    return [dict(base, **dict(zip(keys, values))) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+class BacktestResult:
+    """Columnar results: one row per (strategy, parameter combination)."""
+
+    def __init__(self, columns, param_names, int_params=None):
+        self.columns = columns
+        self.param_names = param_names
+        # {strategy: params given as integers}; the columns hold every value as a float
+        self.int_params = int_params or {}
+
+    def __len__(self):
+        return len(self.columns["strategy"])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def params(self, i):
+        """Parameter dict of row `i`: the parameters its strategy's rule reads, integers as ints."""
+        strategy = self.columns["strategy"][i]
+        ints = self.int_params.get(strategy, ())
+        out = {}
+        for k in RULE_PARAMS.get(strategy, self.param_names):
+            value = self.columns[k][i] if k in self.columns else np.nan
+            if not np.isnan(value):
+                out[k] = int(value) if k in ints else value.item()
+        return out
+
+    def best(self, metric="sharpe", n=10):
+        """Row indices of the top `n` results by `metric` (max_drawdown: least negative first)."""
+        order = np.argsort(-np.nan_to_num(self.columns[metric], nan=-np.inf), kind="stable")
+        return order[:n]
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.columns)
+
+
+def _as_ohlcv(data):
+    if isinstance(data, np.ndarray) and data.dtype.names:
+        data = {name: data[name] for name in data.dtype.names}
+    close = np.ascontiguousarray(data["close"], dtype=float)
+    columns = {"close": close}
+    for name in ("open", "high", "low"):
+        columns[name] = np.asarray(data[name], dtype=float) if name in data else close
+    # Volume only when it was recorded (the market store fills missing volume with 0);
+    # without it the momentum rule drops its volume filter
+    volume = data.get("volume")
+    if volume is not None and np.any(volume):
+        columns["volume"] = np.asarray(volume, dtype=float)
+    return columns
+
+
+def backtest(data, strategies=None, grids=None, fee_bps=10.0, slippage_bps=5.0,
+             initial_capital=1000.0, periods_per_year=MINUTES_PER_YEAR, chunk_size=None):
+    """
+    Backtest strategies over an OHLCV history.
+
+    data      : dict of 1-D arrays (or a structured array) with at least "close"
+    strategies: {name: {"params": {...}}}, defaults to `default_strategies`
+    grids     : {name: {param: [values...]}} swept around each strategy's params
+    chunk_size: combinations simulated per block (default keeps blocks ~2M cells)
+    """
+    data = _as_ohlcv(data)
+    strategies = default_strategies if strategies is None else strategies
+    grids = grids or {}
+    n = len(data["close"])
+    chunk_size = chunk_size or max(1, 2_000_000 // max(n, 1))
+    cache = _IndicatorCache(data)
+
+    names, combos, metrics, int_params = [], [], [], {}
+    for name, spec in strategies.items():
+        if name not in SIGNAL_RULES:
+            raise ValueError(f"No signal rule for strategy {name!r}; known: {sorted(SIGNAL_RULES)}")
+        strategy_combos = expand_grid(spec.get("params", {}), grids.get(name))
+        for c0 in range(0, len(strategy_combos), chunk_size):
+            chunk = strategy_combos[c0:c0 + chunk_size]
+            p = {k: np.array([c[k] for c in chunk]) for k in chunk[0]}
+            signals = SIGNAL_RULES[name](data, p, cache)
+            metrics.append(simulate(data["close"], signals, fee_bps, slippage_bps, initial_capital, periods_per_year))
+        int_params[name] = {k for k in strategy_combos[0]
+                            if all(isinstance(c[k], (int, np.integer)) and not isinstance(c[k], bool)
+                                   for c in strategy_combos)}
+        names += [name] * len(strategy_combos)
+        combos += strategy_combos
+
+    param_names = sorted(set(k for c in combos for k in c))
+    columns = {"strategy": np.array(names)}
+    for k in param_names:
+        columns[k] = np.array([c.get(k, np.nan) for c in combos], dtype=float)
+    for key in (metrics[0] if metrics else {}):
+        columns[key] = np.concatenate([m[key] for m in metrics])
+    return BacktestResult(columns, param_names, int_params)
+
+
+def replay(data, strategy, params, exchange=None, product_id="REPLAY", size=1.0, initial_capital=1000.0):
+    """
+    Re-run one strategy/parameter set bar by bar through a PaperExchange, so a
+    backtest candidate gets the same fills (fees, slippage, order book) as a
+    paper session. Returns (equity per bar, exchange).
+    """
+    from paper_exchange import PaperExchange
+    data = _as_ohlcv(data)
+    exchange = exchange or PaperExchange(initial_cash=initial_capital)
+    p = {k: np.array([v]) for k, v in expand_grid(params)[0].items()}
+    signals = SIGNAL_RULES[strategy](data, p, _IndicatorCache(data))[0]
+    return exchange.replay(product_id, data["close"], signals, size=size, account=strategy), exchange
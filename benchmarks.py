@@ -0,0 +1,706 @@
+#!/usr/bin/env python
+"""
+Benchmark Suite
+-----------------------------
+
+Repeatable timings for the hot paths, compared against a stored baseline so
+performance work can be measured instead of eyeballed:
+
+    indicators   IndicatorEngine / IndicatorBook per tick, by window size and symbol count
+    signal       TradingAgent.evaluate_trade_signal and update_strategy (AAA.py)
+    strategy     compiled strategy kernels and the agent2.py slot strategy
+    loop         agent-loop throughput: run_tick with paper execution
+    orders       request signing, paper fills, and submission to a local stub server
+    rpc          SlotMonitor round trips to a local JSON-RPC endpoint backed by eth-tester
+    feed         market_feed pipeline, ticks -> bars -> subscribers
+
+Prices are synthetic (a seeded random walk) and nothing leaves the machine:
+orders go to a stub HTTP server on localhost, slot reads to eth-tester behind
+a local JSON-RPC endpoint, and the CDP SDK is replaced by a stub. Benchmarks
+whose dependencies are not installed are reported as skipped.
+
+    python benchmarks.py                    # run everything, compare with the baseline if one exists
+    python benchmarks.py -k orders -k rpc   # only benchmarks whose id contains "orders" or "rpc"
+    python benchmarks.py --save             # store the results as the baseline (merged by id)
+    python benchmarks.py --check            # exit 1 if a benchmark regressed past --threshold
+
+Each sample runs at least --min-time seconds (the call count is calibrated
+first); the median of --repeat samples is compared with the baseline, and the
+minimum is reported as the least noisy estimate. Baselines are per machine.
+"""
+
+import argparse
+import contextlib
+import gc
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+SEED = 42
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks_baseline.json")
+
+
+# ================================
+# 1. REGISTRY & RUNNER
+# ================================
+class Skip(Exception):
+    """Raised by a benchmark setup when a dependency or service is unavailable."""
+
+
+class Benchmark:
+    __slots__ = ("group", "name", "setup", "params")
+
+    def __init__(self, group, name, setup, params):
+        self.group = group
+        self.name = name
+        self.setup = setup
+        self.params = params
+
+    def cases(self):
+        """(id, params) for every combination of the declared parameter values."""
+        keys = list(self.params)
+        for values in itertools.product(*(self.params[k] for k in keys)):
+            case = dict(zip(keys, values))
+            label = ",".join(f"{k}={v}" for k, v in case.items())
+            yield f"{self.group}/{self.name}" + (f"[{label}]" if label else ""), case
+
+
+BENCHMARKS = []
+
+
+def bench(group, name=None, **params):
+    """
+    Register `setup(stack, **case)` for every combination of `params`. The setup
+    returns `(run, ops)`: `run()` is what gets timed and performs `ops`
+    operations (ticks, orders, round trips), so results are per operation.
+    Servers and files are released through `stack` (a contextlib.ExitStack).
+    """
+    def wrap(setup):
+        BENCHMARKS.append(Benchmark(group, name or setup.__name__.lstrip("_"), setup, params))
+        return setup
+    return wrap
+
+
+def _sample(run, number):
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(number):
+            run()
+        return time.perf_counter() - started
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure(run, ops=1, min_time=0.1, repeat=5):
+    """Per-operation timings of `run` (seconds): median, min, and throughput."""
+    # Calibrate (this also warms caches and connections): grow the call count until a sample lasts min_time
+    number = 1
+    while True:
+        elapsed = _sample(run, number)
+        if elapsed >= min_time:
+            break
+        number = min(number * 100, int(number * min_time * 1.2 / max(elapsed, 1e-9)) + 1)
+    per_op = [_sample(run, number) / (number * ops) for _ in range(repeat)]
+    median = statistics.median(per_op)
+    return {"median": median, "min": min(per_op), "ops_per_sec": 1.0 / median,
+            "number": number, "ops": ops, "repeat": repeat}
+
+
+def run_benchmarks(patterns=(), min_time=0.1, repeat=5, out=sys.stdout):
+    """Run every benchmark whose id contains one of `patterns` (all when empty); id -> result."""
+    results = {}
+    for benchmark in BENCHMARKS:
+        for bench_id, case in benchmark.cases():
+            if patterns and not any(p in bench_id for p in patterns):
+                continue
+            # Code under test may print (paper fills, session banners); keep it out of the report
+            with contextlib.ExitStack() as stack, open(os.devnull, "w") as devnull:
+                try:
+                    with contextlib.redirect_stdout(devnull):
+                        run, ops = benchmark.setup(stack, **case)
+                        result = measure(run, ops, min_time, repeat)
+                except (Skip, ImportError) as e:
+                    result = {"skipped": str(e)}
+                except Exception as e:
+                    result = {"error": f"{type(e).__name__}: {e}"}
+            results[bench_id] = result
+            print(format_row(bench_id, result), file=out, flush=True)
+    return results
+
+
+# ================================
+# 2. BASELINES & REGRESSIONS
+# ================================
+def machine_info():
+    # What the timings depend on; not the hostname, so a baseline carries over between identical runners
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "system": platform.system(), "cpus": os.cpu_count()}
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    """Merge the measured results into the baseline file (skipped/failed benchmarks are left as they were)."""
+    baseline = load_baseline(path) or {"results": {}}
+    baseline["machine"] = machine_info()
+    baseline["saved"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    for bench_id, result in results.items():
+        if "median" in result:
+            baseline["results"][bench_id] = {k: result[k] for k in ("median", "min", "ops_per_sec")}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    return baseline
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    id -> (status, ratio) against the baseline medians: "regressed" when slower
+    by more than `threshold` (0.2 = 20%), "improved" when faster by as much,
+    "ok" otherwise, "new" without a baseline entry.
+    """
+    reference = (baseline or {}).get("results", {})
+    out = {}
+    for bench_id, result in results.items():
+        if "median" not in result:
+            continue
+        base = reference.get(bench_id)
+        if base is None:
+            out[bench_id] = ("new", None)
+            continue
+        ratio = result["median"] / base["median"]
+        status = "regressed" if ratio > 1 + threshold else "improved" if ratio < 1 / (1 + threshold) else "ok"
+        out[bench_id] = (status, ratio)
+    return out
+
+
+def _fmt_time(seconds):
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def _fmt_rate(rate):
+    for unit, scale in (("M", 1e6), ("k", 1e3)):
+        if rate >= scale:
+            return f"{rate / scale:.1f}{unit}"
+    return f"{rate:.1f}"
+
+
+def format_row(bench_id, result, verdict=None):
+    if "skipped" in result:
+        return f"{bench_id:<48} skipped: {result['skipped']}"
+    if "error" in result:
+        return f"{bench_id:<48} ERROR: {result['error']}"
+    row = (f"{bench_id:<48} {_fmt_time(result['median']):>10}  (min {_fmt_time(result['min'])})"
+           f"  {_fmt_rate(result['ops_per_sec']):>7} ops/s")
+    if verdict is not None:
+        status, ratio = verdict
+        row += "  new" if ratio is None else f"  {(ratio - 1) * 100:+6.1f}% {status}"
+    return row
+
+
+# ================================
+# 3. SYNTHETIC DATA & STUB BACKENDS
+# ================================
+def synthetic_prices(n, seed=SEED, start=100.0, vol=0.002):
+    """Deterministic geometric random walk."""
+    rng = np.random.default_rng(seed)
+    return start * np.exp(np.cumsum(rng.normal(0.0, vol, n)))
+
+
+class _Close:
+    __slots__ = ("ts", "close", "volume")
+
+    def __init__(self, close, volume):
+        self.ts = 0
+        self.close = close
+        self.volume = volume
+
+
+class PriceFeed:
+    """
+    Stand-in for a market_feed Subscription: each drain() returns the next
+    `per_drain` bars of a synthetic series, wrapping around at the end.
+    Timestamps keep increasing across wraps, like a live feed.
+    """
+
+    def __init__(self, prices, per_drain=1):
+        volumes = np.random.default_rng(0).lognormal(0.0, 0.5, len(prices))
+        self.bars = [_Close(float(p), float(v)) for p, v in zip(prices, volumes)]
+        self.per_drain = per_drain
+        self.position = 0
+        self.ts = 0
+
+    def drain(self, max_items=None):
+        start = self.position
+        end = start + self.per_drain
+        if end > len(self.bars):
+            start, end = 0, self.per_drain
+        self.position = end
+        bars = self.bars[start:end]
+        for bar in bars:
+            self.ts += 1
+            bar.ts = self.ts
+        return bars
+
+
+class StubContract:
+    """web3 contract stand-in: functions.slotBalance(slot).call() returns a fixed balance per slot."""
+
+    def __init__(self, balances):
+        call = types.SimpleNamespace
+        self.functions = types.SimpleNamespace(
+            slotBalance=lambda slot: call(call=lambda: balances.get(slot, 0)))
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoints
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+
+
+class LocalServer:
+    """A ThreadingHTTPServer on an ephemeral localhost port, served from a daemon thread."""
+
+    def __init__(self, handler):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, name="bench-server", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def stub_order_server():
+    """Accepts any order POST and acknowledges it the way the brokerage API does."""
+    order_ids = itertools.count(1)
+
+    class Handler(_QuietHandler):
+        def do_POST(self):
+            order = self._read_json() or {}
+            order_id = str(next(order_ids))
+            self._reply(200, {"success": True, "order_id": order_id,
+                              "success_response": {"order_id": order_id, "product_id": order.get("product_id"),
+                                                   "side": order.get("side")}})
+
+    return LocalServer(Handler)
+
+
+# Deployed by eth_rpc_server(): `slotBalance(uint256 slot)` (any selector, in fact) returns `slot`,
+# so every slot has a known, distinct balance.
+#   init:    PUSH1 0x0b PUSH1 0x0c PUSH1 0 CODECOPY PUSH1 0x0b PUSH1 0 RETURN
+#   runtime: PUSH1 4 CALLDATALOAD PUSH1 0 MSTORE PUSH1 0x20 PUSH1 0 RETURN
+SLOT_ECHO_BYTECODE = "0x600b600c600039600b6000f3" + "600435600052602060" + "00f3"
+
+
+def _rpc_value(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return value
+
+
+def eth_rpc_server():
+    """
+    JSON-RPC over HTTP (single and batch requests) in front of an in-process
+    eth-tester chain, with the slot echo contract deployed. Returns (server, contract, account).
+    """
+    try:
+        from web3 import EthereumTesterProvider, Web3
+        web3 = Web3(EthereumTesterProvider())
+    except Exception as e:  # web3 without eth-tester / py-evm
+        raise Skip(f"eth-tester unavailable ({e})")
+    account = web3.eth.accounts[0]
+    receipt = web3.eth.wait_for_transaction_receipt(
+        web3.eth.send_transaction({"from": account, "data": SLOT_ECHO_BYTECODE}))
+    provider = web3.provider
+    lock = threading.Lock()  # eth-tester is not thread-safe
+
+    def call(request):
+        params = request.get("params", [])
+        if request.get("method") == "eth_call" and "from" not in params[0]:
+            params = [dict(params[0], **{"from": account})] + params[1:]
+        with lock:
+            reply = provider.make_request(request.get("method"), params)
+        out = {"jsonrpc": "2.0", "id": request.get("id")}
+        if "error" in reply:
+            out["error"] = reply["error"]
+        else:
+            out["result"] = _rpc_value(reply.get("result"))
+        return out
+
+    class Handler(_QuietHandler):
+        def do_POST(self):
+            payload = self._read_json()
+            self._reply(200, [call(r) for r in payload] if isinstance(payload, list) else call(payload))
+
+    return LocalServer(Handler), receipt["contractAddress"], account
+
+
+def install_cdp_stub():
+    """agent2.py imports the CDP SDK at module level; the benchmarks never touch a wallet."""
+    if "cdp" in sys.modules:
+        return
+
+    class _Unavailable:
+        def __init__(self, *args, **kwargs):
+            raise RuntimeError("CDP is stubbed out in benchmarks")
+
+        configure = create = import_data = classmethod(lambda cls, *a, **k: cls())
+
+    cdp = types.ModuleType("cdp")
+    cdp.Cdp = cdp.Wallet = _Unavailable
+    sys.modules["cdp"] = cdp
+
+
+def load_agent2():
+    """
+    Import agent2.py. The file is kept as it was pasted (a header line and a
+    one-space indent), so it is loaded from its source rather than imported.
+    """
+    module = sys.modules.get("agent2")
+    if module is not None:
+        return module
+    install_cdp_stub()
+    # agent2 logs every slot read at INFO to erc3525_agent.log; its basicConfig() is a no-op once
+    # the root logger has a handler, so the strategy is timed without the log file.
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(logging.NullHandler())
+    path = os.path.join(ROOT, "agent2.py")
+    with open(path) as f:
+        lines = f.read().splitlines()
+    start = next(i for i, line in enumerate(lines) if line.strip().startswith("import "))
+    source = textwrap.dedent("\n".join(lines[start:]))
+    module = types.ModuleType("agent2")
+    module.__file__ = path
+    sys.modules["agent2"] = module
+    try:
+        exec(compile(source, path, "exec"), module.__dict__)
+    except BaseException:
+        del sys.modules["agent2"]
+        raise
+    return module
+
+
+def load_aaa():
+    """AAA.py with simulated prices (no MARKET_DATA_DIR) and paper trading."""
+    os.environ.pop("MARKET_DATA_DIR", None)
+    import AAA
+    return AAA
+
+
+# ================================
+# 4. BENCHMARKS
+# ================================
+@bench("indicators", window=[20, 50, 200])
+def engine_update(stack, window):
+    from indicators import IndicatorEngine
+    prices = synthetic_prices(100_000).tolist()
+    engine = IndicatorEngine({"ma_period": window, "ema": window, "bbands_length": window,
+                              "volatility_window": max(window, 100)}).warm_up(prices[:window * 2])
+    feed = itertools.cycle(prices)
+    update = engine.update
+    return lambda: update(next(feed)), 1
+
+
+@bench("indicators", symbols=[1, 10, 100], window=[50])
+def book_update(stack, symbols, window):
+    from indicators import IndicatorBook
+    names = [f"SYM{i}-USD" for i in range(symbols)]
+    series = [synthetic_prices(1000, seed=SEED + i).tolist() for i in range(symbols)]
+    book = IndicatorBook({"ma_period": window, "ema": window, "bbands_length": window})
+    for name, prices in zip(names, series):
+        book.engine(name).warm_up(prices[:window * 2])
+    ticks = itertools.cycle(list(zip(*series)))
+    pairs = list(zip(names, range(symbols)))
+    update = book.update
+
+    def tick():  # one new price for every symbol
+        prices = next(ticks)
+        for name, i in pairs:
+            update(name, prices[i])
+    return tick, symbols
+
+
+@bench("indicators", window=[100])
+def regime_update(stack, window):
+    from regime import RegimeDetector
+    prices = synthetic_prices(100_000).tolist()
+    detector = RegimeDetector({"window": window})
+    for price in prices[:window * 2]:
+        detector.update(price)
+    feed = itertools.cycle(prices)
+    update = detector.update
+    return lambda: update(next(feed)), 1
+
+
+@bench("signal", window=[20, 200])
+def evaluate_trade_signal(stack, window):
+    AAA = load_aaa()
+    np.random.seed(SEED)
+    agent = AAA.TradingAgent("Bench", symbol="BTC-USD")
+    agent.strategy_params["ma_period"] = window
+    agent.indicators = AAA.IndicatorEngine(agent.strategy_params)
+    agent.feed = PriceFeed(synthetic_prices(100_000))
+    agent.evaluate_trade_signal()  # warm-up on the training window
+    return agent.evaluate_trade_signal, 1
+
+
+@bench("signal")
+def update_strategy(stack):
+    AAA = load_aaa()
+    np.random.seed(SEED)
+    agent = AAA.TradingAgent("Bench", symbol="BTC-USD")
+    agent.feed = PriceFeed(synthetic_prices(1000))
+    agent.evaluate_trade_signal()
+    return agent.update_strategy, 1
+
+
+@bench("strategy", n=[1, 1000])
+def sma_rsi(stack, n):
+    from strategy_registry import strategies
+    rng = np.random.default_rng(SEED)
+    price = synthetic_prices(n)
+    sma = price * (1 + rng.normal(0, 0.01, n))
+    rsi = rng.uniform(0, 100, n)
+    if n == 1:
+        price, sma, rsi = float(price[0]), float(sma[0]), float(rsi[0])
+    fn = strategies.compile("sma_rsi").fn
+    return lambda: fn(price, sma, rsi), n
+
+
+@bench("strategy", name="history", rule=["trend", "volatility", "momentum", "hybrid"])
+def history_rule(stack, rule):
+    from strategy_registry import strategies
+    window = synthetic_prices(100)
+    fn = strategies.compile(rule).fn
+    return lambda: fn(window, None), 1
+
+
+@bench("strategy", name="agent2_slot_strategy", slots=[1, 10])
+def agent2_slot_strategy(stack, slots):
+    agent2 = load_agent2()
+    from decimal import Decimal
+    thresholds = {slot: Decimal(50) for slot in range(1, slots + 1)}
+    # Half the slots are below their threshold, so both the mint and the no-op paths run
+    contract = StubContract({slot: 25 if slot % 2 else 75 for slot in thresholds})
+    rules, label = agent2.resolve_strategy("multi", thresholds)
+    return lambda: agent2.slot_strategy(None, contract, None, True, rules, label=label), 1
+
+
+@bench("loop", name="run_tick", agents=[1, 10, 100])
+def run_tick(stack, agents):
+    AAA = load_aaa()
+    np.random.seed(SEED)
+    # Bars arrive in bursts of a few per tick, as they would from a feed between polls
+    population = []
+    for i in range(agents):
+        agent = AAA.TradingAgent(f"Bench_{i}", symbol="BTC-USD")
+        agent.feed = PriceFeed(synthetic_prices(20_000, seed=SEED + i), per_drain=5)
+        population.append(agent)
+    tick = AAA.run_tick
+
+    def step():
+        for agent in population:
+            tick(agent, verbose=False)
+    step()
+    return step, agents
+
+
+@bench("orders", name="sign")
+def sign(stack):
+    from order_client import ORDER_PATH, _OrderSigner, order_body
+    signer = _OrderSigner("bench-key", "bench-secret", "bench-passphrase")
+    payload = json.dumps(order_body("BUY", "BTC-USD", "0.01"))
+    return lambda: signer.headers("POST", ORDER_PATH, payload), 1
+
+
+@bench("orders", name="paper_fill")
+def paper_fill(stack):
+    from paper_exchange import PaperExchange
+    exchange = PaperExchange(fee_bps=10, slippage_bps=5)
+    prices = itertools.cycle(synthetic_prices(10_000).tolist())
+    sides = itertools.cycle(("BUY", "SELL"))
+
+    def fill():
+        exchange.update_price("BTC-USD", next(prices))
+        exchange.place_order(next(sides), "BTC-USD", 0.01, account="bench")
+    return fill, 1
+
+
+@bench("orders", name="submit", batch=[1, 20])
+def submit(stack, batch):
+    from order_client import OrderClient
+    server = stub_order_server()
+    stack.callback(server.close)
+    client = OrderClient(server.url, "bench-key", "bench-secret", "bench-passphrase", max_concurrency=4)
+    stack.callback(client.close)
+    if batch == 1:
+        return lambda: client.place_order("BUY", "BTC-USD", "0.01"), 1
+    orders = [("BUY" if i % 2 else "SELL", "BTC-USD", "0.01") for i in range(batch)]
+    return lambda: client.place_orders(orders), batch
+
+
+@bench("rpc", name="slot_read", slots=[1, 10, 100])
+def slot_read(stack, slots):
+    from slot_monitor import SlotMonitor
+    server, contract, account = eth_rpc_server()
+    stack.callback(server.close)
+    monitor = SlotMonitor(server.url, contract, account, slots=range(1, slots + 1))
+    snapshot = monitor.read()
+    if snapshot.errors or snapshot.balance(slots) != slots:
+        raise RuntimeError(f"unexpected slot reads: {snapshot}")
+    return monitor.read, 1
+
+
+@bench("rpc", name="agent2_slot_strategy", slots=[1, 10])
+def agent2_monitored(stack, slots):
+    agent2 = load_agent2()
+    from decimal import Decimal
+    from slot_monitor import SlotMonitor
+    server, contract, account = eth_rpc_server()
+    stack.callback(server.close)
+    thresholds = {slot: Decimal(50) for slot in range(1, slots + 1)}
+    monitor = SlotMonitor(server.url, contract, account, slots=thresholds)
+    rules, label = agent2.resolve_strategy("multi", thresholds)
+    return lambda: agent2.slot_strategy(None, None, account, True, rules, monitor, label=label), 1
+
+
+@bench("feed", name="pipeline", symbols=[1, 10])
+def feed_pipeline(stack, symbols):
+    from market_feed import FeedPipeline, StubSource
+    rng = np.random.default_rng(SEED)
+    names = [f"SYM{i}-USD" for i in range(symbols)]
+    n = 20_000
+    # Normalized ticks, 10 per second of event time, round-robin over the symbols
+    start_ns = 1_700_000_000 * 10 ** 9
+    ticks = [(names[i % symbols], start_ns + i * 100_000_000, float(p), float(s))
+             for i, (p, s) in enumerate(zip(synthetic_prices(n), rng.exponential(0.05, n)))]
+
+    def process():
+        pipeline = FeedPipeline(StubSource(names), timeframes=(1, 60, 300))
+        pipeline.subscribe("bench", timeframes=(60,))
+        pipeline.process(ticks)
+    return process, n
+
+
+@bench("loop", name="journal_signal")
+def journal_signal(stack):
+    from journal import Journal
+    root = stack.enter_context(tempfile.TemporaryDirectory())
+    log = Journal(root, session="bench", fsync="never")
+    stack.callback(log.close)
+    prices = itertools.cycle(synthetic_prices(1000).tolist())
+    return lambda: log.signal("Bench", "BTC-USD", "buy", next(prices)), 1
+
+
+@bench("loop", name="risk_check")
+def risk_check(stack):
+    from risk import RiskEngine, RiskLimits
+    engine = RiskEngine(RiskLimits(max_position=10, max_notional=1e6, max_order_size=1, max_orders_per_sec=1e9))
+    prices = itertools.cycle(synthetic_prices(1000).tolist())
+    # Alternating sides keep the position within max_position, so every sample takes the accept path
+    sides = itertools.cycle(("BUY", "SELL"))
+    return lambda: engine.check_order("Bench", next(sides), "BTC-USD", 0.01, next(prices)), 1
+
+
+# ================================
+# 5. CLI
+# ================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for indicators, signals, agent loops, orders and RPC")
+    parser.add_argument("-k", dest="patterns", action="append", default=[],
+                        help="only benchmarks whose id contains this (repeatable)")
+    parser.add_argument("--list", action="store_true", help="list benchmark ids and exit")
+    parser.add_argument("--min-time", type=float, default=0.1, help="minimum seconds per sample")
+    parser.add_argument("--repeat", type=int, default=5, help="samples per benchmark")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file")
+    parser.add_argument("--save", action="store_true", help="store the results in the baseline file")
+    parser.add_argument("--check", action="store_true", help="exit 1 on regressions (or errors)")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown of the median that counts as a regression")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for benchmark in BENCHMARKS:
+            for bench_id, _ in benchmark.cases():
+                print(bench_id)
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    machine = machine_info()
+    recorded = (baseline or {}).get("machine") or {}
+    if baseline is not None and {key: recorded.get(key) for key in machine} != machine:
+        print(f"⚠️ Baseline {args.baseline} was recorded on a different machine/interpreter: {baseline.get('machine')}")
+    results = run_benchmarks(args.patterns, args.min_time, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=2, sort_keys=True)
+
+    verdicts = compare(results, baseline, args.threshold)
+    regressed = [bench_id for bench_id, (status, _) in verdicts.items() if status == "regressed"]
+    errors = [bench_id for bench_id, result in results.items() if "error" in result]
+    if baseline is not None:
+        print(f"\nAgainst baseline {args.baseline} ({baseline.get('saved', '?')}), threshold {args.threshold:.0%}:")
+        for bench_id, verdict in verdicts.items():
+            print(format_row(bench_id, results[bench_id], verdict))
+    skipped = sum("skipped" in r for r in results.values())
+    print(f"\n{len(results)} benchmarks: {len(regressed)} regressed, "
+          f"{sum(s == 'improved' for s, _ in verdicts.values())} improved, {skipped} skipped, {len(errors)} errors")
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(f"💾 Baseline saved to {args.baseline}")
+    if args.check and (regressed or errors):
+        for bench_id in regressed:
+            print(f"❌ Regression: {bench_id} ({(verdicts[bench_id][1] - 1) * 100:+.1f}%)")
+        for bench_id in errors:
+            print(f"❌ Error: {bench_id}: {results[bench_id]['error']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Clocks
+-----------------------------
+
+Injectable time source for the session loops, so the same agent code runs
+live, accelerated, or replayed against recorded data.
+
+- WallClock   : real time (the default)
+- ScaledClock : real time running `speed` times faster, for "N x speed"
+                sessions that still sleep between ticks
+- SimClock    : virtual time; `sleep()` advances it instantly (optionally
+                pacing at `speed` x wall time). Driven by replay.ReplayEngine.
+
+    from clocks import get_clock, set_clock, SimClock
+
+    set_clock(SimClock(start=1_700_000_000))
+    clock = get_clock()
+    clock.sleep(5)        # returns at once; clock.time() is now 5s later
+
+Loops take the clock through `get_clock()` (or a `clock=` argument), never
+`time.time()` / `time.sleep()` directly.
+"""
+
+import threading
+import time
+
+
+class WallClock:
+    simulated = False
+
+    def time(self):
+        return time.time()
+
+    def time_ns(self):
+        return time.time_ns()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def sleep_until(self, timestamp):
+        self.sleep(timestamp - self.time())
+
+
+class ScaledClock(WallClock):
+    """Wall time sped up `speed` times from the moment the clock is created (or from `start`)."""
+
+    def __init__(self, speed=10.0, start=None):
+        self.speed = float(speed)
+        self._wall0 = time.time()
+        self._mono0 = time.monotonic()
+        self._start = self._wall0 if start is None else float(start)
+
+    def time(self):
+        return self._start + (time.time() - self._wall0) * self.speed
+
+    def time_ns(self):
+        return int(self.time() * 1e9)
+
+    def monotonic(self):
+        return self._mono0 + (time.monotonic() - self._mono0) * self.speed
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+
+class SimClock:
+    """
+    Virtual clock. Time only moves when someone sleeps (or advance()/set() is
+    called), so results depend on the event order alone, not on CPU speed.
+    With `speed`, each advance also waits `delta / speed` wall seconds.
+    Meant for one driving thread (a loop or a ReplayEngine).
+    """
+    simulated = True
+
+    def __init__(self, start=0.0, speed=None):
+        self.now = float(start)
+        self.speed = speed
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self.now
+
+    def time_ns(self):
+        return int(round(self.now * 1e9))
+
+    def monotonic(self):
+        return self.now
+
+    def set(self, timestamp):
+        """Jump to `timestamp` (never backwards)."""
+        with self._lock:
+            delta = timestamp - self.now
+            if delta > 0:
+                self.now = float(timestamp)
+        if self.speed and delta > 0:
+            time.sleep(delta / self.speed)
+
+    def advance(self, seconds):
+        self.set(self.now + seconds)
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.advance(seconds)
+
+    def sleep_until(self, timestamp):
+        self.set(timestamp)
+
+
+# ================================
+# PROCESS-WIDE CLOCK
+# ================================
+_clock = WallClock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """Install `clock` for every loop that uses get_clock(); returns the previous one."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
@@ -0,0 +1,792 @@
+#!/usr/bin/env python
+"""
+Fleet Coordinator
+-----------------------------
+
+Spreads agents and their asset/slot assignments over worker processes, on
+one box or many, and keeps exactly one owner per wallet.
+
+    Coordinator   holds the item list and a consistent-hash ring of live workers
+    Worker        connects over TCP, heartbeats, and runs the items it is assigned
+
+An item is a dict with a unique "key" plus whatever the worker's factory
+needs, e.g. {"key": "asset:BTC-USD", "kind": "asset", "asset": "BTC-USD"}.
+Items that sign with the same account carry the same "wallet" and are
+placed by the wallet instead of by their own key, so a single worker holds
+that wallet and its nonce. A new or lost worker only moves the items that
+hash to it (about 1/N of them).
+
+Ownership is handed over in two steps. A moving item is revoked from its old
+worker first, and it is granted to the new worker only after the old one
+confirms it stopped (its last tick has finished) or its lease has run out.
+Each acknowledged heartbeat renews a worker's lease for `lease_ttl` seconds.
+A worker whose lease lapses stops all of its items. The coordinator declares
+a worker dead only after `dead_after` >= `lease_ttl` seconds of silence, so
+two workers never run (or sign for) the same item at the same time.
+
+The wire protocol is newline-delimited JSON over TCP, so a whole fleet can
+run as local processes over localhost sockets:
+
+    python coordinator.py serve --port 8800 --items fleet.json     # or --items fleet:fleet_items
+    python coordinator.py worker --connect 127.0.0.1:8800 --factory fleet:make_tick
+    python coordinator.py demo --workers 3    # local processes; kills one and checks the rebalance
+"""
+
+import asyncio
+import bisect
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8800
+LINE_LIMIT = 16 * 1024 * 1024  # an assignment is one line, however many items it carries
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def _encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+def shard_key(item):
+    """Ring key of an item: its wallet when it signs for one, otherwise its own key."""
+    wallet = item.get("wallet")
+    return f"wallet:{wallet}" if wallet else item["key"]
+
+
+def load_object(spec):
+    """'module:attribute' -> the attribute (worker factories, item builders)."""
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+# ================================
+# 1. CONSISTENT HASHING
+# ================================
+class HashRing:
+    """
+    Consistent hashing with `replicas` virtual nodes per node (scaled by
+    weight), so keys spread evenly and a node change only moves its share.
+    """
+
+    def __init__(self, nodes=(), replicas=64):
+        self.replicas = replicas
+        self.nodes = {}
+        self._points = []
+        self._owners = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node, weight=1.0):
+        if self.nodes.get(node) == weight:
+            return
+        self.nodes[node] = weight
+        self._rebuild()
+
+    def remove(self, node):
+        if self.nodes.pop(node, None) is not None:
+            self._rebuild()
+
+    def _rebuild(self):
+        points = sorted((_hash(f"{node}#{i}"), node)
+                        for node, weight in self.nodes.items() for i in range(max(1, int(self.replicas * weight))))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key):
+        if not self._points:
+            return None
+        return self._owners[bisect.bisect(self._points, _hash(key)) % len(self._points)]
+
+    def __contains__(self, node):
+        return node in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+# ================================
+# 2. COORDINATOR
+# ================================
+class WorkerState:
+    """The coordinator's view of one worker."""
+    __slots__ = ("name", "writer", "weight", "last_seen", "connected", "granted", "held", "epoch", "running")
+
+    def __init__(self, name, writer, weight, running=()):
+        self.name = name
+        self.writer = writer
+        self.weight = weight
+        self.last_seen = time.monotonic()
+        self.connected = True
+        self.granted = frozenset()   # keys in the latest assignment sent
+        self.held = set(running)     # keys it may still be running: granted, or revoked but not yet confirmed
+        self.epoch = 0               # epoch of the latest assignment sent
+        self.running = set(running)  # keys it reported in its last heartbeat
+
+
+class Coordinator:
+    """
+    Assigns items to workers and keeps the assignment balanced as workers
+    come and go.
+
+        coordinator = Coordinator(items, port=8800).start()
+        coordinator.assignments()    # {"host-a-4121": ["asset:BTC-USD", ...], ...}
+        coordinator.stop()
+    """
+
+    def __init__(self, items=(), host="127.0.0.1", port=DEFAULT_PORT, heartbeat_interval=1.0, lease_ttl=3.0,
+                 dead_after=5.0, replicas=64):
+        if dead_after < lease_ttl:
+            raise ValueError("dead_after must be >= lease_ttl, or a live worker's items could be reassigned")
+        if lease_ttl <= heartbeat_interval:
+            raise ValueError("lease_ttl must be longer than heartbeat_interval")
+        self.items = {}
+        for item in items:
+            self._put(item)
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_ttl = lease_ttl
+        self.dead_after = dead_after
+        self.ring = HashRing(replicas=replicas)
+        self.workers = {}
+        self.epoch = 0
+        self.pending = 0      # items waiting for their previous holder to let go
+        self.rebalances = 0
+        self.deaths = 0
+        self.conflicts = 0    # the same item reported running on two workers (should stay 0)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._task = None
+        self._thread = None
+        self._connections = set()
+        self._ready = threading.Event()
+
+    # -------- items --------
+    def _put(self, item):
+        if "key" not in item:
+            raise ValueError(f"Item without a key: {item}")
+        self.items[item["key"]] = dict(item)
+
+    def add_item(self, item):
+        with self._lock:
+            self._put(item)
+        self._changed()
+
+    def remove_item(self, key):
+        with self._lock:
+            self.items.pop(key, None)
+        self._changed()
+
+    def _changed(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._rebalance)
+
+    # -------- placement --------
+    def _rebalance(self):
+        """Grant every item to its ring owner, unless another worker still holds it."""
+        with self._lock:
+            items = dict(self.items)
+        desired = {name: set() for name in self.ring.nodes}
+        for key, item in items.items():
+            owner = self.ring.owner(shard_key(item))
+            if owner is not None:
+                desired[owner].add(key)
+        holders = {}
+        for worker in self.workers.values():
+            for key in worker.held:
+                holders.setdefault(key, set()).add(worker.name)
+        pending = 0
+        for name, keys in desired.items():
+            worker = self.workers[name]
+            grant = set()
+            for key in keys:
+                if holders.get(key, {name}) - {name}:
+                    pending += 1
+                else:
+                    grant.add(key)
+            if grant != worker.granted:
+                self._assign(worker, frozenset(grant), items)
+        self.pending = pending
+        self.rebalances += 1
+
+    def _assign(self, worker, grant, items):
+        self.epoch += 1
+        added, removed = grant - worker.granted, worker.granted - grant
+        worker.granted = grant
+        worker.held |= grant
+        worker.epoch = self.epoch
+        logger.info(f"Assign {worker.name} (epoch {self.epoch}): {len(grant)} items, +{len(added)} -{len(removed)}")
+        worker.writer.write(_encode({"type": "assign", "epoch": self.epoch,
+                                     "items": [items[key] for key in sorted(grant)]}))
+
+    # -------- protocol --------
+    def _hello(self, message, writer):
+        name = message["worker"]
+        worker = self.workers.get(name)
+        if worker is not None and worker.connected:
+            writer.write(_encode({"type": "reject", "reason": f"worker name {name!r} is already connected"}))
+            return None
+        running = message.get("running", [])
+        if worker is None:
+            worker = self.workers[name] = WorkerState(name, writer, float(message.get("weight", 1.0)), running)
+            logger.info(f"Worker {name} joined ({len(self.workers)} workers)")
+        else:
+            # Reconnected within its lease: it keeps what it holds and gets its assignment again
+            worker.writer, worker.connected, worker.last_seen = writer, True, time.monotonic()
+            worker.held |= set(running)
+            worker.granted = frozenset()
+            logger.info(f"Worker {name} reconnected")
+        writer.write(_encode({"type": "welcome", "heartbeat_interval": self.heartbeat_interval,
+                              "lease_ttl": self.lease_ttl}))
+        self.ring.add(name, worker.weight)
+        self._rebalance()
+        return worker
+
+    def _heartbeat(self, worker, message):
+        worker.last_seen = time.monotonic()
+        worker.writer.write(_encode({"type": "ack", "seq": message["seq"]}))
+        worker.running = set(message.get("running", ()))
+        for other in self.workers.values():
+            if other is not worker:
+                clash = worker.running & other.running
+                if clash:
+                    self.conflicts += 1
+                    logger.error(f"Items running on both {worker.name} and {other.name}: {sorted(clash)}")
+
+    def _applied(self, worker, message):
+        # The worker stopped everything outside its latest assignment, so only that is still held
+        if message["epoch"] == worker.epoch and worker.held != worker.granted:
+            worker.held = set(worker.granted)
+            worker.running &= worker.granted
+            self._rebalance()
+
+    async def _handle(self, reader, writer):
+        worker = None
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                kind = message.get("type")
+                if kind == "hello":
+                    worker = self._hello(message, writer)
+                    if worker is None:
+                        break
+                elif worker is None:
+                    continue
+                elif kind == "heartbeat":
+                    self._heartbeat(worker, message)
+                elif kind == "applied":
+                    self._applied(worker, message)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Worker connection {worker.name if worker else '?'} failed: {e}")
+        finally:
+            if worker is not None and worker.writer is writer:
+                # Its items move on the ring now, but stay held until its lease runs out (see _reap)
+                worker.connected = False
+                self.ring.remove(worker.name)
+                logger.warning(f"Worker {worker.name} disconnected")
+                self._rebalance()
+            writer.close()
+            self._connections.discard(asyncio.current_task())
+
+    async def _reap(self):
+        """Drop workers that went silent; by then their leases have expired."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval / 2)
+            now = time.monotonic()
+            dead = [worker for worker in self.workers.values()
+                    if now - worker.last_seen > (self.lease_ttl if not worker.connected else self.dead_after)]
+            for worker in dead:
+                del self.workers[worker.name]
+                self.ring.remove(worker.name)
+                self.deaths += 1
+                if worker.connected:
+                    worker.writer.close()
+                logger.warning(f"Worker {worker.name} is dead; releasing {len(worker.held)} items")
+            if dead or self.pending:
+                self._rebalance()
+
+    # -------- running --------
+    async def run(self, duration=None):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        server = await asyncio.start_server(self._handle, self.host, self.port, limit=LINE_LIMIT)
+        self.port = server.sockets[0].getsockname()[1]
+        logger.info(f"Coordinator listening on {self.host}:{self.port} with {len(self.items)} items")
+        self._ready.set()
+        reaper = asyncio.ensure_future(self._reap())
+        try:
+            await asyncio.sleep(duration if duration is not None else float("inf"))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            reaper.cancel()
+            server.close()
+            for worker in self.workers.values():
+                if worker.connected:
+                    worker.writer.close()
+            if self._connections:
+                await asyncio.wait(list(self._connections), timeout=1.0)
+        return self.stats()
+
+    def start(self, duration=None, timeout=5.0):
+        """Serve on its own thread and event loop; returns self once it is listening."""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run(duration)), name="coordinator", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError(f"Coordinator did not start listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._loop is not None and self._task is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.stats()
+
+    def assignments(self):
+        return {name: sorted(worker.granted) for name, worker in list(self.workers.items()) if worker.connected}
+
+    def stats(self):
+        now = time.monotonic()
+        workers = list(self.workers.items())
+        granted = set().union(*(worker.granted for _, worker in workers))
+        return {
+            "items": len(self.items),
+            "unassigned": len(set(self.items) - granted),
+            "pending": self.pending,
+            "epoch": self.epoch,
+            "rebalances": self.rebalances,
+            "deaths": self.deaths,
+            "conflicts": self.conflicts,
+            "workers": {name: {"connected": worker.connected, "items": len(worker.granted),
+                               "running": len(worker.running), "silent": round(now - worker.last_seen, 3)}
+                        for name, worker in workers},
+        }
+
+
+# ================================
+# 3. WORKER
+# ================================
+class Lease:
+    """
+    Handed to an item's factory. Check valid() right before signing for the
+    item's wallet: it is False once the item is revoked or the worker's lease
+    has lapsed. `epoch` can be recorded as a fencing token.
+    """
+    __slots__ = ("worker", "key", "revoked")
+
+    def __init__(self, worker, key):
+        self.worker = worker
+        self.key = key
+        self.revoked = False
+
+    def valid(self):
+        return not self.revoked and self.worker.lease_valid()
+
+    @property
+    def epoch(self):
+        return self.worker.epoch
+
+
+class _RunningItem:
+    __slots__ = ("item", "tick", "lease", "task", "stopping", "ticks", "errors", "fenced")
+
+    def __init__(self, item, tick, lease):
+        self.item = item
+        self.tick = tick
+        self.lease = lease
+        self.task = None
+        self.stopping = asyncio.Event()
+        self.ticks = 0
+        self.errors = 0
+        self.fenced = 0   # ticks skipped because the lease was not valid
+
+
+class Worker:
+    """
+    Runs the items a Coordinator assigns it. `factory(item, lease)` returns
+    the item's tick: a plain function (run on a thread pool) or a coroutine
+    function, called every item["interval"] seconds (default_interval otherwise).
+
+        worker = Worker(make_tick, "127.0.0.1", 8800)
+        asyncio.run(worker.run())
+    """
+
+    def __init__(self, factory, host="127.0.0.1", port=DEFAULT_PORT, name=None, weight=1.0,
+                 default_interval=5.0, max_threads=None, reconnect=True, max_backoff=10.0):
+        self.factory = factory
+        self.host = host
+        self.port = port
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.weight = weight
+        self.default_interval = default_interval
+        self.max_threads = max_threads
+        self.reconnect = reconnect
+        self.max_backoff = max_backoff
+        self.heartbeat_interval = 1.0
+        self.lease_ttl = 3.0
+        self.lease_until = 0.0
+        self.epoch = 0
+        self.items = {}
+        self.lost_leases = 0
+        self._sent = {}
+        self._seq = 0
+        self._pool = None
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    def lease_valid(self):
+        return time.monotonic() < self.lease_until
+
+    # -------- items --------
+    def _launch(self, item):
+        lease = Lease(self, item["key"])
+        try:
+            tick = self.factory(item, lease)
+        except Exception as e:
+            logger.error(f"[{self.name}] could not start {item['key']}: {e}", exc_info=True)
+            return
+        running = self.items[item["key"]] = _RunningItem(item, tick, lease)
+        running.task = asyncio.ensure_future(self._drive(running))
+
+    @staticmethod
+    def _call(running):
+        # Checked on the pool thread: a tick queued before a revoke must not run after it
+        if not running.lease.valid():
+            return False
+        running.tick()
+        return True
+
+    async def _drive(self, running):
+        loop = asyncio.get_running_loop()
+        interval = float(running.item.get("interval", self.default_interval))
+        is_async = inspect.iscoroutinefunction(running.tick)
+        while not running.stopping.is_set():
+            started = loop.time()
+            try:
+                if is_async:
+                    ran = running.lease.valid()
+                    if ran:
+                        await running.tick()
+                else:
+                    ran = await loop.run_in_executor(self._pool, self._call, running)
+                if ran:
+                    running.ticks += 1
+                else:
+                    running.fenced += 1
+            except Exception as e:
+                running.errors += 1
+                logger.error(f"[{self.name}] {running.item['key']} tick failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(running.stopping.wait(), max(0.0, interval - (loop.time() - started)))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _retire(self, keys):
+        """Stop `keys` and wait for their in-flight ticks to finish."""
+        running = [self.items.pop(key) for key in list(keys) if key in self.items]
+        for item in running:
+            item.lease.revoked = True
+            item.stopping.set()
+        if running:
+            await asyncio.gather(*(item.task for item in running), return_exceptions=True)
+
+    async def _apply(self, message, writer):
+        wanted = {item["key"]: item for item in message["items"]}
+        await self._retire([key for key, running in self.items.items() if wanted.get(key) != running.item])
+        for key, item in wanted.items():
+            if key not in self.items:
+                self._launch(item)
+        self.epoch = message["epoch"]
+        writer.write(_encode({"type": "applied", "epoch": self.epoch}))
+        logger.info(f"[{self.name}] running {len(self.items)} items (epoch {self.epoch})")
+
+    async def _applier(self, assignments, writer):
+        # Assignments are applied one at a time, off the read loop, so acks keep renewing the lease
+        while True:
+            await self._apply(await assignments.get(), writer)
+
+    # -------- protocol --------
+    async def _heartbeats(self, writer):
+        while True:
+            self._seq += 1
+            self._sent[self._seq] = time.monotonic()
+            writer.write(_encode({"type": "heartbeat", "seq": self._seq, "running": sorted(self.items)}))
+            await writer.drain()
+            if len(self._sent) > 64:
+                for seq in sorted(self._sent)[:-64]:
+                    del self._sent[seq]
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _watchdog(self):
+        """Stop everything once the lease lapses (coordinator unreachable or too slow to ack)."""
+        while True:
+            await asyncio.sleep(min(self.heartbeat_interval, self.lease_ttl) / 4)
+            if self.items and not self.lease_valid():
+                self.lost_leases += 1
+                logger.warning(f"[{self.name}] lease expired; stopping {len(self.items)} items")
+                await self._retire(list(self.items))
+
+    async def _session(self, reader, writer):
+        hello_sent = time.monotonic()
+        writer.write(_encode({"type": "hello", "worker": self.name, "weight": self.weight,
+                              "running": sorted(self.items)}))
+        assignments = asyncio.Queue()
+        tasks = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    logger.warning(f"[{self.name}] coordinator closed the connection")
+                    return
+                message = json.loads(line)
+                kind = message.get("type")
+                if kind == "ack":
+                    sent = self._sent.pop(message["seq"], None)
+                    if sent is not None:
+                        self.lease_until = max(self.lease_until, sent + self.lease_ttl)
+                elif kind == "assign":
+                    assignments.put_nowait(message)
+                elif kind == "welcome":
+                    self.heartbeat_interval = message["heartbeat_interval"]
+                    self.lease_ttl = message["lease_ttl"]
+                    self.lease_until = max(self.lease_until, hello_sent + self.lease_ttl)
+                    tasks = [asyncio.ensure_future(self._heartbeats(writer)),
+                             asyncio.ensure_future(self._applier(assignments, writer))]
+                elif kind == "reject":
+                    raise RuntimeError(f"Coordinator rejected {self.name}: {message.get('reason')}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _connect_loop(self):
+        backoff = 0.5
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=LINE_LIMIT)
+            except OSError as e:
+                if not self.reconnect:
+                    raise
+                logger.warning(f"[{self.name}] coordinator {self.host}:{self.port} unreachable ({e}); "
+                               f"retrying in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = 0.5
+            try:
+                await self._session(reader, writer)
+            except (ConnectionError, ValueError) as e:
+                logger.warning(f"[{self.name}] connection to coordinator failed: {e}")
+            finally:
+                writer.close()
+            if not self.reconnect:
+                return
+
+    async def run(self, duration=None):
+        """Serve assignments until `duration` seconds pass or stop() is called."""
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix=self.name)
+        watchdog = asyncio.ensure_future(self._watchdog())
+        try:
+            await asyncio.wait_for(self._connect_loop(), duration)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            pass
+        finally:
+            watchdog.cancel()
+            self.lease_until = 0.0
+            await self._retire(list(self.items))
+            self._pool.shutdown(wait=True)
+        return self.stats()
+
+    def start(self, duration=None):
+        """Run on its own thread and event loop; returns self."""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run(duration)), name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        if self._loop is not None and self._task is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.stats()
+
+    def stats(self):
+        return {
+            "worker": self.name,
+            "epoch": self.epoch,
+            "lease_valid": self.lease_valid(),
+            "lost_leases": self.lost_leases,
+            "items": {key: {"ticks": item.ticks, "errors": item.errors, "fenced": item.fenced}
+                      for key, item in self.items.items()},
+        }
+
+
+# ================================
+# 4. LOCAL DEMO / CLI
+# ================================
+def demo_items(assets=8, slots=4, wallet="erc3525-minter"):
+    """Asset items for the REST agent, and slot items that all sign with one wallet."""
+    items = [{"key": f"asset:ASSET{i}-USD", "kind": "asset", "asset": f"ASSET{i}-USD", "interval": 0.2}
+             for i in range(assets)]
+    items += [{"key": f"slot:{slot}", "kind": "slot", "slot": slot, "wallet": wallet, "interval": 0.2}
+              for slot in range(1, slots + 1)]
+    return items
+
+
+def demo_tick(item, lease):
+    """Worker factory for the demo: a short sleep stands in for an agent cycle."""
+    def tick():
+        time.sleep(0.01)
+    return tick
+
+
+def check_ownership(items, assigned, step=""):
+    """
+    Raise unless every item is assigned to exactly one worker and each wallet's
+    items to a single worker. Returns {wallet: [holder]}.
+    """
+    keys = [key for granted in assigned.values() for key in granted]
+    expected = sorted(item["key"] for item in items)
+    if sorted(keys) != expected:
+        missing, doubled = set(expected) - set(keys), {k for k in keys if keys.count(k) > 1}
+        raise RuntimeError(f"{step}: items not assigned exactly once (missing {sorted(missing)}, doubled {sorted(doubled)})")
+    owner = {key: name for name, granted in assigned.items() for key in granted}
+    wallets = {}
+    for item in items:
+        if item.get("wallet"):
+            wallets.setdefault(item["wallet"], set()).add(owner[item["key"]])
+    split = {wallet: sorted(holders) for wallet, holders in wallets.items() if len(holders) > 1}
+    if split:
+        raise RuntimeError(f"{step}: wallets split across workers: {split}")
+    return {wallet: sorted(holders) for wallet, holders in wallets.items()}
+
+
+def _wait_settled(coordinator, workers, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = coordinator.stats()
+        if (stats["unassigned"] == 0 and stats["pending"] == 0
+                and sorted(coordinator.assignments()) == sorted(workers)):
+            return time.monotonic()
+        time.sleep(0.05)
+    raise TimeoutError(f"fleet did not settle: {coordinator.stats()}")
+
+
+def demo(workers=3, assets=8, slots=4):
+    """
+    Coordinator in this process, `workers` worker processes on localhost.
+    Kills one worker and adds a new one, checking after each step that every
+    item is assigned exactly once and the wallet's items stay together.
+    """
+    import subprocess
+    import sys
+    coordinator = Coordinator(demo_items(assets, slots), port=0, heartbeat_interval=0.2,
+                              lease_ttl=0.6, dead_after=1.0).start()
+
+    def spawn(name):
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker", "--name", name,
+                                 "--connect", f"127.0.0.1:{coordinator.port}", "--factory", "coordinator:demo_tick"],
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    def check(step):
+        assigned = coordinator.assignments()
+        wallet_holders = check_ownership(coordinator.items.values(), assigned, step)["erc3525-minter"]
+        print(f"{step}: " + ", ".join(f"{name}={len(items)}" for name, items in sorted(assigned.items()))
+              + f" (wallet on {wallet_holders[0]})")
+        return assigned
+
+    procs = {f"worker-{i}": spawn(f"worker-{i}") for i in range(workers)}
+    try:
+        _wait_settled(coordinator, procs)
+        before = check("started")
+
+        victim = sorted(procs)[0]
+        killed = time.monotonic()
+        procs.pop(victim).kill()
+        settled = _wait_settled(coordinator, procs)
+        after = check(f"{victim} killed")
+        moved = sum(1 for name, items in after.items() for key in items if key not in before.get(name, ()))
+        print(f"  reassigned {moved} items in {settled - killed:.2f}s (only {victim}'s {len(before[victim])} should move)")
+
+        newcomer = f"worker-{workers}"
+        procs[newcomer] = spawn(newcomer)
+        _wait_settled(coordinator, procs)
+        joined = check(f"{newcomer} joined")
+        print(f"  {newcomer} took {len(joined[newcomer])} of {len(coordinator.items)} items")
+        time.sleep(1.0)   # a few heartbeats with the final assignment
+    finally:
+        for proc in procs.values():
+            proc.terminate()
+        for proc in procs.values():
+            proc.wait(10)
+        stats = coordinator.stop()
+    print(f"deaths={stats['deaths']} rebalances={stats['rebalances']} conflicts={stats['conflicts']}")
+    return stats
+
+
+def _load_items(spec):
+    if spec is None:
+        return []
+    if os.path.exists(spec):
+        with open(spec) as f:
+            return json.load(f)
+    return list(load_object(spec)())
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Shard agents over worker processes with a coordinator")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="run the coordinator")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--items", help="JSON file with the item list, or module:function returning it")
+    serve.add_argument("--heartbeat", type=float, default=1.0, help="heartbeat interval (s)")
+    serve.add_argument("--lease", type=float, default=3.0, help="worker lease (s)")
+    serve.add_argument("--dead-after", type=float, default=5.0, help="silence before a worker is declared dead (s)")
+    worker = sub.add_parser("worker", help="run a worker")
+    worker.add_argument("--connect", default=f"127.0.0.1:{DEFAULT_PORT}", help="coordinator host:port")
+    worker.add_argument("--factory", required=True, help="module:function building an item's tick")
+    worker.add_argument("--name", help="worker name (default: hostname-pid)")
+    worker.add_argument("--weight", type=float, default=1.0, help="relative share of items")
+    run_demo = sub.add_parser("demo", help="local multi-process demo")
+    run_demo.add_argument("--workers", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.command != "demo" else logging.WARNING,
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+
+    try:
+        if args.command == "serve":
+            coordinator = Coordinator(_load_items(args.items), args.host, args.port, args.heartbeat,
+                                      args.lease, args.dead_after)
+            asyncio.run(coordinator.run())
+        elif args.command == "worker":
+            host, port = args.connect.rsplit(":", 1)
+            asyncio.run(Worker(load_object(args.factory), host, int(port), args.name, args.weight).run())
+        else:
+            demo(args.workers)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+"""
+Feature Cache
+-----------------------------
+
+Indicator values keyed by (symbol, indicator, params, last-bar timestamp),
+so agents that trade the same assets stop recomputing identical features.
+
+- FeatureCache       : in-process LRU bounded by total array bytes; the
+                       module-level `feature_cache` is shared by every agent
+                       in the process.
+- SharedFeatureCache : same interface, plus a cross-process tier in POSIX /
+                       Windows shared memory. Each entry lives in its own
+                       named block derived from a hash of the key, so other
+                       processes find it by name without a shared index.
+                       A block costs whole pages and holds file descriptors,
+                       so entries are charged their page-rounded block size
+                       and the number of blocks is capped (a share of
+                       RLIMIT_NOFILE); when the OS refuses a block the entry
+                       is kept in the local LRU only. Callers should cache
+                       one vector per asset and bar (indicators.batch_features
+                       packs all of an asset's features into one entry).
+
+Because the last-bar timestamp is part of the key, entries never go stale:
+a new bar simply produces a new key and the old one ages out of the LRU.
+
+The module-level `feature_cache` (the default of indicators.compute_signals)
+is picked from the environment: FEATURE_CACHE=shared makes it a
+SharedFeatureCache, so agents in separate worker processes on one host
+(coordinator.py workers) compute each feature once between them.
+FEATURE_CACHE_MB sets its size, FEATURE_CACHE_NAMESPACE its block prefix.
+"""
+
+import atexit
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import os
+import sys
+import threading
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: no RLIMIT_NOFILE
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def feature_key(symbol, indicator, params, last_ts):
+    """Canonical cache key; `params` may be a dict, tuple or scalar."""
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    elif not isinstance(params, tuple):
+        params = (params,)
+    return (symbol, indicator, params, int(last_ts))
+
+
+class FeatureCache:
+    """Thread-safe LRU of NumPy arrays bounded by `max_bytes`."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """FEATURE_CACHE=shared -> SharedFeatureCache, anything else -> in-process FeatureCache."""
+        mb = environ.get("FEATURE_CACHE_MB")
+        max_bytes = int(float(mb) * 1024 * 1024) if mb not in (None, "") else DEFAULT_MAX_BYTES
+        if environ.get("FEATURE_CACHE", "").lower() != "shared":
+            return FeatureCache(max_bytes)
+        cache = SharedFeatureCache(max_bytes, namespace=environ.get("FEATURE_CACHE_NAMESPACE") or "aaa")
+        atexit.register(cache.close)
+        return cache
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        value = np.asarray(value)
+        if self._cost(value) > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self._cost(old)
+                if old is not value:
+                    self._evicted(old)
+            self._entries[key] = value
+            self.bytes += self._cost(value)
+            while self._full() and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= self._cost(evicted)
+                self._evicted(evicted)
+        return value
+
+    def _cost(self, value):
+        """Bytes an entry is charged against max_bytes."""
+        return value.nbytes
+
+    def _full(self):
+        return self.bytes > self.max_bytes
+
+    def _evicted(self, value):
+        pass
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+# ================================
+# CROSS-PROCESS TIER
+# ================================
+# Block layout: [ready flag int64][length int64][float64 * length]
+_HEADER = 16
+# A mapped block holds two descriptors (the shm fd and mmap's duplicate)
+_FDS_PER_BLOCK = 2
+
+
+def _block_size(nbytes):
+    """Bytes a block of `nbytes` payload occupies: whole pages."""
+    size = _HEADER + max(nbytes, 8)
+    return -(-size // mmap.PAGESIZE) * mmap.PAGESIZE
+
+
+def default_max_blocks():
+    """Blocks one process may map: a quarter of its descriptor limit (at most 4096)."""
+    if resource is None:
+        return 4096
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return 4096
+    return max(8, min(4096, soft // (4 * _FDS_PER_BLOCK)))
+
+
+def _attach(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    block = shared_memory.SharedMemory(name=name)
+    # Before 3.13 attaching registers the block with this process's resource
+    # tracker. multiprocessing children share their parent's tracker, which is
+    # harmless; an unrelated process has its own tracker that would unlink the
+    # block when it exits, so hand the block back to its creator.
+    if multiprocessing.parent_process() is None:
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, "shared_memory")
+        except Exception:
+            pass
+    return block
+
+
+class SharedFeatureCache(FeatureCache):
+    """
+    FeatureCache backed by shared memory for float64 1-D features.
+    Local LRU entries are views onto the shared blocks; blocks created by
+    this process are unlinked when evicted (or on close()). At most
+    `max_blocks` blocks are mapped at once (default_max_blocks()).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, namespace="aaa", max_blocks=None):
+        super().__init__(max_bytes)
+        self.namespace = namespace
+        self.max_blocks = max_blocks or default_max_blocks()
+        self.fallbacks = 0   # entries kept local because the OS refused a block
+        self._blocks = {}
+
+    def _name(self, key):
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=10).hexdigest()
+        return f"{self.namespace}_{digest}"
+
+    def get(self, key, default=None):
+        value = super().get(key)
+        if value is not None:
+            return value
+        name = self._name(key)
+        if len(self._blocks) >= self.max_blocks:
+            self._make_room()
+        try:
+            block = _attach(name)
+        except OSError:  # not there (FileNotFoundError), or out of descriptors / memory
+            return default
+        header = np.ndarray((2,), dtype=np.int64, buffer=block.buf)
+        if header[0] != 1:  # still being written by its creator
+            block.close()
+            return default
+        value = np.ndarray((int(header[1]),), dtype=np.float64, buffer=block.buf, offset=_HEADER)
+        self.misses -= 1
+        self.hits += 1
+        if _block_size(value.nbytes) > self.max_bytes:  # too big to keep locally: hand back a copy, detach now
+            value = value.copy()
+            block.close()
+            return value
+        value.flags.writeable = False
+        self._blocks[id(value)] = (block, False)
+        return super().put(key, value)
+
+    def put(self, key, value):
+        value = np.ascontiguousarray(value, dtype=np.float64).ravel()
+        if _block_size(value.nbytes) > self.max_bytes:  # rejected by the LRU, so never give it a block
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self._cost(old)
+        if old is not None:  # replacing: unlink our old block first so the name is free again
+            self._evicted(old)
+        if len(self._blocks) >= self.max_blocks:
+            self._make_room()
+        try:
+            block = shared_memory.SharedMemory(name=self._name(key), create=True, size=_HEADER + max(value.nbytes, 8))
+        except FileExistsError:
+            return super().put(key, value)
+        except OSError as e:  # out of descriptors or shared memory: keep it in this process only
+            self.fallbacks += 1
+            if self.fallbacks == 1:
+                logger.warning(f"Shared feature block refused ({e}); caching locally")
+            return super().put(key, value)
+        header = np.ndarray((2,), dtype=np.int64, buffer=block.buf)
+        header[1] = len(value)
+        shared = np.ndarray(value.shape, dtype=np.float64, buffer=block.buf, offset=_HEADER)
+        shared[:] = value
+        header[0] = 1
+        shared.flags.writeable = False
+        self._blocks[id(shared)] = (block, True)
+        return super().put(key, shared)
+
+    def _cost(self, value):
+        # A shared entry occupies its block's whole pages
+        return _block_size(value.nbytes) if id(value) in self._blocks else value.nbytes
+
+    def _full(self):
+        return self.bytes > self.max_bytes or len(self._blocks) > self.max_blocks
+
+    def _make_room(self):
+        """Evict least recently used entries until a new block fits under max_blocks."""
+        with self._lock:
+            while len(self._blocks) >= self.max_blocks and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= self._cost(evicted)
+                self._evicted(evicted)
+
+    def _evicted(self, value):
+        block, owner = self._blocks.pop(id(value), (None, False))
+        if block is None:
+            return
+        del value
+        try:
+            block.close()
+        except BufferError:  # still referenced by a caller; the mapping goes when they drop it
+            pass
+        if owner:
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return dict(super().stats(), blocks=len(self._blocks), fallbacks=self.fallbacks)
+
+    def close(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self.bytes = 0
+        for value in entries:
+            self._evicted(value)
+
+
+# Shared by every agent in this process (and across processes with FEATURE_CACHE=shared).
+feature_cache = FeatureCache.from_env()
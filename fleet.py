@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Fleet Items
+-----------------------------
+
+The item list and worker factory that shard AAA.py's trading agents over
+coordinator.py workers: one item per asset, each run as a TradingAgent
+ticking on that symbol (run_tick) in whichever worker holds its lease.
+
+Every AAA agent signs with the one WALLET_FILE wallet, so every asset item
+carries it as its "wallet": the coordinator keeps them all on a single
+worker, which then owns the wallet and its nonce. Items only spread over
+workers once assets trade from different wallets.
+
+    FLEET_ASSETS=BTC-USD,ETH-USD,SOL-USD python coordinator.py serve --items fleet:fleet_items
+    python coordinator.py worker --connect 127.0.0.1:8800 --factory fleet:make_tick   # one per process / host
+
+FLEET_INTERVAL sets the seconds between an agent's ticks (default 5).
+agent2.py's slot minting is not sharded here: it is a pasted script, not an
+importable module, and runs as its own process holding the minting wallet.
+"""
+
+import os
+from functools import partial
+
+# AAA.CONFIG["WALLET_FILE"]'s default, without importing AAA into the coordinator
+DEFAULT_WALLET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wallet_seed.json")
+
+
+def fleet_items(environ=os.environ):
+    """One coordinator item per asset in FLEET_ASSETS (default: AAA's SYMBOL), all on AAA's wallet."""
+    assets = [a.strip() for a in environ.get("FLEET_ASSETS", environ.get("SYMBOL", "BTC-USD")).split(",") if a.strip()]
+    interval = float(environ.get("FLEET_INTERVAL", 5))
+    wallet = environ.get("WALLET_FILE", DEFAULT_WALLET_FILE)
+    return [{"key": f"asset:{asset}", "kind": "asset", "asset": asset, "wallet": wallet, "interval": interval}
+            for asset in assets]
+
+
+def make_tick(item, lease):
+    """
+    Worker factory: a TradingAgent for the item's asset and its tick. The worker
+    only starts a tick while it holds the item's lease, and the tick checks the
+    lease again before acting on its signal, so an asset never trades in two
+    processes at once.
+    """
+    import AAA  # the worker's agents; the coordinator never needs it
+    if item["kind"] != "asset":
+        raise ValueError(f"fleet.make_tick: unknown item kind {item['kind']!r}")
+    agent = AAA.TradingAgent(f"Agent_{item['asset']}", symbol=item["asset"])
+    return partial(AAA.run_tick, agent, verbose=False, lease=lease)
@@ -0,0 +1,441 @@
+#!/usr/bin/env python
+"""
+Streaming Indicators
+-----------------------------
+
+Incremental versions of the indicators used by the agents. Every indicator
+keeps its state in a fixed-size ring buffer and updates in O(1) when a new
+price arrives, instead of rebuilding a DataFrame and recomputing the whole
+series on every tick.
+
+Values follow the TA-Lib / pandas_ta batch conventions:
+- SMA        -> ta.sma / talib.SMA
+- EMA        -> talib.EMA (seeded with the SMA of the first `period` prices)
+- RSI        -> talib.RSI (Wilder smoothing)
+- Bollinger  -> talib.BBANDS (population standard deviation)
+- MACD       -> talib.MACD
+Until an indicator has seen enough prices its value is NaN, as in TA-Lib.
+
+`compute_signals` (section 4) is the batch path used by the REST agent:
+it evaluates every asset as one 2-D array and goes through the shared
+feature cache, so agents trading the same assets compute each feature once.
+"""
+
+import math
+import os
+
+import numpy as np
+
+from feature_cache import feature_cache, feature_key
+
+NAN = float("nan")
+
+
+# ================================
+# 1. RING BUFFER
+# ================================
+class RingBuffer:
+    """
+    Fixed-size buffer of the last `size` values.
+    `push` returns the value that fell out of the window (or None).
+    """
+    __slots__ = ("size", "data", "pos", "count")
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("RingBuffer size must be >= 1")
+        self.size = size
+        self.data = [0.0] * size
+        self.pos = 0
+        self.count = 0
+
+    def push(self, value):
+        evicted = self.data[self.pos] if self.count == self.size else None
+        self.data[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        return evicted
+
+    @property
+    def full(self):
+        return self.count == self.size
+
+    def last(self):
+        return self.data[(self.pos - 1) % self.size] if self.count else NAN
+
+    def values(self):
+        """Oldest-to-newest copy of the buffered values."""
+        if self.count < self.size:
+            return self.data[:self.count]
+        return self.data[self.pos:] + self.data[:self.pos]
+
+
+# ================================
+# 2. INDICATORS
+# ================================
+class SMA:
+    """Simple moving average over a running sum."""
+    __slots__ = ("period", "buffer", "total", "value")
+
+    def __init__(self, period):
+        self.period = period
+        self.buffer = RingBuffer(period)
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, price):
+        evicted = self.buffer.push(price)
+        if evicted is None:
+            self.total += price
+        else:
+            self.total += price - evicted
+            # Re-sum once per wrap to stop floating-point drift (amortized O(1)).
+            if self.buffer.pos == 0:
+                self.total = math.fsum(self.buffer.data)
+        if self.buffer.full:
+            self.value = self.total / self.period
+        return self.value
+
+
+class EMA:
+    """Exponential moving average, seeded with the SMA of the first `period` prices."""
+    __slots__ = ("period", "alpha", "seed", "value")
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.seed = SMA(period)
+        self.value = NAN
+
+    def update(self, price):
+        if self.value != self.value:  # still NaN: warming up on the seed SMA
+            self.value = self.seed.update(price)
+        else:
+            self.value += self.alpha * (price - self.value)
+        return self.value
+
+
+class RSI:
+    """Relative Strength Index with Wilder smoothing."""
+    __slots__ = ("period", "prev_price", "count", "avg_gain", "avg_loss", "value")
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_price = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value = NAN
+
+    def update(self, price):
+        if self.prev_price is None:
+            self.prev_price = price
+            return self.value
+        change = price - self.prev_price
+        self.prev_price = price
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        self.count += 1
+        if self.count < self.period:
+            self.avg_gain += gain
+            self.avg_loss += loss
+            return self.value
+        if self.count == self.period:
+            self.avg_gain = (self.avg_gain + gain) / self.period
+            self.avg_loss = (self.avg_loss + loss) / self.period
+        else:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        total = self.avg_gain + self.avg_loss
+        self.value = 100.0 * self.avg_gain / total if total else 0.0
+        return self.value
+
+
+class RollingStd:
+    """Rolling standard deviation over running sums (ddof=0 like TA-Lib, ddof=1 like pandas)."""
+    __slots__ = ("period", "ddof", "buffer", "total", "total_sq", "value")
+
+    def __init__(self, period, ddof=0):
+        self.period = period
+        self.ddof = ddof
+        self.buffer = RingBuffer(period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.value = NAN
+
+    def update(self, price):
+        evicted = self.buffer.push(price)
+        self.total += price
+        self.total_sq += price * price
+        if evicted is not None:
+            self.total -= evicted
+            self.total_sq -= evicted * evicted
+            if self.buffer.pos == 0:
+                self.total = math.fsum(self.buffer.data)
+                self.total_sq = math.fsum(x * x for x in self.buffer.data)
+        if self.buffer.full:
+            mean = self.total / self.period
+            var = (self.total_sq - self.period * mean * mean) / (self.period - self.ddof)
+            self.value = math.sqrt(var) if var > 0 else 0.0
+        return self.value
+
+
+class BollingerBands:
+    """Bollinger Bands: SMA +/- `num_std` population standard deviations."""
+    __slots__ = ("period", "num_std", "std", "upper", "middle", "lower")
+
+    def __init__(self, period=20, num_std=2.0):
+        self.period = period
+        self.num_std = num_std
+        self.std = RollingStd(period, ddof=0)
+        self.upper = self.middle = self.lower = NAN
+
+    def update(self, price):
+        std = self.std.update(price)
+        if std == std:
+            self.middle = self.std.total / self.period
+            self.upper = self.middle + self.num_std * std
+            self.lower = self.middle - self.num_std * std
+        return self.upper, self.middle, self.lower
+
+
+class MACD:
+    """
+    MACD line, signal line and histogram.
+    As in TA-Lib, the fast EMA is seeded on the same bar as the slow EMA and
+    nothing is reported until the signal line has warmed up.
+    """
+    __slots__ = ("fast", "slow", "signal_period", "count", "fast_seed", "fast_ema",
+                 "slow_ema", "signal_ema", "macd", "signal", "hist")
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        if fast > slow:
+            fast, slow = slow, fast
+        self.fast = fast
+        self.slow = slow
+        self.signal_period = signal
+        self.count = 0
+        self.fast_seed = SMA(fast)
+        self.fast_ema = NAN
+        self.slow_ema = EMA(slow)
+        self.signal_ema = EMA(signal)
+        self.macd = self.signal = self.hist = NAN
+
+    def update(self, price):
+        self.count += 1
+        slow = self.slow_ema.update(price)
+        if self.count < self.slow:
+            self.fast_seed.update(price)
+            return self.macd, self.signal, self.hist
+        if self.count == self.slow:
+            self.fast_ema = self.fast_seed.update(price)
+        else:
+            self.fast_ema += 2.0 / (self.fast + 1) * (price - self.fast_ema)
+        line = self.fast_ema - slow
+        signal = self.signal_ema.update(line)
+        if signal == signal:
+            self.macd, self.signal, self.hist = line, signal, line - signal
+        return self.macd, self.signal, self.hist
+
+
+# ================================
+# 3. ENGINE (one per symbol)
+# ================================
+class IndicatorEngine:
+    """
+    Bundle of streaming indicators for a single price series.
+    Built from a TradingAgent-style `strategy_params` dict; unknown keys are ignored.
+    """
+
+    def __init__(self, params=None):
+        params = params or {}
+        self.sma = SMA(int(params.get("ma_period", 20)))
+        self.ema = EMA(int(params.get("ema", params.get("ema_short", 20))))
+        self.rsi = RSI(int(params.get("rsi_period", params.get("rsi", 14))))
+        self.bbands = BollingerBands(int(params.get("bbands_length", 20)),
+                                     float(params.get("bbands_std", 2.0)))
+        self.macd = MACD(int(params.get("macd_fast", 12)),
+                         int(params.get("macd_slow", 26)),
+                         int(params.get("macd_signal", 9)))
+        # Sample std (pandas default) used by TradingAgent.update_strategy.
+        self.volatility = RollingStd(int(params.get("volatility_window", 100)), ddof=1)
+        self.price = NAN
+        self.ticks = 0
+
+    def update(self, price):
+        price = float(price)
+        self.price = price
+        self.ticks += 1
+        self.sma.update(price)
+        self.ema.update(price)
+        self.rsi.update(price)
+        self.bbands.update(price)
+        self.macd.update(price)
+        self.volatility.update(price)
+        return self
+
+    def warm_up(self, prices):
+        for price in prices:
+            self.update(price)
+        return self
+
+    def snapshot(self):
+        return {
+            "price": self.price,
+            "SMA": self.sma.value,
+            "EMA": self.ema.value,
+            "RSI": self.rsi.value,
+            "BB_upper": self.bbands.upper,
+            "BB_middle": self.bbands.middle,
+            "BB_lower": self.bbands.lower,
+            "MACD": self.macd.macd,
+            "MACD_signal": self.macd.signal,
+            "MACD_hist": self.macd.hist,
+            "volatility": self.volatility.value,
+        }
+
+
+class IndicatorBook:
+    """Per-symbol IndicatorEngines sharing one set of params."""
+
+    def __init__(self, params=None):
+        self.params = dict(params or {})
+        self.engines = {}
+
+    def engine(self, symbol):
+        engine = self.engines.get(symbol)
+        if engine is None:
+            engine = self.engines[symbol] = IndicatorEngine(self.params)
+        return engine
+
+    def update(self, symbol, price):
+        return self.engine(symbol).update(price)
+
+    def __contains__(self, symbol):
+        return symbol in self.engines
+
+    def __len__(self):
+        return len(self.engines)
+
+
+# ================================
+# 4. BATCH SIGNALS (all assets as one 2-D array)
+# ================================
+def batch_sma(prices, period):
+    """Last SMA value per row of a (assets x bars) array."""
+    if prices.shape[1] < period:
+        return np.full(prices.shape[0], NAN)
+    return prices[:, -period:].mean(axis=1)
+
+
+def batch_rsi(prices, period):
+    """Last Wilder RSI value per row, seeded at the start of the window (as talib.RSI on that window)."""
+    rows, bars = prices.shape
+    if bars <= period:
+        return np.full(rows, NAN)
+    change = np.diff(prices, axis=1)
+    gains = np.clip(change, 0.0, None)
+    losses = np.clip(-change, 0.0, None)
+    avg_gain = gains[:, :period].mean(axis=1)
+    avg_loss = losses[:, :period].mean(axis=1)
+    # Vectorized across assets; the recursion runs over the window's bars only.
+    for t in range(period, bars - 1):
+        avg_gain = (avg_gain * (period - 1) + gains[:, t]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[:, t]) / period
+    total = avg_gain + avg_loss
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total == 0, 0.0, 100.0 * avg_gain / total)
+
+
+BATCH_FEATURES = {
+    "sma": lambda prices, params: batch_sma(prices, int(params.get("ma_period", 20))),
+    "rsi": lambda prices, params: batch_rsi(prices, int(params.get("rsi_period", 14))),
+}
+
+_default_store = None
+
+
+def default_store():
+    """MarketStore at $MARKET_DATA_DIR (default ./market_data), opened once per process."""
+    global _default_store
+    if _default_store is None:
+        from market_store import MarketStore
+        _default_store = MarketStore(os.getenv("MARKET_DATA_DIR", "market_data"))
+    return _default_store
+
+
+def batch_features(assets, params, store=None, cache=feature_cache, window=100):
+    """
+    Latest price, SMA and RSI for every asset, as arrays aligned with the
+    returned asset list (assets without enough history are dropped).
+    An asset's features for its last bar are cached as one vector (one
+    shared-memory block with FEATURE_CACHE=shared) and reused; the assets
+    missing from `cache` are computed in one (assets x window) batch.
+    """
+    store = store or default_store()
+    window = max(window, int(params.get("ma_period", 20)), int(params.get("rsi_period", 14)) + 1)
+    names, last_ts, closes = [], [], []
+    for asset in assets:
+        bars = store.last(asset, window)
+        if len(bars) < window:
+            continue
+        names.append(asset)
+        last_ts.append(int(bars.ts[-1]))
+        closes.append(bars.close)
+    features = {"price": np.array([c[-1] for c in closes], dtype=float)}
+    if not names:
+        return names, {name: np.empty(0) for name in ("price",) + tuple(BATCH_FEATURES)}
+    packed = tuple((feature, params_key(feature, params)) for feature in BATCH_FEATURES)
+    keys = [feature_key(a, "features", packed, ts) for a, ts in zip(names, last_ts)]
+    values = np.empty((len(BATCH_FEATURES), len(names)))
+    missing = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            values[:, i] = cached
+    if missing:
+        batch = np.stack([closes[i] for i in missing])
+        fresh = np.stack([compute(batch, params) for compute in BATCH_FEATURES.values()])
+        values[:, missing] = fresh
+        for j, i in enumerate(missing):
+            cache.put(keys[i], fresh[:, j].copy())
+    for row, feature in enumerate(BATCH_FEATURES):
+        features[feature] = values[row]
+    return names, features
+
+
+def params_key(feature, params):
+    if feature == "sma":
+        return (int(params.get("ma_period", 20)),)
+    if feature == "rsi":
+        return (int(params.get("rsi_period", 14)),)
+    return tuple(sorted(params.items()))
+
+
+def compute_signals(assets, params, store=None, cache=feature_cache):
+    """
+    Order signals for `assets` from the shared market store.
+    Same rule as TradingAgent.evaluate_trade_signal, evaluated for all assets at once:
+    price above SMA with RSI below overbought -> BUY, price below SMA with RSI above oversold -> SELL.
+    Returns [{"side", "product_id", "size", "price"}] (price None = market order).
+    """
+    from strategy_registry import strategies
+    names, f = batch_features(assets, params, store, cache, int(params.get("window", 100)))
+    rule = strategies.compile("sma_rsi", rsi_overbought=float(params.get("rsi_overbought", 70)),
+                              rsi_oversold=float(params.get("rsi_oversold", 30)))
+    side = rule(f["price"], f["sma"], f["rsi"])
+    buy, sell = side > 0, side < 0
+    size = str(params.get("size", os.getenv("TRADE_SIZE", "0.01")))
+    limit = bool(params.get("limit_orders", False))
+    signals = []
+    for i in np.flatnonzero(buy | sell):
+        signals.append({
+            "side": "BUY" if buy[i] else "SELL",
+            "product_id": names[i],
+            "size": size,
+            "price": str(f["price"][i]) if limit else None,
+        })
+    return signals
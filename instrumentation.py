@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+"""
+Latency Instrumentation
+-----------------------------
+
+Monotonic-clock spans around the tick -> signal -> order path, aggregated
+into log-bucketed (HDR-style) histograms per agent and span name.
+
+    from instrumentation import span
+
+    with span("indicators", agent.name):
+        ...
+
+Enable with AAA_METRICS=1 (or `instruments.enable()`). When disabled,
+`span()` returns a shared no-op context manager, so an instrumented call
+costs a few hundred nanoseconds at most.
+
+Export:
+- instruments.prometheus_text()         Prometheus text exposition (summary per span)
+- instruments.snapshot()                dict for JSON
+- instruments.start_json_snapshots(path, interval)   periodic JSON file
+- instruments.serve_prometheus(port)    /metrics over HTTP on a daemon thread
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+# ================================
+# 1. HISTOGRAM
+# ================================
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram: seconds in, nanosecond resolution,
+    16 sub-buckets per power of two (~6% precision). Cheap enough to record
+    on every call.
+    """
+    SUB_BUCKETS = 16
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def _bucket_value(self, bucket):
+        if bucket == 0:
+            return 0.0
+        exponent, fraction = divmod(bucket - 1, self.SUB_BUCKETS)
+        return (1 << exponent) * (1 + (fraction + 1) / self.SUB_BUCKETS) / 1e9
+
+    def record(self, seconds):
+        self.record_ns(int(seconds * 1e9))
+
+    def record_ns(self, nanos):
+        if nanos > 0:
+            exponent = nanos.bit_length() - 1
+            # top 4 bits below the leading one select the sub-bucket
+            bucket = exponent * 16 + ((nanos << 4) >> exponent) - 15
+        else:
+            bucket = 0
+        seconds = nanos / 1e9
+        with self._lock:
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, pct):
+        """Upper bound (seconds) of the bucket holding the `pct` percentile."""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * pct / 100.0))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return min(self._bucket_value(bucket), self.max)
+        return self.max
+
+    def merge(self, other):
+        with self._lock:
+            for bucket, n in other.counts.items():
+                self.counts[bucket] = self.counts.get(bucket, 0) + n
+            self.count += other.count
+            self.total += other.total
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.max,
+        }
+
+
+# ================================
+# 2. SPANS
+# ================================
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record_ns(time.perf_counter_ns() - self.started)
+        return False
+
+
+class Instrumentation:
+    """Registry of per-(agent, span) histograms."""
+
+    def __init__(self, enabled=False, prefix="aaa"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._snapshot_thread = None
+        self._snapshot_stop = threading.Event()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def histogram(self, name, agent=None):
+        key = (agent or "global", name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def span(self, name, agent=None):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self.histogram(name, agent))
+
+    def record(self, name, seconds, agent=None):
+        if self.enabled:
+            self.histogram(name, agent).record(seconds)
+
+    def timed(self, name):
+        """Decorator form of span(); the agent label is taken from `self.name` when present."""
+        def wrap(fn):
+            def inner(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                agent = getattr(args[0], "name", None) if args else None
+                with self.span(name, agent):
+                    return fn(*args, **kwargs)
+            inner.__name__ = fn.__name__
+            inner.__doc__ = fn.__doc__
+            inner.__wrapped__ = fn
+            return inner
+        return wrap
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    # -------- export --------
+    def snapshot(self):
+        out = {}
+        for (agent, name), histogram in sorted(self.histograms.items()):
+            out.setdefault(agent, {})[name] = histogram.summary()
+        return {"timestamp": time.time(), "spans": out}
+
+    def prometheus_text(self):
+        metric = f"{self.prefix}_span_seconds"
+        lines = [f"# HELP {metric} Latency of instrumented spans.", f"# TYPE {metric} summary"]
+        for (agent, name), histogram in sorted(self.histograms.items()):
+            labels = f'agent="{_escape(agent)}",span="{_escape(name)}"'
+            for q in QUANTILES:
+                lines.append(f'{metric}{{{labels},quantile="{q}"}} {histogram.percentile(q * 100):.9f}')
+            lines.append(f"{metric}_sum{{{labels}}} {histogram.total:.9f}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def start_json_snapshots(self, path, interval=10.0):
+        """Rewrite `path` with a JSON snapshot every `interval` seconds on a daemon thread."""
+        def loop():
+            while not self._snapshot_stop.wait(interval):
+                try:
+                    self.write_json(path)
+                except OSError:
+                    pass
+        self._snapshot_stop.clear()
+        self._snapshot_thread = threading.Thread(target=loop, name="metrics-json", daemon=True)
+        self._snapshot_thread.start()
+        return self._snapshot_thread
+
+    def stop_json_snapshots(self):
+        self._snapshot_stop.set()
+
+    def serve_prometheus(self, port=9108, host="0.0.0.0"):
+        """Serve prometheus_text() at /metrics on a daemon thread; returns the server."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        instruments = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = instruments.prometheus_text().encode()
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide default registry.
+instruments = Instrumentation(enabled=os.getenv("AAA_METRICS", "0") == "1")
+span = instruments.span
+timed = instruments.timed
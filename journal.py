@@ -0,0 +1,510 @@
+#!/usr/bin/env python
+"""
+Trade Journal
+-----------------------------
+
+Append-only binary journal of everything an agent does: signals, orders,
+fills, mint transactions, slot-balance readings and session start/end.
+
+Every event is one fixed-width 56-byte record (EVENT_DTYPE). Strings
+(agent, symbol, order id, tx hash) are interned to integer ids, so the
+event file is a plain array that NumPy maps straight from disk:
+
+    <root>/<session>.jrnl       64-byte header + EVENT_DTYPE records
+    <root>/<session>.strings    one JSON string per line; line i is id i
+
+Recording is off the hot path. `journal.signal(...)` appends a tuple to
+an in-memory deque (about 2 us per event, the writer's share included), and a
+writer thread packs batches to bytes, appends them and fsyncs as
+configured (FSYNC_MODES).
+Strings are always written before the events that use them. A reader
+ignores a torn trailing record, so a crash loses only the last unflushed
+batch; reopening the session cuts the torn tails off both files before
+appending to them.
+
+Enable with AAA_JOURNAL_DIR=<dir> (or `journal.open(dir)`). While
+disabled, every recording call returns immediately.
+
+    from journal import journal, load_session
+
+    journal.signal("Agent_1", "BTC-USD", "buy", 64250.0)
+    journal.close()
+
+    session = load_session(path)                  # memory-mapped, columnar
+    fills = session.kind("fill")                  # structured ndarray
+    session.pnl()                                 # per agent/symbol attribution
+    session.reconcile(paper_exchange.summary())   # journal vs exchange accounts
+    session.to_arrow()                            # pyarrow Table (optional)
+"""
+
+import collections
+import glob
+import json
+import os
+import struct
+import threading
+import time
+from itertools import starmap
+
+import numpy as np
+
+from clocks import get_clock
+
+MAGIC = b"AAAJRNL\x01"
+HEADER = struct.Struct("<8sIIq40x")   # magic, record size, version, created (ns)
+VERSION = 1
+
+EVENT_DTYPE = np.dtype([
+    ("ts", "<i8"),       # session clock, ns
+    ("kind", "u1"),      # KINDS index
+    ("side", "i1"),      # +1 buy, -1 sell, 0 none / hold
+    ("status", "u1"),    # STATUSES index
+    ("flags", "u1"),
+    ("agent", "<u4"),    # string ids
+    ("symbol", "<u4"),
+    ("ref", "<u4"),      # order id / tx hash
+    ("price", "<f8"),
+    ("size", "<f8"),
+    ("value", "<f8"),    # fill: fee, order: filled size, mint: nonce, slot: balance, session: profit
+    ("aux", "<i8"),      # slot, or a numeric order id
+])
+# Same layout for the writer, which packs record tuples straight to bytes
+RECORD = struct.Struct("<qBbBBIIIdddq")
+assert RECORD.size == EVENT_DTYPE.itemsize
+
+KINDS = ("", "session", "signal", "order", "fill", "mint", "slot_balance")
+KIND = {name: i for i, name in enumerate(KINDS)}
+STATUSES = ("", "start", "end", "OPEN", "FILLED", "PARTIAL", "CANCELLED", "REJECTED",
+            "sent", "queued", "paper", "failed")
+STATUS = {name: i for i, name in enumerate(STATUSES)}
+SIDES = {"buy": 1, "BUY": 1, "sell": -1, "SELL": -1, "hold": 0, 1: 1, -1: -1, 0: 0}
+FSYNC_MODES = ("never", "interval", "always")
+
+
+def _default_session():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+# ================================
+# 1. WRITER
+# ================================
+class Journal:
+    """
+    Process-wide event journal. Records are queued by the calling thread and
+    written by a background writer every `flush_interval` seconds (sooner
+    once `batch_size` records are waiting).
+
+    fsync: "never"    leave it to the OS
+           "interval" fsync at most every `fsync_interval` seconds (default)
+           "always"   fsync every batch
+    """
+
+    def __init__(self, root=None, session=None, fsync="interval", fsync_interval=1.0,
+                 flush_interval=0.2, batch_size=16384):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"Unknown fsync mode {fsync!r}, expected one of {FSYNC_MODES}")
+        self.enabled = False
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.path = None
+        self.records = 0
+        self.written = 0
+        self._pending = collections.deque()
+        self._ids = {"": 0}
+        self._new_strings = collections.deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._events_file = None
+        self._strings_file = None
+        self._last_fsync = 0.0
+        if root:
+            self.open(root, session)
+
+    def open(self, root, session=None):
+        """Start journaling to `<root>/<session>.jrnl` (a new file per session name)."""
+        if self.enabled:
+            self.close()
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, f"{session or _default_session()}.jrnl")
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size
+        if new:
+            # A header torn by a crash is rewritten, and the strings start over with it
+            self._events_file = open(self.path, "wb")
+            self._events_file.write(HEADER.pack(MAGIC, EVENT_DTYPE.itemsize, VERSION, time.time_ns()))
+            self._ids = {"": 0}
+            self._strings_file = open(_strings_path(self.path), "w", encoding="utf-8")
+        else:
+            # Cut a torn trailing record / string so appends stay aligned
+            rows = (os.path.getsize(self.path) - HEADER.size) // EVENT_DTYPE.itemsize
+            os.truncate(self.path, HEADER.size + rows * EVENT_DTYPE.itemsize)
+            self._events_file = open(self.path, "ab")
+            self._ids = {s: i for i, s in enumerate(_repair_strings(_strings_path(self.path)))}
+            self._ids.setdefault("", 0)
+            self._strings_file = open(_strings_path(self.path), "a", encoding="utf-8")
+        if not self._strings_file.tell():
+            self._strings_file.write('""\n')   # id 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+        self.enabled = True
+        return self.path
+
+    def _intern(self, value):
+        value = str(value)
+        with self._lock:
+            i = self._ids.get(value)
+            if i is None:
+                # Queue the string before publishing its id: record() reads _ids without the lock,
+                # and an event must never be queued ahead of the string it refers to
+                i = len(self._ids)
+                self._new_strings.append(value)
+                self._ids[value] = i
+            return i
+
+    # -------- recording (hot path) --------
+    def record(self, kind, agent, symbol="", side=0, status="", ref="", price=0.0, size=0.0, value=0.0, aux=0):
+        if not self.enabled:
+            return
+        ids = self._ids
+        a = ids.get(agent)
+        if a is None:
+            a = self._intern(agent)
+        s = ids.get(symbol)
+        if s is None:
+            s = self._intern(symbol)
+        r = ids.get(ref)
+        if r is None:
+            r = self._intern(ref)
+        self._pending.append((get_clock().time_ns(), kind, side, STATUS.get(status, 0), 0, a, s, r,
+                              price, size, value, aux))
+        self.records += 1
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def signal(self, agent, symbol, signal, price=0.0):
+        # Once per tick, so record() is inlined
+        if not self.enabled:
+            return
+        ids = self._ids
+        a = ids.get(agent)
+        s = ids.get(symbol)
+        if a is None or s is None:
+            a, s = self._intern(agent), self._intern(symbol)
+        self._pending.append((get_clock().time_ns(), 2, SIDES.get(signal, 0), 0, 0, a, s, 0,
+                              float(price or 0.0), 0.0, 0.0, 0))
+        self.records += 1
+
+    def order(self, agent, response):
+        """An order response dict (PaperExchange / OrderClient shape)."""
+        if not self.enabled or not isinstance(response, dict):
+            return
+        order_id = response.get("order_id", "")
+        numeric = isinstance(order_id, int)
+        self.record(3, agent, response.get("product_id", ""), SIDES.get(response.get("side"), 0),
+                    response.get("status", ""), "" if numeric else order_id,
+                    float(response.get("average_filled_price") or response.get("limit_price") or 0.0),
+                    float(response.get("size") or 0.0), float(response.get("filled_size") or 0.0),
+                    order_id if numeric else 0)
+
+    def fill(self, agent, symbol, side, size, price, fee=0.0, order_id=""):
+        if not self.enabled:
+            return
+        numeric = isinstance(order_id, int)
+        self.record(4, agent, symbol, SIDES.get(side, 0), "", "" if numeric else order_id,
+                    price, size, fee, order_id if numeric else 0)
+
+    def mint(self, agent, slot, amount, status, tx_hash="", nonce=-1):
+        if self.enabled:
+            self.record(5, agent, "", 1, status, tx_hash or "", 0.0, float(amount), float(-1 if nonce is None else nonce), int(slot))
+
+    def slot_balance(self, agent, slot, balance, threshold=0.0):
+        if self.enabled:
+            self.record(6, agent, "", 0, "", "", float(threshold), 0.0, float(balance), int(slot))
+
+    def session_start(self, agent, capital=0.0):
+        if self.enabled:
+            self.record(1, agent, "", 0, "start", "", float(capital))
+
+    def session_end(self, agent, capital=0.0, profit=0.0):
+        if self.enabled:
+            self.record(1, agent, "", 0, "end", "", float(capital), 0.0, float(profit))
+
+    # -------- writer thread --------
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._write()
+        self._write()
+
+    def _write(self):
+        with self._write_lock:
+            self._write_batch()
+
+    def _write_batch(self):
+        strings, pending = self._new_strings, self._pending
+        if not pending and not strings:
+            return
+        # Count the events first: every string they refer to is queued by then, so it is written first
+        n = len(pending)
+        if strings:
+            self._strings_file.write("".join(json.dumps(strings.popleft()) + "\n" for _ in range(len(strings))))
+            self._strings_file.flush()
+        if n:
+            popleft = pending.popleft
+            self._events_file.write(b"".join(starmap(RECORD.pack, (popleft() for _ in range(n)))))
+            self._events_file.flush()
+            self.written += n
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._strings_file.fileno())
+            os.fsync(self._events_file.fileno())
+            self._last_fsync = now
+
+    def flush(self, timeout=5.0):
+        """Block until everything recorded so far is written (not necessarily fsynced)."""
+        deadline = time.monotonic() + timeout
+        while self.enabled and (self._pending or self._new_strings) and time.monotonic() < deadline:
+            self._wake.set()
+            time.sleep(0.001)
+        with self._write_lock:   # a batch already taken off the queue is on disk once this is free
+            return not self._pending
+
+    def close(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        for f in (self._strings_file, self._events_file):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+
+    def stats(self):
+        return {"path": self.path, "records": self.records, "written": self.written,
+                "pending": len(self._pending), "strings": len(self._ids)}
+
+
+# ================================
+# 2. READER & ANALYTICS
+# ================================
+def _strings_path(path):
+    return path[:-len(".jrnl")] + ".strings" if path.endswith(".jrnl") else path + ".strings"
+
+
+def _read_strings(path):
+    if not os.path.exists(path):
+        return [""]
+    with open(path, encoding="utf-8") as f:
+        strings = []
+        for line in f:
+            try:
+                strings.append(json.loads(line))
+            except ValueError:   # torn last line
+                break
+        return strings
+
+
+def _repair_strings(path):
+    """Truncate a strings file after its last complete line and return the strings up to there."""
+    if not os.path.exists(path):
+        return [""]
+    strings, end = [], 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                strings.append(json.loads(line))
+            except ValueError:
+                break
+            end += len(line)
+    os.truncate(path, end)
+    return strings
+
+
+def list_sessions(root):
+    return sorted(glob.glob(os.path.join(root, "*.jrnl")))
+
+
+def load_session(path):
+    """Memory-map a journal file; the newest session in `path` if it is a directory."""
+    if os.path.isdir(path):
+        sessions = list_sessions(path)
+        if not sessions:
+            raise FileNotFoundError(f"No journal sessions in {path}")
+        path = sessions[-1]
+    return Session(path)
+
+
+class Session:
+    """One journal file as columns. `events` is a read-only structured array (memmap)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, itemsize, version, created = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or itemsize != EVENT_DTYPE.itemsize:
+            raise ValueError(f"{path}: not a version {VERSION} journal")
+        self.created = created
+        rows = (os.path.getsize(path) - HEADER.size) // EVENT_DTYPE.itemsize   # drop a torn tail
+        self.events = (np.memmap(path, dtype=EVENT_DTYPE, mode="r", offset=HEADER.size, shape=(rows,))
+                       if rows else np.empty(0, dtype=EVENT_DTYPE))
+        self.strings = np.array(_read_strings(_strings_path(path)), dtype=object)
+
+    def __len__(self):
+        return len(self.events)
+
+    def kind(self, name):
+        return self.events[self.events["kind"] == KIND[name]]
+
+    def counts(self):
+        counts = np.bincount(self.events["kind"], minlength=len(KINDS))
+        return {name: int(counts[i]) for i, name in enumerate(KINDS) if name}
+
+    def decode(self, ids):
+        return self.strings[np.asarray(ids, dtype=np.int64)]
+
+    def columns(self, kind=None, decode=True):
+        """dict of NumPy columns (string ids decoded to str when `decode`)."""
+        events = self.events if kind is None else self.kind(kind)
+        out = {name: np.asarray(events[name]) for name in EVENT_DTYPE.names}
+        out["kind"] = np.array(KINDS, dtype=object)[out["kind"]]
+        out["status"] = np.array(STATUSES, dtype=object)[out["status"]]
+        if decode:
+            for name in ("agent", "symbol", "ref"):
+                out[name] = self.decode(out[name])
+        return out
+
+    def to_arrow(self, kind=None):
+        """pyarrow Table with string columns as dictionary arrays (requires pyarrow)."""
+        import pyarrow as pa
+        cols = self.columns(kind, decode=False)
+        dictionary = pa.array(self.strings.tolist(), type=pa.string())
+        arrays = {}
+        for name, column in cols.items():
+            if name in ("agent", "symbol", "ref"):
+                arrays[name] = pa.DictionaryArray.from_arrays(pa.array(column.astype(np.int32)), dictionary)
+            elif column.dtype == object:
+                arrays[name] = pa.array(column.tolist(), type=pa.string())
+            else:
+                arrays[name] = pa.array(column)
+        return pa.table(arrays)
+
+    def to_pandas(self, kind=None):
+        import pandas as pd
+        return pd.DataFrame(self.columns(kind))
+
+    def _marks(self, marks):
+        # Last traded/signalled price per symbol id unless given
+        priced = self.events[(self.events["price"] > 0) & np.isin(self.events["kind"], (KIND["signal"], KIND["fill"]))]
+        out = np.full(len(self.strings), np.nan)
+        if len(priced):
+            symbol = np.asarray(priced["symbol"])
+            last = len(symbol) - 1 - np.unique(symbol[::-1], return_index=True)[1]
+            out[symbol[last]] = priced["price"][last]
+        for name, price in (marks or {}).items():
+            i = np.flatnonzero(self.strings == name)
+            if len(i):
+                out[i[0]] = price
+        return out
+
+    def pnl(self, marks=None):
+        """
+        PnL attribution per (agent, symbol) from fills, all vectorized:
+        position, turnover, fees, cash flow and mark-to-market PnL at the
+        last journaled price (or `marks`).
+        """
+        fills = self.kind("fill")
+        if not len(fills):
+            return []
+        keys = fills["agent"].astype(np.int64) * len(self.strings) + fills["symbol"]
+        groups, inverse = np.unique(keys, return_inverse=True)
+        signed = np.where(fills["side"] > 0, fills["size"], -fills["size"])
+        notional = fills["size"] * fills["price"]
+        position = np.bincount(inverse, signed)
+        fees = np.bincount(inverse, fills["value"])
+        cash = -np.bincount(inverse, signed * fills["price"]) - fees
+        mark = self._marks(marks)[groups % len(self.strings)]
+        pnl = cash + position * np.nan_to_num(mark)
+        counts = np.bincount(inverse)
+        turnover = np.bincount(inverse, notional)
+        rows = []
+        for i, key in enumerate(groups):
+            rows.append({
+                "agent": self.strings[key // len(self.strings)],
+                "symbol": self.strings[key % len(self.strings)],
+                "fills": int(counts[i]),
+                "turnover": float(turnover[i]),
+                "position": float(position[i]),
+                "fees": float(fees[i]),
+                "cash_flow": float(cash[i]),
+                "mark": float(mark[i]),
+                "pnl": float(pnl[i]),
+            })
+        return rows
+
+    def reconcile(self, accounts, tolerance=1e-6):
+        """
+        Compare journal fills with account summaries ({agent: {"positions", "fees", "fills"}},
+        e.g. PaperExchange.summary()). Returns the mismatches, empty when they agree.
+        """
+        fills = self.kind("fill")
+        agents = self.decode(fills["agent"])
+        symbols = self.decode(fills["symbol"])
+        signed = np.where(fills["side"] > 0, fills["size"], -fills["size"])
+        mismatches = []
+        for name, summary in accounts.items():
+            mine = agents == name
+            journal = {
+                "fills": int(np.count_nonzero(mine)),
+                "fees": float(fills["value"][mine].sum()),
+            }
+            for field, value in journal.items():
+                if abs(value - summary.get(field, 0)) > tolerance * max(1.0, abs(value)):
+                    mismatches.append({"agent": name, "field": field, "journal": value, "account": summary.get(field)})
+            positions = summary.get("positions", {})
+            for symbol in set(positions) | set(symbols[mine].tolist()):
+                value = float(signed[mine & (symbols == symbol)].sum())
+                if abs(value - positions.get(symbol, 0.0)) > tolerance * max(1.0, abs(value)):
+                    mismatches.append({"agent": name, "field": f"position:{symbol}", "journal": value,
+                                       "account": positions.get(symbol, 0.0)})
+        return mismatches
+
+    def mints(self):
+        """Mint amount and count per (slot, status)."""
+        mints = self.kind("mint")
+        out = {}
+        for slot, status, amount in zip(mints["aux"].tolist(), mints["status"].tolist(), mints["size"].tolist()):
+            entry = out.setdefault((slot, STATUSES[status]), {"count": 0, "amount": 0.0})
+            entry["count"] += 1
+            entry["amount"] += amount
+        return out
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize a journal session")
+    parser.add_argument("path", help="journal file, or a directory (newest session)")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    session = load_session(args.path)
+    print(f"{session.path}: {len(session)} events {session.counts()}")
+    for row in session.pnl():
+        print(row)
+    print(f"analyzed in {time.perf_counter() - t0:.2f}s")
+
+
+# Process-wide journal; records nothing unless AAA_JOURNAL_DIR is set or journal.open() is called.
+journal = Journal(os.getenv("AAA_JOURNAL_DIR"), fsync=os.getenv("AAA_JOURNAL_FSYNC", "interval"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,811 @@
+#!/usr/bin/env python
+"""
+Market Data Feed
+-----------------------------
+
+asyncio ingestion pipeline that gets live trades to the agents, which
+until now only read stored or simulated prices:
+
+    source -> Normalizer -> BarAggregator (1s / 1m / 5m) -> FanOut -> agents
+
+- Sources       : WebSocketSource (Coinbase Advanced Trade `market_trades` /
+                  `ticker`, needs the optional `websockets` package),
+                  TcpSource (newline-delimited JSON, e.g. from serve_stub),
+                  ReplaySource (MarketStore history) and StubSource
+                  (synthetic random-walk trades for tests and benchmarks).
+                  Each yields batches of raw messages.
+- Normalizer    : raw exchange messages -> ticks `(symbol, ts_ns, price, size)`.
+- BarAggregator : candles built incrementally. Only the base timeframe (1s)
+                  is touched per tick; coarser bars are rolled up from closed
+                  base bars, so the per-tick cost does not grow with the
+                  number of timeframes.
+- FanOut        : topic -> subscriptions, resolved once per topic. Every
+                  subscription has a bounded mailbox and an explicit
+                  slow-consumer policy, so one lagging agent never stalls
+                  the feed:
+                      drop_oldest  keep the newest `maxsize` items (default)
+                      drop_newest  refuse new items while full
+                      conflate     keep only the latest item per topic
+                      block        lossless; the feed waits for the consumer
+                                   (for recorders, never for agents)
+
+    pipeline = FeedPipeline(WebSocketSource(["BTC-USD"]), store=market_store)
+    sub = pipeline.subscribe("Agent_1", symbols=["BTC-USD"], timeframes=[60])
+    pipeline.start()                        # own thread + event loop
+    ...
+    for bar in sub.drain():                 # from any thread, never blocks
+        agent.indicators.update(bar.close)
+
+Inside the pipeline's loop, `await sub.get()` / `async for item in sub`
+work as well. `python market_feed.py --bench 1000000` measures throughput.
+"""
+
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from clocks import get_clock
+
+logger = logging.getLogger(__name__)
+
+COINBASE_WS_URL = "wss://advanced-trade-ws.coinbase.com"
+DEFAULT_TIMEFRAMES = (1, 60, 300)
+POLICIES = ("drop_oldest", "drop_newest", "conflate", "block")
+NS = 1_000_000_000
+
+
+class Bar:
+    """One closed candle; `ts` is the bar's start in ns, like MarketStore rows."""
+    __slots__ = ("symbol", "timeframe", "ts", "open", "high", "low", "close", "volume", "trades")
+
+    def __init__(self, symbol, timeframe, ts, open, high, low, close, volume, trades):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.ts = ts
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.trades = trades
+
+    @property
+    def topic(self):
+        return ("bar", self.symbol, self.timeframe)
+
+    def __repr__(self):
+        return (f"Bar({self.symbol} {self.timeframe}s @{self.ts // NS} "
+                f"o={self.open} h={self.high} l={self.low} c={self.close} v={self.volume} n={self.trades})")
+
+
+# ================================
+# 1. SOURCES
+# ================================
+class WebSocketSource:
+    """
+    Coinbase Advanced Trade public channels. Reconnects with capped
+    exponential backoff and re-subscribes; requires `websockets`.
+    """
+    live = True
+
+    def __init__(self, product_ids, channel="market_trades", url=COINBASE_WS_URL, max_backoff=30.0):
+        self.product_ids = list(product_ids)
+        self.channel = channel
+        self.url = url
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+
+    async def batches(self):
+        import websockets
+        backoff = 0.5
+        while True:
+            try:
+                async with websockets.connect(self.url, max_size=None, ping_interval=20) as ws:
+                    for channel in (self.channel, "heartbeats"):
+                        await ws.send(json.dumps({"type": "subscribe", "product_ids": self.product_ids, "channel": channel}))
+                    backoff = 0.5
+                    async for message in ws:
+                        yield (message,)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.reconnects += 1
+                logger.warning(f"Feed connection lost ({e}); reconnecting in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+
+class TcpSource:
+    """Newline-delimited JSON messages over TCP (serve_stub, or any local relay)."""
+    live = True
+
+    def __init__(self, host="127.0.0.1", port=8765, read_size=1 << 16):
+        self.host = host
+        self.port = port
+        self.read_size = read_size
+
+    async def batches(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        pending = b""
+        try:
+            while True:
+                # Every complete line in one read is one batch; a partial line waits for the next read
+                chunk = await reader.read(self.read_size)
+                if not chunk:
+                    return
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                if lines:
+                    yield lines
+        finally:
+            writer.close()
+
+
+class ReplaySource:
+    """
+    MarketStore bars between `start` and `end` (epoch seconds) as ticks, merged
+    across symbols in time order. speed=None replays as fast as possible,
+    speed=N at N x real time.
+    """
+    live = False
+
+    def __init__(self, store, symbols, start=None, end=None, speed=None, batch=1000):
+        self.store = store
+        self.symbols = list(symbols)
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.batch = batch
+
+    def ticks(self):
+        start = None if self.start is None else int(self.start * NS)
+        end = None if self.end is None else int(self.end * NS) + 1
+        columns = [self.store.range(symbol, start, end) for symbol in self.symbols]
+        ts = np.concatenate([bars.ts for bars in columns]) if columns else np.empty(0, np.int64)
+        order = np.argsort(ts, kind="stable")
+        symbol = np.repeat(np.arange(len(columns)), [len(bars) for bars in columns])[order]
+        close = np.concatenate([bars.close for bars in columns])[order] if columns else ts
+        volume = np.concatenate([bars.volume for bars in columns])[order] if columns else ts
+        names = self.symbols
+        return [(names[s], t, c, v) for s, t, c, v in
+                zip(symbol.tolist(), ts[order].tolist(), close.tolist(), volume.tolist())]
+
+    async def batches(self):
+        ticks = self.ticks()
+        wall0 = time.monotonic()
+        for i in range(0, len(ticks), self.batch):
+            batch = ticks[i:i + self.batch]
+            if self.speed:
+                due = (batch[0][1] - ticks[0][1]) / NS / self.speed - (time.monotonic() - wall0)
+                if due > 0:
+                    await asyncio.sleep(due)
+            yield batch
+
+
+class StubSource:
+    """
+    Synthetic Coinbase `market_trades` messages (random walk), so the whole
+    path including JSON parsing is exercised. Event time advances `spacing`
+    seconds per trade; `rate` paces the output in trades per wall second.
+    """
+    live = False
+
+    def __init__(self, symbols=("BTC-USD",), count=None, rate=None, trades_per_message=50,
+                 start=None, spacing=0.001, price=100.0, seed=0, prerender=False):
+        self.symbols = list(symbols)
+        self.count = count
+        self.rate = rate
+        self.per_message = trades_per_message
+        self.start = time.time() if start is None else start
+        self.spacing = spacing
+        self.price = price
+        self.seed = seed
+        # Render every message before the first batch (needs `count`), so a benchmark
+        # measures the pipeline rather than the JSON encoding of the stub itself
+        self.prerender = prerender
+
+    @staticmethod
+    def _iso(ts, _cache={}):
+        sec = int(ts)
+        prefix = _cache.get(sec)
+        if prefix is None:
+            if len(_cache) > 4096:
+                _cache.clear()
+            prefix = _cache[sec] = datetime.fromtimestamp(sec, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        return f"{prefix}.{int((ts - sec) * 1e6):06d}Z"
+
+    def messages(self):
+        rng = np.random.default_rng(self.seed)
+        prices = {symbol: self.price for symbol in self.symbols}
+        sequence = itertools.count()
+        trade_ids = itertools.count(1)
+        ts = self.start
+        sent = 0
+        while self.count is None or sent < self.count:
+            symbol = self.symbols[next(sequence) % len(self.symbols)]
+            n = self.per_message if self.count is None else min(self.per_message, self.count - sent)
+            steps = rng.normal(0, 0.0005, n).cumsum()
+            sizes = rng.exponential(0.05, n).round(8)
+            p0 = prices[symbol]
+            trades = []
+            for step, size in zip(steps.tolist(), sizes.tolist()):
+                ts += self.spacing
+                trades.append({"trade_id": str(next(trade_ids)), "product_id": symbol,
+                               "price": f"{p0 * (1 + step):.2f}", "size": f"{size:.8f}",
+                               "side": "BUY" if step > 0 else "SELL", "time": self._iso(ts)})
+            prices[symbol] = p0 * (1 + steps[-1])
+            # Newest first, as the exchange sends them
+            trades.reverse()
+            yield json.dumps({"channel": "market_trades", "timestamp": trades[0]["time"],
+                              "sequence_num": sent // self.per_message,
+                              "events": [{"type": "update", "trades": trades}]})
+            sent += n
+
+    async def batches(self, messages_per_batch=20):
+        wall0 = time.monotonic()
+        sent = 0
+        messages = iter(list(self.messages())) if self.prerender and self.count else self.messages()
+        while True:
+            batch = list(itertools.islice(messages, messages_per_batch))
+            if not batch:
+                return
+            yield batch
+            sent += len(batch) * self.per_message
+            if self.rate:
+                due = sent / self.rate - (time.monotonic() - wall0)
+                if due > 0:
+                    await asyncio.sleep(due)
+
+
+async def serve_stub(source, host="127.0.0.1", port=8765):
+    """
+    Local stub server: streams `source`'s messages to every client as
+    newline-delimited JSON (ticks from ReplaySource are sent as JSON arrays).
+    Returns the asyncio server; pair it with TcpSource.
+    """
+    async def handle(reader, writer):
+        try:
+            async for batch in source.batches():
+                writer.write(b"".join((m if isinstance(m, str) else json.dumps(m)).encode() + b"\n" for m in batch))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+# ================================
+# 2. NORMALIZER
+# ================================
+class Normalizer:
+    """
+    Raw messages -> ticks `(symbol, ts_ns, price, size)` in arrival order.
+    Accepts Coinbase `market_trades` / `ticker` JSON (str, bytes or dict) and
+    already-normalized ticks (tuples or JSON arrays). Heartbeats and
+    subscription acks are skipped; sequence gaps are counted.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.errors = 0
+        self.gaps = 0
+        self._sequence = None
+        self._seconds = {}
+
+    def _ts(self, iso):
+        # "2024-06-01T00:00:00.123456Z": the whole-second part is parsed once per second
+        seconds = self._seconds.get(iso[:19])
+        if seconds is None:
+            if len(self._seconds) > 4096:
+                self._seconds.clear()
+            seconds = self._seconds[iso[:19]] = int(datetime.fromisoformat(iso[:19] + "+00:00").timestamp()) * NS
+        fraction = iso[20:-1]
+        return seconds + int(fraction.ljust(9, "0")[:9]) if fraction else seconds
+
+    def normalize(self, message, out):
+        """Append the ticks in `message` to `out`; returns how many were added."""
+        self.messages += 1
+        before = len(out)
+        try:
+            if isinstance(message, tuple):
+                out.append(message)
+                return 1
+            if isinstance(message, (str, bytes, bytearray)):
+                message = json.loads(message)
+            if isinstance(message, list):
+                out.append((message[0], int(message[1]), float(message[2]), float(message[3])))
+                return 1
+            sequence = message.get("sequence_num")
+            if sequence is not None:
+                if self._sequence is not None and sequence > self._sequence + 1:
+                    self.gaps += sequence - self._sequence - 1
+                self._sequence = sequence
+            channel = message.get("channel")
+            if channel == "market_trades":
+                ts = self._ts
+                for event in message["events"]:
+                    trades = event.get("trades") or ()
+                    start = len(out)
+                    for t in trades:
+                        out.append((t["product_id"], ts(t["time"]), float(t["price"]), float(t["size"])))
+                    # Trades within an event arrive newest first
+                    if len(out) - start > 1 and out[start][1] > out[-1][1]:
+                        out[start:] = out[start:][::-1]
+            elif channel == "ticker":
+                ts = self._ts(message["timestamp"])
+                for event in message["events"]:
+                    for t in event.get("tickers") or ():
+                        out.append((t["product_id"], ts, float(t["price"]), 0.0))
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            self.errors += 1
+            del out[before:]
+            logger.warning(f"Dropped malformed feed message: {e}")
+        return len(out) - before
+
+
+# ================================
+# 3. BAR AGGREGATOR
+# ================================
+class BarAggregator:
+    """
+    Incremental OHLCV candles per symbol. The smallest timeframe is updated
+    per tick; each larger one (a multiple of it) is folded from closed base
+    bars. A bar closes when a tick for a later interval arrives or on
+    flush(now_ns). Ticks for an already-closed interval are counted as late
+    and dropped.
+    """
+
+    def __init__(self, timeframes=DEFAULT_TIMEFRAMES):
+        timeframes = sorted(set(int(tf) for tf in timeframes))
+        base = timeframes[0]
+        if base <= 0 or any(tf % base for tf in timeframes):
+            raise ValueError(f"timeframes must be positive multiples of {base}s: {timeframes}")
+        self.timeframes = tuple(timeframes)
+        self.base = base
+        self._base_ns = base * NS
+        self._higher = [(tf, tf * NS) for tf in timeframes[1:]]
+        self._open = {}     # symbol -> [bucket, open, high, low, close, volume, trades]
+        self._rollup = {}   # symbol -> [None | [start_ns, open, high, low, close, volume, trades]] per higher tf
+        self._closed = {}   # symbol -> last closed base bucket
+        self.late = 0
+
+    def update(self, symbol, ts, price, size):
+        """Fold one tick in; returns the bars it closed (or None)."""
+        bucket = ts // self._base_ns
+        state = self._open.get(symbol)
+        if state is not None and bucket == state[0]:
+            if price > state[2]:
+                state[2] = price
+            elif price < state[3]:
+                state[3] = price
+            state[4] = price
+            state[5] += size
+            state[6] += 1
+            return None
+        if bucket <= self._closed.get(symbol, -1) or (state is not None and bucket < state[0]):
+            self.late += 1
+            return None
+        self._open[symbol] = [bucket, price, price, price, price, size, 1]
+        return self._close(symbol, state) if state is not None else None
+
+    def _close(self, symbol, state, out=None):
+        out = [] if out is None else out
+        bucket, o, h, l, c, v, n = state
+        self._closed[symbol] = bucket
+        start = bucket * self._base_ns
+        out.append(Bar(symbol, self.base, start, o, h, l, c, v, n))
+        rollup = self._rollup.get(symbol)
+        if rollup is None:
+            rollup = self._rollup[symbol] = [None] * len(self._higher)
+        end = start + self._base_ns
+        for i, (tf, tf_ns) in enumerate(self._higher):
+            r = rollup[i]
+            tf_start = start - start % tf_ns
+            if r is not None and r[0] != tf_start:
+                out.append(Bar(symbol, tf, *r))
+                r = None
+            if r is None:
+                r = rollup[i] = [tf_start, o, h, l, c, v, n]
+            else:
+                if h > r[2]:
+                    r[2] = h
+                if l < r[3]:
+                    r[3] = l
+                r[4] = c
+                r[5] += v
+                r[6] += n
+            if end % tf_ns == 0:
+                out.append(Bar(symbol, tf, *r))
+                rollup[i] = None
+        return out
+
+    def flush(self, now_ns=None):
+        """Close every bar whose interval ended by `now_ns` (all open bars if None)."""
+        out = []
+        for symbol, state in list(self._open.items()):
+            if now_ns is None or (state[0] + 1) * self._base_ns <= now_ns:
+                del self._open[symbol]
+                self._close(symbol, state, out)
+        for symbol, rollup in self._rollup.items():
+            for i, (tf, tf_ns) in enumerate(self._higher):
+                r = rollup[i]
+                # Base bars still open here all start after now_ns, so none belongs to `r`
+                if r is not None and (now_ns is None or r[0] + tf_ns <= now_ns):
+                    out.append(Bar(symbol, tf, *r))
+                    rollup[i] = None
+        return out
+
+
+# ================================
+# 4. FAN-OUT
+# ================================
+class Subscription:
+    """
+    A consumer's bounded mailbox. `drain()` is non-blocking and safe from any
+    thread; `get()` / `get_batch()` / `async for` are for coroutines on the
+    pipeline's own event loop.
+    """
+    __slots__ = ("name", "topics", "policy", "maxsize", "offer", "delivered", "dropped",
+                 "conflated", "high_water", "stalls", "_queue", "_latest", "_lock", "_waiter")
+
+    def __init__(self, name, topics, maxsize=1024, policy="drop_oldest"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.name = name
+        self.topics = tuple(topics)
+        self.policy = policy
+        self.maxsize = maxsize
+        self.delivered = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.high_water = 0
+        self.stalls = 0
+        self._queue = collections.deque(maxlen=maxsize if policy == "drop_oldest" else None)
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._waiter = None
+        # Policy chosen once here; the publisher just calls sub.offer(topic, item)
+        self.offer = {"drop_oldest": self._offer_drop_oldest, "drop_newest": self._offer_drop_newest,
+                      "conflate": self._offer_conflate, "block": self._offer_block}[policy]
+
+    def __len__(self):
+        return len(self._latest) if self.policy == "conflate" else len(self._queue)
+
+    def _wake(self):
+        waiter, self._waiter = self._waiter, None
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def _offer_drop_oldest(self, topic, item):
+        queue = self._queue
+        if len(queue) == self.maxsize:
+            self.dropped += 1
+        else:
+            self.high_water = max(self.high_water, len(queue) + 1)
+        queue.append(item)
+        self.delivered += 1
+        if self._waiter is not None:
+            self._wake()
+
+    def _offer_drop_newest(self, topic, item):
+        queue = self._queue
+        if len(queue) >= self.maxsize:
+            self.dropped += 1
+            return
+        queue.append(item)
+        self.delivered += 1
+        if len(queue) > self.high_water:
+            self.high_water = len(queue)
+        if self._waiter is not None:
+            self._wake()
+
+    def _offer_conflate(self, topic, item):
+        with self._lock:
+            latest = self._latest
+            if topic in latest:
+                self.conflated += 1
+            elif len(latest) >= self.maxsize:
+                self.dropped += 1
+                return
+            latest[topic] = item
+        self.delivered += 1
+        if self._waiter is not None:
+            self._wake()
+
+    def _offer_block(self, topic, item):
+        # Never refused; the pipeline waits in wait_for_space() before its next batch
+        self._queue.append(item)
+        self.delivered += 1
+        if len(self._queue) > self.high_water:
+            self.high_water = len(self._queue)
+        if self._waiter is not None:
+            self._wake()
+
+    def drain(self, max_items=None):
+        """Everything queued (up to `max_items`), oldest first; never blocks."""
+        if self.policy == "conflate":
+            with self._lock:
+                if max_items is None or max_items >= len(self._latest):
+                    items, self._latest = list(self._latest.values()), {}
+                    return items
+                keys = list(itertools.islice(self._latest, max_items))
+                return [self._latest.pop(key) for key in keys]
+        queue = self._queue
+        n = len(queue) if max_items is None else min(max_items, len(queue))
+        return [queue.popleft() for _ in range(n)]
+
+    async def get_batch(self, max_items=None):
+        while not len(self):
+            self._waiter = asyncio.get_running_loop().create_future()
+            await self._waiter
+        return self.drain(max_items)
+
+    async def get(self):
+        return (await self.get_batch(1))[0]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.get()
+
+    async def wait_for_space(self, poll=0.001):
+        if self.policy != "block" or len(self._queue) < self.maxsize:
+            return
+        self.stalls += 1
+        while len(self._queue) >= self.maxsize:
+            await asyncio.sleep(poll)
+
+    def stats(self):
+        return {"policy": self.policy, "queued": len(self), "delivered": self.delivered, "dropped": self.dropped,
+                "conflated": self.conflated, "high_water": self.high_water, "stalls": self.stalls}
+
+
+class FanOut:
+    """
+    Topic router. Topics are ("tick", symbol) and ("bar", symbol, timeframe);
+    "*" as the symbol matches every symbol. Each topic's subscriber list is
+    resolved on first publish and cached until the next subscribe.
+    """
+
+    def __init__(self):
+        self.subscriptions = []
+        self.blocking = []
+        self._routes = {}
+
+    def subscribe(self, name, topics, maxsize=1024, policy="drop_oldest"):
+        sub = Subscription(name, topics, maxsize, policy)
+        self.subscriptions.append(sub)
+        if policy == "block":
+            self.blocking.append(sub)
+        self._routes = {}
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscriptions.remove(sub)
+        if sub in self.blocking:
+            self.blocking.remove(sub)
+        self._routes = {}
+
+    def _route(self, topic):
+        wildcard = (topic[0], "*") + topic[2:]
+        subs = tuple(sub for sub in self.subscriptions if topic in sub.topics or wildcard in sub.topics)
+        self._routes[topic] = subs
+        return subs
+
+    def publish(self, topic, item):
+        subs = self._routes.get(topic)
+        if subs is None:
+            subs = self._route(topic)
+        for sub in subs:
+            sub.offer(topic, item)
+        return len(subs)
+
+
+# ================================
+# 5. PIPELINE
+# ================================
+class FeedPipeline:
+    """
+    Runs source -> normalizer -> aggregator -> fan-out on one event loop.
+    Closed bars of `store_timeframe` are appended to `store` (a MarketStore),
+    so agents that read history see live bars too. For live sources, bars
+    also close on a timer `lateness` seconds after their interval ends, so a
+    quiet market still produces candles.
+    """
+
+    def __init__(self, source, timeframes=DEFAULT_TIMEFRAMES, store=None, store_timeframe=60,
+                 flush_interval=0.25, lateness=0.5, clock=None):
+        self.source = source
+        self.normalizer = Normalizer()
+        self.aggregator = BarAggregator(timeframes)
+        self.fanout = FanOut()
+        self.store = store
+        self.store_timeframe = store_timeframe
+        self.flush_interval = flush_interval
+        self.lateness = lateness
+        self.clock = clock
+        self.ticks = 0
+        self.bars = 0
+        self.store_errors = 0
+        self.elapsed = 0.0
+        self._tick_topics = {}
+        self._running = False
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    def subscribe(self, name, symbols=("*",), timeframes=None, ticks=False, maxsize=1024, policy="drop_oldest"):
+        """Bars for `timeframes` (default: all) and/or raw ticks for `symbols`."""
+        timeframes = self.aggregator.timeframes if timeframes is None else timeframes
+        topics = [("bar", symbol, tf) for symbol in symbols for tf in timeframes]
+        if ticks:
+            topics += [("tick", symbol) for symbol in symbols]
+        return self.fanout.subscribe(name, topics, maxsize, policy)
+
+    def _publish_bars(self, bars):
+        publish = self.fanout.publish
+        for bar in bars:
+            publish(("bar", bar.symbol, bar.timeframe), bar)
+            if self.store is not None and bar.timeframe == self.store_timeframe:
+                try:
+                    self.store.append(bar.symbol, bar.ts, open=bar.open, high=bar.high, low=bar.low,
+                                      close=bar.close, volume=bar.volume)
+                except ValueError as e:
+                    self.store_errors += 1
+                    logger.warning(f"Bar not stored: {e}")
+        self.bars += len(bars)
+
+    def process(self, ticks):
+        """Aggregate and publish a batch of normalized ticks (the per-tick hot path)."""
+        publish = self.fanout.publish
+        routes = self.fanout._routes
+        update = self.aggregator.update
+        topics = self._tick_topics
+        for tick in ticks:
+            symbol = tick[0]
+            topic = topics.get(symbol)
+            if topic is None:
+                topic = topics[symbol] = ("tick", symbol)
+            if routes.get(topic, True):
+                publish(topic, tick)
+            closed = update(symbol, tick[1], tick[2], tick[3])
+            if closed:
+                self._publish_bars(closed)
+        self.ticks += len(ticks)
+
+    async def _flush_timer(self):
+        clock = self.clock or get_clock()
+        lateness_ns = int(self.lateness * NS)
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self._publish_bars(self.aggregator.flush(clock.time_ns() - lateness_ns))
+
+    async def run(self, duration=None):
+        """Consume the source until it ends, `duration` seconds pass, or stop() is called."""
+        self._running = True
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        timer = asyncio.ensure_future(self._flush_timer()) if self.source.live else None
+        deadline = None if duration is None else time.monotonic() + duration
+        normalize = self.normalizer.normalize
+        blocking = self.fanout.blocking
+        t0 = None
+        try:
+            async for batch in self.source.batches():
+                if t0 is None:
+                    t0 = time.perf_counter()   # throughput counts from the first batch, not the connect
+                ticks = []
+                for message in batch:
+                    normalize(message, ticks)
+                self.process(ticks)
+                for sub in blocking:
+                    await sub.wait_for_space()
+                # Let consumers on this loop run between batches
+                await asyncio.sleep(0)
+                if not self._running or (deadline is not None and time.monotonic() >= deadline):
+                    break
+            if not self.source.live:
+                self._publish_bars(self.aggregator.flush())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if t0 is not None:
+                self.elapsed += time.perf_counter() - t0
+            if timer is not None:
+                timer.cancel()
+            self._running = False
+        return self.stats()
+
+    def start(self, duration=None):
+        """Run the pipeline on its own thread and event loop; returns self."""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run(duration)), name="market-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._running = False
+        if self._loop is not None and self._task is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.stats()
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "bars": self.bars,
+            "ticks_per_sec": round(self.ticks / self.elapsed) if self.elapsed else 0,
+            "messages": self.normalizer.messages,
+            "malformed": self.normalizer.errors,
+            "sequence_gaps": self.normalizer.gaps,
+            "late_ticks": self.aggregator.late,
+            "store_errors": self.store_errors,
+            "subscriptions": {sub.name: sub.stats() for sub in self.fanout.subscriptions},
+        }
+
+
+# ================================
+# 6. BENCHMARK / CLI
+# ================================
+async def _bench(count, symbols, consumers):
+    pipeline = FeedPipeline(StubSource(symbols, count=count, prerender=True))
+    subs = [pipeline.subscribe(f"agent_{i}", timeframes=[1, 60], maxsize=256) for i in range(consumers)]
+    subs.append(pipeline.subscribe("dashboard", ticks=True, timeframes=[], policy="conflate"))
+    slow = pipeline.subscribe("lagging_agent", maxsize=16)    # never drained
+
+    async def consume(sub):
+        while True:
+            await sub.get_batch()
+
+    tasks = [asyncio.ensure_future(consume(sub)) for sub in subs]
+    stats = await pipeline.run()
+    for task in tasks:
+        task.cancel()
+    stats["subscriptions"][slow.name]["note"] = "never drained"
+    return stats
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Market data feed: live bars, or a throughput benchmark")
+    parser.add_argument("--bench", type=int, metavar="TICKS", help="push TICKS synthetic trades through the pipeline")
+    parser.add_argument("--symbols", default="BTC-USD,ETH-USD", help="comma-separated product ids")
+    parser.add_argument("--consumers", type=int, default=8, help="subscribed agents in the benchmark")
+    parser.add_argument("--timeframe", type=int, default=60, help="bar timeframe to print when following the live feed")
+    args = parser.parse_args()
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    if args.bench:
+        print(json.dumps(asyncio.run(_bench(args.bench, symbols, args.consumers)), indent=2))
+        return
+
+    async def follow():
+        pipeline = FeedPipeline(WebSocketSource(symbols))
+        sub = pipeline.subscribe("cli", timeframes=[args.timeframe])
+        task = asyncio.ensure_future(pipeline.run())
+        try:
+            async for bar in sub:
+                print(bar)
+        finally:
+            task.cancel()
+
+    try:
+        asyncio.run(follow())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Market Data Store
+-----------------------------
+
+Append-only, per-symbol columnar OHLCV history on disk, shared by every
+agent on a host through memory-mapped reads.
+
+Layout (one directory per symbol under the store root):
+
+    <root>/<SYMBOL>/ts.i8      int64 timestamps (ns since epoch, non-decreasing)
+    <root>/<SYMBOL>/open.f8    float64
+    <root>/<SYMBOL>/high.f8
+    <root>/<SYMBOL>/low.f8
+    <root>/<SYMBOL>/close.f8
+    <root>/<SYMBOL>/volume.f8
+
+Every column is a headerless fixed-width array, so row i lives at byte
+i * 8 of each file. Appends write to the end of each file only; a reader
+sizes its view from the file length, so it never sees a half-written row
+as long as the timestamp column is written last. Writers, in this or any
+other process, take an exclusive flock on <root>/<SYMBOL>/.lock around
+each append, so concurrent appends never interleave their column writes.
+
+    store = MarketStore("data")
+    store.append("BTC-USD", ts, open=o, high=h, low=l, close=c, volume=v)
+    bars = store.last("BTC-USD", 200)          # zero-copy views into the mmap
+    window = store.range("BTC-USD", t0, t1)    # binary search on timestamps
+"""
+
+import builtins
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within the process
+    fcntl = None
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+TS = "ts"
+_FILES = dict({TS: "ts.i8"}, **{name: f"{name}.f8" for name in COLUMNS})
+_DTYPES = dict({TS: np.int64}, **{name: np.float64 for name in COLUMNS})
+
+
+class Bars:
+    """Column views for a slice of one symbol's history (arrays are read-only mmap views)."""
+    __slots__ = ("symbol", "ts", "open", "high", "low", "close", "volume")
+
+    def __init__(self, symbol, columns):
+        self.symbol = symbol
+        for name in (TS,) + COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.ts)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in (TS,) + COLUMNS}
+
+
+class _SymbolFiles:
+    """Open handles and cached memory maps for one symbol."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()          # the cached maps
+        self.write_lock = threading.Lock()    # appends; held while waiting on other processes
+        self.maps = {}
+        self.mapped_rows = -1
+
+    def file(self, name):
+        return os.path.join(self.path, _FILES[name])
+
+    @contextmanager
+    def writing(self):
+        """The append lock: write_lock in this process, plus an flock shared with other processes."""
+        with self.write_lock:
+            os.makedirs(self.path, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            # Opened per append: a descriptor inherited over fork would share the lock with the child
+            fd = os.open(os.path.join(self.path, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)   # releases the flock
+
+    def rows(self):
+        try:
+            return os.path.getsize(self.file(TS)) // 8
+        except FileNotFoundError:
+            return 0
+
+    def view(self):
+        """Memory maps covering every complete row; remapped only when the files have grown."""
+        rows = self.rows()
+        with self.lock:
+            if rows != self.mapped_rows:
+                self.maps = {name: (np.memmap(self.file(name), dtype=_DTYPES[name], mode="r", shape=(rows,))
+                                    if rows else np.empty(0, dtype=_DTYPES[name]))
+                             for name in _FILES}
+                self.mapped_rows = rows
+            return self.maps, rows
+
+
+class MarketStore:
+    """Per-symbol append-only OHLCV store with memory-mapped, zero-copy reads."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._symbols = {}
+        self._lock = threading.Lock()
+
+    def _files(self, symbol):
+        with self._lock:
+            files = self._symbols.get(symbol)
+            if files is None:
+                files = self._symbols[symbol] = _SymbolFiles(os.path.join(self.root, symbol))
+            return files
+
+    def symbols(self):
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, name, _FILES[TS])))
+
+    def __len__(self):
+        return len(self.symbols())
+
+    def rows(self, symbol):
+        return self._files(symbol).rows()
+
+    # -------- ingestion --------
+    def append(self, symbol, ts, open=None, high=None, low=None, close=None, volume=None, price=None):
+        """
+        Append bars (or ticks: pass `price`, which fills open/high/low/close, and
+        optionally `volume`). Scalars or equal-length arrays; timestamps must not
+        go backwards. Only the tail of each column file is written.
+        """
+        ts = np.atleast_1d(np.asarray(ts, dtype=np.int64))
+        if price is not None:
+            open = high = low = close = price
+        values = {"open": open, "high": high, "low": low, "close": close, "volume": volume}
+        if values["close"] is None:
+            raise ValueError("append needs close (or price)")
+        columns = {}
+        for name in COLUMNS:
+            value = values[name]
+            if value is None:
+                value = 0.0 if name == "volume" else values["close"]
+            column = np.broadcast_to(np.asarray(value, dtype=np.float64), ts.shape)
+            columns[name] = np.ascontiguousarray(column)
+        if len(ts) > 1 and np.any(np.diff(ts) < 0):
+            raise ValueError("timestamps must be non-decreasing")
+        files = self._files(symbol)
+        with files.writing():
+            self._repair(files)
+            last = self._last_ts(files)
+            if last is not None and len(ts) and ts[0] < last:
+                raise ValueError(f"{symbol}: timestamp {ts[0]} is older than the last stored bar {last}")
+            # Value columns first, timestamps last: readers size their view from ts.i8.
+            for name in COLUMNS + (TS,):
+                with builtins.open(files.file(name), "ab") as f:
+                    (ts if name == TS else columns[name]).tofile(f)
+        return len(ts)
+
+    @staticmethod
+    def _repair(files):
+        """Drop any partial row left by an interrupted append so the columns stay aligned."""
+        rows = files.rows()
+        for name in _FILES:
+            path = files.file(name)
+            if os.path.exists(path) and os.path.getsize(path) != rows * 8:
+                os.truncate(path, rows * 8)
+
+    @staticmethod
+    def _last_ts(files):
+        path = files.file(TS)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+        if size < 8:
+            return None
+        with builtins.open(path, "rb") as f:
+            f.seek(size - size % 8 - 8)
+            return int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+
+    # -------- queries --------
+    def last(self, symbol, n, end_ts=None):
+        """The most recent `n` bars (before `end_ts`, if given) as zero-copy views."""
+        maps, rows = self._files(symbol).view()
+        if end_ts is not None:
+            rows = int(np.searchsorted(maps[TS], end_ts, side="left"))
+        start = max(0, rows - n)
+        return Bars(symbol, {name: maps[name][start:rows] for name in _FILES})
+
+    def range(self, symbol, start_ts=None, end_ts=None):
+        """Bars with start_ts <= ts < end_ts (either bound may be None)."""
+        maps, rows = self._files(symbol).view()
+        ts = maps[TS]
+        lo = 0 if start_ts is None else int(np.searchsorted(ts, start_ts, side="left"))
+        hi = rows if end_ts is None else int(np.searchsorted(ts, end_ts, side="left"))
+        return Bars(symbol, {name: maps[name][lo:hi] for name in _FILES})
+
+    def all(self, symbol):
+        return self.range(symbol)
+
+    def last_price(self, symbol):
+        bars = self.last(symbol, 1)
+        return float(bars.close[0]) if len(bars) else float("nan")
@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+"""
+Strategy Parameter Optimizer
+-----------------------------
+
+Searches `TradingAgent.strategy_params` (the "agent" rule in backtest.py)
+and the `default_strategies` param sets with grid, random or
+successive-halving search, scoring candidates with the vectorized
+backtester.
+
+- Price history is copied once into shared memory; pool workers attach to
+  it by name, so tasks carry only a batch of parameter dicts.
+- Each task evaluates a batch of candidates in one vectorized backtest and
+  the worker keeps its indicator cache between tasks, so throughput scales
+  with the number of processes.
+- Every finished evaluation is appended to a JSON-lines checkpoint. A rerun
+  with the same settings regenerates the same candidates (seeded) and only
+  evaluates what is missing. The checkpoint's first line fingerprints the
+  data and costs (symbol, bars, first/last timestamp, a hash of the closes);
+  a run on different data starts its own file next to it instead of
+  resuming someone else's metrics.
+
+    python optimizer.py --symbol BTC-USD --method halving --samples 512 \\
+        --checkpoint retune.ckpt --out tuned_params.json
+
+AAA.py picks up the "agent" entry of the output file (STRATEGY_PARAMS_FILE).
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest import SIGNAL_RULES, MINUTES_PER_YEAR, _as_ohlcv, _IndicatorCache, expand_grid, simulate
+from feature_cache import _attach
+from strategies import default_strategies
+
+# Search ranges: (low, high) inclusive; ints when both bounds are ints.
+SEARCH_SPACES = {
+    "agent": {"ma_period": (5, 100), "rsi_period": (5, 30), "rsi_overbought": (60, 85), "rsi_oversold": (15, 40)},
+    "trend": {"ma_short": (10, 100), "ma_long": (100, 300), "rsi_period": (5, 30),
+              "rsi_overbought": (60, 85), "rsi_oversold": (15, 40)},
+    "volatility": {"bbands_length": (10, 50), "bbands_std": (1.5, 3.0), "macd_fast": (5, 15), "macd_slow": (16, 40)},
+    "momentum": {"ema_short": (5, 40), "ema_long": (30, 120), "volume_sma": (10, 50)},
+    "hybrid": {"sma_short": (10, 100), "sma_long": (100, 300), "ema": (10, 50), "rsi": (5, 30),
+               "rsi_overbought": (60, 85), "rsi_oversold": (15, 40)},
+}
+CONSTRAINTS = {
+    "agent": lambda p: p["rsi_oversold"] < p["rsi_overbought"],
+    "trend": lambda p: p["ma_short"] < p["ma_long"] and p["rsi_oversold"] < p["rsi_overbought"],
+    "volatility": lambda p: p["macd_fast"] < p["macd_slow"],
+    "momentum": lambda p: p["ema_short"] < p["ema_long"],
+    "hybrid": lambda p: p["sma_short"] < p["sma_long"] and p["rsi_oversold"] < p["rsi_overbought"],
+}
+AGENT_DEFAULTS = {"ma_period": 20, "rsi_period": 14, "rsi_overbought": 70, "rsi_oversold": 30}
+
+
+def base_params(strategy):
+    if strategy == "agent":
+        return dict(AGENT_DEFAULTS)
+    return dict(default_strategies[strategy]["params"])
+
+
+# ================================
+# 1. CANDIDATES
+# ================================
+def _is_int(bounds):
+    return all(isinstance(b, int) for b in bounds)
+
+
+def grid_candidates(strategy, points=5, space=None):
+    """Evenly spaced values per parameter, all combinations that satisfy the constraints."""
+    space = space or SEARCH_SPACES[strategy]
+    grid = {}
+    for name, (lo, hi) in space.items():
+        values = np.linspace(lo, hi, points)
+        grid[name] = sorted(set(int(round(v)) for v in values)) if _is_int((lo, hi)) else [round(float(v), 4) for v in values]
+    return _valid(strategy, expand_grid(base_params(strategy), grid))
+
+
+def random_candidates(strategy, n, seed=0, space=None):
+    """`n` distinct uniform samples (deterministic for a given seed)."""
+    space = space or SEARCH_SPACES[strategy]
+    rng = np.random.default_rng(seed)
+    seen, out = set(), []
+    for _ in range(n * 20):
+        params = base_params(strategy)
+        for name, (lo, hi) in space.items():
+            params[name] = int(rng.integers(lo, hi + 1)) if _is_int((lo, hi)) else round(float(rng.uniform(lo, hi)), 4)
+        key = params_key(params)
+        if key not in seen and _check(strategy, params):
+            seen.add(key)
+            out.append(expand_grid(params)[0])
+            if len(out) == n:
+                break
+    return out
+
+
+def _check(strategy, params):
+    rule = CONSTRAINTS.get(strategy)
+    return rule is None or rule(params)
+
+
+def _valid(strategy, candidates):
+    return [c for c in candidates if _check(strategy, c)]
+
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+# ================================
+# 2. SHARED PRICE HISTORY & WORKERS
+# ================================
+class SharedHistory:
+    """OHLCV columns copied once into shared memory; `spec` is what workers need to attach."""
+
+    def __init__(self, data):
+        self.blocks = []
+        self.spec = {}
+        for name, column in _as_ohlcv(data).items():
+            column = np.ascontiguousarray(column, dtype=np.float64)
+            block = shared_memory.SharedMemory(create=True, size=max(column.nbytes, 8))
+            np.ndarray(column.shape, dtype=np.float64, buffer=block.buf)[:] = column
+            self.blocks.append(block)
+            self.spec[name] = (block.name, len(column))
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_worker = {}
+
+
+def _init_worker(spec, fee_bps, slippage_bps, periods_per_year, cache_bytes=None):
+    blocks, data = [], {}
+    for name, (block_name, length) in spec.items():
+        block = _attach(block_name)
+        blocks.append(block)
+        data[name] = np.ndarray((length,), dtype=np.float64, buffer=block.buf)
+    _worker.update(blocks=blocks, data=data, cache=None, cache_bytes=cache_bytes,
+                   costs=(fee_bps, slippage_bps, periods_per_year))
+
+
+def _evaluate(strategy, candidates, bars):
+    """Score a batch of candidates on the most recent `bars` bars (runs in a worker)."""
+    data = _worker["data"]
+    cache = _worker["cache"]
+    if cache is None or len(cache.data["close"]) != bars:
+        # One indicator cache, for the current history length (a rung of successive halving),
+        # bounded by cache_bytes; the previous length's rows are dropped
+        cache = _worker["cache"] = _IndicatorCache({k: v[-bars:] for k, v in data.items()}, _worker["cache_bytes"])
+    p = {k: np.array([c[k] for c in candidates]) for k in candidates[0]}
+    signals = SIGNAL_RULES[strategy](cache.data, p, cache)
+    fee_bps, slippage_bps, periods_per_year = _worker["costs"]
+    metrics = simulate(cache.data["close"], signals, fee_bps, slippage_bps, 1000.0, periods_per_year)
+    return [{k: float(v[i]) for k, v in metrics.items()} for i in range(len(candidates))]
+
+
+# ================================
+# 3. CHECKPOINTS
+# ================================
+def data_fingerprint(data, symbol=None, ts=None, **settings):
+    """
+    What a checkpoint's metrics depend on besides the candidates: the symbol, the
+    history (length, first/last timestamp, a hash of the closes) and the cost settings.
+    """
+    close = np.ascontiguousarray(_as_ohlcv(data)["close"], dtype=np.float64)
+    fingerprint = {"symbol": symbol, "bars": len(close),
+                   "first_ts": int(ts[0]) if ts is not None and len(ts) else None,
+                   "last_ts": int(ts[-1]) if ts is not None and len(ts) else None,
+                   "close": hashlib.blake2b(close.tobytes(), digest_size=16).hexdigest()}
+    fingerprint.update(settings)
+    return fingerprint
+
+
+class Checkpoint:
+    """
+    Append-only JSON-lines record of finished evaluations keyed by (strategy, bars, params).
+    The first line holds the data fingerprint; rows are only resumed from a file whose
+    fingerprint matches. Otherwise the checkpoint moves to "<name>-<digest><ext>" next to
+    `path`, so runs on different data (or costs) each resume their own file.
+    """
+
+    def __init__(self, path=None, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.results = {}
+        if path and fingerprint is not None and self._header(path) not in (None, fingerprint):
+            digest = hashlib.blake2b(json.dumps(fingerprint, sort_keys=True).encode(), digest_size=6).hexdigest()
+            root, ext = os.path.splitext(path)
+            print(f"⚠️ {path} was written for different data; checkpointing to {root}-{digest}{ext}")
+            path = f"{root}-{digest}{ext}"
+        self.path = path
+        new = not (path and os.path.exists(path) and os.path.getsize(path))
+        if not new:
+            if fingerprint is not None and self._header(path) != fingerprint:
+                raise ValueError(f"Checkpoint {path} does not match this data; remove it or pick another path")
+            with open(path) as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    if "metrics" in row:
+                        self.results[(row["strategy"], row["bars"], row["key"])] = row["metrics"]
+        self._file = open(path, "a") if path else None
+        if self._file is not None and new and fingerprint is not None:
+            self._file.write(json.dumps({"fingerprint": fingerprint}) + "\n")
+            self._file.flush()
+
+    @staticmethod
+    def _header(path):
+        """The fingerprint a checkpoint file was written for; None for a missing/empty file, {} if it has none."""
+        if not os.path.exists(path) or not os.path.getsize(path):
+            return None
+        with open(path) as f:
+            try:
+                return json.loads(f.readline()).get("fingerprint", {})
+            except ValueError:
+                return {}
+
+    def get(self, strategy, bars, params):
+        return self.results.get((strategy, bars, params_key(params)))
+
+    def put(self, strategy, bars, params, metrics):
+        key = params_key(params)
+        self.results[(strategy, bars, key)] = metrics
+        if self._file is not None:
+            self._file.write(json.dumps({"strategy": strategy, "bars": bars, "key": key, "metrics": metrics}) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# ================================
+# 4. OPTIMIZER
+# ================================
+class Optimizer:
+    """
+    Parallel search over strategy parameters.
+
+        with Optimizer(data, workers=8, checkpoint="retune.ckpt") as opt:
+            best = opt.successive_halving("agent", n=512)
+            opt.write("tuned_params.json")
+    """
+
+    def __init__(self, data, workers=None, batch_size=32, metric="sharpe", min_fills=5, checkpoint=None,
+                 fee_bps=10.0, slippage_bps=5.0, periods_per_year=MINUTES_PER_YEAR, symbol=None, ts=None,
+                 cache_mb=256):
+        fingerprint = data_fingerprint(data, symbol, ts, fee_bps=fee_bps, slippage_bps=slippage_bps,
+                                       periods_per_year=periods_per_year)
+        self.checkpoint = Checkpoint(checkpoint, fingerprint)
+        self.history = SharedHistory(data)
+        self.bars = self.history.spec["close"][1]
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.metric = metric
+        self.min_fills = min_fills
+        # Per-worker bound on cached indicator rows (one float64 row per parameter value)
+        cache_bytes = int(cache_mb * 1024 * 1024) if cache_mb else None
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.history.spec, fee_bps, slippage_bps, periods_per_year,
+                                                  cache_bytes))
+        self.results = {}
+        self.evaluated = 0
+        self.resumed = 0
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.checkpoint.close()
+        self.history.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -------- evaluation --------
+    def score(self, metrics):
+        if metrics["fills"] < self.min_fills:
+            return -math.inf
+        value = metrics[self.metric]
+        return -math.inf if value != value else value  # NaN
+
+    def evaluate(self, strategy, candidates, bars=None):
+        """Metrics for every candidate (checkpointed ones are not re-run), in input order."""
+        bars = min(bars or self.bars, self.bars)
+        out = [self.checkpoint.get(strategy, bars, c) for c in candidates]
+        self.resumed += sum(m is not None for m in out)
+        todo = [i for i, m in enumerate(out) if m is None]
+        # Enough batches to keep every worker busy, never more than batch_size candidates each
+        size = max(1, min(self.batch_size, math.ceil(len(todo) / (self.workers * 4))))
+        batches = [todo[i:i + size] for i in range(0, len(todo), size)]
+        futures = [(batch, self.pool.submit(_evaluate, strategy, [candidates[i] for i in batch], bars)) for batch in batches]
+        for batch, future in futures:
+            for i, metrics in zip(batch, future.result()):
+                out[i] = metrics
+                self.checkpoint.put(strategy, bars, candidates[i], metrics)
+                self.evaluated += 1
+        return out
+
+    def _rank(self, strategy, candidates, metrics):
+        ranked = sorted(zip(candidates, metrics), key=lambda cm: self.score(cm[1]), reverse=True)
+        self.results[strategy] = ranked
+        return ranked
+
+    # -------- search methods --------
+    def grid(self, strategy, points=5):
+        candidates = grid_candidates(strategy, points)
+        return self._rank(strategy, candidates, self.evaluate(strategy, candidates))[0]
+
+    def random(self, strategy, n=256, seed=0):
+        candidates = random_candidates(strategy, n, seed)
+        return self._rank(strategy, candidates, self.evaluate(strategy, candidates))[0]
+
+    def successive_halving(self, strategy, n=256, eta=3, min_bars=None, seed=0):
+        """
+        Score `n` random candidates on the most recent `min_bars` of history, keep
+        the best 1/eta, multiply the history by eta, and repeat until the survivors
+        have been scored on the full history.
+        """
+        candidates = random_candidates(strategy, n, seed)
+        rungs = max(1, math.ceil(math.log(max(len(candidates), 1), eta)))
+        bars = min_bars or max(500, self.bars // eta ** (rungs - 1))
+        while True:
+            bars = min(bars, self.bars)
+            metrics = self.evaluate(strategy, candidates, bars)
+            ranked = self._rank(strategy, candidates, metrics)
+            if bars >= self.bars or len(candidates) <= 1:
+                return ranked[0]
+            candidates = [c for c, _ in ranked[:max(1, len(ranked) // eta)]]
+            bars *= eta
+
+    def run(self, strategies, method="halving", **kwargs):
+        search = {"grid": self.grid, "random": self.random, "halving": self.successive_halving}[method]
+        return {strategy: search(strategy, **kwargs) for strategy in strategies}
+
+    # -------- output --------
+    def best_params(self):
+        out = {}
+        for strategy, ranked in self.results.items():
+            params, metrics = ranked[0]
+            keys = SEARCH_SPACES.get(strategy, params).keys() | base_params(strategy).keys()
+            out[strategy] = {"params": {k: params[k] for k in sorted(keys)}, "metrics": metrics}
+        return out
+
+    def write(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.best_params(), f, indent=2)
+        os.replace(tmp, path)
+
+
+def load_history(market_data_dir, symbol, bars=None):
+    """OHLCV columns of `symbol` plus their "ts" column (kept for the checkpoint fingerprint)."""
+    from market_store import MarketStore
+    store = MarketStore(market_data_dir)
+    history = store.last(symbol, bars) if bars else store.all(symbol)
+    return {name: np.array(column) for name, column in history.as_dict().items()}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Retune strategy parameters on stored market history.")
+    parser.add_argument("--data", default=os.getenv("MARKET_DATA_DIR", "market_data"), help="MarketStore directory")
+    parser.add_argument("--symbol", default=os.getenv("SYMBOL", "BTC-USD"))
+    parser.add_argument("--bars", type=int, default=None, help="Use only the most recent N bars")
+    parser.add_argument("--strategies", default="agent," + ",".join(default_strategies))
+    parser.add_argument("--method", choices=("grid", "random", "halving"), default="halving")
+    parser.add_argument("--samples", type=int, default=256, help="Candidates per strategy (random/halving)")
+    parser.add_argument("--points", type=int, default=5, help="Values per parameter (grid)")
+    parser.add_argument("--metric", default="sharpe")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", default="optimizer.ckpt",
+                        help="resumed only when written for the same data and costs")
+    parser.add_argument("--cache-mb", type=float, default=256, help="indicator cache per worker (MB)")
+    parser.add_argument("--out", default=os.getenv("STRATEGY_PARAMS_FILE", "tuned_params.json"))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    data = load_history(args.data, args.symbol, args.bars)
+    ts = data.pop("ts")
+    strategies = [s for s in args.strategies.split(",") if s]
+    kwargs = {"points": args.points} if args.method == "grid" else {"n": args.samples, "seed": args.seed}
+    started = time.perf_counter()
+    with Optimizer(data, workers=args.workers, metric=args.metric, checkpoint=args.checkpoint,
+                   symbol=args.symbol, ts=ts, cache_mb=args.cache_mb) as opt:
+        opt.run(strategies, args.method, **kwargs)
+        opt.write(args.out)
+        for strategy, best in opt.best_params().items():
+            metrics = best["metrics"]
+            print(f"{strategy}: {args.metric}={metrics[args.metric]:.3f} fills={metrics['fills']:.0f} {best['params']}")
+        print(f"✅ {opt.evaluated} evaluations ({opt.resumed} from checkpoint) on {opt.workers} workers "
+              f"in {time.perf_counter() - started:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
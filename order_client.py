@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+"""
+Order Client
+-----------------------------
+
+Pooled replacement for `trade_api.place_order`, which opened a new
+TCP/TLS connection per order and rebuilt the signing headers from scratch.
+
+- OrderClient      : requests.Session with a sized connection pool (sync)
+- AsyncOrderClient : aiohttp session with the same API (asyncio, optional dependency)
+
+Both sign with a pre-keyed HMAC, send exactly the bytes they signed, submit
+batches of orders with bounded concurrency, back off on 429 (honouring
+Retry-After, shared by every in-flight order), and record per-order latency
+in a LatencyHistogram.
+
+Every order carries a client_order_id fixed when its body is built, so each
+retry of a logical order is the same request. Order POSTs are only retried on
+429 (the request was not processed): a 5xx or gateway timeout may mean the
+exchange already accepted the order, so it is raised as an OrderError holding
+the client_order_id to reconcile against instead of being sent again.
+Idempotent methods (GET, DELETE, ...) are also retried on 5xx.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import LatencyHistogram, instruments, span
+
+API_URL = "https://api.coinbase.com"
+ORDER_PATH = "/v3/brokerage/orders"
+RETRY_STATUSES = (429, 500, 502, 503, 504)   # idempotent requests
+ORDER_RETRY_STATUSES = (429,)                 # POSTs: only when the request was not processed
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+# ================================
+# 1. SIGNING & REQUEST SHAPING (shared by sync and async clients)
+# ================================
+class _OrderSigner:
+    def __init__(self, api_key, api_secret, passphrase):
+        self._mac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256)
+        self._static = {
+            "CB-ACCESS-KEY": api_key,
+            "CB-ACCESS-PASSPHRASE": passphrase,
+            "Content-Type": "application/json",
+        }
+
+    def headers(self, method, path, payload=""):
+        timestamp = str(int(time.time()))
+        mac = self._mac.copy()
+        mac.update((timestamp + method + path + payload).encode())
+        headers = dict(self._static)
+        headers["CB-ACCESS-SIGN"] = mac.hexdigest()
+        headers["CB-ACCESS-TIMESTAMP"] = timestamp
+        return headers
+
+
+def order_body(side, product_id, size, price=None, client_order_id=None):
+    """Request body of one logical order; its client_order_id is fixed here and reused by every retry."""
+    body = {"client_order_id": client_order_id or uuid.uuid4().hex, "side": side,
+            "product_id": product_id, "size": size}
+    if price:
+        body.update(type="limit", limit_price=price)
+    return body
+
+
+def _as_body(order):
+    if isinstance(order, dict):
+        return order_body(order["side"], order["product_id"], order["size"], order.get("price"),
+                          order.get("client_order_id"))
+    return order_body(*order)
+
+
+def _retry_statuses(method):
+    return RETRY_STATUSES if method.upper() in IDEMPOTENT_METHODS else ORDER_RETRY_STATUSES
+
+
+def _client_order_id(body):
+    return body.get("client_order_id") if isinstance(body, dict) else None
+
+
+def _retry_delay(attempt, backoff, max_backoff, retry_after=None):
+    if retry_after:
+        try:
+            return min(float(retry_after), max_backoff)
+        except ValueError:
+            pass
+    delay = min(backoff * (2 ** attempt), max_backoff)
+    return delay * (0.5 + random.random() / 2)  # jitter
+
+
+class OrderError(Exception):
+    """
+    Order rejected with a non-retryable status, or retries exhausted. After a 5xx
+    the order may still have been placed: look it up by `client_order_id`.
+    """
+
+    def __init__(self, status, body, client_order_id=None):
+        super().__init__(f"Order failed with HTTP {status}: {body}"
+                         + (f" (client_order_id {client_order_id})" if client_order_id else ""))
+        self.status = status
+        self.body = body
+        self.client_order_id = client_order_id
+
+
+# ================================
+# 2. SYNC CLIENT
+# ================================
+class OrderClient:
+    """
+    Sync order client over one pooled requests.Session.
+
+        client = OrderClient(API_URL, CB_API_KEY, CB_API_SECRET, CB_API_PASSPHRASE)
+        client.place_order("BUY", "BTC-USD", "0.01")
+        client.place_orders([("BUY", "BTC-USD", "0.01"), ("SELL", "ETH-USD", "0.1", "2500")])
+    """
+
+    def __init__(self, api_url, api_key, api_secret, passphrase, pool_size=10, keep_alive=True,
+                 timeout=10, max_retries=3, backoff=0.25, max_backoff=8.0, max_concurrency=4):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.api_url = api_url.rstrip("/")
+        self.signer = _OrderSigner(api_key, api_secret, passphrase)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency
+        self.latency = LatencyHistogram()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+        self._pool = None
+        self._blocked_until = 0.0  # shared rate-limit backoff
+
+    def sign(self, method, path, body=None):
+        return self.signer.headers(method, path, json.dumps(body) if body else "")
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body) if body else ""
+        retry_statuses = _retry_statuses(method)
+        for attempt in range(self.max_retries + 1):
+            wait = self._blocked_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            started = time.perf_counter()
+            with span("sign_request"):
+                headers = self.signer.headers(method, path, payload)
+            with span("place_order"):
+                resp = self.session.request(method, self.api_url + path, data=payload or None,
+                                            headers=headers, timeout=self.timeout)
+            self.latency.record(time.perf_counter() - started)
+            if resp.status_code in retry_statuses and attempt < self.max_retries:
+                delay = _retry_delay(attempt, self.backoff, self.max_backoff, resp.headers.get("Retry-After"))
+                if resp.status_code == 429:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                else:
+                    time.sleep(delay)
+                continue
+            if resp.status_code >= 400:
+                raise OrderError(resp.status_code, resp.text, _client_order_id(body))
+            return resp.json()
+
+    def place_order(self, side, product_id, size, price=None):
+        return self.request("POST", ORDER_PATH, order_body(side, product_id, size, price))
+
+    def place_orders(self, orders):
+        """
+        Submit a batch of orders ((side, product_id, size[, price]) tuples or dicts)
+        with at most `max_concurrency` in flight. Returns results in order; a
+        failed order's slot holds its exception.
+        """
+        bodies = [_as_body(order) for order in orders]
+        if len(bodies) <= 1 or self.max_concurrency <= 1:
+            return [self._safe_submit(body) for body in bodies]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        return list(self._pool.map(self._safe_submit, bodies))
+
+    def _safe_submit(self, body):
+        try:
+            return self.request("POST", ORDER_PATH, body)
+        except Exception as e:
+            return e
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ================================
+# 3. ASYNC CLIENT
+# ================================
+class AsyncOrderClient:
+    """
+    asyncio order client over one pooled aiohttp session (requires aiohttp).
+
+        async with AsyncOrderClient(API_URL, key, secret, passphrase) as client:
+            results = await client.place_orders(orders)
+    """
+
+    def __init__(self, api_url, api_key, api_secret, passphrase, pool_size=10, keep_alive=True,
+                 timeout=10, max_retries=3, backoff=0.25, max_backoff=8.0, max_concurrency=4,
+                 keepalive_timeout=30):
+        self.api_url = api_url.rstrip("/")
+        self.signer = _OrderSigner(api_key, api_secret, passphrase)
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency
+        self.latency = LatencyHistogram()
+        self.session = None
+        self._semaphore = None
+        self._blocked_until = 0.0
+
+    async def open(self):
+        import aiohttp
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, force_close=not self.keep_alive,
+                                             keepalive_timeout=self.keepalive_timeout if self.keep_alive else None)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def request(self, method, path, body=None):
+        await self.open()
+        payload = json.dumps(body) if body else ""
+        retry_statuses = _retry_statuses(method)
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                wait = self._blocked_until - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                started = time.perf_counter()
+                with span("sign_request"):
+                    headers = self.signer.headers(method, path, payload)
+                async with self.session.request(method, self.api_url + path, data=payload or None,
+                                                headers=headers) as resp:
+                    text = await resp.text()
+                    self.latency.record(time.perf_counter() - started)
+                    instruments.record("place_order", time.perf_counter() - started)
+                    if resp.status in retry_statuses and attempt < self.max_retries:
+                        delay = _retry_delay(attempt, self.backoff, self.max_backoff, resp.headers.get("Retry-After"))
+                        if resp.status == 429:
+                            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                        else:
+                            await asyncio.sleep(delay)
+                        continue
+                    if resp.status >= 400:
+                        raise OrderError(resp.status, text, _client_order_id(body))
+                    return json.loads(text) if text else None
+
+    async def place_order(self, side, product_id, size, price=None):
+        return await self.request("POST", ORDER_PATH, order_body(side, product_id, size, price))
+
+    async def place_orders(self, orders):
+        """Submit a batch concurrently (bounded by `max_concurrency`); failures are returned in place."""
+        return await asyncio.gather(*(self.request("POST", ORDER_PATH, _as_body(o)) for o in orders),
+                                    return_exceptions=True)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
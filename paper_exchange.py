@@ -0,0 +1,508 @@
+#!/usr/bin/env python
+"""
+Paper Exchange
+-----------------------------
+
+In-process execution simulator for paper sessions and replays.
+
+- OrderBook     : one limit order book per product; price-time priority
+                  (best price first, FIFO within a level).
+- Account       : cash, signed positions, average entry, realized PnL, fees.
+- PaperExchange : routes orders to the books. Market orders, and the part of
+                  a marketable limit order the book can't fill, trade against
+                  a reference quote around the product's mark price, adjusted
+                  by `spread_bps` / `slippage_bps`. Resting limit orders fill
+                  (as maker) when the mark trades through them. An account's
+                  orders never trade with each other (`self_trade`).
+- PaperClient   : an account-bound view with OrderClient's
+                  `place_order(side, product_id, size, price=None)` /
+                  `place_orders(orders)`, so paper mode swaps in without
+                  touching the calling code.
+
+    exchange = PaperExchange(fee_bps=10, slippage_bps=5)
+    exchange.bind(agent)                              # writes capital/profit back after fills
+    exchange.update_price("BTC-USD", 64000.0)
+    exchange.place_order("BUY", "BTC-USD", "0.01", account=agent.name)
+
+`replay()` runs a backtest signal row through the same fill model, so
+paper sessions and backtests price their trades identically.
+"""
+
+import heapq
+import itertools
+import threading
+from collections import deque
+
+import numpy as np
+
+from journal import journal
+
+BUY, SELL = "BUY", "SELL"
+OPEN, FILLED, PARTIAL, CANCELLED, REJECTED = "OPEN", "FILLED", "PARTIALLY_FILLED", "CANCELLED", "REJECTED"
+CANCEL_RESTING, CANCEL_INCOMING = "cancel_resting", "cancel_incoming"
+
+
+# ================================
+# 1. ORDERS & BOOK
+# ================================
+class Order:
+    __slots__ = ("order_id", "account", "owner", "product_id", "side", "price", "size", "remaining",
+                 "filled_value", "fees", "status")
+
+    def __init__(self, order_id, account, product_id, side, price, size, owner=None):
+        self.order_id = order_id
+        self.account = account
+        self.owner = owner
+        self.product_id = product_id
+        self.side = side
+        self.price = price
+        self.size = size
+        self.remaining = size
+        self.filled_value = 0.0
+        self.fees = 0.0
+        self.status = OPEN
+
+    @property
+    def filled_size(self):
+        return self.size - self.remaining
+
+    @property
+    def average_price(self):
+        filled = self.size - self.remaining
+        return self.filled_value / filled if filled else 0.0
+
+    def as_dict(self):
+        return {
+            "order_id": self.order_id,
+            "product_id": self.product_id,
+            "side": self.side,
+            "type": "market" if self.price is None else "limit",
+            "limit_price": self.price,
+            "size": self.size,
+            "filled_size": self.size - self.remaining,
+            "average_filled_price": self.average_price,
+            "fees": self.fees,
+            "status": self.status,
+        }
+
+    def __repr__(self):
+        return (f"Order({self.order_id}, {self.side} {self.size} {self.product_id} @ {self.price}, "
+                f"filled={self.size - self.remaining}, {self.status})")
+
+
+class OrderBook:
+    """
+    Price levels are FIFO deques keyed by price, with a heap per side for the
+    best price. Cancelled orders and emptied levels are dropped lazily when
+    they reach the top of the book.
+    """
+
+    def __init__(self, product_id):
+        self.product_id = product_id
+        self.bids = {}
+        self.asks = {}
+        self._bid_prices = []  # max-heap via negated prices
+        self._ask_prices = []
+
+    def add(self, order):
+        if order.side == BUY:
+            level = self.bids.get(order.price)
+            if level is None:
+                level = self.bids[order.price] = deque()
+                heapq.heappush(self._bid_prices, -order.price)
+        else:
+            level = self.asks.get(order.price)
+            if level is None:
+                level = self.asks[order.price] = deque()
+                heapq.heappush(self._ask_prices, order.price)
+        level.append(order)
+
+    def best_bid(self):
+        return self._best(self.bids, self._bid_prices, -1)
+
+    def best_ask(self):
+        return self._best(self.asks, self._ask_prices, 1)
+
+    @staticmethod
+    def _best(levels, prices, sign):
+        while prices:
+            price = prices[0] * sign
+            level = levels.get(price)
+            while level and level[0].remaining <= 0:
+                level.popleft()
+            if level:
+                return price
+            heapq.heappop(prices)
+            levels.pop(price, None)
+        return None
+
+    def level(self, side, price):
+        return (self.bids if side == BUY else self.asks)[price]
+
+    def depth(self, side, levels=10):
+        """[(price, resting size)] for the best `levels` prices on one side."""
+        book = self.bids if side == BUY else self.asks
+        prices = sorted(book, reverse=side == BUY)
+        out = []
+        for price in prices:
+            size = sum(o.remaining for o in book[price] if o.remaining > 0)
+            if size > 0:
+                out.append((price, size))
+                if len(out) == levels:
+                    break
+        return out
+
+    def __len__(self):
+        return sum(1 for book in (self.bids, self.asks) for level in book.values() for o in level if o.remaining > 0)
+
+
+# ================================
+# 2. ACCOUNTS
+# ================================
+class Account:
+    """Cash and per-product positions with average-cost realized PnL."""
+
+    def __init__(self, name, cash=0.0):
+        self.name = name
+        self.initial_cash = float(cash)
+        self.cash = float(cash)
+        self.positions = {}
+        self.avg_price = {}
+        self.realized = 0.0
+        self.fees = 0.0
+        self.fills = 0
+        self.agent = None
+
+    def apply_fill(self, product_id, side, size, price, fee):
+        signed = size if side == BUY else -size
+        position = self.positions.get(product_id, 0.0)
+        new_position = position + signed
+        if position == 0 or (position > 0) == (signed > 0):
+            avg = self.avg_price.get(product_id, 0.0)
+            self.avg_price[product_id] = (avg * position + price * signed) / new_position
+        else:
+            avg = self.avg_price[product_id]
+            if (new_position > 0) == (position > 0) or new_position == 0:
+                self.realized -= signed * (price - avg)
+            else:  # flipped through zero
+                self.realized += position * (price - avg)
+                self.avg_price[product_id] = price
+            if -1e-12 < new_position < 1e-12:
+                new_position = 0.0
+        self.positions[product_id] = new_position
+        self.cash -= signed * price + fee
+        self.fees += fee
+        self.fills += 1
+
+    def unrealized(self, marks):
+        return sum(q * (marks.get(p, self.avg_price[p]) - self.avg_price[p]) for p, q in self.positions.items() if q)
+
+    def equity(self, marks):
+        return self.cash + sum(q * marks.get(p, self.avg_price[p]) for p, q in self.positions.items() if q)
+
+    def pnl(self, marks):
+        return self.equity(marks) - self.initial_cash
+
+    def summary(self, marks):
+        return {
+            "cash": self.cash,
+            "equity": self.equity(marks),
+            "pnl": self.pnl(marks),
+            "realized": self.realized,
+            "unrealized": self.unrealized(marks),
+            "fees": self.fees,
+            "fills": self.fills,
+            "positions": {p: q for p, q in self.positions.items() if q},
+        }
+
+
+# ================================
+# 3. EXCHANGE
+# ================================
+class PaperExchange:
+    """
+    Local matching engine plus a reference-quote liquidity model.
+
+    fee_bps        : taker fee (orders that trade on arrival)
+    maker_fee_bps  : fee for resting limit orders when they fill
+    spread_bps     : full width of the reference quote around the mark
+    slippage_bps   : extra price concession on reference-quote fills
+    price_source   : optional callable(product_id) -> mark, used until
+                     update_price() has been called for the product
+    initial_cash   : starting cash for accounts created on first use
+    self_trade     : when an order meets a resting order of its own account,
+                     "cancel_resting" cancels the resting order and matching
+                     goes on; "cancel_incoming" cancels the rest of the new order
+    """
+
+    def __init__(self, fee_bps=10.0, maker_fee_bps=None, spread_bps=0.0, slippage_bps=5.0,
+                 price_source=None, initial_cash=1000.0, reference_liquidity=True, self_trade=CANCEL_RESTING):
+        if self_trade not in (CANCEL_RESTING, CANCEL_INCOMING):
+            raise ValueError(f"Unknown self_trade policy {self_trade!r}; use {CANCEL_RESTING!r} or {CANCEL_INCOMING!r}")
+        self.taker_fee = fee_bps / 1e4
+        self.maker_fee = (fee_bps if maker_fee_bps is None else maker_fee_bps) / 1e4
+        self.half_spread = spread_bps / 2e4
+        self.slippage = slippage_bps / 1e4
+        self.price_source = price_source
+        self.initial_cash = initial_cash
+        self.reference_liquidity = reference_liquidity
+        self.self_trade = self_trade
+        self.books = {}
+        self.marks = {}
+        self.accounts = {}
+        self.orders = {}
+        self.trades = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    # -------- setup --------
+    def book(self, product_id):
+        book = self.books.get(product_id)
+        if book is None:
+            book = self.books[product_id] = OrderBook(product_id)
+        return book
+
+    def account(self, name="default"):
+        account = self.accounts.get(name)
+        if account is None:
+            account = self.accounts[name] = Account(name, self.initial_cash)
+        return account
+
+    def bind(self, agent, name=None):
+        """
+        Give `agent` an account funded with its current capital; after every fill
+        `agent.capital` (equity at the marks) and `agent.profit` are updated.
+        """
+        name = name or agent.name
+        account = self.accounts.get(name)
+        if account is None:
+            account = self.accounts[name] = Account(name, getattr(agent, "capital", self.initial_cash))
+        account.agent = agent
+        return self.client(name)
+
+    def client(self, account="default"):
+        return PaperClient(self, account)
+
+    def mark(self, product_id):
+        price = self.marks.get(product_id)
+        if price is None and self.price_source is not None:
+            price = self.price_source(product_id)
+            if price is not None and price == price:  # not NaN
+                self.marks[product_id] = price = float(price)
+            else:
+                price = None
+        return price
+
+    # -------- order entry --------
+    def place_order(self, side, product_id, size, price=None, account="default"):
+        """OrderClient-compatible entry point; returns the order as a response dict."""
+        return self.submit(side, product_id, size, price, account).as_dict()
+
+    def place_orders(self, orders, account="default"):
+        """Batch of (side, product_id, size[, price]) tuples or dicts, as OrderClient.place_orders."""
+        results = []
+        for order in orders:
+            if isinstance(order, dict):
+                order = (order["side"], order["product_id"], order["size"], order.get("price"))
+            try:
+                results.append(self.place_order(*order, account=account))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def submit(self, side, product_id, size, price=None, account="default"):
+        """Match a new order and return its Order (fast path for replays)."""
+        side = side.upper()
+        if side not in (BUY, SELL):
+            raise ValueError(f"Unknown side {side!r}")
+        size = float(size)
+        if size <= 0:
+            raise ValueError(f"Order size must be positive, got {size}")
+        price = float(price) if price else None
+        with self._lock:
+            owner = self.accounts.get(account)
+            if owner is None:
+                owner = self.account(account)
+            order = Order(next(self._ids), account, product_id, side, price, size, owner)
+            book = self.books.get(product_id)
+            if book is None:
+                book = self.book(product_id)
+            self._match(book, order)
+            if order.status == CANCELLED:  # self-trade prevention
+                return order
+            if order.remaining > 0 and self.reference_liquidity:
+                self._fill_reference(order)
+            if order.remaining > 0:
+                if price is None:
+                    order.status = PARTIAL if order.remaining < size else REJECTED
+                else:
+                    book.add(order)
+                    self.orders[order.order_id] = order
+                    order.status = PARTIAL if order.remaining < size else OPEN
+            else:
+                order.status = FILLED
+            return order
+
+    def cancel(self, order_id):
+        with self._lock:
+            order = self.orders.pop(order_id, None)
+            if order is None or order.remaining <= 0:
+                return False
+            order.remaining = 0.0  # dropped from its level lazily
+            order.status = CANCELLED
+            return True
+
+    def open_orders(self, account=None):
+        return [o for o in self.orders.values() if o.remaining > 0 and (account is None or o.account == account)]
+
+    # -------- matching --------
+    def _match(self, book, order):
+        buy = order.side == BUY
+        prices = book._ask_prices if buy else book._bid_prices
+        if not prices:
+            return
+        limit = order.price
+        while order.remaining > 0:
+            best = book.best_ask() if buy else book.best_bid()
+            if best is None or (limit is not None and (best > limit if buy else best < limit)):
+                return
+            level = book.level(SELL if buy else BUY, best)
+            while level and order.remaining > 0:
+                resting = level[0]
+                if resting.remaining <= 0:
+                    level.popleft()
+                    continue
+                if resting.account == order.account:
+                    if self.self_trade == CANCEL_INCOMING:
+                        order.status = CANCELLED
+                        return
+                    level.popleft()
+                    self.orders.pop(resting.order_id, None)
+                    resting.remaining = 0.0
+                    resting.status = CANCELLED
+                    continue
+                qty = resting.remaining if resting.remaining < order.remaining else order.remaining
+                self._fill(order, qty, best, self.taker_fee)
+                self._fill(resting, qty, best, self.maker_fee)
+                if resting.remaining <= 0:
+                    level.popleft()
+                    self.orders.pop(resting.order_id, None)
+
+    def _fill_reference(self, order):
+        mark = self.marks.get(order.product_id)
+        if mark is None:
+            mark = self.mark(order.product_id)
+            if mark is None:
+                return
+        concession = self.half_spread + self.slippage
+        price = mark * (1 + concession) if order.side == BUY else mark * (1 - concession)
+        if order.price is not None and (price > order.price if order.side == BUY else price < order.price):
+            return
+        self._fill(order, order.remaining, price, self.taker_fee)
+
+    def _fill(self, order, qty, price, fee_rate):
+        fee = qty * price * fee_rate
+        order.remaining -= qty
+        if order.remaining < 1e-12:
+            order.remaining = 0.0
+            order.status = FILLED
+        else:
+            order.status = PARTIAL
+        order.filled_value += qty * price
+        order.fees += fee
+        self.trades += 1
+        account = order.owner
+        account.apply_fill(order.product_id, order.side, qty, price, fee)
+        if journal.enabled:
+            journal.fill(order.account, order.product_id, order.side, qty, price, fee, order.order_id)
+        if account.agent is not None:
+            self._sync(account)
+
+    def _sync(self, account):
+        equity = account.equity(self.marks)
+        account.agent.capital = equity
+        account.agent.profit = equity - account.initial_cash
+
+    # -------- prices --------
+    def update_price(self, product_id, price):
+        """
+        New mark for `product_id`. Resting bids at or above it (and asks at or
+        below it) fill at their limit price as makers.
+        """
+        price = float(price)
+        with self._lock:
+            self.marks[product_id] = price
+            book = self.books.get(product_id)
+            if book is None:
+                return
+            for side, best in ((BUY, book.best_bid), (SELL, book.best_ask)):
+                while True:
+                    level_price = best()
+                    if level_price is None or (level_price < price if side == BUY else level_price > price):
+                        break
+                    level = book.level(side, level_price)
+                    while level:
+                        resting = level.popleft()
+                        if resting.remaining > 0:
+                            self._fill(resting, resting.remaining, level_price, self.maker_fee)
+                            self.orders.pop(resting.order_id, None)
+
+    # -------- reporting --------
+    def mark_to_market(self, account="default"):
+        """Revalue an account at the current marks (and update its bound agent)."""
+        account = self.account(account)
+        if account.agent is not None:
+            self._sync(account)
+        return account.equity(self.marks)
+
+    def pnl(self, account="default"):
+        return self.account(account).summary(self.marks)
+
+    def summary(self):
+        return {name: account.summary(self.marks) for name, account in self.accounts.items()}
+
+    # -------- replay --------
+    def replay(self, product_id, close, signals, size=1.0, account="replay"):
+        """
+        Trade one backtest signal row (+1 long / -1 short / 0 keep) through the
+        exchange bar by bar with market orders: the position follows the last
+        non-zero signal, as in backtest.simulate. Returns the account's equity
+        after each bar.
+        """
+        close = np.asarray(close, dtype=float)
+        signals = np.asarray(signals)
+        account_ = self.account(account)
+        equity = np.empty(len(close))
+        target = 0.0
+        for i in range(len(close)):
+            self.update_price(product_id, close[i])
+            if signals[i]:
+                target = size * (1 if signals[i] > 0 else -1)
+            delta = target - account_.positions.get(product_id, 0.0)
+            if abs(delta) > 1e-12:
+                self.submit(BUY if delta > 0 else SELL, product_id, abs(delta), account=account)
+            equity[i] = account_.equity(self.marks)
+        return equity
+
+
+class PaperClient:
+    """An OrderClient-shaped handle on one PaperExchange account."""
+
+    def __init__(self, exchange, account="default"):
+        self.exchange = exchange
+        self.account = account
+
+    def place_order(self, side, product_id, size, price=None):
+        return self.exchange.place_order(side, product_id, size, price, account=self.account)
+
+    def place_orders(self, orders):
+        return self.exchange.place_orders(orders, account=self.account)
+
+    def cancel(self, order_id):
+        return self.exchange.cancel(order_id)
+
+    def pnl(self):
+        return self.exchange.pnl(self.account)
+
+    def close(self):
+        pass
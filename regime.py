@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+Market Regime Detector
+-----------------------------
+
+Online estimates per symbol, each updated in O(1) per price:
+- EWMA volatility of log returns (RiskMetrics-style, bias-corrected while warming up)
+- realized variance: the sum of squared log returns over the last `window` prices
+- trend strength: Kaufman's efficiency ratio |p[t] - p[t-window]| / sum |dp| over the window, in [0, 1]
+
+From these it picks which of the default_strategies (strategies.py) fits:
+
+    trend        strong, persistent drift         efficiency ratio >= trend_enter
+    volatility   recent volatility expanding      EWMA vol / realized vol >= volatility_enter
+    momentum     moderate drift                   efficiency ratio >= momentum_enter
+    hybrid       none of the above (choppy, quiet)
+
+Each regime has an enter and a lower exit threshold, and a new regime must
+be the candidate for `confirm` consecutive updates before it replaces the
+current one, so an estimate hovering at a threshold does not flap between
+strategies.
+
+`regimes` is a process-wide RegimeBook. Every agent trading a symbol shares
+one detector: prices come with their bar timestamps, and a bar that another
+agent already pushed is skipped, so the estimates are computed once per
+symbol and bar.
+
+    from regime import regimes
+
+    detector = regimes.update("BTC-USD", closes, timestamps, volumes)
+    detector.regime              # "trend" | "volatility" | "momentum" | "hybrid" (None while warming up)
+    detector.history.values()    # the symbol's last `history` closes
+    detector.history_volume()    # their volumes (None unless every one was given)
+"""
+
+import math
+import os
+import threading
+
+import numpy as np
+
+from indicators import NAN, RingBuffer, RollingStd
+
+REGIME_DEFAULTS = {
+    "window": 100,            # prices in the realized-variance / efficiency-ratio window
+    "ewma_lambda": 0.94,      # decay of the EWMA variance
+    "history": 256,           # shared close history for the history strategies (SMA 200 needs 200)
+    "confirm": 10,            # consecutive updates a new regime must hold before switching
+    # Efficiency ratio of a random walk is ~1/sqrt(window) (0.1); these sit well above it
+    "trend_enter": 0.4,
+    "trend_exit": 0.3,
+    "volatility_enter": 1.3,
+    "volatility_exit": 1.1,
+    "momentum_enter": 0.25,
+    "momentum_exit": 0.15,
+}
+REGIMES = ("trend", "volatility", "momentum", "hybrid")
+
+
+class RegimeDetector:
+    """Streaming volatility/trend estimates and the resulting regime for one price series."""
+    __slots__ = ("window", "lam", "confirm", "bands", "prev", "last_ts", "ticks", "ewma", "decay",
+                 "squares", "realized_var", "moves", "path", "prices", "history", "volume", "price_std",
+                 "regime", "candidate", "streak", "switches")
+
+    def __init__(self, params=None):
+        p = dict(REGIME_DEFAULTS, **(params or {}))
+        self.window = int(p["window"])
+        self.lam = float(p["ewma_lambda"])
+        self.confirm = int(p["confirm"])
+        self.bands = {name: (float(p[f"{name}_enter"]), float(p[f"{name}_exit"]))
+                      for name in ("trend", "volatility", "momentum")}
+        self.prev = None
+        self.last_ts = None
+        self.ticks = 0
+        self.ewma = 0.0
+        self.decay = 1.0                         # lam ** ticks, for the bias correction
+        self.squares = RingBuffer(self.window)   # squared log returns
+        self.realized_var = 0.0
+        self.moves = RingBuffer(self.window)     # |dp|
+        self.path = 0.0
+        self.prices = RingBuffer(self.window + 1)
+        self.history = RingBuffer(int(p["history"]))
+        self.volume = RingBuffer(int(p["history"]))  # NaN where a price came without volume
+        # Sample std of prices (pandas default), as TradingAgent.update_strategy uses it
+        self.price_std = RollingStd(self.window, ddof=1)
+        self.regime = None
+        self.candidate = None
+        self.streak = 0
+        self.switches = 0
+
+    def update(self, price, volume=NAN):
+        price = float(price)
+        self.history.push(price)
+        self.volume.push(float(volume))
+        self.prices.push(price)
+        self.price_std.update(price)
+        prev, self.prev = self.prev, price
+        if prev is None or prev <= 0.0 or price <= 0.0:
+            return self.regime
+        r = math.log(price / prev)
+        square = r * r
+        self.ticks += 1
+        self.ewma = self.lam * self.ewma + (1.0 - self.lam) * square
+        self.decay *= self.lam
+        move = abs(price - prev)
+        evicted = self.squares.push(square)
+        self.realized_var += square - (evicted or 0.0)
+        evicted = self.moves.push(move)
+        self.path += move - (evicted or 0.0)
+        # Both buffers wrap together; re-sum once per wrap to stop floating-point drift (amortized O(1))
+        if self.squares.pos == 0:
+            self.realized_var = math.fsum(self.squares.data)
+            self.path = math.fsum(self.moves.data)
+        if self.squares.full:
+            self._classify()
+        return self.regime
+
+    def history_volume(self):
+        """Volumes aligned with history.values(), or None if any of those prices came without one."""
+        volume = np.array(self.volume.values())
+        return None if np.isnan(volume).any() else volume
+
+    # -------- estimates --------
+    @property
+    def ewma_vol(self):
+        """Per-price volatility of log returns (EWMA)."""
+        return math.sqrt(self.ewma / (1.0 - self.decay)) if self.ticks else NAN
+
+    @property
+    def realized_vol(self):
+        """Per-price volatility of log returns over the window."""
+        return math.sqrt(max(self.realized_var, 0.0) / self.squares.count) if self.squares.count else NAN
+
+    @property
+    def vol_ratio(self):
+        realized = self.realized_vol
+        return self.ewma_vol / realized if realized > 0.0 else NAN
+
+    @property
+    def trend_strength(self):
+        if not self.prices.full or self.path <= 0.0:
+            return NAN
+        return min(1.0, abs(self.prices.last() - self.prices.data[self.prices.pos]) / self.path)
+
+    @property
+    def direction(self):
+        if not self.prices.full:
+            return 0
+        change = self.prices.last() - self.prices.data[self.prices.pos]
+        return (change > 0) - (change < 0)
+
+    # -------- regime --------
+    def _above(self, name, value):
+        enter, exit_ = self.bands[name]
+        return value >= (exit_ if self.regime == name else enter)
+
+    def _classify(self):
+        efficiency = self.trend_strength
+        if self._above("trend", efficiency):
+            candidate = "trend"
+        elif self._above("volatility", self.vol_ratio):
+            candidate = "volatility"
+        elif self._above("momentum", efficiency):
+            candidate = "momentum"
+        else:
+            candidate = "hybrid"
+        if self.regime is None:
+            self.regime = candidate
+        elif candidate == self.regime:
+            self.candidate, self.streak = None, 0
+        else:
+            if candidate == self.candidate:
+                self.streak += 1
+            else:
+                self.candidate, self.streak = candidate, 1
+            if self.streak >= self.confirm:
+                self.regime = candidate
+                self.candidate, self.streak = None, 0
+                self.switches += 1
+
+    def snapshot(self):
+        return {
+            "regime": self.regime,
+            "ewma_vol": self.ewma_vol,
+            "realized_var": self.realized_var,
+            "realized_vol": self.realized_vol,
+            "vol_ratio": self.vol_ratio,
+            "trend_strength": self.trend_strength,
+            "direction": self.direction,
+            "price_std": self.price_std.value,
+            "ticks": self.ticks,
+            "switches": self.switches,
+        }
+
+
+class RegimeBook:
+    """Shared RegimeDetectors, one per symbol (or other key)."""
+
+    def __init__(self, params=None):
+        self.params = dict(params or {})
+        self.detectors = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """Overrides from REGIME_<NAME> variables, e.g. REGIME_WINDOW=200, REGIME_CONFIRM=10."""
+        params = {}
+        for name in REGIME_DEFAULTS:
+            value = environ.get(f"REGIME_{name.upper()}")
+            if value not in (None, ""):
+                params[name] = float(value)
+        return cls(params)
+
+    def detector(self, key):
+        detector = self.detectors.get(key)
+        if detector is None:
+            with self._lock:
+                detector = self.detectors.get(key)
+                if detector is None:
+                    detector = self.detectors[key] = RegimeDetector(self.params)
+        return detector
+
+    def update(self, key, prices, ts=None, volumes=None):
+        """
+        Push new prices (and their volumes, if known) for `key` and return its
+        detector. With `ts` (ascending, one per price) prices at or before the
+        last pushed timestamp are skipped, so agents sharing a symbol only push
+        bars nobody has pushed yet.
+        """
+        detector = self.detector(key)
+        with self._lock:
+            start = 0
+            if ts is not None:
+                ts = np.asarray(ts)
+                if not len(ts):
+                    return detector
+                start = 0 if detector.last_ts is None else int(np.searchsorted(ts, detector.last_ts, side="right"))
+                detector.last_ts = max(ts[-1], detector.last_ts if detector.last_ts is not None else ts[-1])
+            if volumes is None:
+                for price in prices[start:]:
+                    detector.update(price)
+            else:
+                for price, volume in zip(prices[start:], volumes[start:]):
+                    detector.update(price, volume)
+        return detector
+
+    def snapshot(self):
+        return {key: detector.snapshot() for key, detector in list(self.detectors.items())}
+
+
+regimes = RegimeBook.from_env()
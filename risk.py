@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+"""
+Pre-trade Risk Engine
+-----------------------------
+
+Limits checked before anything leaves the process: orders on the REST /
+paper path and ERC-3525 mints.
+
+- Per agent and global: absolute position per symbol, gross notional,
+  order size / notional, order rate (token bucket) and drawdown from peak
+  equity (a halted agent may still reduce its positions).
+- Per slot: mint size and minted amount per rolling window.
+- Kill switch: `risk.kill(reason)` (or creating RISK_KILL_FILE, which other
+  processes on the host also see) rejects every order and mint until
+  `resume()`.
+
+Every figure a check needs is kept as a running counter. Positions,
+exposures, notional totals, token buckets and peak equity are all
+adjusted by the delta of each accepted order, so a check is a handful of
+dict lookups and comparisons, with no sums over positions or history.
+
+Accepted orders are committed at check time, at the check price (worst
+case). When the venue reports a smaller fill, `settle()` backs out the
+unfilled part.
+
+    from risk import risk, GuardedClient
+
+    client = GuardedClient(PaperClient(exchange, "Agent_1"), risk, "Agent_1")
+    client.place_order("BUY", "BTC-USD", 0.5)   # raises RiskRejected when a limit is hit
+    amount = risk.check_mint("ERC3525", slot=1, amount=Decimal("50"))   # clipped to the caps
+
+Limits come from RISK_* environment variables (see RiskEngine.from_env);
+unset means unlimited. Rates and mint windows run on the session clock
+(clocks.py), so replays are limited in simulated time.
+"""
+
+import logging
+import os
+import threading
+
+from collections import Counter
+from decimal import Decimal
+
+from clocks import get_clock
+
+logger = logging.getLogger(__name__)
+
+INF = float("inf")
+
+
+class RiskRejected(Exception):
+    def __init__(self, agent, reason):
+        super().__init__(f"{agent}: {reason}")
+        self.agent = agent
+        self.reason = reason
+
+
+class RiskLimits:
+    """Order limits for one agent (or the whole process). None = unlimited."""
+    __slots__ = ("max_position", "max_notional", "max_order_size", "max_order_notional",
+                 "max_orders_per_sec", "burst", "max_drawdown")
+
+    def __init__(self, max_position=None, max_notional=None, max_order_size=None, max_order_notional=None,
+                 max_orders_per_sec=None, burst=None, max_drawdown=None):
+        # Stored as inf rather than None so a check is a plain comparison
+        self.max_position = INF if max_position is None else float(max_position)
+        self.max_notional = INF if max_notional is None else float(max_notional)
+        self.max_order_size = INF if max_order_size is None else float(max_order_size)
+        self.max_order_notional = INF if max_order_notional is None else float(max_order_notional)
+        self.max_orders_per_sec = INF if max_orders_per_sec is None else float(max_orders_per_sec)
+        self.burst = max(1.0, float(burst if burst is not None else min(self.max_orders_per_sec, 10.0)))
+        self.max_drawdown = INF if max_drawdown is None else float(max_drawdown)   # fraction of peak equity
+
+
+class MintLimits:
+    """Caps for one slot: per mint, and per `window` seconds."""
+    __slots__ = ("max_per_mint", "max_per_window", "window")
+
+    def __init__(self, max_per_mint=None, max_per_window=None, window=86400.0):
+        self.max_per_mint = INF if max_per_mint is None else float(max_per_mint)
+        self.max_per_window = INF if max_per_window is None else float(max_per_window)
+        self.window = float(window)
+
+
+class _Book:
+    """Running counters for one agent, or for the global book."""
+    __slots__ = ("limits", "positions", "exposure", "notional", "tokens", "refilled",
+                 "equity", "peak", "halted")
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.positions = {}   # symbol -> signed quantity
+        self.exposure = {}    # symbol -> |position| * price at its last update
+        self.notional = 0.0   # sum of exposure
+        self.tokens = limits.burst
+        self.refilled = None
+        self.equity = None
+        self.peak = None
+        self.halted = None    # reason, once a drawdown limit trips
+
+    def take_token(self, now):
+        rate = self.limits.max_orders_per_sec
+        if rate == INF:
+            return True
+        tokens = self.tokens + (now - (now if self.refilled is None else self.refilled)) * rate
+        self.refilled = now
+        if tokens > self.limits.burst:
+            tokens = self.limits.burst
+        if tokens < 1.0:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - 1.0
+        return True
+
+    def apply(self, symbol, signed, price):
+        position = self.positions.get(symbol, 0.0) + signed
+        if -1e-12 < position < 1e-12:
+            position = 0.0
+        exposure = abs(position) * price
+        self.notional += exposure - self.exposure.get(symbol, 0.0)
+        self.positions[symbol] = position
+        self.exposure[symbol] = exposure
+
+
+class _SlotWindow:
+    __slots__ = ("used", "resets_at")
+
+    def __init__(self):
+        self.used = 0.0
+        self.resets_at = 0.0
+
+
+class RiskEngine:
+    """Pre-trade checks against per-agent and global limits; every check is O(1)."""
+
+    def __init__(self, limits=None, global_limits=None, mint_limits=None, kill_file=None, kill_check_interval=1.0):
+        self.default_limits = limits or RiskLimits()
+        self.agent_limits = {}
+        self.mint_limits = dict(mint_limits or {})   # slot (or "*") -> MintLimits
+        self.kill_file = kill_file
+        self.kill_check_interval = kill_check_interval
+        self.killed = None
+        self.marks = {}
+        self.rejections = Counter()
+        self.accepted = 0
+        self._global = _Book(global_limits or RiskLimits())
+        self._books = {}
+        self._slots = {}
+        self._next_kill_check = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        def num(name):
+            value = environ.get(name)
+            return float(value) if value not in (None, "") else None
+        limits = RiskLimits(max_position=num("RISK_MAX_POSITION"), max_notional=num("RISK_MAX_NOTIONAL"),
+                            max_order_size=num("RISK_MAX_ORDER_SIZE"),
+                            max_order_notional=num("RISK_MAX_ORDER_NOTIONAL"),
+                            max_orders_per_sec=num("RISK_MAX_ORDERS_PER_SEC"),
+                            max_drawdown=num("RISK_MAX_DRAWDOWN"))
+        global_limits = RiskLimits(max_notional=num("RISK_GLOBAL_MAX_NOTIONAL"),
+                                   max_orders_per_sec=num("RISK_GLOBAL_MAX_ORDERS_PER_SEC"),
+                                   max_drawdown=num("RISK_GLOBAL_MAX_DRAWDOWN"))
+        mint = {"*": MintLimits(num("RISK_MINT_MAX"), num("RISK_MINT_MAX_PER_WINDOW"),
+                                num("RISK_MINT_WINDOW") or 86400.0)}
+        return cls(limits, global_limits, mint, kill_file=environ.get("RISK_KILL_FILE") or None)
+
+    def set_limits(self, agent, limits):
+        with self._lock:
+            self.agent_limits[agent] = limits
+            book = self._books.get(agent)
+            if book is not None:
+                book.limits = limits
+
+    def book(self, agent):
+        book = self._books.get(agent)
+        if book is None:
+            book = self._books[agent] = _Book(self.agent_limits.get(agent, self.default_limits))
+        return book
+
+    # -------- kill switch --------
+    def kill(self, reason="kill switch", propagate=True):
+        """Halt every agent now; with `propagate`, also create kill_file for other processes."""
+        self.killed = reason
+        logger.critical(f"Risk kill switch: {reason}")
+        if propagate and self.kill_file:
+            with open(self.kill_file, "w") as f:
+                f.write(reason)
+
+    def resume(self):
+        if self.kill_file and os.path.exists(self.kill_file):
+            os.remove(self.kill_file)
+        self.killed = None
+        with self._lock:
+            for book in list(self._books.values()) + [self._global]:
+                book.halted = None
+                book.peak = book.equity
+
+    def _check_kill_file(self, now):
+        self._next_kill_check = now + self.kill_check_interval
+        if self.kill_file and os.path.exists(self.kill_file):
+            if self.killed is None:
+                with open(self.kill_file) as f:
+                    self.killed = f.read().strip() or "kill file"
+                logger.critical(f"Risk kill switch ({self.kill_file}): {self.killed}")
+
+    # -------- orders --------
+    def check_order(self, agent, side, symbol, size, price=None):
+        """
+        None if the order may go out (it is then counted in positions/notional/rate),
+        otherwise the reason it was rejected.
+        """
+        now = get_clock().monotonic()
+        if now >= self._next_kill_check:
+            self._check_kill_file(now)
+        if self.killed is not None:
+            return self._reject(f"killed: {self.killed}")
+        size = float(size)
+        price = self.marks.get(symbol) if price is None else float(price)
+        signed = size if side in ("BUY", "buy") else -size
+        with self._lock:
+            book = self._books.get(agent)
+            if book is None:
+                book = self.book(agent)
+            g = self._global
+            limits = book.limits
+            if price is None:
+                # A market order with no mark: the notional limits cannot be checked, so they fail closed
+                if min(limits.max_notional, limits.max_order_notional, g.limits.max_notional) < INF:
+                    return self._reject("no price")
+                price = 0.0
+            position = book.positions.get(symbol, 0.0) + signed
+            reducing = abs(position) < abs(position - signed)
+            # A drawdown halt still lets an agent cut its positions; the kill switch does not
+            if not reducing and (book.halted is not None or g.halted is not None):
+                return self._reject(book.halted or g.halted)
+            if size > limits.max_order_size:
+                return self._reject("order size")
+            order_notional = size * price
+            if order_notional > limits.max_order_notional:
+                return self._reject("order notional")
+            if abs(position) > limits.max_position and not reducing:
+                return self._reject("position")
+            exposure = abs(position) * price
+            delta = exposure - book.exposure.get(symbol, 0.0)
+            # Reducing orders are always allowed through the notional limits
+            if delta > 0 and book.notional + delta > limits.max_notional:
+                return self._reject("notional")
+            g_delta = abs(g.positions.get(symbol, 0.0) + signed) * price - g.exposure.get(symbol, 0.0)
+            if g_delta > 0 and g.notional + g_delta > g.limits.max_notional:
+                return self._reject("global notional")
+            if not book.take_token(now):
+                return self._reject("order rate")
+            if not g.take_token(now):
+                return self._reject("global order rate")
+            book.apply(symbol, signed, price)
+            g.apply(symbol, signed, price)
+            self.accepted += 1
+        return None
+
+    def _reject(self, reason):
+        self.rejections[reason] += 1
+        return reason
+
+    def require_order(self, agent, side, symbol, size, price=None):
+        reason = self.check_order(agent, side, symbol, size, price)
+        if reason is not None:
+            raise RiskRejected(agent, reason)
+
+    def settle(self, agent, side, symbol, size, filled, price=None):
+        """Back out the unfilled part (`size - filled`) of an order accepted by check_order."""
+        unfilled = float(size) - float(filled)
+        if unfilled <= 1e-12:
+            return
+        price = self.marks.get(symbol, 0.0) if price is None else float(price)
+        signed = -unfilled if side in ("BUY", "buy") else unfilled
+        with self._lock:
+            self.book(agent).apply(symbol, signed, price)
+            self._global.apply(symbol, signed, price)
+
+    def update_price(self, symbol, price):
+        """Mark used for market orders (exposures are revalued as positions change)."""
+        self.marks[symbol] = float(price)
+
+    def update_equity(self, agent, equity):
+        """Track peak equity; halts the agent (or everyone) when a drawdown limit is hit."""
+        equity = float(equity)
+        with self._lock:
+            book = self.book(agent)
+            g = self._global
+            g.equity = (g.equity or 0.0) + equity - (book.equity or 0.0)
+            book.equity = equity
+            for b, label in ((book, agent), (g, "global")):
+                if b.peak is None or b.equity > b.peak:
+                    b.peak = b.equity
+                if b.halted is None and b.peak > 0 and (b.peak - b.equity) / b.peak > b.limits.max_drawdown:
+                    b.halted = f"{label} drawdown {(b.peak - b.equity) / b.peak:.1%}"
+                    logger.error(f"Risk halt: {b.halted}")
+
+    # -------- mints --------
+    def check_mint(self, agent, slot, amount):
+        """
+        The part of `amount` that may be minted now (0 when blocked), after
+        the kill switch, the per-mint cap and the slot's window budget.
+        The allowed amount is counted against the window.
+        """
+        now = get_clock().monotonic()
+        if now >= self._next_kill_check:
+            self._check_kill_file(now)
+        if self.killed is not None:
+            self._reject(f"killed: {self.killed}")
+            return amount * 0
+        limits = self.mint_limits.get(slot) or self.mint_limits.get("*")
+        if limits is None:
+            return amount
+        with self._lock:
+            window = self._slots.get(slot)
+            if window is None:
+                window = self._slots[slot] = _SlotWindow()
+            if now >= window.resets_at:
+                window.used = 0.0
+                window.resets_at = now + limits.window
+            cap = min(limits.max_per_mint, limits.max_per_window - window.used)
+            if cap <= 0:
+                self._reject(f"mint budget slot {slot}")
+                return amount * 0
+            if float(amount) > cap:
+                self._reject(f"mint cap slot {slot}")
+                amount = Decimal(repr(cap)) if isinstance(amount, Decimal) else type(amount)(cap)
+            window.used += float(amount)
+        return amount
+
+    # -------- reporting --------
+    def snapshot(self):
+        with self._lock:
+            return {
+                "killed": self.killed,
+                "accepted": self.accepted,
+                "rejections": dict(self.rejections),
+                "global": {"notional": self._global.notional, "equity": self._global.equity, "halted": self._global.halted},
+                "agents": {name: {"positions": {s: q for s, q in b.positions.items() if q}, "notional": b.notional,
+                                  "equity": b.equity, "peak": b.peak, "halted": b.halted}
+                           for name, b in self._books.items()},
+                "mint_used": {slot: w.used for slot, w in self._slots.items()},
+            }
+
+
+class GuardedClient:
+    """
+    Puts a RiskEngine in front of any OrderClient-shaped client (OrderClient,
+    PaperClient, the trade_api module). Rejected orders raise RiskRejected from
+    place_order and occupy their slot in place_orders' results, as failed orders do.
+    """
+
+    def __init__(self, client, engine, agent):
+        self.client = client
+        self.engine = engine
+        self.agent = agent
+
+    def place_order(self, side, product_id, size, price=None):
+        self.engine.require_order(self.agent, side, product_id, size, price)
+        try:
+            response = self.client.place_order(side, product_id, size, price)
+        except Exception:
+            self.engine.settle(self.agent, side, product_id, size, 0.0, price)
+            raise
+        self._settle(side, product_id, size, price, response)
+        return response
+
+    def place_orders(self, orders):
+        results, passed, slots = [], [], []
+        for order in orders:
+            if isinstance(order, dict):
+                order = (order["side"], order["product_id"], order["size"], order.get("price"))
+            side, product_id, size = order[:3]
+            price = order[3] if len(order) > 3 else None
+            reason = self.engine.check_order(self.agent, side, product_id, size, price)
+            if reason is None:
+                slots.append(len(results))
+                passed.append(order)
+                results.append(None)
+            else:
+                results.append(RiskRejected(self.agent, reason))
+        if passed:
+            for i, order, response in zip(slots, passed, self.client.place_orders(passed)):
+                side, product_id, size = order[:3]
+                self._settle(side, product_id, size, order[3] if len(order) > 3 else None, response)
+                results[i] = response
+        return results
+
+    def _settle(self, side, product_id, size, price, response):
+        # Paper responses report the filled size; a failed order filled nothing
+        if isinstance(response, Exception):
+            self.engine.settle(self.agent, side, product_id, size, 0.0, price)
+        elif isinstance(response, dict) and "filled_size" in response:
+            self.engine.settle(self.agent, side, product_id, size, response["filled_size"], price)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+# Process-wide engine, configured from RISK_* environment variables.
+risk = RiskEngine.from_env()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Concurrent Agent Scheduler
+-----------------------------
+
+Runs many agents on one asyncio event loop instead of calling
+`run_session` / `TradingAgent.start` / `main_loop` one after another.
+
+Each agent is registered as a tick callable with its own interval:
+- plain functions run on a shared thread pool (network/RPC bound work),
+- coroutine functions are awaited directly on the loop,
+- backend="process" sends the tick to a process pool for CPU-heavy
+  indicator work (the callable and its arguments must be picklable).
+
+Ticks are scheduled on a fixed grid (start + k * interval, plus jitter) so
+they do not drift. A tick that runs past its deadline is counted as an
+overrun and the slots it covered are skipped rather than fired in a burst.
+
+Intervals, jitter, deadlines, durations and latencies are in session-clock
+seconds (clocks.get_clock()), so under a ScaledClock(speed=10) a 5 s
+interval passes in 0.5 s of wall time. Simulated clocks only move when
+driven, so simulated sessions run on replay.ReplayEngine instead.
+"""
+
+import asyncio
+import inspect
+import logging
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from clocks import get_clock
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("thread", "process", "async")
+
+
+class ScheduledAgent:
+    """Bookkeeping for one registered agent."""
+
+    def __init__(self, name, tick, interval, jitter=0.0, deadline=None, backend=None, on_result=None):
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        if backend is None:
+            backend = "async" if inspect.iscoroutinefunction(tick) else "thread"
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+        self.name = name
+        self.tick = tick
+        self.interval = interval
+        self.jitter = jitter
+        self.deadline = deadline if deadline is not None else interval
+        self.backend = backend
+        self.on_result = on_result
+        # Stats
+        self.ticks = 0
+        self.errors = 0
+        self.missed = 0
+        self.overruns = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "errors": self.errors,
+            "missed": self.missed,
+            "overruns": self.overruns,
+            "last_latency": self.last_latency,
+            "max_latency": self.max_latency,
+        }
+
+
+class AgentScheduler:
+    """
+    Drive N agents concurrently on a single event loop.
+
+        scheduler = AgentScheduler()
+        scheduler.add("Agent_1", agent.evaluate_trade_signal, interval=5, jitter=0.5)
+        scheduler.start(duration=60)
+    """
+
+    def __init__(self, max_threads=None, process_workers=0, seed=None, clock=None):
+        self.agents = {}
+        self.clock = clock   # None: the session clock when run() starts
+        self.max_threads = max_threads
+        self.process_workers = process_workers
+        self.random = random.Random(seed)
+        self.thread_pool = None
+        self.process_pool = None
+        self._stopping = None
+
+    def add(self, name, tick, interval, jitter=0.0, deadline=None, backend=None, on_result=None):
+        if name in self.agents:
+            raise ValueError(f"Agent {name!r} is already scheduled")
+        agent = ScheduledAgent(name, tick, interval, jitter, deadline, backend, on_result)
+        self.agents[name] = agent
+        return agent
+
+    def remove(self, name):
+        self.agents.pop(name, None)
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def stats(self):
+        return {name: agent.stats() for name, agent in self.agents.items()}
+
+    # -------- running --------
+    def start(self, duration=None):
+        """Blocking entry point: run all agents for `duration` seconds (forever if None)."""
+        asyncio.run(self.run(duration))
+        return self.stats()
+
+    async def run(self, duration=None):
+        clock = self.clock or get_clock()
+        if getattr(clock, "simulated", False):
+            raise ValueError("AgentScheduler needs a real-time clock; replay simulated sessions with replay.ReplayEngine")
+        self._now = clock.monotonic
+        self._speed = getattr(clock, "speed", 1.0)
+        self._stopping = asyncio.Event()
+        self.thread_pool = ThreadPoolExecutor(max_workers=self.max_threads)
+        if self.process_workers or any(a.backend == "process" for a in self.agents.values()):
+            self.process_pool = ProcessPoolExecutor(max_workers=self.process_workers or None)
+        end = self._now() + duration if duration is not None else None
+        try:
+            tasks = [asyncio.create_task(self._drive(agent, end)) for agent in list(self.agents.values())]
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            self.thread_pool.shutdown(wait=False)
+            if self.process_pool is not None:
+                self.process_pool.shutdown(wait=False)
+            self.thread_pool = self.process_pool = None
+
+    async def run_cpu(self, fn, *args):
+        """Offload a CPU-heavy call (e.g. an indicator batch) to the process pool from inside an async tick."""
+        loop = asyncio.get_running_loop()
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=self.process_workers or None)
+        return await loop.run_in_executor(self.process_pool, fn, *args)
+
+    async def _call(self, agent):
+        loop = asyncio.get_running_loop()
+        if agent.backend == "async":
+            return await agent.tick()
+        pool = self.process_pool if agent.backend == "process" else self.thread_pool
+        return await loop.run_in_executor(pool, agent.tick)
+
+    async def _sleep_until(self, when, end):
+        if end is not None:
+            when = min(when, end)
+        # Clock seconds to wall seconds: a ScaledClock passes `speed` seconds per wall second
+        delay = (when - self._now()) / self._speed
+        if delay <= 0:
+            return self._stopping.is_set()
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        return self._stopping.is_set()
+
+    async def _drive(self, agent, end):
+        now = self._now
+        # Stagger first ticks so agents sharing an interval don't all fire together.
+        origin = now() + self.random.uniform(0, agent.jitter)
+        slot = 0
+        while not self._stopping.is_set():
+            scheduled = origin + slot * agent.interval
+            if agent.jitter:
+                scheduled += self.random.uniform(0, agent.jitter)
+            if await self._sleep_until(scheduled, end):
+                break
+            started = now()
+            if end is not None and started >= end:
+                break
+            # Woke up past this slot's deadline (loop was saturated): drop it.
+            if started - scheduled > agent.deadline:
+                agent.missed += 1
+                slot += 1
+                continue
+            try:
+                result = await self._call(agent)
+                if agent.on_result is not None:
+                    agent.on_result(agent.name, result)
+            except Exception as e:
+                agent.errors += 1
+                logger.error(f"[{agent.name} ERROR] {e}", exc_info=True)
+            elapsed = now() - started
+            agent.ticks += 1
+            agent.last_latency = elapsed
+            agent.max_latency = max(agent.max_latency, elapsed)
+            if elapsed > agent.deadline:
+                agent.overruns += 1
+            # Skip every slot the tick ran through instead of firing them back to back.
+            next_slot = int((now() - origin) // agent.interval) + 1
+            agent.missed += max(0, next_slot - slot - 1)
+            slot = max(slot + 1, next_slot)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+ERC-3525 Slot Monitor
+-----------------------------
+
+Reads `slotBalance` for any number of slots, plus the account nonce, gas
+price and block number, in a single JSON-RPC batch round trip instead of
+one `contract.functions.slotBalance(slot).call()` per slot.
+
+With use_multicall=True all slot reads are folded into one Multicall3
+`aggregate3` eth_call inside that batch (useful for providers that bill
+per call or cap batch sizes). Large slot lists are split into batches of
+`max_batch` requests (and aggregate3 calls of `max_multicall` slots).
+
+Calldata is encoded by hand (fixed selectors, uint256 args), so reading a
+tick's worth of slots does not go through web3's ABI machinery.
+"""
+
+import itertools
+import logging
+
+import requests
+
+from instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+# keccak256("slotBalance(uint256)")[:4]
+SLOT_BALANCE_SELECTOR = "f26d143b"
+# keccak256("aggregate3((address,bool,bytes)[])")[:4]
+AGGREGATE3_SELECTOR = "82ad56cb"
+# Multicall3 is deployed at the same address on mainnet, Base and most EVM chains.
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+
+class RPCError(Exception):
+    """JSON-RPC transport failure or error response."""
+
+
+def _word(value):
+    return format(value, "064x")
+
+
+def encode_slot_balance(slot):
+    return "0x" + SLOT_BALANCE_SELECTOR + _word(int(slot))
+
+
+def encode_aggregate3(target, calldatas, allow_failure=True):
+    """ABI-encode aggregate3(Call3[]) for calls to one `target`."""
+    target_word = _word(int(target, 16))
+    failure_word = _word(1 if allow_failure else 0)
+    encoded_calls = []
+    for data in calldatas:
+        raw = data[2:] if data.startswith("0x") else data
+        size = len(raw) // 2
+        padded = raw + "0" * ((-len(raw)) % 64)
+        # (address, bool, offset-to-bytes=0x60) then the bytes (length + padded data)
+        encoded_calls.append(target_word + failure_word + _word(0x60) + _word(size) + padded)
+    offsets, position = [], 32 * len(encoded_calls)
+    for call in encoded_calls:
+        offsets.append(_word(position))
+        position += len(call) // 2
+    return ("0x" + AGGREGATE3_SELECTOR + _word(0x20) + _word(len(encoded_calls))
+            + "".join(offsets) + "".join(encoded_calls))
+
+
+def decode_aggregate3(result):
+    """Decode aggregate3's (bool success, bytes returnData)[] into a list of (success, hex data)."""
+    raw = bytes.fromhex(result[2:] if result.startswith("0x") else result)
+
+    def word(offset):
+        return int.from_bytes(raw[offset:offset + 32], "big")
+
+    array = word(0)
+    count = word(array)
+    base = array + 32
+    out = []
+    for i in range(count):
+        start = base + word(base + 32 * i)
+        success = bool(word(start))
+        data_at = start + word(start + 32)
+        size = word(data_at)
+        out.append((success, "0x" + raw[data_at + 32:data_at + 32 + size].hex()))
+    return out
+
+
+def decode_uint(result):
+    if not result or result == "0x":
+        raise ValueError("empty return data")
+    return int(result, 16)
+
+
+class SlotSnapshot:
+    """Result of one monitor read."""
+    __slots__ = ("balances", "errors", "nonce", "gas_price", "block_number")
+
+    def __init__(self):
+        self.balances = {}
+        self.errors = {}
+        self.nonce = None
+        self.gas_price = None
+        self.block_number = None
+
+    def balance(self, slot, default=0):
+        return self.balances.get(slot, default)
+
+    def __repr__(self):
+        return (f"SlotSnapshot(block={self.block_number}, nonce={self.nonce}, gas_price={self.gas_price}, "
+                f"slots={len(self.balances)}, errors={len(self.errors)})")
+
+
+class SlotMonitor:
+    """
+    Batched reader for many ERC-3525 slots.
+
+        monitor = SlotMonitor(rpc_url, erc3525_address, account.address, slots=[1, 2, 3])
+        snapshot = monitor.read()
+        snapshot.balance(1), snapshot.nonce, snapshot.gas_price
+    """
+
+    def __init__(self, rpc_url, contract_address, account_address=None, slots=(), use_multicall=False,
+                 multicall_address=MULTICALL3_ADDRESS, max_batch=500, max_multicall=500, timeout=10, session=None):
+        self.rpc_url = rpc_url
+        self.contract_address = contract_address
+        self.account_address = account_address
+        self.slots = list(dict.fromkeys(int(s) for s in slots))
+        self.use_multicall = use_multicall
+        self.multicall_address = multicall_address
+        self.max_batch = max_batch
+        self.max_multicall = max_multicall
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self._ids = itertools.count(1)
+        self.round_trips = 0
+
+    def add_slots(self, slots):
+        for slot in slots:
+            if int(slot) not in self.slots:
+                self.slots.append(int(slot))
+
+    def remove_slots(self, slots):
+        drop = set(int(s) for s in slots)
+        self.slots = [s for s in self.slots if s not in drop]
+
+    # -------- JSON-RPC --------
+    def _request(self, method, params):
+        return {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+
+    def batch(self, calls):
+        """Send [(method, params), ...] as one JSON-RPC batch; returns results (or RPCError) in order."""
+        requests_ = [self._request(method, params) for method, params in calls]
+        with span("rpc_batch"):
+            resp = self.session.post(self.rpc_url, json=requests_, timeout=self.timeout)
+        self.round_trips += 1
+        resp.raise_for_status()
+        replies = resp.json()
+        if not isinstance(replies, list):
+            raise RPCError(f"Node rejected batch request: {replies}")
+        by_id = {reply.get("id"): reply for reply in replies}
+        out = []
+        for request in requests_:
+            reply = by_id.get(request["id"])
+            if reply is None:
+                out.append(RPCError(f"No reply for {request['method']}"))
+            elif "error" in reply:
+                out.append(RPCError(f"{request['method']}: {reply['error']}"))
+            else:
+                out.append(reply.get("result"))
+        return out
+
+    def _slot_calls(self, slots, block="latest"):
+        """[(method, params, slots_covered), ...] for the slot reads."""
+        if self.use_multicall:
+            calls = []
+            for i in range(0, len(slots), self.max_multicall):
+                chunk = slots[i:i + self.max_multicall]
+                data = encode_aggregate3(self.contract_address, [encode_slot_balance(s) for s in chunk])
+                calls.append(("eth_call", [{"to": self.multicall_address, "data": data}, block], chunk))
+            return calls
+        return [("eth_call", [{"to": self.contract_address, "data": encode_slot_balance(s)}, block], [s])
+                for s in slots]
+
+    def read(self, slots=None, block="latest"):
+        """
+        Read balances for `slots` (default: all monitored) plus nonce/gas price/block.
+        `block` (a tag or hex block number) pins the balance reads to that block.
+        """
+        slots = self.slots if slots is None else [int(s) for s in slots]
+        snapshot = SlotSnapshot()
+        header = [("eth_blockNumber", []), ("eth_gasPrice", [])]
+        if self.account_address:
+            header.append(("eth_getTransactionCount", [self.account_address, "pending"]))
+        slot_calls = self._slot_calls(slots, block)
+        calls = header + [(method, params) for method, params, _ in slot_calls]
+        results = []
+        for i in range(0, len(calls), self.max_batch):
+            results += self.batch(calls[i:i + self.max_batch])
+        for (method, _), value in zip(header, results):
+            if isinstance(value, Exception):
+                logger.error(f"Error reading {method}: {value}")
+            elif method == "eth_blockNumber":
+                snapshot.block_number = int(value, 16)
+            elif method == "eth_gasPrice":
+                snapshot.gas_price = int(value, 16)
+            else:
+                snapshot.nonce = int(value, 16)
+        for (_, _, covered), value in zip(slot_calls, results[len(header):]):
+            if self.use_multicall:
+                self._collect_multicall(snapshot, covered, value)
+            else:
+                self._collect(snapshot, covered[0], value)
+        return snapshot
+
+    def _collect(self, snapshot, slot, value):
+        try:
+            if isinstance(value, Exception):
+                raise value
+            snapshot.balances[slot] = decode_uint(value)
+        except Exception as e:
+            snapshot.errors[slot] = e
+            logger.error(f"Error reading slot balance for slot {slot}: {e}")
+
+    def _collect_multicall(self, snapshot, slots, value):
+        if isinstance(value, Exception):
+            for slot in slots:
+                self._collect(snapshot, slot, value)
+            return
+        for slot, (success, data) in zip(slots, decode_aggregate3(value)):
+            self._collect(snapshot, slot, data if success else RPCError("slotBalance reverted"))
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""
+ERC-3525 Slot Watcher
+-----------------------------
+
+Event-driven alternative to polling `slotBalance` every 10 seconds.
+
+The watcher seeds an in-memory slot-balance index with one batched
+SlotMonitor read, then follows new blocks with `eth_getLogs` filtered by
+the contract address and the ERC-3525 events:
+
+    TransferValue(uint256 indexed _fromTokenId, uint256 indexed _toTokenId, uint256 _value)
+    SlotChanged(uint256 indexed _tokenId, uint256 indexed _oldSlot, uint256 indexed _newSlot)
+
+Each TransferValue moves `_value` from the sending token's slot to the
+receiving token's slot (token 0 = mint/burn). Token slots are learned from
+SlotChanged and otherwise resolved once with a batched `slotOf` call at the
+block of the token's first transfer. A token moving between slots triggers
+a re-read of the two slots, pinned to the last block applied.
+
+A block range is folded into copies of the index and committed, with
+`last_block`, only once every read for it has succeeded; a failed read
+leaves the index at the previous range, and the next poll refetches it.
+
+A token whose slot cannot be resolved is marked dirty: its transfers are
+not applied, and every poll retries the lookup and re-reads the token's
+slot once it is known, so the index converges back to chain state.
+
+`on_cross(slot, balance, threshold, below)` is called only when a watched
+slot's balance crosses its threshold, so an idle chain costs one
+`eth_blockNumber` per poll.
+"""
+
+import logging
+
+from clocks import get_clock
+from slot_monitor import SlotMonitor, decode_uint
+
+logger = logging.getLogger(__name__)
+
+# keccak256 of the ERC-3525 event signatures
+TRANSFER_VALUE_TOPIC = "0x0b2aac84f3ec956911fd78eae5311062972ff949f38412e8da39069d9f068cc6"
+SLOT_CHANGED_TOPIC = "0xe4f48c240d3b994948aa54f3e2f5fca59263dfe1d52b6e4cf39a5d249b5ccb65"
+# keccak256("slotOf(uint256)")[:4]
+SLOT_OF_SELECTOR = "263f3e7e"
+
+
+class SlotWatcher:
+    """
+    Incremental slot-balance index driven by contract logs.
+
+        watcher = SlotWatcher(monitor, thresholds, on_cross=handle)
+        watcher.run(poll_interval=2)          # or call watcher.poll() from your own loop
+    """
+
+    def __init__(self, monitor: SlotMonitor, thresholds, on_cross=None, confirmations=0, max_block_range=2000):
+        self.monitor = monitor
+        self.thresholds = dict(thresholds)
+        self.on_cross = on_cross
+        self.confirmations = confirmations
+        self.max_block_range = max_block_range
+        self.balances = {}
+        self.below = {}
+        self.token_slots = {}
+        self.dirty = set()   # tokens whose slot is unknown, so their transfers were not applied
+        self.last_block = None
+        self.events = 0
+
+    # -------- setup --------
+    def seed(self):
+        """Load current balances for the watched slots and fire on_cross for any already below threshold."""
+        snapshot = self.monitor.read(self.thresholds.keys())
+        self.last_block = snapshot.block_number
+        for slot in self.thresholds:
+            self._set(slot, snapshot.balance(slot), initial=True)
+        return snapshot
+
+    def watch(self, slot, threshold):
+        self.thresholds[int(slot)] = threshold
+        self._resync([int(slot)])
+
+    # -------- index updates --------
+    def _set(self, slot, balance, initial=False):
+        self.balances[slot] = balance
+        threshold = self.thresholds.get(slot)
+        if threshold is None:
+            return
+        below = balance < threshold
+        if self.below.get(slot) != below and (below or not initial):
+            self.below[slot] = below
+            if self.on_cross is not None:
+                try:
+                    self.on_cross(slot, balance, threshold, below)
+                except Exception as e:
+                    logger.error(f"Error in slot {slot} crossing handler: {e}", exc_info=True)
+        else:
+            self.below[slot] = below
+
+    def _apply(self, slot, delta):
+        if slot in self.thresholds:
+            self._set(slot, self.balances.get(slot, 0) + delta)
+
+    def _read(self, slots, block="latest"):
+        snapshot = self.monitor.read(slots, block)
+        return {slot: snapshot.balances[slot] for slot in slots if slot in snapshot.balances}
+
+    def _resync(self, slots, block="latest"):
+        for slot, balance in self._read(slots, block).items():
+            self._set(slot, balance)
+
+    def _resolve_slots(self, tokens, token_slots):
+        """
+        `slotOf` for {token_id: block} in one batch, each read at its block,
+        recorded in `token_slots`. Returns the tokens that could not be resolved.
+        """
+        if not tokens:
+            return set()
+        to = self.monitor.contract_address
+        items = sorted(tokens.items())
+        calls = [("eth_call", [{"to": to, "data": "0x" + SLOT_OF_SELECTOR + format(t, "064x")}, block])
+                 for t, block in items]
+        try:
+            results = self.monitor.batch(calls)
+        except Exception as e:
+            results = [e] * len(items)
+        failed = set()
+        for (token_id, _), result in zip(items, results):
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                token_slots[token_id] = decode_uint(result)
+            except Exception as e:
+                failed.add(token_id)
+                logger.error(f"Error resolving slot of token {token_id}: {e}")
+        return failed
+
+    def _unknown_tokens(self, logs, token_slots):
+        """
+        {token_id: block} for tokens whose slot is unknown and whose first event
+        in `logs` is a transfer. A token that changes slot later in the range
+        is credited to that change's old slot without a lookup.
+        """
+        unknown, seen = {}, set()
+        for log in logs:
+            topics = log["topics"]
+            if topics[0] == SLOT_CHANGED_TOPIC:
+                token_id, old_slot = int(topics[1], 16), int(topics[2], 16)
+                if token_id in unknown and old_slot:
+                    token_slots[token_id] = old_slot
+                    del unknown[token_id]
+                seen.add(token_id)
+            elif topics[0] == TRANSFER_VALUE_TOPIC:
+                for token_id in (int(topics[1], 16), int(topics[2], 16)):
+                    if token_id and token_id not in seen and token_id not in token_slots:
+                        unknown[token_id] = log["blockNumber"]
+                    seen.add(token_id)
+        return unknown
+
+    def _repair(self, dirty, token_slots, block):
+        """
+        Retry dirty tokens at `block`. Returns the tokens still dirty and the
+        balances of their slots read there, which include the transfers skipped.
+        """
+        tokens = sorted(dirty)
+        dirty = self._resolve_slots({token_id: block for token_id in tokens}, token_slots)
+        slots = sorted({token_slots[t] for t in tokens if t not in dirty} & self.thresholds.keys())
+        reads = self._read(slots, block) if slots else {}
+        if dirty:
+            logger.warning(f"Slot index is missing transfers for tokens {sorted(dirty)}; retrying next poll")
+        return dirty, reads
+
+    def apply_logs(self, logs, block="latest"):
+        """
+        Fold a block range's logs (in chain order) into the index. `block` is
+        the range's last block; re-reads of moved or repaired slots are pinned to it.
+        Nothing is applied if any read raises, so the range can be retried whole.
+        """
+        token_slots, dirty = dict(self.token_slots), set(self.dirty)
+        dirty |= self._resolve_slots(self._unknown_tokens(logs, token_slots), token_slots)
+        deltas, moved = {}, set()
+        for log in logs:
+            topics = log["topics"]
+            if topics[0] == SLOT_CHANGED_TOPIC:
+                token_id, old_slot, new_slot = (int(t, 16) for t in topics[1:4])
+                token_slots[token_id] = new_slot
+                dirty.discard(token_id)
+                if old_slot:
+                    # The token's value moved with it; re-read both slots after this range.
+                    moved.update((old_slot, new_slot))
+            elif topics[0] == TRANSFER_VALUE_TOPIC:
+                from_id, to_id = int(topics[1], 16), int(topics[2], 16)
+                value = int(log["data"], 16) if log["data"] not in ("0x", "") else 0
+                if from_id and from_id in token_slots:
+                    slot = token_slots[from_id]
+                    deltas[slot] = deltas.get(slot, 0) - value
+                if to_id and to_id in token_slots:
+                    slot = token_slots[to_id]
+                    deltas[slot] = deltas.get(slot, 0) + value
+        watched = sorted(s for s in moved if s in self.thresholds)
+        reads = self._read(watched, block) if watched else {}
+        if dirty:
+            dirty, repaired = self._repair(dirty, token_slots, block)
+            reads.update(repaired)
+
+        # Every read succeeded: commit. A slot read at `block` already includes the range's deltas.
+        self.token_slots, self.dirty = token_slots, dirty
+        self.events += len(logs)
+        for slot, delta in deltas.items():
+            if slot not in reads:
+                self._apply(slot, delta)
+        for slot, balance in reads.items():
+            self._set(slot, balance)
+
+    # -------- block following --------
+    def poll(self):
+        """Process any new blocks. Returns the number of logs applied."""
+        if self.last_block is None:
+            self.seed()
+            return 0
+        (head,) = self.monitor.batch([("eth_blockNumber", [])])
+        if isinstance(head, Exception):
+            raise head
+        target = int(head, 16) - self.confirmations
+        applied = 0
+        while self.last_block < target:
+            start = self.last_block + 1
+            end = min(target, start + self.max_block_range - 1)
+            (logs,) = self.monitor.batch([("eth_getLogs", [{
+                "address": self.monitor.contract_address,
+                "fromBlock": hex(start),
+                "toBlock": hex(end),
+                "topics": [[TRANSFER_VALUE_TOPIC, SLOT_CHANGED_TOPIC]],
+            }])])
+            if isinstance(logs, Exception):
+                raise logs
+            logs.sort(key=lambda log: (int(log["blockNumber"], 16), int(log["logIndex"], 16)))
+            self.apply_logs(logs, hex(end))
+            applied += len(logs)
+            self.last_block = end
+        return applied
+
+    def run(self, poll_interval=2.0, stop=None, clock=None):
+        """Follow the chain until `stop()` returns True (forever by default)."""
+        clock = clock or get_clock()
+        while stop is None or not stop():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error following slot events: {e}", exc_info=True)
+            clock.sleep(poll_interval)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""
+Default Strategy Definitions
+-----------------------------
+
+The four default setups shared by the live agents (AAA.py) and the
+backtester. Kept in a plain data module so it can be imported without
+configuring CDP/Web3.
+"""
+
+# You can define multiple default setups here.
+# For instance, four default strategies can be stored in a dictionary.
+default_strategies = {
+    "trend": {
+        "description": "SMA 50 & 200, RSI",
+        "params": {"ma_short": 50, "ma_long": 200, "rsi_period": 14}
+    },
+    "volatility": {
+        "description": "Bollinger Bands & MACD",
+        "params": {"bbands_length": 20, "macd_fast": 8, "macd_slow": 21}
+    },
+    "momentum": {
+        "description": "EMA crossovers, Volume SMA",
+        "params": {"ema_short": 20, "ema_long": 50, "volume_sma": 20}
+    },
+    "hybrid": {
+        "description": "Combination of trend and momentum",
+        "params": {"sma_short": 50, "sma_long": 200, "ema": 20, "rsi": 14}
+    }
+}
+# These strategies can be dynamically selected and parameters updated via CONFIG/ENV.
+
+
+def lookback(strategies=None):
+    """Bars the longest indicator window of `strategies` (default: the four setups above) spans."""
+    return max(int(v) for spec in (strategies or default_strategies).values() for v in spec["params"].values())
+
+# TradingAgent.update_strategy: while the sample std of the last `window` prices is above
+# `threshold`, the RSI thresholds sit `widen` points further apart than the agent's own
+# (tuned) values. The backtester's "agent" rule applies the same adjustment, so the
+# optimizer tunes the strategy that actually runs.
+VOLATILITY_RULE = {"window": 100, "threshold": 5.0, "widen": 5}
+
+
+def rsi_thresholds(overbought, oversold, volatile):
+    """(overbought, oversold) after the volatility rule; works on scalars and NumPy arrays."""
+    widen = VOLATILITY_RULE["widen"] * volatile
+    return overbought + widen, oversold - widen
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+"""
+Strategy Registry
+-----------------------------
+
+One place to declare, select and hot-swap strategies for every agent.
+
+A strategy declares its inputs and default parameters and provides a
+kernel `kernel(*inputs, **params)`. `compile(name, **params)` binds the
+parameters once and returns a CompiledStrategy whose call is just
+`fn(*inputs)`. Kernels are written with NumPy operators, so the same
+compiled callable takes scalars (one agent) or arrays (many agents / many
+bars); with `jit=True` the kernel is compiled with Numba when it is
+installed.
+
+Agents hold a StrategyHandle instead of a strategy name. The handle's
+compiled callable is resolved once, so a tick is one attribute lookup and
+a call; `swap()` (or `refresh()` against a JSON file) replaces it while
+the loop keeps running.
+
+    from strategy_registry import strategies
+
+    handle = strategies.handle("sma_rsi", rsi_overbought=75)
+    signal = handle(price, sma, rsi)                 # +1 buy, -1 sell, 0 hold
+    handle.swap("sma_rsi", rsi_overbought=70)        # hot swap
+
+Built in:
+    sma_rsi       TradingAgent.decide (AAA.py): price vs SMA, RSI filter
+    trend, volatility, momentum, hybrid
+                  the default_strategies rules from backtest.py, on close/volume history
+    slot_topup    ERC-3525 mint amount to bring a slot back to its threshold (agent2.py)
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # optional: kernels run as plain NumPy
+    numba = None
+
+# String aliases resolved once at handle/compile time, never per tick.
+ALIASES = {"default": "sma_rsi"}
+HISTORY_INPUTS = ("close", "volume")
+SIGNAL_NAMES = {1: "buy", -1: "sell", 0: "hold"}
+
+
+class Strategy:
+    """Declaration: name, ordered input names, default params and the kernel."""
+
+    def __init__(self, name, inputs, params, kernel, description="", jit=False):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.params = dict(params)
+        self.kernel = kernel
+        self.description = description
+        self.jit = jit
+
+
+class CompiledStrategy:
+    """A strategy with its parameters bound; call it with the declared inputs in order."""
+    __slots__ = ("name", "inputs", "params", "fn", "id")
+
+    def __init__(self, name, inputs, params, fn, strategy_id):
+        self.name = name
+        self.inputs = inputs
+        self.params = params
+        self.fn = fn
+        self.id = strategy_id
+
+    def __call__(self, *inputs):
+        return self.fn(*inputs)
+
+    def __repr__(self):
+        return f"CompiledStrategy({self.name!r}, {self.params})"
+
+
+def _bind(kernel, params, jit):
+    if jit and numba is not None:
+        kernel = numba.njit(cache=True)(kernel)
+    values = tuple(params.values())
+    n = len(values)
+    # Specialise the common arities so the per-call cost is a single extra frame
+    if n == 0:
+        return kernel
+    if n == 1:
+        (a,) = values
+        return lambda *inputs: kernel(*inputs, a)
+    if n == 2:
+        a, b = values
+        return lambda *inputs: kernel(*inputs, a, b)
+    if n == 3:
+        a, b, c = values
+        return lambda *inputs: kernel(*inputs, a, b, c)
+    return lambda *inputs: kernel(*inputs, *values)
+
+
+class StrategyRegistry:
+    def __init__(self):
+        self.specs = {}
+        self.table = []       # id -> CompiledStrategy, for precomputed integer dispatch
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, inputs, params=None, description="", jit=False):
+        """Decorator: register `kernel(*inputs, *params-in-declared-order)` under `name`."""
+        def wrap(kernel):
+            with self._lock:
+                self.specs[name] = Strategy(name, inputs, params or {}, kernel, description, jit)
+                # Anything compiled from an older version of this strategy is stale
+                self._compiled = {k: v for k, v in self._compiled.items() if k[0] != name}
+            return kernel
+        return wrap
+
+    def resolve(self, name):
+        name = ALIASES.get(name, name)
+        if name not in self.specs:
+            raise KeyError(f"Unknown strategy {name!r}; registered: {sorted(self.specs)}")
+        return self.specs[name]
+
+    def names(self):
+        return sorted(self.specs)
+
+    def defaults(self, name):
+        return dict(self.resolve(name).params)
+
+    def compile(self, name, **params):
+        """Bind `params` (over the declared defaults) once; identical requests share the result."""
+        spec = self.resolve(name)
+        unknown = set(params) - set(spec.params)
+        if unknown:
+            raise TypeError(f"{spec.name}: unknown params {sorted(unknown)}")
+        bound = dict(spec.params, **params)
+        key = (spec.name, json.dumps(bound, sort_keys=True, default=str))
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(key)
+                if compiled is None:
+                    compiled = CompiledStrategy(spec.name, spec.inputs, bound, _bind(spec.kernel, bound, spec.jit), len(self.table))
+                    self.table.append(compiled)
+                    self._compiled[key] = compiled
+        return compiled
+
+    def handle(self, name, source=None, **params):
+        return StrategyHandle(self, self.compile(name, **params), source)
+
+    def params_for(self, spec):
+        """
+        Params from a STRATEGY_MODE-style value: a registered name / alias
+        (its defaults) or a JSON object of params.
+        """
+        spec = (spec or "default").strip()
+        if spec.startswith("{"):
+            return json.loads(spec)
+        return self.defaults(spec)
+
+
+class StrategyHandle:
+    """
+    The strategy an agent runs, swappable at runtime. `source` is an optional
+    JSON file {"strategy": name, "params": {...}} picked up by refresh().
+    """
+    __slots__ = ("registry", "compiled", "fn", "_watch")
+
+    def __init__(self, registry, compiled, source=None, check_interval=1.0):
+        self.registry = registry
+        self.compiled = compiled
+        self.fn = compiled.fn
+        self._watch = JsonFileWatch(source, check_interval) if source else None
+
+    def __call__(self, *inputs):
+        return self.fn(*inputs)
+
+    @property
+    def name(self):
+        return self.compiled.name
+
+    @property
+    def params(self):
+        return self.compiled.params
+
+    def swap(self, name=None, **params):
+        """
+        Switch strategy and/or params; takes effect on the next call. Without a
+        new name, `params` are applied on top of the current ones.
+        """
+        if name is None or self.registry.resolve(name).name == self.compiled.name:
+            name, params = self.compiled.name, dict(self.compiled.params, **params)
+        compiled = self.registry.compile(name, **params)
+        if compiled is not self.compiled:
+            self.compiled, self.fn = compiled, compiled.fn
+        return compiled
+
+    def refresh(self):
+        """Reload from `source` if it changed (checked at most every check_interval seconds)."""
+        if self._watch is None:
+            return False
+        spec = self._watch.changed()
+        if spec is None:
+            return False
+        self.swap(spec.get("strategy"), **spec.get("params", {}))
+        return True
+
+
+class JsonFileWatch:
+    """Returns a JSON file's contents from changed() when its mtime moves (rate-limited)."""
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._mtime = None
+        self._checked = 0.0
+
+    def changed(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return None
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        if mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        with open(self.path) as f:
+            return json.load(f)
+
+
+# ================================
+# BUILT-IN STRATEGIES
+# ================================
+strategies = StrategyRegistry()
+
+
+@strategies.register("sma_rsi", inputs=("price", "sma", "rsi"),
+                     params={"rsi_overbought": 70, "rsi_oversold": 30},
+                     description="Price vs SMA with RSI filter (TradingAgent.decide)", jit=True)
+def _sma_rsi(price, sma, rsi, rsi_overbought, rsi_oversold):
+    # Works on scalars and arrays alike: bool * 1 - bool * 1 -> +1 / -1 / 0
+    return 1 * ((price > sma) & (rsi < rsi_overbought)) - 1 * ((price < sma) & (rsi > rsi_oversold))
+
+
+@strategies.register("slot_topup", inputs=("balance",), params={"threshold": 50},
+                     description="Mint amount that restores an ERC-3525 slot to its threshold")
+def _slot_topup(balance, threshold):
+    return (threshold - balance) * (balance < threshold)
+
+
+def _register_history_rules():
+    from backtest import DEFAULT_EXTRA_PARAMS, SIGNAL_RULES, _as_ohlcv, _IndicatorCache
+    from strategies import default_strategies
+
+    def history_kernel(rule, names):
+        def kernel(close, volume, *values):
+            # volume=None (or all zero): not recorded, so rules drop their volume filters
+            data = _as_ohlcv({"close": close} if volume is None else {"close": close, "volume": volume})
+            if "volume" in data and len(data["volume"]) != len(data["close"]):
+                raise ValueError(f"{len(data['volume'])} volumes for {len(data['close'])} closes")
+            p = {k: np.array([v]) for k, v in zip(names, values)}
+            return int(rule(data, p, _IndicatorCache(data))[0, -1])
+        return kernel
+
+    for name, spec in default_strategies.items():
+        params = dict(DEFAULT_EXTRA_PARAMS, **spec["params"])
+        strategies.register(name, inputs=HISTORY_INPUTS, params=params,
+                            description=spec["description"])(history_kernel(SIGNAL_RULES[name], list(params)))
+
+
+_register_history_rules()
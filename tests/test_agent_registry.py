@@ -0,0 +1,51 @@
+"""AgentRegistry: buy sizing as in AAA.buy_target, and strategy params validation."""
+
+import numpy as np
+import pytest
+
+from agent_registry import BUY, AgentRegistry
+
+RISING = {"BTC-USD": 100 + np.arange(100.0)}   # last 199 > SMA; RSI 100, so let every agent buy
+PARAMS = {"rsi_overbought": 101}
+
+
+def test_buy_takes_a_fraction_of_equity():
+    registry = AgentRegistry(trade_fraction=0.1, fee_bps=10, slippage_bps=5)
+    agent = registry.add("A", capital=1000.0, params=PARAMS)
+    assert registry.step(RISING)[0] == BUY
+    assert agent.position == pytest.approx(0.1 * 1000.0 / 199.0)
+    fill = 199.0 * (1 + 5e-4)
+    assert registry.column("cash")[0] == pytest.approx(1000.0 - agent.position * fill * (1 + 1e-3))
+    # An open position is kept as it is
+    position = agent.position
+    registry.step(RISING)
+    assert agent.position == position and registry.column("trades")[0] == 1
+
+
+def test_buy_is_capped_by_cash_after_fees():
+    registry = AgentRegistry(trade_size=50.0, fee_bps=10, slippage_bps=5)
+    registry.add_many(3, capital=np.array([1000.0, 20_000.0, 0.0]), params=PARAMS)
+    registry.step(RISING)
+    cost = 199.0 * (1 + 5e-4) * (1 + 1e-3)   # the fee is charged on the slipped fill
+    np.testing.assert_allclose(registry.column("position"), [1000.0 / cost, 50.0, 0.0])
+    assert registry.column("cash")[0] == pytest.approx(0.0, abs=1e-9)
+    assert registry.column("cash")[1] == pytest.approx(20_000.0 - 50.0 * cost)
+    assert registry.column("trades").tolist() == [1, 1, 0]
+
+
+def test_equity_sizing_scales_with_capital():
+    registry = AgentRegistry()
+    registry.add_many(2, capital=np.array([1000.0, 5000.0]), params=PARAMS)
+    registry.step(RISING)
+    position = registry.column("position")
+    assert position[1] == pytest.approx(5 * position[0])
+
+
+def test_params_must_name_strategy_columns():
+    registry = AgentRegistry()
+    with pytest.raises(ValueError, match="ma_perod"):
+        registry.add("A", params={"ma_perod": 5})
+    with pytest.raises(ValueError, match="cash"):
+        registry.add_many(2, params={"cash": 1e9})
+    assert len(registry) == 0 and not registry.names
+    assert registry.add("A", params={"ma_period": 5}).strategy_params["ma_period"] == 5
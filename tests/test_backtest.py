@@ -0,0 +1,85 @@
+"""Vectorized backtest indicators match TA-Lib row for row; result params are the rule's, with their types."""
+
+import numpy as np
+import pytest
+
+from backtest import RULE_PARAMS, SIGNAL_RULES, backtest, ema, macd, replay, rolling_mean, rolling_std, rsi
+
+talib = pytest.importorskip("talib")
+
+TOL = 1e-9
+
+
+@pytest.fixture(scope="module")
+def close():
+    rng = np.random.default_rng(11)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, 3000)))
+
+
+def assert_parity(actual, expected):
+    actual, expected = np.asarray(actual, dtype=float), np.asarray(expected, dtype=float)
+    assert np.array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOL, equal_nan=True)
+
+
+PERIODS = [2, 5, 14, 20, 50, 200, 400]   # 400 spans several EMA blocks before its seed
+
+
+def test_rolling_mean_matches_sma(close):
+    rows = rolling_mean(close, PERIODS)
+    assert rows.shape == (len(PERIODS), len(close))
+    for row, period in zip(rows, PERIODS):
+        assert_parity(row, talib.SMA(close, timeperiod=period))
+
+
+def test_rolling_std_matches_stddev(close):
+    for row, period in zip(rolling_std(close, PERIODS), PERIODS):
+        assert_parity(row, talib.STDDEV(close, timeperiod=period, nbdev=1))
+
+
+def test_ema_matches_talib(close):
+    for row, period in zip(ema(close, PERIODS), PERIODS):
+        assert_parity(row, talib.EMA(close, timeperiod=period))
+
+
+def test_rsi_matches_talib(close):
+    for row, period in zip(rsi(close, PERIODS), PERIODS):
+        assert_parity(row, talib.RSI(close, timeperiod=period))
+
+
+@pytest.mark.parametrize("signal", [5, 9])
+def test_macd_matches_talib(close, signal):
+    fasts, slows = [8, 12, 26], [21, 26, 12]   # the last pair is given slow-first
+    line, sig, hist = macd(close, fasts, slows, signal)
+    for r, (fast, slow) in enumerate(zip(fasts, slows)):
+        expected = talib.MACD(close, fastperiod=min(fast, slow), slowperiod=max(fast, slow), signalperiod=signal)
+        for actual, want in zip((line[r], sig[r], hist[r]), expected):
+            assert_parity(actual, want)
+
+
+def test_short_series():
+    for n in (0, 1, 3):
+        x = np.arange(1.0, n + 1)
+        assert rolling_mean(x, [5]).shape == ema(x, [5]).shape == rsi(x, [5]).shape == (1, n)
+        assert np.isnan(rsi(x, [5])).all() and np.isnan(ema(x, [5])).all()
+
+
+def test_params_are_the_rules_own_with_integer_periods(close):
+    result = backtest({"close": close}, grids={"trend": {"ma_short": [20, 50], "rsi_oversold": [25.5]},
+                                               "momentum": {"ema_short": [10, 20]}})
+    assert set(result["strategy"]) == set(SIGNAL_RULES) - {"agent"}
+    for i in range(len(result)):
+        strategy = result["strategy"][i]
+        params = result.params(i)
+        assert set(params) == set(RULE_PARAMS[strategy]), strategy
+        for name, value in params.items():
+            if name in ("bbands_std",) or (strategy == "trend" and name == "rsi_oversold"):
+                assert type(value) is float
+            else:
+                assert type(value) is int, (strategy, name, value)
+    trend = [result.params(i) for i in range(len(result)) if result["strategy"][i] == "trend"]
+    assert sorted(p["ma_short"] for p in trend) == [20, 50] and {p["rsi_oversold"] for p in trend} == {25.5}
+    # A row's params re-run the same strategy
+    best = result.best("sharpe", 1)[0]
+    equity, _ = replay({"close": close}, result["strategy"][best], result.params(best))
+    assert len(equity) == len(close)
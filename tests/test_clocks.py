@@ -0,0 +1,64 @@
+"""SimClock moves only when slept or set, ScaledClock runs `speed` times wall time, and the process clock swaps."""
+
+import time
+
+import pytest
+
+from clocks import ScaledClock, SimClock, WallClock, get_clock, set_clock
+
+
+def test_sim_clock_moves_only_when_told():
+    clock = SimClock(start=1000.0)
+    assert clock.time() == clock.monotonic() == 1000.0 and clock.time_ns() == 1000 * 10**9
+    started = time.monotonic()
+    clock.sleep(3600)
+    assert time.monotonic() - started < 0.1      # no wall time spent
+    assert clock.time() == 4600.0
+    clock.advance(0.5)
+    clock.sleep(0)
+    clock.sleep(-10)
+    assert clock.time() == 4600.5 and clock.time_ns() == 4_600_500_000_000
+
+
+def test_sim_clock_never_goes_backwards():
+    clock = SimClock(start=100.0)
+    clock.set(50.0)
+    clock.sleep_until(80.0)
+    assert clock.time() == 100.0
+    clock.sleep_until(120.0)
+    assert clock.time() == 120.0
+
+
+def test_sim_clock_paces_at_speed():
+    clock = SimClock(start=0.0, speed=100.0)
+    started = time.monotonic()
+    clock.sleep(10)                               # 10 simulated seconds at 100x
+    assert 0.09 <= time.monotonic() - started < 0.5
+    assert clock.time() == 10.0
+
+
+def test_scaled_clock_runs_speed_times_faster():
+    clock = ScaledClock(speed=50, start=1000.0)
+    wall, mono = time.monotonic(), clock.monotonic()
+    clock.sleep(2.0)                              # 2 clock seconds = 0.04 wall seconds
+    elapsed = time.monotonic() - wall
+    assert 0.035 <= elapsed < 0.5
+    assert clock.monotonic() - mono == pytest.approx(elapsed * 50, rel=0.1)
+    assert 1002.0 <= clock.time() < 1000.0 + 0.5 * 50
+    assert abs(clock.time_ns() / 1e9 - clock.time()) < 0.1
+
+
+def test_scaled_clock_starts_at_wall_time_by_default():
+    clock = ScaledClock(speed=10)
+    assert abs(clock.time() - time.time()) < 0.5
+    assert not clock.simulated and SimClock.simulated
+
+
+def test_set_clock_returns_the_previous_clock():
+    clock = SimClock()
+    previous = set_clock(clock)
+    try:
+        assert get_clock() is clock
+    finally:
+        assert set_clock(previous) is clock
+    assert get_clock() is previous and isinstance(previous, WallClock)
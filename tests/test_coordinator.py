@@ -0,0 +1,157 @@
+"""Coordinator with worker processes on localhost: a killed worker's items move without ever running twice."""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from coordinator import Coordinator, _wait_settled, check_ownership, demo_items
+from fleet import DEFAULT_WALLET_FILE, fleet_items, make_tick
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WALLET = "erc3525-minter"
+
+
+def record_tick(item, lease):
+    """Worker factory: each tick appends "<key> <pid> <start> <end>" to $COORDINATOR_TEST_LOG."""
+    path = os.environ["COORDINATOR_TEST_LOG"]
+
+    def tick():
+        started = time.monotonic()
+        time.sleep(0.03)
+        line = f"{item['key']} {os.getpid()} {started:.6f} {time.monotonic():.6f}\n"
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, line.encode())   # one O_APPEND write per line: lines never interleave
+        finally:
+            os.close(fd)
+    return tick
+
+
+def read_ticks(path):
+    ticks = []
+    with open(path) as f:
+        for line in f:
+            key, pid, start, end = line.split()
+            ticks.append((key, int(pid), float(start), float(end)))
+    return ticks
+
+
+def overlaps(ticks):
+    """(a, b) pairs of ticks from different processes that ran at the same time."""
+    found = []
+    ticks = sorted(ticks, key=lambda t: t[2])
+    for i, a in enumerate(ticks):
+        for b in ticks[i + 1:]:
+            if b[2] >= a[3]:
+                break
+            if b[1] != a[1]:
+                found.append((a, b))
+    return found
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    log = str(tmp_path / "ticks.log")
+    items = demo_items(assets=8, slots=4, wallet=WALLET)
+    for item in items:
+        item["interval"] = 0.05
+    coordinator = Coordinator(items, port=0, heartbeat_interval=0.2, lease_ttl=0.6, dead_after=1.0).start()
+    env = dict(os.environ, COORDINATOR_TEST_LOG=log,
+               PYTHONPATH=os.pathsep.join([os.path.dirname(__file__), ROOT, os.environ.get("PYTHONPATH", "")]))
+    procs = {}
+
+    def spawn(name):
+        procs[name] = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "coordinator.py"), "worker", "--name", name,
+             "--connect", f"127.0.0.1:{coordinator.port}", "--factory", "test_coordinator:record_tick"],
+            cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+        return procs[name]
+
+    yield coordinator, procs, spawn, log
+    for proc in procs.values():
+        proc.terminate()
+    for proc in procs.values():
+        proc.wait(10)
+    coordinator.stop()
+
+
+def test_killed_worker_items_have_exactly_one_owner(fleet):
+    coordinator, procs, spawn, log = fleet
+    for i in range(3):
+        spawn(f"worker-{i}")
+    _wait_settled(coordinator, procs)
+    before = coordinator.assignments()
+    check_ownership(coordinator.items.values(), before, "started")
+
+    # Kill the wallet's holder, so the slot items have to move too
+    victim = check_ownership(coordinator.items.values(), before)[WALLET][0]
+    pid = procs[victim].pid
+    procs.pop(victim).send_signal(signal.SIGKILL)
+    killed = time.monotonic()
+    _wait_settled(coordinator, procs)
+    after = coordinator.assignments()
+    assert victim not in after
+    assert check_ownership(coordinator.items.values(), after, "after kill")[WALLET] != [victim]
+    # Only the victim's items moved
+    for name in procs:
+        assert set(before[name]) <= set(after[name])
+    time.sleep(0.5)
+
+    ticks = read_ticks(log)
+    stats = coordinator.stats()
+    assert stats["conflicts"] == 0 and stats["deaths"] == 1
+    # Every item ran after the kill, in a surviving process
+    assert {key for key, p, start, _ in ticks if start > killed and p != pid} == set(coordinator.items)
+    assert not any(p == pid and start > killed for _, p, start, _ in ticks)
+    # On the workers' own clocks: no item, and no wallet, ever ran in two processes at once
+    for key in coordinator.items:
+        assert not overlaps([t for t in ticks if t[0] == key]), key
+    assert not overlaps([t for t in ticks if t[0].startswith("slot:")])
+
+
+def test_check_ownership():
+    items = demo_items(assets=2, slots=2, wallet=WALLET)
+    ok = {"a": ["asset:ASSET0-USD", "slot:1", "slot:2"], "b": ["asset:ASSET1-USD"]}
+    assert check_ownership(items, ok) == {WALLET: ["a"]}
+    with pytest.raises(RuntimeError, match="exactly once"):
+        check_ownership(items, dict(ok, b=["asset:ASSET1-USD", "slot:1"]))
+    with pytest.raises(RuntimeError, match="exactly once"):
+        check_ownership(items, dict(ok, b=[]))
+    with pytest.raises(RuntimeError, match="split"):
+        check_ownership(items, {"a": ["asset:ASSET0-USD", "slot:1"], "b": ["asset:ASSET1-USD", "slot:2"]})
+
+
+def test_fleet_assets_share_the_agents_wallet():
+    items = fleet_items({"FLEET_ASSETS": "BTC-USD, ETH-USD,SOL-USD", "WALLET_FILE": "/keys/wallet.json"})
+    assert [item["asset"] for item in items] == ["BTC-USD", "ETH-USD", "SOL-USD"]
+    assert {item["wallet"] for item in items} == {"/keys/wallet.json"}
+    assert check_ownership(items, {"a": [item["key"] for item in items], "b": []}) == {"/keys/wallet.json": ["a"]}
+    with pytest.raises(RuntimeError, match="split"):
+        check_ownership(items, {"a": ["asset:BTC-USD"], "b": ["asset:ETH-USD", "asset:SOL-USD"]})
+    assert fleet_items({})[0]["wallet"] == DEFAULT_WALLET_FILE
+
+
+class FakeLease:
+    def __init__(self, valid):
+        self._valid = valid
+
+    def valid(self):
+        return self._valid
+
+
+def test_fleet_tick_does_not_trade_without_its_lease(tmp_path, monkeypatch):
+    pytest.importorskip("dotenv")
+    monkeypatch.setenv("MARKET_DATA_DIR", "")
+    import AAA
+    traded = []
+    monkeypatch.setattr(AAA, "execute_paper_trade", lambda agent, signal: traded.append(signal))
+    monkeypatch.setitem(AAA.CONFIG, "PAPER_TRADING", True)
+    item = fleet_items({"FLEET_ASSETS": "BTC-USD"})[0]
+    assert make_tick(item, FakeLease(False))() is None
+    assert not traded
+    make_tick(item, FakeLease(True))()
+    assert len(traded) == 1
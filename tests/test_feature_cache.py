@@ -0,0 +1,178 @@
+"""FeatureCache LRU, SharedFeatureCache block lifetime, and sharing features across processes."""
+
+import glob
+import mmap
+import os
+import subprocess
+import sys
+import uuid
+
+import numpy as np
+import pytest
+
+from feature_cache import FeatureCache, SharedFeatureCache, feature_key
+
+resource = pytest.importorskip("resource")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="counts POSIX shared memory blocks")
+
+
+@pytest.fixture
+def namespace():
+    name = f"t{uuid.uuid4().hex[:8]}"
+    yield name
+    for path in glob.glob(f"/dev/shm/{name}_*"):
+        os.unlink(path)
+
+
+def blocks(namespace):
+    return glob.glob(f"/dev/shm/{namespace}_*")
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = FeatureCache(max_bytes=3 * 80)
+    for i in range(4):
+        cache.put(i, np.zeros(10))
+    assert 0 not in cache and len(cache) == 3
+    assert cache.get(1) is not None
+    cache.put(4, np.zeros(10))
+    assert 1 in cache and 2 not in cache
+    assert cache.put("huge", np.zeros(1000)).shape == (1000,)
+    assert "huge" not in cache
+    assert cache.stats()["bytes"] == 3 * 80
+
+
+def test_from_env():
+    assert type(FeatureCache.from_env({})) is FeatureCache
+    cache = FeatureCache.from_env({"FEATURE_CACHE": "shared", "FEATURE_CACHE_MB": "2",
+                                   "FEATURE_CACHE_NAMESPACE": "fx"})
+    assert isinstance(cache, SharedFeatureCache)
+    assert cache.max_bytes == 2 * 1024 * 1024 and cache.namespace == "fx"
+
+
+def test_replacing_a_key_unlinks_the_old_block(namespace):
+    cache = SharedFeatureCache(namespace=namespace)
+    cache.put("k", np.arange(3.0))
+    cache.put("k", np.arange(5.0))
+    assert len(blocks(namespace)) == 1
+    np.testing.assert_array_equal(cache.get("k"), np.arange(5.0))
+    cache.close()
+    assert not blocks(namespace)
+
+
+def test_oversized_values_get_no_block(namespace):
+    cache = SharedFeatureCache(max_bytes=100, namespace=namespace)
+    value = cache.put("big", np.arange(50.0))
+    np.testing.assert_array_equal(value, np.arange(50.0))
+    assert "big" not in cache
+    assert not blocks(namespace)
+
+
+def test_evicted_blocks_are_unlinked(namespace):
+    # Each shared entry is charged its block's whole page, not its 80 bytes
+    cache = SharedFeatureCache(max_bytes=2 * mmap.PAGESIZE, namespace=namespace)
+    for i in range(5):
+        cache.put(i, np.zeros(10))
+    assert len(cache) == 2
+    assert len(blocks(namespace)) == 2
+    assert cache.stats()["bytes"] == 2 * mmap.PAGESIZE
+    cache.close()
+    assert not blocks(namespace)
+
+
+def test_block_count_is_capped(namespace):
+    cache = SharedFeatureCache(namespace=namespace, max_blocks=4)
+    for i in range(10):
+        cache.put(i, np.ones(1))
+    assert len(blocks(namespace)) == 4 and len(cache) == 4
+    assert cache.get(9) is not None and 0 not in cache
+    cache.close()
+
+
+FD_LIMIT_SCRIPT = """
+import resource, sys
+sys.path.insert(0, {root!r})
+resource.setrlimit(resource.RLIMIT_NOFILE, (128, resource.getrlimit(resource.RLIMIT_NOFILE)[1]))
+import numpy as np
+from feature_cache import SharedFeatureCache
+cache = SharedFeatureCache(namespace={namespace!r})
+assert cache.max_blocks <= 128 // 4
+for i in range(5000):
+    cache.put(("BTC-USD", "features", i), np.array([float(i), 50.0]))
+    assert cache.get(("BTC-USD", "features", i))[0] == i
+# Even without the cap, a refused block falls back to the local LRU
+cache.max_blocks = 10**6
+for i in range(5000, 5200):
+    cache.put(("BTC-USD", "features", i), np.array([float(i), 50.0]))
+print(cache.stats()["blocks"], cache.stats()["fallbacks"])
+cache.close()
+"""
+
+
+def test_thousands_of_puts_under_a_low_fd_limit(namespace):
+    result = subprocess.run([sys.executable, "-c", FD_LIMIT_SCRIPT.format(root=ROOT, namespace=namespace)],
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    mapped, fallbacks = map(int, result.stdout.split())
+    assert fallbacks > 0 and mapped < 128
+    assert not blocks(namespace)
+
+
+SIGNALS_SCRIPT = """
+import json, sys
+sys.path.insert(0, {root!r})
+from feature_cache import feature_cache
+from indicators import compute_signals
+from market_store import MarketStore
+signals = compute_signals({assets!r}, {{"ma_period": 20}}, store=MarketStore({store!r}))
+print(json.dumps({{"type": type(feature_cache).__name__, "signals": signals, **feature_cache.stats()}}))
+"""
+
+
+def run_agent_process(namespace, store, assets):
+    env = dict(os.environ, FEATURE_CACHE="shared", FEATURE_CACHE_NAMESPACE=namespace)
+    script = SIGNALS_SCRIPT.format(root=ROOT, assets=assets, store=store)
+    # Keep the process alive (stdin) until its peer has read the features, as a running worker would be
+    return subprocess.Popen([sys.executable, "-c", script + "sys.stdin.read()\n"], env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+
+def read_result(process):
+    import json
+    return json.loads(process.stdout.readline())
+
+
+def test_worker_processes_share_features(namespace, tmp_path):
+    from market_store import MarketStore
+    store = MarketStore(str(tmp_path))
+    assets = ["BTC-USD", "ETH-USD", "SOL-USD"]
+    rng = np.random.default_rng(3)
+    for asset in assets:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 200)))
+        store.append(asset, np.arange(200) * 60_000_000_000, close=close)
+
+    first = run_agent_process(namespace, str(tmp_path), assets)
+    try:
+        computed = read_result(first)
+        assert computed["type"] == "SharedFeatureCache"
+        assert computed["hits"] == 0 and computed["misses"] == len(assets)
+        assert len(blocks(namespace)) == len(assets)  # one block per asset and bar
+
+        second = run_agent_process(namespace, str(tmp_path), assets)
+        try:
+            reused = read_result(second)
+        finally:
+            second.communicate("")
+        assert reused["hits"] == len(assets) and reused["misses"] == 0
+        assert reused["signals"] == computed["signals"]
+    finally:
+        first.communicate("")
+    assert first.returncode == 0 and second.returncode == 0
+    assert not blocks(namespace)  # the creator unlinks its blocks on exit
+
+
+def test_feature_key_normalizes_params():
+    assert feature_key("BTC-USD", "sma", {"b": 1, "a": 2}, 5.0) == ("BTC-USD", "sma", (("a", 2), ("b", 1)), 5)
+    assert feature_key("BTC-USD", "sma", 20, 5) == ("BTC-USD", "sma", (20,), 5)
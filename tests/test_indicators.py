@@ -0,0 +1,90 @@
+"""Streaming indicators match TA-Lib's batch results bar for bar."""
+
+import numpy as np
+import pytest
+
+from indicators import (EMA, MACD, RSI, SMA, BollingerBands, IndicatorEngine, RollingStd,
+                        batch_rsi, batch_sma)
+
+talib = pytest.importorskip("talib")
+
+TOL = 1e-9
+
+
+@pytest.fixture(scope="module")
+def prices():
+    rng = np.random.default_rng(7)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, 2000)))
+
+
+def stream(indicator, prices):
+    return np.array([indicator.update(p) for p in prices], dtype=float)
+
+
+def assert_parity(actual, expected):
+    actual, expected = np.asarray(actual, dtype=float), np.asarray(expected, dtype=float)
+    assert np.array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOL, equal_nan=True)
+
+
+@pytest.mark.parametrize("period", [5, 20, 200])
+def test_sma(prices, period):
+    assert_parity(stream(SMA(period), prices), talib.SMA(prices, timeperiod=period))
+
+
+@pytest.mark.parametrize("period", [5, 20, 200])
+def test_ema(prices, period):
+    assert_parity(stream(EMA(period), prices), talib.EMA(prices, timeperiod=period))
+
+
+@pytest.mark.parametrize("period", [2, 14, 30])
+def test_rsi(prices, period):
+    assert_parity(stream(RSI(period), prices), talib.RSI(prices, timeperiod=period))
+
+
+def test_rsi_flat_prices():
+    flat = np.full(50, 100.0)
+    assert_parity(stream(RSI(14), flat), talib.RSI(flat, timeperiod=14))
+
+
+@pytest.mark.parametrize("period,num_std", [(20, 2.0), (50, 1.5)])
+def test_bbands(prices, period, num_std):
+    bands = BollingerBands(period, num_std)
+    actual = np.array([bands.update(p) for p in prices], dtype=float).T
+    expected = talib.BBANDS(prices, timeperiod=period, nbdevup=num_std, nbdevdn=num_std, matype=0)
+    for got, want in zip(actual, expected):
+        assert_parity(got, want)
+
+
+@pytest.mark.parametrize("fast,slow,signal", [(12, 26, 9), (5, 35, 5)])
+def test_macd(prices, fast, slow, signal):
+    macd = MACD(fast, slow, signal)
+    actual = np.array([macd.update(p) for p in prices], dtype=float).T
+    expected = talib.MACD(prices, fastperiod=fast, slowperiod=slow, signalperiod=signal)
+    for got, want in zip(actual, expected):
+        assert_parity(got, want)
+
+
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_rolling_std(prices, ddof):
+    period = 100
+    expected = np.full(len(prices), np.nan)
+    for i in range(period - 1, len(prices)):
+        expected[i] = prices[i - period + 1:i + 1].std(ddof=ddof)
+    assert_parity(stream(RollingStd(period, ddof), prices), expected)
+
+
+def test_engine_snapshot(prices):
+    engine = IndicatorEngine({"ma_period": 50}).warm_up(prices)
+    snap = engine.snapshot()
+    assert snap["price"] == prices[-1]
+    assert abs(snap["SMA"] - talib.SMA(prices, 50)[-1]) < TOL
+    assert abs(snap["RSI"] - talib.RSI(prices, 14)[-1]) < TOL
+    assert abs(snap["MACD_hist"] - talib.MACD(prices)[2][-1]) < TOL
+
+
+def test_batch_features_match_talib(prices):
+    window = 100
+    rows = np.stack([prices[i:i + window] for i in (0, 500, 1900)])
+    assert_parity(batch_sma(rows, 20), [talib.SMA(row, 20)[-1] for row in rows])
+    assert_parity(batch_rsi(rows, 14), [talib.RSI(row, 14)[-1] for row in rows])
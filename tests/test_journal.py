@@ -0,0 +1,80 @@
+"""Journal reopen after a crash: torn event records and string lines are cut before appending."""
+
+import collections
+import os
+
+from journal import EVENT_DTYPE, HEADER, Journal, load_session
+
+
+def write(root, session, agents):
+    journal = Journal(str(root), session, fsync="never")
+    for agent in agents:
+        journal.signal(agent, "BTC-USD", "buy", 100.0)
+    journal.close()
+    return journal.path
+
+
+def test_reopen_truncates_torn_tails(tmp_path):
+    path = write(tmp_path, "s", ["A", "B"])
+    strings = path[:-len(".jrnl")] + ".strings"
+    # A crash mid-batch: half an event record and half a string line
+    with open(path, "ab") as f:
+        f.write(b"\x07" * (EVENT_DTYPE.itemsize // 2))
+    with open(strings, "ab") as f:
+        f.write(b'"C')
+
+    write(tmp_path, "s", ["C", "A"])
+    assert (os.path.getsize(path) - HEADER.size) % EVENT_DTYPE.itemsize == 0
+    session = load_session(path)
+    assert len(session) == 4
+    assert session.columns()["agent"].tolist() == ["A", "B", "C", "A"]
+    assert set(session.columns()["symbol"]) == {"BTC-USD"}
+
+
+def test_complete_last_string_without_newline_is_dropped(tmp_path):
+    path = write(tmp_path, "s", ["A"])
+    strings = path[:-len(".jrnl")] + ".strings"
+    with open(strings, "ab") as f:
+        f.write(b'"orphan"')   # written, but its newline and events never were
+
+    write(tmp_path, "s", ["B"])
+    session = load_session(path)
+    assert session.columns()["agent"].tolist() == ["A", "B"]
+    assert "orphan" not in session.strings.tolist()
+
+
+def test_torn_header_starts_over(tmp_path):
+    path = str(tmp_path / "s.jrnl")
+    with open(path, "wb") as f:
+        f.write(b"AAAJ")
+    write(tmp_path, "s", ["A"])
+    assert load_session(path).columns()["agent"].tolist() == ["A"]
+
+
+def on_disk(journal):
+    """(strings written, highest string id any written event refers to)."""
+    session = load_session(journal.path)
+    ids = [int(session.events[field].max()) for field in ("agent", "symbol", "ref") if len(session)]
+    return len(session.strings), max(ids, default=0)
+
+
+def test_an_event_never_reaches_disk_before_its_string(tmp_path):
+    journal = Journal(str(tmp_path), "s", fsync="never", flush_interval=60)
+    journal.signal("other", "BTC-USD", "buy")
+    checks = []
+
+    class Racing(collections.deque):
+        def append(self, value):
+            # At this instant another thread records with any id already published, and the writer runs
+            if journal._ids.get(value) is not None:
+                journal.signal("other", value, "buy")
+            journal._write()
+            checks.append(on_disk(journal))
+            super().append(value)
+
+    journal._new_strings = Racing(journal._new_strings)
+    for symbol in ("ETH-USD", "SOL-USD"):
+        journal.signal("A", symbol, "sell")
+    journal.close()
+    assert checks and all(highest < written for written, highest in checks)
+    assert load_session(journal.path).columns()["symbol"].tolist() == ["BTC-USD", "ETH-USD", "SOL-USD"]
@@ -0,0 +1,216 @@
+"""Feed normalizer, bar rollups and subscription slow-consumer policies."""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from market_feed import NS, BarAggregator, FanOut, FeedPipeline, Normalizer, Subscription
+
+T0 = 1_717_200_000 * NS   # 2024-06-01T00:00:00Z
+
+
+def trades_message(trades, sequence=None):
+    message = {"channel": "market_trades", "events": [{"type": "update", "trades": [
+        {"product_id": symbol, "time": time, "price": str(price), "size": str(size)}
+        for symbol, time, price, size in trades]}]}
+    if sequence is not None:
+        message["sequence_num"] = sequence
+    return message
+
+
+# ================================
+# NORMALIZER
+# ================================
+def test_trades_within_an_event_are_put_oldest_first():
+    normalizer, out = Normalizer(), []
+    newest_first = [("BTC-USD", "2024-06-01T00:00:02.5Z", 102, 0.1),
+                    ("BTC-USD", "2024-06-01T00:00:01.000123Z", 101, 0.2),
+                    ("BTC-USD", "2024-06-01T00:00:00Z", 100, 0.3)]
+    assert normalizer.normalize(json.dumps(trades_message(newest_first)), out) == 3
+    assert out == [("BTC-USD", T0, 100.0, 0.3), ("BTC-USD", T0 + NS + 123_000, 101.0, 0.2),
+                   ("BTC-USD", T0 + 2 * NS + 500_000_000, 102.0, 0.1)]
+    # Already in order: left alone
+    normalizer.normalize(trades_message(newest_first[::-1]), out)
+    assert [tick[1] for tick in out[3:]] == [tick[1] for tick in out[:3]]
+
+
+def test_sequence_gaps_are_counted():
+    normalizer, out = Normalizer(), []
+    for sequence in (1, 2, 5, 6, 10):
+        normalizer.normalize({"channel": "heartbeats", "sequence_num": sequence}, out)
+    assert normalizer.gaps == 2 + 3
+    assert not out and normalizer.messages == 5
+
+
+def test_malformed_messages_are_dropped_whole():
+    normalizer, out = Normalizer(), [("ETH-USD", 1, 1.0, 1.0)]
+    good = ("BTC-USD", "2024-06-01T00:00:00Z", 100, 1)
+    bad_price = ("BTC-USD", "2024-06-01T00:00:01Z", "n/a", 1)
+    assert normalizer.normalize(trades_message([good, bad_price]), out) == 0
+    assert normalizer.normalize('{"channel": "market_trades", "events": [{"trades": [{}]}]}', out) == 0
+    assert normalizer.normalize("not json", out) == 0
+    assert normalizer.normalize(["BTC-USD", "x", 1, 1], out) == 0
+    assert normalizer.errors == 4
+    assert out == [("ETH-USD", 1, 1.0, 1.0)]   # nothing half-added
+    # Ticker messages and already-normalized ticks pass through
+    ticker = {"channel": "ticker", "timestamp": "2024-06-01T00:00:03Z",
+              "events": [{"tickers": [{"product_id": "BTC-USD", "price": "99.5"}]}]}
+    assert normalizer.normalize(ticker, out) == 1
+    assert normalizer.normalize(["BTC-USD", T0, 1, 2], out) == 1
+    assert out[1:] == [("BTC-USD", T0 + 3 * NS, 99.5, 0.0), ("BTC-USD", T0, 1.0, 2.0)]
+
+
+# ================================
+# BAR AGGREGATOR
+# ================================
+def expected_bars(ts, price, size, tf):
+    """OHLCV per `tf`-second interval, computed directly from the ticks."""
+    buckets = ts // (tf * NS)
+    bars = []
+    for bucket in np.unique(buckets):
+        rows = buckets == bucket
+        p = price[rows]
+        bars.append((int(bucket) * tf * NS, p[0], p.max(), p.min(), p[-1], size[rows].sum(), int(rows.sum())))
+    return bars
+
+
+def as_tuples(bars):
+    return [(bar.ts, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.trades) for bar in bars]
+
+
+def test_1s_bars_roll_up_into_60s_and_300s():
+    rng = np.random.default_rng(0)
+    ts = T0 + np.sort(rng.integers(0, 900 * NS, 5000))
+    price = 100 + np.cumsum(rng.normal(0, 0.1, 5000))
+    size = rng.exponential(1.0, 5000)
+    aggregator = BarAggregator((300, 1, 60))
+    assert aggregator.timeframes == (1, 60, 300)
+    bars = []
+    for t, p, s in zip(ts.tolist(), price.tolist(), size.tolist()):
+        bars += aggregator.update("BTC-USD", t, p, s) or []
+    bars += aggregator.flush()
+    assert aggregator.late == 0
+    for tf in (1, 60, 300):
+        got = [bar for bar in bars if bar.timeframe == tf]
+        assert {bar.symbol for bar in got} == {"BTC-USD"}
+        np.testing.assert_allclose(as_tuples(got), expected_bars(ts, price, size, tf))
+
+
+def test_late_ticks_are_dropped():
+    aggregator = BarAggregator((1, 60))
+    aggregator.update("BTC-USD", T0, 100.0, 1.0)
+    closed = aggregator.update("BTC-USD", T0 + 2 * NS, 101.0, 1.0)
+    assert as_tuples(closed) == [(T0, 100.0, 100.0, 100.0, 100.0, 1.0, 1)]
+    # Second 0 is closed and second 1 is behind the open bar
+    assert aggregator.update("BTC-USD", T0 + 500_000_000, 50.0, 9.0) is None
+    assert aggregator.update("BTC-USD", T0 + NS, 50.0, 9.0) is None
+    assert aggregator.late == 2
+    # Other symbols keep their own clock
+    assert aggregator.update("ETH-USD", T0, 10.0, 1.0) is None
+    minute = [bar for bar in aggregator.flush() if bar.timeframe == 60 and bar.symbol == "BTC-USD"]
+    assert as_tuples(minute) == [(T0, 100.0, 101.0, 100.0, 101.0, 2.0, 2)]
+
+
+def test_flush_closes_only_intervals_that_have_ended():
+    aggregator = BarAggregator((1, 60))
+    aggregator.update("BTC-USD", T0 + 59 * NS, 100.0, 1.0)
+    assert aggregator.flush(T0 + 59 * NS + 999_999_999) == []
+    closed = aggregator.flush(T0 + 60 * NS)
+    # The last second of the minute closes the minute too
+    assert [(bar.timeframe, bar.ts) for bar in closed] == [(1, T0 + 59 * NS), (60, T0)]
+
+    aggregator.update("BTC-USD", T0 + 61 * NS, 101.0, 1.0)
+    closed = aggregator.flush(T0 + 62 * NS)
+    assert [(bar.timeframe, bar.ts) for bar in closed] == [(1, T0 + 61 * NS)]
+    assert [(bar.timeframe, bar.ts, bar.close) for bar in aggregator.flush(T0 + 120 * NS)] == [(60, T0 + 60 * NS, 101.0)]
+    assert aggregator.flush() == []
+
+
+def test_timeframes_must_be_multiples_of_the_base():
+    with pytest.raises(ValueError):
+        BarAggregator((2, 3))
+    with pytest.raises(ValueError):
+        BarAggregator((0, 60))
+
+
+# ================================
+# SUBSCRIPTIONS
+# ================================
+def offer(sub, items, topic=("tick", "BTC-USD")):
+    for item in items:
+        sub.offer(topic, item)
+
+
+def test_drop_oldest_keeps_the_newest():
+    sub = Subscription("a", [], maxsize=3, policy="drop_oldest")
+    offer(sub, range(5))
+    assert sub.drain() == [2, 3, 4]
+    assert sub.stats()["dropped"] == 2 and sub.high_water == 3
+
+
+def test_drop_newest_refuses_while_full():
+    sub = Subscription("a", [], maxsize=3, policy="drop_newest")
+    offer(sub, range(5))
+    assert sub.drain(2) == [0, 1]
+    offer(sub, [5, 6, 7])
+    assert sub.drain() == [2, 5, 6]
+    assert sub.dropped == 3 and sub.delivered == 5
+
+
+def test_conflate_keeps_the_latest_per_topic():
+    sub = Subscription("a", [], maxsize=2, policy="conflate")
+    for i in range(3):
+        sub.offer(("bar", "BTC-USD", 60), ("BTC", i))
+        sub.offer(("bar", "ETH-USD", 60), ("ETH", i))
+    sub.offer(("bar", "SOL-USD", 60), ("SOL", 0))   # a third topic does not fit
+    assert len(sub) == 2
+    assert sub.drain() == [("BTC", 2), ("ETH", 2)]
+    assert sub.conflated == 4 and sub.dropped == 1
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        Subscription("a", [], policy="drop_all")
+    with pytest.raises(ValueError):
+        FanOut().subscribe("a", [], maxsize=0)
+
+
+class ListSource:
+    live = False
+
+    def __init__(self, batches):
+        self._batches = batches
+
+    async def batches(self):
+        for batch in self._batches:
+            yield batch
+
+
+def test_block_stalls_the_feed_instead_of_dropping():
+    ticks = [("BTC-USD", T0 + i * NS // 10, 100.0 + i, 1.0) for i in range(200)]
+    pipeline = FeedPipeline(ListSource([ticks[i:i + 10] for i in range(0, 200, 10)]), timeframes=(1,))
+    recorder = pipeline.subscribe("recorder", ticks=True, timeframes=[], maxsize=15, policy="block")
+    agent = pipeline.subscribe("agent", ticks=True, timeframes=[], maxsize=15)   # never drained
+    received = []
+
+    async def main():
+        async def consume():
+            while True:
+                received.extend(await recorder.get_batch(4))
+                await asyncio.sleep(0.001)
+        consumer = asyncio.ensure_future(consume())
+        stats = await pipeline.run()
+        while len(recorder):
+            await asyncio.sleep(0.001)
+        consumer.cancel()
+        return stats
+
+    stats = asyncio.run(main())
+    assert received == ticks   # lossless and in order
+    assert stats["subscriptions"]["recorder"]["stalls"] > 0
+    assert recorder.dropped == 0 and recorder.high_water <= 15 + 10
+    # The lagging agent only loses its own oldest items
+    assert agent.dropped == 200 - 15 and agent.drain() == ticks[-15:]
+    assert stats["bars"] == 20
@@ -0,0 +1,92 @@
+"""MarketStore appends and reads, torn-row repair, and appends from two processes at once."""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from market_store import COLUMNS, MarketStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_append_last_and_range(tmp_path):
+    store = MarketStore(str(tmp_path))
+    ts = np.arange(10) * 60
+    close = 100.0 + np.arange(10)
+    assert store.append("BTC-USD", ts, open=close - 1, high=close + 1, low=close - 2, close=close,
+                        volume=np.ones(10)) == 10
+    store.append("BTC-USD", 600, price=200.0)   # a tick fills every price column
+    assert store.symbols() == ["BTC-USD"] and store.rows("BTC-USD") == 11
+
+    bars = store.last("BTC-USD", 3)
+    assert bars.ts.tolist() == [480, 540, 600]
+    assert bars.close.tolist() == [108.0, 109.0, 200.0]
+    assert bars.open[-1] == bars.high[-1] == bars.low[-1] == 200.0 and bars.volume[-1] == 0.0
+    assert store.last("BTC-USD", 2, end_ts=300).ts.tolist() == [180, 240]
+    assert len(store.last("BTC-USD", 50)) == 11
+    assert store.last_price("BTC-USD") == 200.0
+
+    assert store.range("BTC-USD", 120, 300).ts.tolist() == [120, 180, 240]
+    assert store.range("BTC-USD", 550).close.tolist() == [200.0]
+    assert len(store.range("BTC-USD", end_ts=0)) == 0
+    assert len(store.all("ETH-USD")) == 0 and np.isnan(store.last_price("ETH-USD"))
+
+
+def test_timestamps_may_not_go_backwards(tmp_path):
+    store = MarketStore(str(tmp_path))
+    store.append("BTC-USD", [10, 20], price=[1.0, 2.0])
+    with pytest.raises(ValueError, match="older"):
+        store.append("BTC-USD", 15, price=1.5)
+    with pytest.raises(ValueError, match="non-decreasing"):
+        store.append("BTC-USD", [30, 25], price=[1.0, 2.0])
+    with pytest.raises(ValueError, match="close"):
+        store.append("BTC-USD", 30, open=1.0)
+    store.append("BTC-USD", 20, price=2.5)   # equal timestamps are fine
+    assert store.all("BTC-USD").close.tolist() == [1.0, 2.0, 2.5]
+
+
+def test_torn_row_is_dropped_before_appending(tmp_path):
+    store = MarketStore(str(tmp_path))
+    store.append("BTC-USD", [1, 2], price=[1.0, 2.0])
+    # A crash after some value columns of row 3 were written, before its timestamp
+    for name in ("open", "high"):
+        with open(os.path.join(str(tmp_path), "BTC-USD", f"{name}.f8"), "ab") as f:
+            np.float64(9.0).tofile(f)
+    assert len(store.all("BTC-USD")) == 2
+    store.append("BTC-USD", 3, price=3.0)
+    bars = store.all("BTC-USD")
+    assert bars.open.tolist() == bars.close.tolist() == [1.0, 2.0, 3.0]
+
+
+APPENDER = """
+import sys
+sys.path.insert(0, {root!r})
+from market_store import MarketStore
+store = MarketStore({path!r})
+writer = float({writer})
+for i in range({rows}):
+    # Every column of a row carries the writer id; volume carries the row's sequence number
+    store.append("BTC-USD", 1, price=writer, volume=float(i))
+"""
+
+
+def test_two_processes_append_at_once(tmp_path):
+    rows = 400
+    procs = [subprocess.Popen([sys.executable, "-c", APPENDER.format(root=ROOT, path=str(tmp_path), writer=w,
+                                                                    rows=rows)])
+             for w in (1, 2)]
+    for proc in procs:
+        assert proc.wait(60) == 0
+
+    store = MarketStore(str(tmp_path))
+    bars = store.all("BTC-USD")
+    assert len(bars) == 2 * rows
+    for name in COLUMNS:
+        assert os.path.getsize(os.path.join(str(tmp_path), "BTC-USD", f"{name}.f8")) == 2 * rows * 8
+    # No row mixes the two writers' columns, and each writer's rows are all there, in order
+    assert (bars.open == bars.close).all() and (bars.high == bars.close).all() and (bars.low == bars.close).all()
+    for writer in (1.0, 2.0):
+        assert bars.volume[bars.close == writer].tolist() == list(range(rows))
@@ -0,0 +1,61 @@
+"""Checkpoint fingerprints, the bounded indicator cache and the volatility rule on tuned thresholds."""
+
+import numpy as np
+
+from backtest import _IndicatorCache
+from optimizer import Checkpoint, data_fingerprint
+from strategies import VOLATILITY_RULE, rsi_thresholds
+
+
+def history(seed=0, n=500):
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, n)))
+    return {"open": close, "high": close, "low": close, "close": close, "volume": np.ones(n)}
+
+
+def test_checkpoint_resumes_only_for_the_same_data(tmp_path):
+    path = str(tmp_path / "opt.ckpt")
+    ts = np.arange(500) * 60
+    first = data_fingerprint(history(0), "BTC-USD", ts, fee_bps=10.0)
+    checkpoint = Checkpoint(path, first)
+    checkpoint.put("momentum", 500, {"ma_period": 20}, {"sharpe": 1.5})
+    checkpoint.close()
+
+    assert Checkpoint(path, first).get("momentum", 500, {"ma_period": 20}) == {"sharpe": 1.5}
+
+    for other in (data_fingerprint(history(1), "BTC-USD", ts, fee_bps=10.0),
+                  data_fingerprint(history(0), "ETH-USD", ts, fee_bps=10.0),
+                  data_fingerprint(history(0), "BTC-USD", ts + 60, fee_bps=10.0),
+                  data_fingerprint(history(0), "BTC-USD", ts, fee_bps=20.0)):
+        elsewhere = Checkpoint(path, other)
+        assert elsewhere.path != path
+        assert elsewhere.get("momentum", 500, {"ma_period": 20}) is None
+        elsewhere.close()
+    assert Checkpoint(path, first).path == path
+
+
+def test_checkpoint_without_header_is_not_resumed(tmp_path):
+    path = tmp_path / "opt.ckpt"
+    path.write_text('{"strategy": "momentum", "bars": 500, "key": "[]", "metrics": {"sharpe": 9}}\n')
+    checkpoint = Checkpoint(str(path), data_fingerprint(history(0)))
+    assert checkpoint.path != str(path) and not checkpoint.results
+
+
+def test_indicator_cache_is_bounded():
+    data = {"close": np.arange(1000.0)}
+    cache = _IndicatorCache(data, max_bytes=3 * 8000)
+    compute = lambda keys: np.ones((len(keys), 1000)) * keys[:, None]
+    for period in range(10):
+        assert cache.get("sma", [period], compute)[0, 0] == period
+    assert len(cache.rows) == 3 and cache.bytes == 3 * 8000
+    # Rows the current call needs are kept even above the bound
+    assert cache.get("sma", list(range(5)), compute).shape == (5, 1000)
+    assert len(cache.rows) == 5
+
+
+def test_volatility_widens_the_tuned_thresholds():
+    widen = VOLATILITY_RULE["widen"]
+    assert rsi_thresholds(68, 27, False) == (68, 27)
+    assert rsi_thresholds(68, 27, True) == (68 + widen, 27 - widen)
+    overbought, oversold = rsi_thresholds(np.array([[68], [72]]), np.array([[27], [31]]), np.array([[False, True]]))
+    np.testing.assert_array_equal(overbought, [[68, 68 + widen], [72, 72 + widen]])
+    np.testing.assert_array_equal(oversold, [[27, 27 - widen], [31, 31 - widen]])
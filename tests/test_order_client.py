@@ -0,0 +1,198 @@
+"""OrderClient / AsyncOrderClient against a local ThreadingHTTPServer stub."""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from order_client import ORDER_PATH, AsyncOrderClient, OrderClient, OrderError
+
+SECRET = "s3cret"
+
+
+class StubExchange:
+    """
+    Records every request and answers from a script of (status, headers, body)
+    responses; once the script is empty every order is accepted.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.script = deque()
+        self.ports = set()
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub.lock:
+                    stub.requests.append((time.monotonic(), self.path, dict(self.headers), raw))
+                    stub.ports.add(self.client_address[1])
+                    status, headers, body = stub.script.popleft() if stub.script else (200, {}, None)
+                if body is None:
+                    order = json.loads(raw) if raw else {"product_id": "none"}
+                    body = {"success": True, "order_id": f"{order['product_id']}-{len(stub.requests)}"}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def exchange():
+    stub = StubExchange()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def client(exchange):
+    with OrderClient(exchange.url, "key", SECRET, "pass", backoff=0.01, max_backoff=1.0) as c:
+        yield c
+
+
+def test_signs_the_bytes_it_sends(client, exchange):
+    result = client.place_order("BUY", "BTC-USD", "0.01", "25000")
+    assert result["success"]
+    _, path, headers, raw = exchange.requests[0]
+    assert path == ORDER_PATH
+    body = json.loads(raw)
+    assert len(body.pop("client_order_id")) == 32
+    assert body == {"side": "BUY", "product_id": "BTC-USD", "size": "0.01", "type": "limit", "limit_price": "25000"}
+    message = headers["CB-ACCESS-TIMESTAMP"] + "POST" + ORDER_PATH + raw.decode()
+    expected = hmac.new(SECRET.encode(), message.encode(), hashlib.sha256).hexdigest()
+    assert headers["CB-ACCESS-SIGN"] == expected
+    assert headers["CB-ACCESS-KEY"] == "key"
+
+
+def test_reuses_pooled_connection(client, exchange):
+    for _ in range(5):
+        client.place_order("BUY", "BTC-USD", "0.01")
+    assert len(exchange.requests) == 5
+    assert len(exchange.ports) == 1
+    assert client.latency.count == 5
+
+
+def test_429_honours_retry_after(client, exchange):
+    exchange.script.append((429, {"Retry-After": "0.3"}, {"error": "rate limited"}))
+    started = time.monotonic()
+    result = client.place_order("BUY", "BTC-USD", "0.01")
+    assert result["success"]
+    assert len(exchange.requests) == 2
+    assert exchange.requests[1][0] - exchange.requests[0][0] >= 0.3
+    assert time.monotonic() - started >= 0.3
+
+
+def test_429_backoff_is_shared_by_the_batch(exchange):
+    exchange.script.append((429, {"Retry-After": "0.3"}, {"error": "rate limited"}))
+    with OrderClient(exchange.url, "key", SECRET, "pass", max_concurrency=4) as client:
+        client.place_order("BUY", "BTC-USD", "0.01")  # absorbs the 429
+        blocked_until = exchange.requests[0][0] + 0.3
+        results = client.place_orders([("BUY", "ETH-USD", "0.1")] * 4)
+    assert all(r["success"] for r in results)
+    assert all(at >= blocked_until for at, *_ in exchange.requests[1:])
+
+
+@pytest.mark.parametrize("status", [500, 502, 503, 504])
+def test_order_is_not_resent_after_5xx(client, exchange, status):
+    # The exchange may have accepted it: raise with the id to reconcile instead of placing it twice
+    exchange.script.append((status, {}, {"error": "gateway timeout"}))
+    with pytest.raises(OrderError) as err:
+        client.place_order("BUY", "BTC-USD", "0.01")
+    assert err.value.status == status
+    assert len(exchange.requests) == 1
+    assert err.value.client_order_id == json.loads(exchange.requests[0][3])["client_order_id"]
+
+
+def test_retry_resends_the_same_order(client, exchange):
+    exchange.script.append((429, {"Retry-After": "0"}, {"error": "rate limited"}))
+    client.place_order("BUY", "BTC-USD", "0.01")
+    first, second = (raw for *_, raw in exchange.requests)
+    assert first == second
+
+
+def test_orders_get_distinct_client_ids(client, exchange):
+    client.place_orders([("BUY", "BTC-USD", "0.01")] * 3 + [{"side": "SELL", "product_id": "ETH-USD",
+                                                              "size": "0.1", "client_order_id": "mine"}])
+    ids = [json.loads(raw)["client_order_id"] for *_, raw in exchange.requests]
+    assert len(set(ids)) == 4 and "mine" in ids
+
+
+def test_idempotent_requests_retry_5xx_then_give_up(client, exchange):
+    exchange.script.extend([(503, {}, {"error": "busy"})] * 4)
+    with pytest.raises(OrderError) as err:
+        client.request("GET", ORDER_PATH + "/historical/batch")
+    assert err.value.status == 503
+    assert len(exchange.requests) == client.max_retries + 1
+
+
+def test_client_error_is_not_retried(client, exchange):
+    exchange.script.append((400, {}, {"error": "bad size"}))
+    with pytest.raises(OrderError) as err:
+        client.place_order("BUY", "BTC-USD", "-1")
+    assert err.value.status == 400
+    assert len(exchange.requests) == 1
+
+
+def test_batch_keeps_order_and_failures_in_place(client, exchange):
+    exchange.script.append((400, {}, {"error": "rejected"}))
+    orders = [("BUY", "BTC-USD", "0.01"), {"side": "SELL", "product_id": "ETH-USD", "size": "0.1"}]
+    client.max_concurrency = 1  # serial, so the scripted 400 hits the first order
+    results = client.place_orders(orders)
+    assert isinstance(results[0], OrderError)
+    assert results[1]["order_id"].startswith("ETH-USD")
+
+
+def test_async_client_does_not_resend_after_5xx(exchange):
+    pytest.importorskip("aiohttp")
+    exchange.script.append((502, {}, {"error": "bad gateway"}))
+
+    async def run():
+        async with AsyncOrderClient(exchange.url, "key", SECRET, "pass", backoff=0.01) as client:
+            return await client.place_orders([("BUY", "BTC-USD", "0.01")])
+
+    [result] = asyncio.run(run())
+    assert isinstance(result, OrderError) and result.status == 502
+    assert len(exchange.requests) == 1
+
+
+def test_async_client(exchange):
+    pytest.importorskip("aiohttp")
+    exchange.script.append((429, {"Retry-After": "0.2"}, {"error": "rate limited"}))
+
+    async def run():
+        async with AsyncOrderClient(exchange.url, "key", SECRET, "pass", backoff=0.01) as client:
+            return await client.place_orders([("BUY", "BTC-USD", "0.01"), ("SELL", "ETH-USD", "0.1")])
+
+    results = asyncio.run(run())
+    assert all(r["success"] for r in results)
+    assert len(exchange.requests) == 3
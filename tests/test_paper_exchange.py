@@ -0,0 +1,156 @@
+"""PaperExchange matching: price-time priority, partial fills, average-cost PnL and self-trade prevention."""
+
+import pytest
+
+from paper_exchange import BUY, CANCELLED, FILLED, OPEN, PARTIAL, REJECTED, SELL, Account, PaperExchange
+
+
+def book_only(**kwargs):
+    """An exchange that fills only against its own book, without fees."""
+    return PaperExchange(fee_bps=0.0, slippage_bps=0.0, reference_liquidity=False, **kwargs)
+
+
+# ================================
+# MATCHING
+# ================================
+def test_best_price_first_then_first_come():
+    exchange = book_only()
+    a = exchange.submit(SELL, "BTC-USD", 1, 101, account="a")
+    b = exchange.submit(SELL, "BTC-USD", 2, 100, account="b")
+    c = exchange.submit(SELL, "BTC-USD", 1, 100, account="c")
+    d = exchange.submit(SELL, "BTC-USD", 1, 102, account="d")
+    assert exchange.book("BTC-USD").best_ask() == 100
+
+    taker = exchange.submit(BUY, "BTC-USD", 3.5, 101, account="t")
+    assert taker.status == FILLED
+    assert taker.average_price == pytest.approx((2 * 100 + 1 * 100 + 0.5 * 101) / 3.5)
+    assert (b.status, c.status, a.status, d.status) == (FILLED, FILLED, PARTIAL, OPEN)
+    assert a.remaining == 0.5 and d.remaining == 1
+    assert exchange.book("BTC-USD").depth(SELL) == [(101, 0.5), (102, 1)]
+    assert [o.order_id for o in exchange.open_orders()] == [a.order_id, d.order_id]
+
+
+def test_bids_match_highest_first():
+    exchange = book_only()
+    low = exchange.submit(BUY, "BTC-USD", 1, 99, account="a")
+    first = exchange.submit(BUY, "BTC-USD", 1, 100, account="b")
+    second = exchange.submit(BUY, "BTC-USD", 1, 100, account="c")
+    taker = exchange.submit(SELL, "BTC-USD", 1.5, account="t")   # market order
+    assert taker.status == FILLED and taker.average_price == 100
+    assert (first.status, second.status, low.status) == (FILLED, PARTIAL, OPEN)
+    assert exchange.book("BTC-USD").depth(BUY) == [(100, 0.5), (99, 1)]
+
+
+def test_partial_fill_rests_the_remainder():
+    exchange = book_only()
+    exchange.submit(SELL, "BTC-USD", 2, 100, account="a")
+    exchange.submit(SELL, "BTC-USD", 1, 105, account="a")
+    order = exchange.submit(BUY, "BTC-USD", 5, 101, account="t")
+    assert order.status == PARTIAL and order.filled_size == 2 and order.remaining == 3
+    assert exchange.book("BTC-USD").best_bid() == 101
+    assert exchange.open_orders("t") == [order]
+    # The mark trading down to the bid fills the rest at its limit, as maker
+    exchange.update_price("BTC-USD", 101.5)
+    assert order.status == PARTIAL
+    exchange.update_price("BTC-USD", 101)
+    assert order.status == FILLED and order.average_price == pytest.approx((2 * 100 + 3 * 101) / 5)
+    assert exchange.open_orders("t") == [] and exchange.accounts["t"].positions["BTC-USD"] == 5
+
+
+def test_market_order_without_liquidity():
+    exchange = book_only()
+    assert exchange.submit(BUY, "BTC-USD", 1, account="t").status == REJECTED
+    exchange.submit(SELL, "BTC-USD", 0.4, 100, account="a")
+    order = exchange.submit(BUY, "BTC-USD", 1, account="t")
+    assert order.status == PARTIAL and order.filled_size == 0.4
+    assert exchange.open_orders() == []   # market orders never rest
+
+
+def test_reference_quote_fills_what_the_book_cannot():
+    exchange = PaperExchange(fee_bps=10.0, spread_bps=10.0, slippage_bps=5.0)
+    exchange.update_price("BTC-USD", 100.0)
+    assert exchange.submit(SELL, "BTC-USD", 1, 100.05, account="a").status == OPEN   # above the bid side
+    order = exchange.submit(BUY, "BTC-USD", 3, account="t")
+    assert order.status == FILLED
+    assert order.average_price == pytest.approx((100.05 + 2 * 100 * (1 + 0.0005 + 0.0005)) / 3)
+    assert order.fees == pytest.approx(order.filled_value * 0.001)
+    # A limit below the reference quote rests instead
+    assert exchange.submit(BUY, "BTC-USD", 1, 100, account="t").status == OPEN
+
+
+# ================================
+# ACCOUNTS
+# ================================
+def test_average_cost_pnl():
+    account = Account("a", cash=1000.0)
+    account.apply_fill("BTC-USD", BUY, 2, 100.0, 1.0)
+    account.apply_fill("BTC-USD", BUY, 2, 110.0, 1.0)
+    assert account.avg_price["BTC-USD"] == 105.0 and account.realized == 0.0
+    assert account.unrealized({"BTC-USD": 120.0}) == 4 * 15.0
+
+    account.apply_fill("BTC-USD", SELL, 1, 120.0, 1.0)    # realizes 1 * (120 - 105)
+    assert account.realized == 15.0 and account.avg_price["BTC-USD"] == 105.0
+    account.apply_fill("BTC-USD", SELL, 5, 100.0, 1.0)    # closes 3 at a loss of 5, opens 2 short at 100
+    assert account.realized == 0.0
+    assert account.positions["BTC-USD"] == -2 and account.avg_price["BTC-USD"] == 100.0
+    assert account.unrealized({"BTC-USD": 90.0}) == 20.0
+
+    account.apply_fill("BTC-USD", BUY, 1, 90.0, 1.0)
+    account.apply_fill("BTC-USD", BUY, 1, 95.0, 1.0)
+    assert account.realized == 10.0 + 5.0 and account.positions["BTC-USD"] == 0.0
+    assert account.fees == 6.0 and account.fills == 6
+    assert account.cash == 1000 - 200 - 220 + 120 + 500 - 90 - 95 - 6
+    assert account.pnl({"BTC-USD": 1e6}) == account.realized - account.fees
+
+
+def test_bound_agent_follows_its_equity():
+    class Agent:
+        name, capital, profit = "agent", 500.0, 0.0
+
+    agent = Agent()
+    exchange = PaperExchange(fee_bps=0.0, slippage_bps=0.0)
+    client = exchange.bind(agent)
+    exchange.update_price("BTC-USD", 100.0)
+    client.place_order(BUY, "BTC-USD", "2")
+    exchange.update_price("BTC-USD", 110.0)
+    assert exchange.mark_to_market("agent") == 520.0
+    assert agent.capital == 520.0 and agent.profit == 20.0
+
+
+# ================================
+# SELF-TRADE PREVENTION
+# ================================
+def test_self_trade_cancels_the_resting_order():
+    exchange = book_only()
+    own = exchange.submit(SELL, "BTC-USD", 1, 100, account="a")
+    other = exchange.submit(SELL, "BTC-USD", 1, 101, account="b")
+    order = exchange.submit(BUY, "BTC-USD", 2, 101, account="a")
+    assert own.status == CANCELLED and other.status == FILLED
+    assert order.status == PARTIAL and order.filled_size == 1 and order.average_price == 101
+    account = exchange.accounts["a"]
+    assert account.fills == 1 and account.positions["BTC-USD"] == 1 and account.cash == 1000 - 101
+    assert exchange.open_orders("a") == [order] and exchange.book("BTC-USD").best_ask() is None
+
+
+def test_self_trade_cancels_the_incoming_order():
+    exchange = book_only(self_trade="cancel_incoming")
+    other = exchange.submit(SELL, "BTC-USD", 1, 99, account="b")
+    own = exchange.submit(SELL, "BTC-USD", 1, 100, account="a")
+    order = exchange.submit(BUY, "BTC-USD", 2, 101, account="a")
+    assert other.status == FILLED and own.status == OPEN
+    assert order.status == CANCELLED and order.filled_size == 1 and order.average_price == 99
+    assert exchange.open_orders("a") == [own] and exchange.book("BTC-USD").best_bid() is None
+    assert exchange.accounts["a"].fills == 1
+
+
+def test_self_trade_is_not_filled_from_the_reference_quote():
+    exchange = PaperExchange(self_trade="cancel_incoming")
+    exchange.update_price("BTC-USD", 100.0)
+    exchange.submit(SELL, "BTC-USD", 1, 100.5, account="a")
+    order = exchange.submit(BUY, "BTC-USD", 1, account="a")
+    assert order.status == CANCELLED and order.filled_size == 0
+
+
+def test_unknown_self_trade_policy():
+    with pytest.raises(ValueError):
+        PaperExchange(self_trade="allow")
@@ -0,0 +1,124 @@
+"""Regime estimates match NumPy, regime switches need confirmation, and the shared book skips pushed bars."""
+
+import math
+
+import numpy as np
+import pytest
+
+from regime import RegimeBook, RegimeDetector
+
+WINDOW = 50
+LAM = 0.94
+
+
+@pytest.fixture(scope="module")
+def prices():
+    rng = np.random.default_rng(3)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0.0005, 0.01, 737)))
+
+
+def detector_after(prices, n):
+    detector = RegimeDetector({"window": WINDOW, "ewma_lambda": LAM})
+    for price in prices[:n]:
+        detector.update(price)
+    return detector
+
+
+@pytest.mark.parametrize("n", [WINDOW + 1, 2 * WINDOW + 1, 3 * WINDOW + 7, 737])   # before, at and past a wrap
+def test_estimates_match_numpy(prices, n):
+    detector = detector_after(prices, n)
+    p = prices[:n]
+    returns = np.diff(np.log(p))
+    window = returns[-WINDOW:]
+    assert detector.realized_var == pytest.approx(np.sum(window ** 2), rel=1e-12)
+    assert detector.realized_vol == pytest.approx(np.sqrt(np.mean(window ** 2)), rel=1e-12)
+    moves = np.abs(np.diff(p))[-WINDOW:]
+    assert detector.trend_strength == pytest.approx(abs(p[-1] - p[-WINDOW - 1]) / moves.sum(), rel=1e-12)
+    assert detector.direction == np.sign(p[-1] - p[-WINDOW - 1])
+    weights = (1 - LAM) * LAM ** np.arange(len(returns))[::-1]
+    ewma = np.sum(weights * returns ** 2) / (1 - LAM ** len(returns))
+    assert detector.ewma_vol == pytest.approx(math.sqrt(ewma), rel=1e-9)
+    assert detector.price_std.value == pytest.approx(np.std(p[-WINDOW:], ddof=1), rel=1e-9)
+
+
+def test_no_regime_until_the_window_is_full(prices):
+    assert detector_after(prices, WINDOW).regime is None
+    assert detector_after(prices, WINDOW + 1).regime in ("trend", "volatility", "momentum", "hybrid")
+
+
+class Scripted(RegimeDetector):
+    """A detector whose efficiency ratio and volatility ratio are set by the test."""
+    __slots__ = ("efficiency", "ratio")
+    trend_strength = property(lambda self: self.efficiency)
+    vol_ratio = property(lambda self: self.ratio)
+
+    def step(self, efficiency, ratio=1.0):
+        self.efficiency, self.ratio = efficiency, ratio
+        self._classify()
+        return self.regime
+
+
+def test_hysteresis_between_enter_and_exit():
+    detector = Scripted({"confirm": 3})
+    assert detector.step(0.5) == "trend"              # the first regime needs no confirmation
+    # Between trend's exit (0.3) and enter (0.4): still trend
+    assert [detector.step(e) for e in (0.35, 0.31, 0.39)] == ["trend"] * 3
+    assert detector.candidate is None
+    # Momentum for two updates, then trend again: the streak starts over
+    assert [detector.step(e) for e in (0.29, 0.29, 0.35)] == ["trend"] * 3
+    assert [detector.step(0.29) for _ in range(3)] == ["trend", "trend", "momentum"]
+    assert detector.switches == 1
+    # Now momentum holds down to its exit (0.15), and trend needs its enter (0.4) again
+    assert [detector.step(e) for e in (0.2, 0.16, 0.39, 0.38)] == ["momentum"] * 4
+    assert detector.step(0.2, ratio=1.2) == "momentum"   # volatility below its enter (1.3)
+
+
+def test_alternating_candidates_never_switch():
+    detector = Scripted({"confirm": 3})
+    detector.step(0.3)
+    assert detector.regime == "momentum"
+    # Volatility and hybrid take turns as the candidate: neither holds for `confirm` updates
+    for i in range(50):
+        assert detector.step(0.05, ratio=1.5 if i % 2 else 1.0) == "momentum"
+    assert detector.switches == 0
+    assert [detector.step(0.05, ratio=1.5) for _ in range(3)][-1] == "volatility"
+
+
+def test_switch_happens_after_exactly_confirm_updates():
+    for confirm in (1, 5, 10):
+        detector = Scripted({"confirm": confirm})
+        detector.step(0.05)
+        regimes = [detector.step(0.9) for _ in range(confirm)]
+        assert regimes == ["hybrid"] * (confirm - 1) + ["trend"]
+
+
+def test_book_skips_bars_already_pushed():
+    book = RegimeBook({"window": 5})
+    detector = book.update("BTC-USD", [1.0, 2.0, 3.0], ts=[10, 20, 30])
+    assert book.update("BTC-USD", [2.0, 3.0, 4.0, 5.0], ts=[20, 30, 40, 50]) is detector
+    assert detector.history.values() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    # Nothing new: older, equal or no bars
+    book.update("BTC-USD", [1.0, 2.0], ts=[10, 20])
+    book.update("BTC-USD", [5.0], ts=[50])
+    book.update("BTC-USD", [], ts=[])
+    assert detector.ticks == 4 and detector.last_ts == 50
+    # Without timestamps every price is pushed
+    book.update("BTC-USD", [6.0, 7.0])
+    assert detector.history.values()[-3:] == [5.0, 6.0, 7.0]
+    # Another key has its own detector
+    assert book.update("ETH-USD", [1.0], ts=[10]) is not detector
+
+
+def test_batch_agent_without_a_store_pushes_one_bar_per_call(monkeypatch):
+    pytest.importorskip("dotenv")
+    pytest.importorskip("pandas_ta")
+    import AAA
+    monkeypatch.setattr(AAA, "market_store", None)
+    monkeypatch.setitem(AAA.CONFIG, "INDICATOR_BACKEND", "batch")
+    agent = AAA.TradingAgent("RegimeBatchAgent", symbol="BTC-USD")
+    agent.evaluate_trade_signal()
+    assert len(agent.regime.history.values()) == AAA.TRAINING_BARS
+    for calls in range(1, 4):
+        agent.evaluate_trade_signal()
+        assert len(agent.regime.history.values()) == min(AAA.TRAINING_BARS + calls, agent.regime.history.size)
+        assert agent.regime.history.last() == agent.market_data['price'].iloc[-1]
@@ -0,0 +1,78 @@
+"""ReplayEngine merges bars and timers in time order, bars first on ties, with the clock at each event's time."""
+
+import numpy as np
+
+from clocks import SimClock, WallClock, get_clock
+from replay import ReplayEngine, replay_running
+
+T0 = 1_717_200_000   # 2024-06-01T00:00:00Z
+
+
+def recorder(events, label):
+    def record(*args):
+        events.append((get_clock().time(), label) + args)
+    return record
+
+
+def test_events_run_in_time_order_bars_first_on_ties():
+    events = []
+    engine = ReplayEngine(start=0, end=15)
+    engine.every(5, recorder(events, "timer"))             # registered before the bars
+    engine.feed("A", [0, 5, 10], [1.0, 2.0, 3.0], recorder(events, "bar"))
+    engine.feed("B", [5, 10, 15], [10.0, 20.0, 30.0], recorder(events, "bar"))
+    engine.at(10, recorder(events, "once"))
+    stats = engine.run()
+    assert events == [
+        (0.0, "bar", "A", 1.0),
+        (5.0, "bar", "A", 2.0), (5.0, "bar", "B", 10.0), (5.0, "timer"),
+        (10.0, "bar", "A", 3.0), (10.0, "bar", "B", 20.0), (10.0, "timer"), (10.0, "once"),
+        (15.0, "bar", "B", 30.0), (15.0, "timer"),
+    ]
+    assert stats == {"time": 15.0, "bars": 6, "ticks": 4, "errors": 0}
+
+
+def test_timers_on_ties_keep_registration_order():
+    events = []
+    engine = ReplayEngine(start=0, end=6)
+    engine.every(3, recorder(events, "slow"))
+    engine.every(2, recorder(events, "fast"))
+    engine.every(3, recorder(events, "late"), first=3)
+    engine.run()
+    assert events == [(2.0, "fast"), (3.0, "slow"), (3.0, "late"), (4.0, "fast"),
+                      (6.0, "slow"), (6.0, "fast"), (6.0, "late")]
+
+
+def test_only_bars_between_start_and_end_are_fed():
+    events = []
+    engine = ReplayEngine(start=T0 + 10, end=T0 + 20)
+    ts_ns = (T0 + np.array([5, 10, 15, 20, 25], dtype=np.int64)) * 10**9   # recorded in nanoseconds
+    engine.feed("A", ts_ns, [5.0, 10.0, 15.0, 20.0, 25.0], recorder(events, "bar"))
+    engine.run()
+    assert events == [(T0 + 10.0, "bar", "A", 10.0), (T0 + 15.0, "bar", "A", 15.0), (T0 + 20.0, "bar", "A", 20.0)]
+
+
+def test_run_until_stops_and_resumes():
+    events = []
+    engine = ReplayEngine(start=0)
+    engine.feed("A", [1, 2, 3, 4], [1.0, 2.0, 3.0, 4.0], recorder(events, "bar"))
+    assert engine.run(until=2.5)["bars"] == 2
+    assert engine.clock.time() == 2.5
+    assert engine.run()["bars"] == 4
+    assert [e[0] for e in events] == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_clock_is_installed_only_while_running():
+    seen = []
+    engine = ReplayEngine(start=100, end=101)
+
+    def broken():
+        seen.append((get_clock(), replay_running()))
+        raise RuntimeError("boom")
+
+    engine.every(1, broken)
+    before = get_clock()
+    assert not replay_running()
+    stats = engine.run()
+    assert seen == [(engine.clock, True)] and isinstance(engine.clock, SimClock)
+    assert stats["errors"] == 1 and stats["ticks"] == 1
+    assert get_clock() is before and isinstance(before, WallClock)
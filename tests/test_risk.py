@@ -0,0 +1,164 @@
+"""Pre-trade risk checks: order limits, rate, drawdown, kill switch, mint caps and the guarded client."""
+
+from decimal import Decimal
+
+import pytest
+
+from clocks import SimClock, set_clock
+from risk import GuardedClient, MintLimits, RiskEngine, RiskLimits, RiskRejected
+
+
+@pytest.fixture
+def clock():
+    clock = SimClock(start=1000.0)
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
+
+
+def engine(**limits):
+    return RiskEngine(RiskLimits(**limits))
+
+
+def test_position_limit_still_lets_a_position_shrink(clock):
+    risk = engine(max_position=1.0)
+    assert risk.check_order("A", "BUY", "BTC-USD", 0.6, 100.0) is None
+    assert risk.check_order("A", "BUY", "BTC-USD", 0.6, 100.0) == "position"
+    assert risk.check_order("A", "SELL", "BTC-USD", 0.4, 100.0) is None
+    assert risk.check_order("A", "BUY", "BTC-USD", 0.8, 100.0) is None
+    assert risk.snapshot()["agents"]["A"]["positions"] == {"BTC-USD": pytest.approx(1.0)}
+    # Another agent has its own book
+    assert risk.check_order("B", "BUY", "BTC-USD", 1.0, 100.0) is None
+
+
+def test_notional_limits(clock):
+    risk = engine(max_notional=1000.0, max_order_notional=600.0)
+    assert risk.check_order("A", "BUY", "BTC-USD", 7, 100.0) == "order notional"
+    assert risk.check_order("A", "BUY", "BTC-USD", 5, 100.0) is None
+    assert risk.check_order("A", "BUY", "ETH-USD", 5, 100.0) is None
+    assert risk.check_order("A", "BUY", "ETH-USD", 1, 100.0) == "notional"
+    # Reducing orders go through the notional limit
+    assert risk.check_order("A", "SELL", "ETH-USD", 2, 100.0) is None
+    assert risk.snapshot()["agents"]["A"]["notional"] == pytest.approx(800.0)
+
+
+def test_market_order_without_a_mark_fails_closed_under_notional_limits(clock):
+    risk = engine(max_notional=1000.0)
+    assert risk.check_order("A", "BUY", "BTC-USD", 100) == "no price"
+    risk.update_price("BTC-USD", 100.0)
+    assert risk.check_order("A", "BUY", "BTC-USD", 100) == "notional"
+    assert risk.check_order("A", "BUY", "BTC-USD", 5) is None
+    # Without a notional limit the mark is not needed
+    assert engine(max_position=10).check_order("A", "BUY", "ETH-USD", 1) is None
+    global_only = RiskEngine(global_limits=RiskLimits(max_notional=1000.0))
+    assert global_only.check_order("A", "BUY", "ETH-USD", 1) == "no price"
+
+
+def test_token_bucket_refills_on_the_session_clock(clock):
+    risk = engine(max_orders_per_sec=2, burst=3)
+    assert [risk.check_order("A", "BUY", "BTC-USD", 1, 1.0) for _ in range(4)] == [None, None, None, "order rate"]
+    clock.advance(0.25)
+    assert risk.check_order("A", "BUY", "BTC-USD", 1, 1.0) == "order rate"
+    clock.advance(0.25)
+    assert risk.check_order("A", "BUY", "BTC-USD", 1, 1.0) is None
+    # Refills stop at the burst
+    clock.advance(60)
+    assert [risk.check_order("A", "BUY", "BTC-USD", 1, 1.0) for _ in range(4)] == [None, None, None, "order rate"]
+    assert risk.rejections["order rate"] == 3
+
+
+def test_drawdown_halts_new_risk_but_not_reductions(clock):
+    risk = engine(max_drawdown=0.1)
+    assert risk.check_order("A", "BUY", "BTC-USD", 2, 100.0) is None
+    risk.update_equity("A", 1000.0)
+    risk.update_equity("A", 1200.0)
+    risk.update_equity("A", 1090.0)
+    assert risk.snapshot()["agents"]["A"]["halted"] is None
+    risk.update_equity("A", 1070.0)
+    halted = risk.snapshot()["agents"]["A"]["halted"]
+    assert halted.startswith("A drawdown")
+    assert risk.check_order("A", "BUY", "BTC-USD", 1, 100.0) == halted
+    assert risk.check_order("A", "SELL", "BTC-USD", 5, 100.0) == halted   # flips to a bigger short
+    assert risk.check_order("A", "SELL", "BTC-USD", 1, 100.0) is None
+    # Recovering equity does not lift the halt; resume() does
+    risk.update_equity("A", 1300.0)
+    assert risk.check_order("A", "BUY", "BTC-USD", 1, 100.0) == halted
+    risk.resume()
+    assert risk.check_order("A", "BUY", "BTC-USD", 1, 100.0) is None
+    assert risk.check_order("B", "BUY", "BTC-USD", 1, 100.0) is None
+
+
+def test_kill_file_stops_orders_and_mints(clock, tmp_path):
+    kill_file = str(tmp_path / "KILL")
+    risk = RiskEngine(kill_file=kill_file, kill_check_interval=5.0)
+    assert risk.check_order("A", "BUY", "BTC-USD", 1, 1.0) is None
+    with open(kill_file, "w") as f:
+        f.write("operator stop\n")
+    # Only looked at every kill_check_interval seconds
+    assert risk.check_order("A", "BUY", "BTC-USD", 1, 1.0) is None
+    clock.advance(5.0)
+    assert risk.check_order("A", "SELL", "BTC-USD", 1, 1.0) == "killed: operator stop"
+    assert risk.check_mint("ERC3525", 1, Decimal("5")) == Decimal("0")
+    risk.resume()
+    assert not (tmp_path / "KILL").exists()
+    assert risk.check_order("A", "SELL", "BTC-USD", 1, 1.0) is None
+
+    # kill() propagates to other processes through the file
+    RiskEngine(kill_file=kill_file).kill("from elsewhere")
+    clock.advance(5.0)
+    assert risk.check_order("A", "BUY", "BTC-USD", 1, 1.0) == "killed: from elsewhere"
+
+
+def test_check_mint_clips_to_the_per_mint_cap_and_the_window(clock):
+    risk = RiskEngine(mint_limits={"*": MintLimits(max_per_mint=30, max_per_window=50, window=60.0),
+                                   2: MintLimits(max_per_mint=1.5)})
+    clipped = risk.check_mint("ERC3525", 1, Decimal("45.5"))
+    assert clipped == Decimal("30") and isinstance(clipped, Decimal)
+    assert risk.check_mint("ERC3525", 1, Decimal("25")) == Decimal("20")
+    assert risk.check_mint("ERC3525", 1, Decimal("1")) == Decimal("0")
+    assert risk.check_mint("ERC3525", 1, 7) == 0
+    # Slots have their own windows, and their own limits when configured
+    assert risk.check_mint("ERC3525", 3, 10) == 10
+    assert risk.check_mint("ERC3525", 2, Decimal("2.25")) == Decimal("1.5")
+    assert risk.check_mint("ERC3525", 2, 1.25) == 1.25
+    clock.advance(60.0)
+    assert risk.check_mint("ERC3525", 1, Decimal("12")) == Decimal("12")
+    assert risk.snapshot()["mint_used"][1] == 12.0
+    assert risk.rejections["mint cap slot 1"] == 2 and risk.rejections["mint budget slot 1"] == 2
+
+
+class FakeClient:
+    """Fills every order it is sent by half, or fails the ones for FAIL-USD."""
+
+    def __init__(self):
+        self.sent = []
+
+    def place_orders(self, orders):
+        self.sent.append(list(orders))
+        return [RuntimeError("rejected by exchange") if order[1] == "FAIL-USD"
+                else {"product_id": order[1], "filled_size": float(order[2]) / 2} for order in orders]
+
+
+def test_guarded_client_keeps_rejections_in_place(clock):
+    risk = engine(max_position=2.0)
+    client = FakeClient()
+    guarded = GuardedClient(client, risk, "A")
+    results = guarded.place_orders([
+        ("BUY", "BTC-USD", 1.0, 100.0),
+        ("BUY", "ETH-USD", 5.0, 10.0),                                           # over max_position
+        {"side": "BUY", "product_id": "FAIL-USD", "size": 1.0, "price": 1.0},
+        ("BUY", "SOL-USD", 2.0, 20.0),
+    ])
+    # Only the accepted orders reach the client, in order
+    assert [order[1] for order in client.sent[0]] == ["BTC-USD", "FAIL-USD", "SOL-USD"]
+    assert results[0] == {"product_id": "BTC-USD", "filled_size": 0.5}
+    assert isinstance(results[1], RiskRejected) and results[1].reason == "position"
+    assert isinstance(results[2], RuntimeError)
+    assert results[3] == {"product_id": "SOL-USD", "filled_size": 1.0}
+    # Positions count fills only: the unfilled halves and the failed order are backed out
+    assert risk.snapshot()["agents"]["A"]["positions"] == {"BTC-USD": 0.5, "SOL-USD": 1.0}
+    assert risk.snapshot()["agents"]["A"]["notional"] == pytest.approx(70.0)
+    assert risk.accepted == 3 and risk.rejections["position"] == 1
+
+    assert guarded.place_orders([("BUY", "ETH-USD", 5.0, 10.0)])[0].reason == "position"
+    assert len(client.sent) == 1   # an all-rejected batch never reaches the client
@@ -0,0 +1,150 @@
+"""AgentScheduler: the tick grid and its jitter, skipped deadlines, backends, and the session clock."""
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from clocks import ScaledClock, SimClock
+from scheduler import AgentScheduler
+
+
+def recorder(times, clock=time.monotonic):
+    def tick():
+        times.append(clock())
+    return tick
+
+
+def gaps(times):
+    return [b - a for a, b in zip(times, times[1:])]
+
+
+def test_jittered_ticks_stay_on_the_grid():
+    scheduler = AgentScheduler(seed=1)
+    ticks = {name: [] for name in ("a", "b", "c")}
+    for name, times in ticks.items():
+        scheduler.add(name, recorder(times), interval=0.05, jitter=0.02)
+    started = time.monotonic()
+    stats = scheduler.start(duration=0.6)
+    for name, times in ticks.items():
+        assert 10 <= len(times) <= 13 and stats[name]["ticks"] == len(times) and stats[name]["missed"] == 0
+        # Each tick is on start + k * interval plus up to 2 * jitter (stagger and per-tick), never drifting
+        for k, t in enumerate(times):
+            assert 0.05 * k - 0.005 <= t - started <= 0.05 * k + 0.04 + 0.03
+        assert all(0.05 - 0.02 - 0.01 <= gap <= 0.05 + 0.02 + 0.02 for gap in gaps(times))
+    # The first ticks are staggered
+    assert len({round(times[0], 4) for times in ticks.values()}) == 3
+
+
+def test_seed_makes_the_jitter_reproducible():
+    def offsets(seed):
+        scheduler = AgentScheduler(seed=seed)
+        times = []
+        scheduler.add("a", recorder(times), interval=0.02, jitter=0.01)
+        started = time.monotonic()
+        scheduler.start(duration=0.01)
+        return [round(t - started, 2) for t in times]
+    assert offsets(5) == offsets(5)
+
+
+def test_slow_tick_skips_the_slots_it_ran_through():
+    scheduler = AgentScheduler()
+    times = []
+
+    def slow():
+        times.append(time.monotonic())
+        time.sleep(0.125)
+
+    scheduler.add("slow", slow, interval=0.05, deadline=0.1)
+    stats = scheduler.start(duration=0.6)["slow"]
+    # One tick every three slots: the covered slots are missed rather than fired back to back
+    assert 3 <= stats["ticks"] <= 5 and stats["overruns"] == stats["ticks"]
+    assert stats["missed"] >= 2 * (stats["ticks"] - 1)
+    assert all(gap >= 0.14 for gap in gaps(times))
+
+
+def test_slot_past_its_deadline_is_dropped():
+    scheduler = AgentScheduler()
+    fast = []
+
+    async def hog():
+        time.sleep(0.2)   # blocks the event loop itself
+
+    scheduler.add("fast", recorder(fast), interval=0.02, deadline=0.01, backend="async")
+    scheduler.add("hog", hog, interval=10)
+    stats = scheduler.start(duration=0.4)
+    # Slots that came due while the loop was blocked are dropped on waking, not run late
+    assert stats["fast"]["missed"] >= 5
+    assert stats["fast"]["ticks"] + stats["fast"]["missed"] <= 0.4 / 0.02 + 2
+    assert stats["hog"]["ticks"] == 1
+
+
+def where():
+    return os.getpid(), threading.get_ident()
+
+
+def test_backends_run_ticks_where_they_should():
+    scheduler = AgentScheduler()
+    results = {}
+    loop_thread = []
+
+    async def on_loop():
+        loop_thread.append(threading.get_ident())
+        return where()
+
+    def on_result(name, result):
+        results.setdefault(name, result)
+
+    scheduler.add("thread", where, interval=0.05, on_result=on_result)
+    scheduler.add("async", on_loop, interval=0.05, on_result=on_result)
+    scheduler.add("process", where, interval=0.05, backend="process", on_result=on_result)
+    stats = scheduler.start(duration=1.0)
+    assert scheduler.agents["thread"].backend == "thread" and scheduler.agents["async"].backend == "async"
+    assert all(s["ticks"] and not s["errors"] for s in stats.values()), stats
+    me = os.getpid()
+    assert results["async"] == (me, loop_thread[0])
+    assert results["thread"][0] == me and results["thread"][1] != loop_thread[0]
+    assert results["process"][0] != me
+
+
+def test_errors_are_counted_and_ticking_goes_on():
+    scheduler = AgentScheduler()
+
+    def broken():
+        raise RuntimeError("boom")
+
+    scheduler.add("broken", broken, interval=0.02)
+    stats = scheduler.start(duration=0.15)["broken"]
+    assert stats["errors"] == stats["ticks"] >= 5
+
+
+def test_intervals_are_session_clock_seconds():
+    clock = ScaledClock(speed=50)
+    scheduler = AgentScheduler(clock=clock)
+    times = []
+    scheduler.add("a", recorder(times, clock.monotonic), interval=1.0, deadline=0.5)
+    started = time.monotonic()
+    stats = scheduler.start(duration=10.0)["a"]
+    assert time.monotonic() - started < 0.5          # 10 clock seconds at 50x
+    assert 9 <= stats["ticks"] <= 11 and stats["missed"] == 0
+    assert all(0.8 <= gap <= 1.2 for gap in gaps(times))
+
+
+def test_simulated_clock_is_refused():
+    scheduler = AgentScheduler(clock=SimClock())
+    scheduler.add("a", lambda: None, interval=1.0)
+    with pytest.raises(ValueError, match="ReplayEngine"):
+        asyncio.run(scheduler.run(1.0))
+
+
+def test_add_validates():
+    scheduler = AgentScheduler()
+    scheduler.add("a", lambda: None, interval=1)
+    with pytest.raises(ValueError):
+        scheduler.add("a", lambda: None, interval=1)
+    with pytest.raises(ValueError):
+        scheduler.add("b", lambda: None, interval=0)
+    with pytest.raises(ValueError):
+        scheduler.add("c", lambda: None, interval=1, backend="gpu")
@@ -0,0 +1,162 @@
+"""SlotMonitor batched reads against an eth-tester chain behind a local JSON-RPC endpoint."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from slot_monitor import (AGGREGATE3_SELECTOR, SLOT_BALANCE_SELECTOR, SlotMonitor, decode_aggregate3,
+                          encode_aggregate3, encode_slot_balance)
+
+pytest.importorskip("web3")
+pytest.importorskip("eth_tester")
+
+# Runtime returns its first calldata argument, so slotBalance(slot) == slot.
+ECHO_BYTECODE = "0x600b600c600039600b6000f3" + "600435600052602060" + "00f3"
+# Runtime reverts on every call.
+REVERT_BYTECODE = "0x6005600c60003960056000f3" + "60006000fd"
+
+
+def _rpc_value(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return value
+
+
+class Node:
+    """eth-tester chain served over HTTP JSON-RPC (single and batch requests)."""
+
+    def __init__(self):
+        from web3 import EthereumTesterProvider, Web3
+        self.web3 = Web3(EthereumTesterProvider())
+        self.account = self.web3.eth.accounts[0]
+        self.echo = self.deploy(ECHO_BYTECODE)
+        self.reverter = self.deploy(REVERT_BYTECODE)
+        self.batches = []
+        lock = threading.Lock()
+        node = self
+
+        def call(request):
+            params = request.get("params", [])
+            if request["method"] == "eth_call" and "from" not in params[0]:
+                params = [dict(params[0], **{"from": node.account})] + params[1:]
+            out = {"jsonrpc": "2.0", "id": request.get("id")}
+            try:
+                with lock:
+                    reply = node.web3.provider.make_request(request["method"], params)
+            except Exception as e:  # eth-tester raises where a node answers with an error
+                return dict(out, error={"code": 3, "message": str(e)})
+            if "error" in reply:
+                out["error"] = reply["error"]
+            else:
+                out["result"] = _rpc_value(reply.get("result"))
+            return out
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                node.batches.append(len(payload) if isinstance(payload, list) else 1)
+                reply = [call(r) for r in payload] if isinstance(payload, list) else call(payload)
+                body = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def deploy(self, bytecode):
+        tx_hash = self.web3.eth.send_transaction({"from": self.account, "data": bytecode})
+        return self.web3.eth.wait_for_transaction_receipt(tx_hash)["contractAddress"]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(scope="module")
+def node():
+    node = Node()
+    yield node
+    node.close()
+
+
+def test_reads_slots_and_header_in_one_round_trip(node):
+    monitor = SlotMonitor(node.url, node.echo, node.account, slots=[1, 2, 3, 2**64])
+    node.batches.clear()
+    snapshot = monitor.read()
+    assert monitor.round_trips == 1
+    assert node.batches == [3 + 4]
+    assert snapshot.balances == {1: 1, 2: 2, 3: 3, 2**64: 2**64}
+    assert not snapshot.errors
+    assert snapshot.block_number == node.web3.eth.block_number
+    assert snapshot.nonce == node.web3.eth.get_transaction_count(node.account, "pending")
+    assert snapshot.gas_price == node.web3.eth.gas_price
+
+
+def test_follows_the_chain(node):
+    monitor = SlotMonitor(node.url, node.echo, node.account, slots=[7])
+    before = monitor.read()
+    node.web3.eth.wait_for_transaction_receipt(
+        node.web3.eth.send_transaction({"from": node.account, "to": node.account, "value": 1}))
+    after = monitor.read()
+    assert after.block_number == before.block_number + 1
+    assert after.nonce == before.nonce + 1
+
+
+def test_splits_large_lists_into_batches(node):
+    slots = list(range(1, 26))
+    monitor = SlotMonitor(node.url, node.echo, node.account, slots=slots, max_batch=10)
+    snapshot = monitor.read()
+    assert monitor.round_trips == 3  # 28 calls
+    assert snapshot.balances == {s: s for s in slots}
+
+
+def test_failed_slot_reads_are_reported_per_slot(node):
+    monitor = SlotMonitor(node.url, node.reverter, slots=[1, 2])
+    snapshot = monitor.read()
+    assert snapshot.balances == {}
+    assert set(snapshot.errors) == {1, 2}
+    assert snapshot.balance(1, default=None) is None
+    assert snapshot.block_number is not None
+
+
+def test_slot_list_management(node):
+    monitor = SlotMonitor(node.url, node.echo, slots=[1, 1, 2])
+    monitor.add_slots([2, 3])
+    monitor.remove_slots([1])
+    assert monitor.slots == [2, 3]
+    assert monitor.read([5]).balances == {5: 5}
+
+
+def test_calldata_matches_web3():
+    from web3 import Web3
+    assert Web3.keccak(text="slotBalance(uint256)")[:4].hex() == SLOT_BALANCE_SELECTOR
+    assert Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4].hex() == AGGREGATE3_SELECTOR
+    assert encode_slot_balance(5) == "0x" + SLOT_BALANCE_SELECTOR + "0" * 63 + "5"
+
+
+def test_aggregate3_codec_matches_eth_abi():
+    from eth_abi import decode, encode
+    target = "0x" + "ab" * 20
+    calldatas = [encode_slot_balance(s) for s in (1, 2, 3)]
+    data = bytes.fromhex(encode_aggregate3(target, calldatas)[2 + 8:])
+    calls = decode(["(address,bool,bytes)[]"], data)[0]
+    assert [(c[0], c[1], "0x" + c[2].hex()) for c in calls] == [(target, True, d) for d in calldatas]
+
+    returned = [(True, (42).to_bytes(32, "big")), (False, b""), (True, (7).to_bytes(32, "big"))]
+    result = "0x" + encode(["(bool,bytes)[]"], [returned]).hex()
+    assert decode_aggregate3(result) == [(ok, "0x" + raw.hex()) for ok, raw in returned]
@@ -0,0 +1,160 @@
+"""SlotWatcher log folding against a scripted monitor (slotOf / slotBalance answered per block)."""
+
+import pytest
+
+from slot_monitor import RPCError, SlotSnapshot
+from slot_watcher import SLOT_CHANGED_TOPIC, SLOT_OF_SELECTOR, TRANSFER_VALUE_TOPIC, SlotWatcher
+
+
+class ScriptedMonitor:
+    """
+    Answers slotOf from `slots[(token, block)]` (falling back to `slots[token]`)
+    and slotBalance from `balances[(slot, block)]`; tokens in `failing` error out,
+    and so do the next `failing_reads` slotBalance reads. Serves `logs` up to `head`.
+    """
+    contract_address = "0x" + "11" * 20
+
+    def __init__(self, slots=None, balances=None):
+        self.slots = dict(slots or {})
+        self.balances = dict(balances or {})
+        self.failing = set()
+        self.failing_reads = 0
+        self.head = 0
+        self.logs = []
+        self.calls = []
+        self.reads = []
+
+    def batch(self, calls):
+        out = []
+        for method, params in calls:
+            if method == "eth_blockNumber":
+                out.append(hex(self.head))
+                continue
+            if method == "eth_getLogs":
+                start, end = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+                out.append([log for log in self.logs if start <= int(log["blockNumber"], 16) <= end])
+                continue
+            self.calls.append((method, params))
+            data, block = params[0]["data"], params[1]
+            assert data.startswith("0x" + SLOT_OF_SELECTOR)
+            token = int(data[10:], 16)
+            if token in self.failing:
+                out.append(RPCError("execution reverted"))
+                continue
+            slot = self.slots.get((token, block), self.slots.get(token))
+            out.append(hex(slot))
+        return out
+
+    def read(self, slots, block="latest"):
+        self.reads.append((list(slots), block))
+        if self.failing_reads:
+            self.failing_reads -= 1
+            raise RPCError("header not found")
+        snapshot = SlotSnapshot()
+        snapshot.block_number = 0
+        for slot in slots:
+            snapshot.balances[slot] = self.balances.get((slot, block), self.balances.get(slot, 0))
+        return snapshot
+
+
+def word(value):
+    return "0x" + format(value, "064x")
+
+
+def transfer(block, from_id, to_id, value, index=0):
+    return {"blockNumber": hex(block), "logIndex": hex(index),
+            "topics": [TRANSFER_VALUE_TOPIC, word(from_id), word(to_id)], "data": word(value)}
+
+
+def slot_changed(block, token_id, old_slot, new_slot, index=0):
+    return {"blockNumber": hex(block), "logIndex": hex(index),
+            "topics": [SLOT_CHANGED_TOPIC, word(token_id), word(old_slot), word(new_slot)], "data": "0x"}
+
+
+def make_watcher(monitor, thresholds, crossings=None):
+    watcher = SlotWatcher(monitor, thresholds,
+                          on_cross=lambda *args: crossings.append(args) if crossings is not None else None)
+    watcher.balances = {slot: 100 for slot in thresholds}
+    watcher.below = {slot: False for slot in thresholds}
+    watcher.last_block = 0
+    return watcher
+
+
+def test_transfers_move_value_between_slots():
+    monitor = ScriptedMonitor(slots={1: 10, 2: 20})
+    crossings = []
+    watcher = make_watcher(monitor, {10: 50, 20: 50}, crossings)
+    watcher.apply_logs([transfer(5, 1, 2, 60)], hex(5))
+    assert watcher.balances == {10: 40, 20: 160}
+    assert crossings == [(10, 40, 50, True)]
+    assert not watcher.dirty
+
+
+def test_slot_of_is_read_at_the_logs_block():
+    # Token 1 sat in slot 10 at block 5 and was moved to slot 20 later on
+    monitor = ScriptedMonitor(slots={(1, hex(5)): 10, 1: 20, 2: 30})
+    watcher = make_watcher(monitor, {10: 0, 20: 0})
+    watcher.apply_logs([transfer(5, 1, 2, 7)], hex(9))
+    assert [params[1] for _, params in monitor.calls] == [hex(5), hex(5)]
+    assert watcher.balances[10] == 93
+    assert watcher.balances[20] == 100
+
+
+def test_slot_change_later_in_range_needs_no_lookup():
+    monitor = ScriptedMonitor(slots={2: 30}, balances={10: 93, 20: 107})
+    watcher = make_watcher(monitor, {10: 0, 20: 0})
+    watcher.apply_logs([transfer(5, 1, 2, 7), slot_changed(6, 1, 10, 20)], hex(6))
+    assert [int(params[0]["data"][10:], 16) for _, params in monitor.calls] == [2]
+    assert watcher.token_slots[1] == 20
+    assert monitor.reads == [([10, 20], hex(6))]
+    assert watcher.balances == {10: 93, 20: 107}
+
+
+def test_unresolved_token_is_repaired_from_chain_state():
+    monitor = ScriptedMonitor(slots={1: 10, 2: 20}, balances={(10, hex(8)): 75})
+    monitor.failing.add(1)
+    watcher = make_watcher(monitor, {10: 0, 20: 0})
+    watcher.apply_logs([transfer(5, 1, 2, 25)], hex(5))
+    assert watcher.dirty == {1}
+    assert watcher.balances == {10: 100, 20: 125}  # the debit could not be applied
+
+    monitor.failing.clear()
+    watcher.apply_logs([], hex(8))
+    assert not watcher.dirty
+    assert watcher.token_slots[1] == 10
+    assert monitor.reads[-1] == ([10], hex(8))
+    assert watcher.balances[10] == 75
+
+
+def test_slot_change_clears_dirty_token():
+    monitor = ScriptedMonitor(slots={2: 20}, balances={10: 70, 30: 5})
+    monitor.failing.add(1)
+    watcher = make_watcher(monitor, {10: 0, 30: 0})
+    watcher.apply_logs([transfer(5, 1, 2, 30)], hex(5))
+    assert watcher.dirty == {1}
+    watcher.apply_logs([slot_changed(7, 1, 10, 30)], hex(7))
+    assert not watcher.dirty
+    assert watcher.token_slots[1] == 30
+    assert watcher.balances == {10: 70, 30: 5}
+
+
+def test_failed_read_leaves_the_range_to_be_retried_whole():
+    # Block 5 moves 40 out of slot 30; block 6 moves token 1 from slot 10 to 20, which needs a re-read
+    monitor = ScriptedMonitor(slots={2: 30, 3: 40}, balances={10: 60, 20: 140})
+    monitor.head = 6
+    monitor.logs = [transfer(5, 2, 3, 40), slot_changed(6, 1, 10, 20)]
+    crossings = []
+    watcher = make_watcher(monitor, {10: 0, 20: 0, 30: 70}, crossings)
+    monitor.failing_reads = 1
+    with pytest.raises(RPCError):
+        watcher.poll()
+    assert watcher.last_block == 0
+    assert watcher.balances == {10: 100, 20: 100, 30: 100}
+    assert 1 not in watcher.token_slots and not crossings and watcher.events == 0
+
+    assert watcher.poll() == 2
+    assert watcher.last_block == 6
+    assert watcher.balances == {10: 60, 20: 140, 30: 60}   # the debit is applied once
+    assert crossings == [(30, 60, 70, True)]
+    assert monitor.reads == [([10, 20], hex(6))] * 2
+    assert watcher.poll() == 0 and watcher.balances[30] == 60
@@ -0,0 +1,71 @@
+"""History strategies in the registry: volume handling and the shared regime history."""
+
+import numpy as np
+import pytest
+
+from regime import REGIME_DEFAULTS, REGIMES, RegimeBook
+from strategies import lookback
+from strategy_registry import SIGNAL_NAMES, strategies
+
+
+def trending(n=300, up=True):
+    step = 0.5 if up else -0.5
+    return 100 + step * np.arange(n) + np.sin(np.arange(n))
+
+
+def signal(name, close, volume, **params):
+    return SIGNAL_NAMES[int(strategies.compile(name, **params).fn(close, volume))]
+
+
+def test_momentum_without_volume_drops_the_filter():
+    assert signal("momentum", trending(up=True), None) == "buy"
+    assert signal("momentum", trending(up=False), None) == "sell"
+    # A store without recorded volume holds zeros: not a volume of zero
+    assert signal("momentum", trending(up=True), np.zeros(300)) == "buy"
+
+
+def test_momentum_filters_on_real_volume():
+    close = trending(up=True)
+    quiet, busy = np.full(300, 10.0), np.full(300, 10.0)
+    busy[-1] = 50.0
+    assert signal("momentum", close, quiet) == "hold"
+    assert signal("momentum", close, busy) == "buy"
+    assert signal("momentum", trending(up=False), busy) == "sell"
+
+
+def test_volume_must_line_up_with_close():
+    with pytest.raises(ValueError):
+        signal("momentum", trending(), np.ones(10))
+
+
+def test_regime_history_keeps_volume():
+    book = RegimeBook({"history": 5})
+    detector = book.update("BTC-USD", [1.0, 2.0, 3.0], ts=[1, 2, 3], volumes=[10.0, 20.0, 30.0])
+    assert detector.history_volume().tolist() == [10.0, 20.0, 30.0]
+    # Bars already pushed (by another agent) are skipped along with their volume
+    book.update("BTC-USD", [2.0, 3.0, 4.0], ts=[2, 3, 4], volumes=[20.0, 30.0, 40.0])
+    assert detector.history.values() == [1.0, 2.0, 3.0, 4.0]
+    assert detector.history_volume().tolist() == [10.0, 20.0, 30.0, 40.0]
+    book.update("BTC-USD", [5.0], ts=[5])
+    assert detector.history_volume() is None
+
+
+def windows(bars, n=1000, seed=0):
+    """Trailing (close, volume) windows of `bars` bars over a random walk with a mean-reverting swing."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.005, n))) + 3 * np.sin(np.arange(n) / 6)
+    volume = rng.lognormal(0, 0.5, n)
+    return [(close[end - bars:end], volume[end - bars:end]) for end in range(bars, n + 1)]
+
+
+@pytest.mark.parametrize("name", REGIMES)
+def test_each_regime_strategy_buys_and_sells_on_the_agents_history(name):
+    # TradingAgent hands history strategies lookback() bars (TRAINING_BARS / the regime history)
+    assert REGIME_DEFAULTS["history"] >= lookback()
+    seen = {signal(name, close, volume) for close, volume in windows(lookback())}
+    assert {"buy", "sell"} <= seen
+
+
+@pytest.mark.parametrize("name", ["trend", "hybrid"])
+def test_sma_200_rules_hold_on_a_100_bar_window(name):
+    assert {signal(name, close, volume) for close, volume in windows(100)} == {"hold"}
@@ -0,0 +1,283 @@
+"""NonceManager / TxPipeline on an eth-tester chain, with a txpool double for stuck and dropped transactions."""
+
+import math
+import threading
+import time
+
+import pytest
+
+from tx_pipeline import NonceManager, PipelineStopped, TransactionCancelled, TransactionReverted, TxPipeline, _method
+
+pytest.importorskip("eth_tester")
+rlp = pytest.importorskip("rlp")
+
+ECHO_BYTECODE = "0x600b600c600039600b6000f3" + "600435600052602060" + "00f3"
+REVERT_BYTECODE = "0x6005600c60003960056000f3" + "60006000fd"
+ECHO_ABI = [{"type": "function", "name": "slotBalance", "stateMutability": "nonpayable",
+             "inputs": [{"name": "slot", "type": "uint256"}], "outputs": [{"name": "", "type": "uint256"}]}]
+
+
+class TxPool:
+    """
+    Stands in for web3.eth in front of eth-tester (which mines every
+    transaction on arrival and rejects nonce gaps). Like a node's txpool it
+    holds transactions until the nonces before them arrive, and it drops the
+    broadcasts it is told to (`drop[nonce]` = how many), as a node that
+    evicts a transaction would. Broadcasts in `hold[nonce]` stay in the
+    mempool unmined (underpriced) until `mine_held` picks one of them.
+    """
+
+    def __init__(self, web3):
+        self.real = web3.eth
+        self.eth = self
+        self.account = web3.eth.account
+        self.drop = {}
+        self.hold = {}
+        self.held = {}
+        self.queued = {}
+        self.broadcasts = []
+        self.lock = threading.Lock()
+
+    @property
+    def gas_price(self):
+        return self.real.gas_price
+
+    @property
+    def chain_id(self):
+        return self.real.chain_id
+
+    def get_transaction_count(self, address, block="latest"):
+        with self.lock:
+            count = self.real.get_transaction_count(address)
+            if block == "pending":
+                while count in self.queued or count in self.held:
+                    count += 1
+            return count
+
+    def send_raw_transaction(self, raw):
+        from web3 import Web3
+        nonce = int.from_bytes(rlp.decode(bytes(raw))[0], "big")
+        with self.lock:
+            self.broadcasts.append(nonce)
+            if self.drop.get(nonce, 0) > 0:
+                self.drop[nonce] -= 1
+            elif self.hold.get(nonce, 0) > 0:
+                self.hold[nonce] -= 1
+                self.held.setdefault(nonce, []).append(bytes(raw))
+            else:
+                self.queued[nonce] = bytes(raw)
+                self._flush()
+        return Web3.keccak(raw)
+
+    def mine_held(self, nonce, index=0):
+        """Mine the `index`-th held broadcast at `nonce`; the others are displaced by it."""
+        with self.lock:
+            self.queued[nonce] = self.held.pop(nonce)[index]
+            self._flush()
+
+    def _flush(self):
+        # Single sender in these tests: forward transactions as their nonce comes up
+        while self.queued:
+            nonce = min(self.queued)
+            raw = self.queued[nonce]
+            try:
+                self.real.send_raw_transaction(raw)
+            except Exception:  # a gap before it; wait for the missing nonce
+                return
+            del self.queued[nonce]
+
+    def get_transaction_receipt(self, tx_hash):
+        return self.real.get_transaction_receipt(tx_hash)
+
+
+@pytest.fixture
+def chain():
+    from eth_account import Account
+    from web3 import EthereumTesterProvider, Web3
+    web3 = Web3(EthereumTesterProvider())
+    account = Account.create()
+    web3.eth.wait_for_transaction_receipt(web3.eth.send_transaction(
+        {"from": web3.eth.accounts[0], "to": account.address, "value": 10**20}))
+    return web3, account
+
+
+@pytest.fixture
+def pool(chain):
+    return TxPool(chain[0])
+
+
+def transfer(chain, value=1):
+    return {"to": chain[0].eth.accounts[1], "value": value}
+
+
+def make_pipeline(web3, account, **kwargs):
+    kwargs = dict(dict(gas=21000, poll_interval=0.02, stuck_after=0.2, max_replacements=2), **kwargs)
+    return TxPipeline(web3, account, **kwargs).start()
+
+
+def test_sends_in_nonce_order(chain):
+    web3, account = chain
+    pipeline = make_pipeline(web3, account, max_in_flight=3)
+    try:
+        pending = [pipeline.submit(transfer(chain, i + 1), label=str(i)) for i in range(10)]
+        receipts = [p.result(timeout=10) for p in pending]
+    finally:
+        pipeline.stop()
+    assert [p.nonce for p in pending] == list(range(10))
+    assert all(r["status"] == 1 for r in receipts)
+    assert web3.eth.get_transaction_count(account.address) == 10
+    assert (pipeline.sent, pipeline.confirmed, pipeline.failed) == (10, 10, 0)
+
+
+def test_contract_call(chain):
+    web3, account = chain
+    contract_address = web3.eth.wait_for_transaction_receipt(
+        web3.eth.send_transaction({"from": web3.eth.accounts[0], "data": ECHO_BYTECODE}))["contractAddress"]
+    contract = web3.eth.contract(address=contract_address, abi=ECHO_ABI)
+    pipeline = make_pipeline(web3, account, gas=100000)
+    try:
+        receipt = pipeline.submit(contract.functions.slotBalance(5)).result(timeout=10)
+    finally:
+        pipeline.stop()
+    assert receipt["to"] == contract_address
+    assert receipt["status"] == 1
+
+
+def test_stuck_transaction_is_replaced(chain, pool):
+    web3, account = chain
+    pool.drop[0] = 1
+    pipeline = make_pipeline(pool, account)
+    try:
+        pending = pipeline.submit(transfer(chain))
+        receipt = pending.result(timeout=10)
+    finally:
+        pipeline.stop()
+    assert pending.replacements == 1
+    assert receipt["transactionHash"].hex().removeprefix("0x") == pending.hashes[-1].removeprefix("0x")
+    assert web3.eth.get_transaction(receipt["transactionHash"])["gasPrice"] > web3.eth.gas_price
+
+
+def test_dropped_nonce_is_reused(chain, pool):
+    web3, account = chain
+    pool.drop[0] = math.inf
+    pipeline = make_pipeline(pool, account, max_replacements=1)
+    try:
+        dropped = pipeline.submit(transfer(chain))
+        with pytest.raises(TimeoutError):
+            dropped.result(timeout=10)
+        later = [pipeline.submit(transfer(chain)) for _ in range(3)]
+        pool.drop.clear()
+        receipts = [p.result(timeout=10) for p in later]
+    finally:
+        pipeline.stop()
+    assert pool.broadcasts[:2] == [0, 0]  # original and one replacement
+    assert [p.nonce for p in later] == [0, 1, 2]
+    assert all(r["status"] == 1 for r in receipts)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_stuck_transaction_in_the_mempool_is_cancelled(chain, pool):
+    web3, account = chain
+    pool.hold[0] = 2   # original and its replacement sit in the mempool, underpriced
+    pipeline = make_pipeline(pool, account, max_replacements=1)
+    try:
+        stuck = pipeline.submit(transfer(chain, 7))
+        with pytest.raises(TransactionCancelled):
+            stuck.result(timeout=10)
+        later = pipeline.submit(transfer(chain))
+        later.result(timeout=10)
+    finally:
+        pipeline.stop()
+    assert len(stuck.cancel_hashes) == 1
+    cancel = web3.eth.get_transaction(stuck.cancel_hashes[0])
+    assert (cancel["nonce"], cancel["to"], cancel["value"]) == (0, account.address, 0)
+    assert later.nonce == 1   # nonce 0 was never handed out again
+
+
+def test_stuck_transaction_mined_late_resolves_its_future(chain, pool):
+    web3, account = chain
+    pool.hold[0] = math.inf
+    pipeline = make_pipeline(pool, account, max_replacements=1)
+    try:
+        stuck = pipeline.submit(transfer(chain, 7))
+        wait_for(lambda: stuck.cancel_hashes)
+        assert not stuck.done()   # still reserved: the original may yet be mined
+        follower = pipeline.submit(transfer(chain))
+        pool.mine_held(0, index=0)
+        receipt = stuck.result(timeout=10)
+        follower.result(timeout=10)
+    finally:
+        pipeline.stop()
+    assert receipt["status"] == 1
+    assert web3.eth.get_transaction(receipt["transactionHash"])["value"] == 7
+    assert follower.nonce == 1
+    assert web3.eth.get_transaction_count(account.address) == 2
+
+
+def test_reverted_receipt_fails_the_future(chain):
+    web3, account = chain
+    reverter = web3.eth.wait_for_transaction_receipt(
+        web3.eth.send_transaction({"from": web3.eth.accounts[0], "data": REVERT_BYTECODE}))["contractAddress"]
+    pipeline = make_pipeline(web3, account, gas=100000)
+    try:
+        pending = pipeline.submit({"to": reverter, "value": 0, "data": "0x"})
+        with pytest.raises(TransactionReverted) as err:
+            pending.result(timeout=10)
+    finally:
+        pipeline.stop()
+    assert err.value.receipt["status"] == 0
+    assert (pipeline.confirmed, pipeline.failed) == (0, 1)
+
+
+def test_stop_with_full_window_and_queued_jobs(chain, pool):
+    _, account = chain
+    pool.drop.update({n: math.inf for n in range(10)})
+    pipeline = make_pipeline(pool, account, max_in_flight=2, stuck_after=60)
+    pending = [pipeline.submit(transfer(chain)) for _ in range(5)]
+    deadline = time.monotonic() + 5
+    while pipeline.in_flight() < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pipeline.in_flight() == 2
+    stopper = threading.Thread(target=pipeline.stop)
+    stopper.start()
+    stopper.join(timeout=2)
+    assert not stopper.is_alive(), "stop() hung with the in-flight window full"
+    for p in pending[2:]:
+        with pytest.raises(PipelineStopped):
+            p.result(timeout=1)
+    assert not any(p.done() for p in pending[:2])
+
+
+def test_restart_after_stop(chain):
+    web3, account = chain
+    pipeline = make_pipeline(web3, account)
+    pipeline.stop()
+    pipeline.start()
+    try:
+        assert pipeline.submit(transfer(chain)).result(timeout=10)["status"] == 1
+    finally:
+        pipeline.stop()
+
+
+def test_nonce_manager_release(chain):
+    web3, account = chain
+    nonces = NonceManager(web3, account.address)
+    assert [nonces.next() for _ in range(4)] == [0, 1, 2, 3]
+    nonces.release(1)
+    nonces.release(3)
+    nonces.release(1)
+    assert [nonces.next() for _ in range(3)] == [1, 3, 4]
+    assert nonces.sync() == 0
+
+
+def test_zero_gas_price_is_not_a_missing_attribute():
+    class Eth:  # web3 v6+: snake_case only
+        gas_price = 0
+
+    assert _method(Eth(), "gas_price", "gasPrice") == 0
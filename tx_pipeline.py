@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+"""
+Transaction Pipeline
+-----------------------------
+
+Local nonce tracking and a background send/receipt pipeline for the
+ERC-3525 agent, replacing the `getTransactionCount` -> `buildTransaction`
+-> sign -> send sequence that ran synchronously for every mint.
+
+- NonceManager : fetches the pending nonce once, then hands nonces out locally
+                 (nonces given back are handed out again first, so a dropped
+                 transaction does not leave a gap that blocks every later one)
+- TxPipeline   : builds and signs on a worker thread, keeps up to
+                 `max_in_flight` transactions outstanding, follows receipts on
+                 a second thread and re-sends stuck transactions at the same
+                 nonce with a bumped gas price.
+
+A nonce is only handed out again when nothing sent at it can still be mined:
+after `max_replacements` a transaction the node no longer knows (dropped) gives
+its nonce back; one still in the mempool is cancelled with a 0-value
+self-transfer at its nonce, and its future resolves only once one of its
+transactions (original, replacement or cancel) is mined. A reverted receipt
+fails the future (TransactionReverted).
+
+Works with both web3 v5 (camelCase, as used by agent2.py) and v6+ (snake_case).
+"""
+
+import heapq
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+# Nodes refuse a replacement unless its gas price is at least ~10% higher.
+MIN_REPLACEMENT_BUMP = 1.101
+
+
+def _method(obj, snake, camel):
+    # `is None`, not truthiness: properties such as gas_price can legitimately be 0
+    value = getattr(obj, snake, None)
+    return value if value is not None else getattr(obj, camel)
+
+
+def _raw(signed):
+    return _method(signed, "raw_transaction", "rawTransaction")
+
+
+def _hex(value):
+    return value.hex() if hasattr(value, "hex") else str(value)
+
+
+# ================================
+# 1. NONCE MANAGER
+# ================================
+class NonceManager:
+    """Thread-safe local nonce counter, synced from the node's pending count on demand."""
+
+    def __init__(self, web3, address):
+        self.web3 = web3
+        self.address = address
+        self._next = None
+        self._free = []   # heap of released nonces below _next, reused lowest first
+        self._lock = threading.Lock()
+
+    def _pending_count(self):
+        return _method(self.web3.eth, "get_transaction_count", "getTransactionCount")(self.address, "pending")
+
+    def sync(self):
+        with self._lock:
+            self._next = self._pending_count()
+            self._free = []
+            return self._next
+
+    def next(self):
+        with self._lock:
+            if self._free:
+                return heapq.heappop(self._free)
+            if self._next is None:
+                self._next = self._pending_count()
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce):
+        """
+        Give back a nonce that will not be mined (never broadcast, or dropped by
+        the node). Later transactions wait on it, so it is the next one handed out.
+        """
+        with self._lock:
+            if self._next is None or nonce >= self._next or nonce in self._free:
+                return
+            if nonce == self._next - 1:
+                self._next = nonce
+            else:
+                heapq.heappush(self._free, nonce)
+
+
+# ================================
+# 2. PIPELINE
+# ================================
+class PipelineStopped(RuntimeError):
+    """The pipeline was stopped before the transaction was sent."""
+
+
+class TransactionReverted(RuntimeError):
+    """The transaction was mined with status 0; `receipt` holds its receipt."""
+
+    def __init__(self, message, receipt):
+        super().__init__(message)
+        self.receipt = receipt
+
+
+class TransactionCancelled(TimeoutError):
+    """Stuck past max_replacements and cancelled: the 0-value self-transfer took its nonce."""
+
+    def __init__(self, message, receipt):
+        super().__init__(message)
+        self.receipt = receipt
+
+# Send errors that mean the node already holds a transaction at this nonce
+_NONCE_CONFLICTS = ("nonce", "underpriced", "already known")
+
+
+class PendingTx:
+    """Handle for a submitted transaction; `result()` waits for its receipt."""
+
+    def __init__(self, build, label=None):
+        self.build = build
+        self.label = label
+        self.tx = None
+        self.nonce = None
+        self.tx_hash = None
+        self.hashes = []
+        self.cancel_hashes = []   # 0-value self-transfers sent to free the nonce
+        self.sent_at = None
+        self.replacements = 0
+        self.future = Future()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def done(self):
+        return self.future.done()
+
+    def __repr__(self):
+        return f"PendingTx({self.label!r}, nonce={self.nonce}, hash={self.tx_hash}, replacements={self.replacements})"
+
+
+class TxPipeline:
+    """
+    Background transaction pipeline for one account.
+
+        pipeline = TxPipeline(web3, account).start()
+        pending = pipeline.submit(contract.functions._mint(account.address, slot, amount), label=f"slot {slot}")
+        ...
+        pending.result(timeout=120)   # receipt
+
+    `submit` accepts a contract function call (built with buildTransaction) or
+    a transaction dict. Nonce, gas and gasPrice are filled in by the pipeline.
+    """
+
+    def __init__(self, web3, account, max_in_flight=8, gas=300000, gas_price=None, poll_interval=1.0,
+                 stuck_after=60.0, gas_bump=1.125, max_replacements=3, nonce_manager=None):
+        self.web3 = web3
+        self.account = account
+        self.gas = gas
+        self.gas_price = gas_price
+        self.poll_interval = poll_interval
+        self.stuck_after = stuck_after
+        self.gas_bump = max(gas_bump, MIN_REPLACEMENT_BUMP)
+        self.max_replacements = max_replacements
+        self.nonces = nonce_manager or NonceManager(web3, account.address)
+        self._jobs = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.sent = 0
+        self.confirmed = 0
+        self.failed = 0
+
+    # -------- lifecycle --------
+    def start(self):
+        if not self._threads:
+            self._stop.clear()
+            for target, name in ((self._send_loop, "tx-sender"), (self._receipt_loop, "tx-receipts")):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self, wait=True):
+        """
+        Stop both threads. Queued transactions that were not sent yet fail with
+        PipelineStopped; in-flight ones stay tracked and resolve if the pipeline
+        is started again.
+        """
+        self._stop.set()
+        self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def submit(self, build, label=None):
+        """Queue a transaction; returns a PendingTx immediately."""
+        pending = PendingTx(build, label)
+        self._jobs.put(pending)
+        return pending
+
+    def drain(self, timeout=None):
+        """Wait until every queued and in-flight transaction has resolved."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._jobs.unfinished_tasks or self.in_flight():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(min(self.poll_interval, 0.05))
+        return True
+
+    # -------- building / signing --------
+    def _current_gas_price(self):
+        if self.gas_price is not None:
+            return self.gas_price
+        return _method(self.web3.eth, "gas_price", "gasPrice")
+
+    def _build(self, pending, nonce, gas_price):
+        params = {"from": self.account.address, "nonce": nonce, "gas": self.gas, "gasPrice": gas_price}
+        if isinstance(pending.build, dict):
+            tx = dict(pending.build)
+            for key, value in params.items():
+                tx.setdefault(key, value)
+            tx["nonce"], tx["gasPrice"] = nonce, gas_price
+            tx.setdefault("chainId", _method(self.web3.eth, "chain_id", "chainId"))
+            return tx
+        return _method(pending.build, "build_transaction", "buildTransaction")(params)
+
+    def _sign_and_send(self, tx):
+        sign = _method(self.web3.eth.account, "sign_transaction", "signTransaction")
+        signed = sign(tx, private_key=getattr(self.account, "key", None) or self.account.privateKey)
+        return _method(self.web3.eth, "send_raw_transaction", "sendRawTransaction")(_raw(signed))
+
+    def _acquire_slot(self):
+        # Wait for an in-flight slot, but give up on stop: the receipt loop that frees slots exits then
+        while not self._slots.acquire(timeout=min(self.poll_interval, 0.05)):
+            if self._stop.is_set():
+                return False
+        return True
+
+    def _abandon(self, pending):
+        pending.future.set_exception(PipelineStopped(f"Transaction {pending.label or ''} not sent: pipeline stopped"))
+        self._jobs.task_done()
+
+    def _send_loop(self):
+        while not self._stop.is_set():
+            pending = self._jobs.get()
+            if pending is None:  # stop() sentinel; a stale one left by an earlier stop is skipped
+                self._jobs.task_done()
+                if self._stop.is_set():
+                    break
+                continue
+            if not self._acquire_slot():
+                self._abandon(pending)
+                break
+            nonce = None
+            try:
+                nonce = self.nonces.next()
+                with span("build_tx"):
+                    tx = self._build(pending, nonce, self._current_gas_price())
+                with span("send_tx"):
+                    tx_hash = self._sign_and_send(tx)
+            except Exception as e:
+                self._slots.release()
+                if nonce is not None:
+                    # "nonce too low" / "replacement transaction underpriced": the node already has a
+                    # transaction at this nonce, so our count is off; ask the node instead of reusing it
+                    if any(conflict in str(e).lower() for conflict in _NONCE_CONFLICTS):
+                        self.nonces.sync()
+                    else:
+                        self.nonces.release(nonce)
+                self.failed += 1
+                logger.error(f"Error sending transaction {pending.label or ''}: {e}", exc_info=True)
+                pending.future.set_exception(e)
+            else:
+                pending.tx, pending.nonce, pending.tx_hash = tx, nonce, _hex(tx_hash)
+                pending.hashes.append(pending.tx_hash)
+                pending.sent_at = time.monotonic()
+                with self._lock:
+                    self._in_flight[nonce] = pending
+                self.sent += 1
+                logger.info(f"Transaction sent {pending.label or ''} nonce={nonce} hash={pending.tx_hash}")
+            finally:
+                self._jobs.task_done()
+        while True:
+            try:
+                pending = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                self._jobs.task_done()
+            else:
+                self._abandon(pending)
+
+    # -------- receipts / replacement --------
+    def _receipt(self, tx_hash):
+        try:
+            with span("rpc_receipt"):
+                return _method(self.web3.eth, "get_transaction_receipt", "getTransactionReceipt")(tx_hash)
+        except Exception:  # TransactionNotFound while pending
+            return None
+
+    def _replace(self, pending):
+        tx = dict(pending.tx)
+        tx["gasPrice"] = max(int(tx["gasPrice"] * self.gas_bump), self._current_gas_price())
+        try:
+            tx_hash = self._sign_and_send(tx)
+        except Exception as e:
+            # Typically "nonce too low": an earlier hash was mined in the meantime.
+            logger.warning(f"Replacement for nonce {pending.nonce} not sent: {e}")
+            return
+        pending.tx, pending.tx_hash = tx, _hex(tx_hash)
+        pending.hashes.append(pending.tx_hash)
+        pending.sent_at = time.monotonic()
+        pending.replacements += 1
+        logger.info(f"Replaced stuck transaction nonce={pending.nonce} gasPrice={tx['gasPrice']} hash={pending.tx_hash}")
+
+    def _cancel(self, pending):
+        """Send a 0-value self-transfer at the stuck transaction's nonce, outbidding it."""
+        gas_price = max(int(pending.tx["gasPrice"] * self.gas_bump), self._current_gas_price())
+        tx = {"from": self.account.address, "to": self.account.address, "value": 0, "nonce": pending.nonce,
+              "gas": 21000, "gasPrice": gas_price, "chainId": _method(self.web3.eth, "chain_id", "chainId")}
+        try:
+            tx_hash = _hex(self._sign_and_send(tx))
+        except Exception as e:
+            logger.warning(f"Cancellation for nonce {pending.nonce} not sent: {e}")
+            return
+        pending.tx = tx
+        pending.hashes.append(tx_hash)
+        pending.cancel_hashes.append(tx_hash)
+        pending.sent_at = time.monotonic()
+        logger.warning(f"Cancelling stuck transaction {pending.label or ''} nonce={pending.nonce} "
+                       f"gasPrice={gas_price} hash={tx_hash}")
+
+    def _dropped(self, pending):
+        """True when the node holds nothing at the transaction's nonce (mined or pending)."""
+        try:
+            count = _method(self.web3.eth, "get_transaction_count", "getTransactionCount")(
+                self.account.address, "pending")
+        except Exception:
+            return False
+        return count <= pending.nonce
+
+    def _finish(self, pending, receipt=None, error=None):
+        with self._lock:
+            self._in_flight.pop(pending.nonce, None)
+        self._slots.release()
+        if error is None and receipt is not None and receipt.get("status") == 0:
+            error = TransactionReverted(f"Transaction {pending.label or ''} nonce={pending.nonce} reverted", receipt)
+        if error is not None:
+            self.failed += 1
+            pending.future.set_exception(error)
+        else:
+            self.confirmed += 1
+            pending.future.set_result(receipt)
+
+    def poll_once(self):
+        with self._lock:
+            outstanding = sorted(self._in_flight.values(), key=lambda p: p.nonce)
+        for pending in outstanding:
+            mined, receipt = next(((h, r) for h, r in ((h, self._receipt(h)) for h in reversed(pending.hashes))
+                                   if r is not None), (None, None))
+            if receipt is not None:
+                if mined in pending.cancel_hashes:
+                    self._finish(pending, error=TransactionCancelled(
+                        f"Transaction {pending.label or ''} nonce={pending.nonce} cancelled after "
+                        f"{pending.replacements} replacements", receipt))
+                else:
+                    self._finish(pending, receipt)
+            elif time.monotonic() - pending.sent_at > self.stuck_after:
+                if pending.replacements < self.max_replacements:
+                    self._replace(pending)
+                elif self._dropped(pending):
+                    # Nothing at this nonce can be mined any more: give it to the next transaction,
+                    # or every later nonce stays stuck behind the gap
+                    self.nonces.release(pending.nonce)
+                    self._finish(pending, error=TimeoutError(f"Transaction nonce={pending.nonce} dropped after "
+                                                             f"{pending.replacements} replacements"))
+                elif len(pending.cancel_hashes) < self.max_replacements:
+                    self._cancel(pending)
+                # Otherwise the nonce stays reserved and its hashes are polled until one is mined
+
+    def _receipt_loop(self):
+        while not self._stop.is_set():
+            if self.in_flight():
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    logger.error(f"Error polling receipts: {e}", exc_info=True)
+            self._stop.wait(self.poll_interval)